@@ -7,31 +7,52 @@ from subscriptions.models import Subscription
 from bot.utils.user_autobuy_tasks import user_autobuy_tasks
 from bot.utils.mexc import handle_mexc_response
 from bot.utils.api_errors import parse_mexc_error
-from bot.utils.mexc_rest import MexcRestClient
+from bot.utils.mexc_rest import MexcRestClient, rest_client_for
+from bot.utils.order_fills import OrderFill, order_fills
+from bot.utils.pnl_rollup import transition_deal_status
+from bot.utils.deal_numbers import next_user_order_number
+from bot.utils.message_bus import message_bus, Priority
+from bot.utils.execution_latency import ExecutionTimer, execution_latency
+from bot.utils.user_settings_cache import UserSettings, user_settings_cache
+from bot.utils.autobuy_state import AutobuyState, ActiveOrder
+from bot.utils.autobuy_triggers import (
+    apply_user_settings,
+    attach_autobuy_state,
+    detach_autobuy_state,
+)
 from bot.logger import logger
 from bot.utils.error_notifier import notify_user_autobuy_error
 from decimal import Decimal
-from bot.constants import MAX_FAILS
+from bot.constants import (
+    DEAL_PERSIST_ATTEMPTS,
+    DEAL_PERSIST_RETRY_DELAY,
+    MAX_FAILS,
+    ORDER_FILL_WAIT_TIMEOUT,
+)
 import json
 import time
 import weakref
 import gc
+from typing import Dict, Optional, Set
 
-# Словарь для хранения состояния autobuy для каждого пользователя
-autobuy_states = {}  # {user_id: {'last_buy_price': float, 'active_orders': [], etc.}}
+# Состояние autobuy для каждого пользователя
+autobuy_states: Dict[int, AutobuyState] = {}
 
-# Глобальные переменные для отслеживания триггеров
-trigger_states = {}  # {user_id: {'trigger_price': float, 'trigger_time': float, 'is_rise_trigger': bool}}
+# Фоновые задачи после покупки (запись сделки, уведомления): держим ссылки до завершения
+_background_tasks: Set[asyncio.Task] = set()
+
+# loss/pause/autobuy из кэша настроек сразу попадают в книгу триггеров
+user_settings_cache.add_listener(apply_user_settings)
 
 
 async def autobuy_loop(message: Message, telegram_id: int):
-    startup_fail_count = 0
+    from bot.utils.autobuy_restart import FakeMessage
 
-    # Используем lock для предотвращения одновременных закупок
-    buy_lock = asyncio.Lock()
+    # Все ответы автобая идут через очередь message_bus, цикл не ждет Telegram
+    if not isinstance(message, FakeMessage):
+        message = FakeMessage(telegram_id)
 
-    # Глобальная сессия для всех запросов пользователя
-    session = None
+    startup_fail_count = 0
 
     while startup_fail_count < MAX_FAILS:
         try:
@@ -39,41 +60,14 @@ async def autobuy_loop(message: Message, telegram_id: int):
             from bot.utils.websocket_manager import websocket_manager
 
             user = await sync_to_async(User.objects.get)(telegram_id=telegram_id)
-            rest = MexcRestClient(api_key=user.api_key, api_secret=user.api_secret)
+            user_settings_cache.put(user)
+            rest = rest_client_for(user.api_key, user.api_secret)
             symbol = user.pair.replace("/", "")
 
             # Инициализируем состояние для пользователя, если его еще нет
             if telegram_id not in autobuy_states:
-                autobuy_states[telegram_id] = {
-                    "active_orders": [],
-                    "last_buy_price": None,
-                    "current_price": None,
-                    "price_callbacks": [],
-                    "bookticker_callbacks": [],
-                    "last_trade_time": 0,
-                    "is_ready": False,
-                    "waiting_for_opportunity": False,  # Флаг ожидания новой возможности
-                    "restart_after": 0,  # Временная метка для возобновления покупок
-                    "waiting_reported": False,  # Флаг для отслеживания, сообщили ли мы о том, что ожидаем
-                    "consecutive_errors": 0,  # Счетчик последовательных ошибок
-                    "last_drop_notification": 0,  # Время последнего уведомления о падении
-                    "last_rise_notification": 0,  # Время последнего уведомления о росте
-                    "last_buy_success_time": 0,  # Время последней успешной покупки
-                    "last_order_filled_time": 0,  # Время последнего завершения сделки
-                    "trigger_price": None,  # Цена триггера для покупок на росте
-                    "trigger_time": 0,  # Время установки триггера
-                    "trigger_activated_time": 0,  # Время активации триггера (когда цена пересекла триггер)
-                    "is_rise_trigger": False,  # Флаг триггера на росте
-                    "is_trigger_activated": False,  # Флаг активации триггера
-                    "pause_trend_prices": [],  # Список цен во время паузы для анализа тренда
-                    "trend_only_rise": True,  # Флаг исключительного роста во время паузы
-                    "last_pause_price": None,  # Последняя цена во время паузы
-                    "rise_buy_count": 0,  # Счетчик покупок на росте в текущем цикле
-                    "last_ask_price": None,  # Последняя ask цена для анализа триггеров
-                    "last_mid_price": None,  # Последняя mid цена для анализа тренда
-                    "buy_in_progress": False,  # Глобальный флаг покупки
-                    "buy_lock": asyncio.Lock(),  # Глобальная блокировка покупки на пользователя
-                }
+                autobuy_states[telegram_id] = AutobuyState(telegram_id)
+            state = autobuy_states[telegram_id]
 
             # Восстанавливаем активные ордера из БД
             deals_qs = Deal.objects.filter(
@@ -83,29 +77,15 @@ async def autobuy_loop(message: Message, telegram_id: int):
             active_deals = await sync_to_async(list)(deals_qs)
 
             # Заполняем активные ордера
-            active_orders = []
-            for deal in active_deals:
-                active_orders.append(
-                    {
-                        "order_id": deal.order_id,
-                        "buy_price": float(deal.buy_price),
-                        "notified": False,
-                        "user_order_number": deal.user_order_number,
-                    }
-                )
-
-            autobuy_states[telegram_id]["active_orders"] = active_orders
+            state.replace_orders(ActiveOrder.from_deal(deal) for deal in active_deals)
+            active_orders = state.active_orders
 
             # Если есть активные ордера, устанавливаем last_buy_price на основе последнего
             if active_orders:
-                most_recent_order = max(
-                    active_orders, key=lambda x: x.get("user_order_number", 0)
-                )
-                autobuy_states[telegram_id]["last_buy_price"] = most_recent_order[
-                    "buy_price"
-                ]
+                most_recent_order = state.latest_order()
+                state.last_buy_price = most_recent_order.buy_price
                 logger.info(
-                    f"Установлена цена последней покупки: {most_recent_order['buy_price']} для пользователя {telegram_id}"
+                    f"Установлена цена последней покупки: {most_recent_order.buy_price} для пользователя {telegram_id}"
                 )
 
             # Проверяем, есть ли соединение с WebSocket для рыночных данных
@@ -118,147 +98,33 @@ async def autobuy_loop(message: Message, telegram_id: int):
                 await websocket_manager.subscribe_bookticker_data([symbol])
                 logger.info(f"Подписались на bookTicker данные для {symbol}")
 
-            # Регистрируем колбэк для bookTicker данных (заменяет старый колбэк для цен)
-            async def update_bookticker_for_autobuy(
-                symbol_name, bid_price, ask_price, bid_qty, ask_qty
-            ):
-                try:
-                    # Проверяем, что пользователь все еще в режиме автобай
-                    user_data = await sync_to_async(
-                        User.objects.filter(
-                            telegram_id=telegram_id, autobuy=True
-                        ).exists
-                    )()
-                    if not user_data:
-                        return
-
-                    # Получаем информацию о направлении цены
-                    direction_info = websocket_manager.get_price_direction(symbol_name)
-                    is_rise = direction_info.get("is_rise", False)
-                    current_time = time.time()
-                    mid_price = (float(bid_price) + float(ask_price)) / 2
-
-                    # Получаем актуальные настройки пользователя
-                    user_settings = await sync_to_async(User.objects.get)(
-                        telegram_id=telegram_id
-                    )
-                    loss_threshold = float(user_settings.loss)
-                    profit_percent = float(user_settings.profit)
-                    pause_seconds = user_settings.pause
-
-                    # Обновляем текущую цену
-                    autobuy_states[telegram_id]["current_price"] = mid_price
-
-                    # Логируем обновление bookTicker
-                    # logger.info(f"BookTicker update for {telegram_id} ({symbol_name}): bid={bid_price}, ask={ask_price}, mid={mid_price:.6f}, is_rise={is_rise}")
-
-                    # Проверяем триггеры для покупок на росте
-                    await check_rise_triggers(
-                        telegram_id,
-                        symbol_name,
-                        float(bid_price),
-                        float(ask_price),
-                        is_rise,
-                        current_time,
-                        user_settings,
-                    )
-
-                    # Проверяем условия для покупок на падении (используем ask цену)
-                    last_buy_price = autobuy_states[telegram_id]["last_buy_price"]
-                    if last_buy_price is not None:
-                        ask_price = float(ask_price)
-                        price_drop_percent = (
-                            ((last_buy_price - ask_price) / last_buy_price * 100)
-                            if last_buy_price > 0
-                            else 0
-                        )
-                        last_drop_notification = autobuy_states[telegram_id].get(
-                            "last_drop_notification", 0
-                        )
-
-                        if (
-                            price_drop_percent >= loss_threshold
-                            and (current_time - last_drop_notification) > 10
-                        ):
-                            autobuy_states[telegram_id]["last_drop_notification"] = (
-                                current_time
-                            )
-                            logger.info(
-                                f"Price drop condition met for {telegram_id}: ask={ask_price:.6f}, last_buy={last_buy_price:.6f}, drop={price_drop_percent:.2f}% >= {loss_threshold:.2f}%"
-                            )
-
-                            # Send notification using bot instance directly
-                            from bot.config import bot_instance
-
-                            try:
-                                await bot_instance.send_message(
-                                    telegram_id,
-                                    f"🔻 Обнаружено падение цены для {symbol_name}\n\n"
-                                    f"🔻 Цена ({ask_price:.6f} USDC) снизилась на {price_drop_percent:.2f}% от покупки по {last_buy_price:.6f} USDC. \n"
-                                    f"Покупаем по условию падения ({loss_threshold:.2f}%).",
-                                )
-                                logger.info(f"Drop notification sent to {telegram_id}")
-                            except Exception as e:
-                                logger.error(
-                                    f"Failed to send drop notification to {telegram_id}: {e}"
-                                )
-
-                            # Перед запуском покупки проверяем очередь в памяти и в БД, а также флаг покупки
-                            state = autobuy_states.get(telegram_id, {})
-                            if state.get("buy_in_progress"):
-                                logger.info(
-                                    f"Skip price_drop buy: buy_in_progress for {telegram_id}"
-                                )
-                                return
-
-                            # Create a fake message object for process_buy
-                            from bot.utils.autobuy_restart import FakeMessage
-                            from bot.config import bot_instance
-
-                            fake_message = FakeMessage(telegram_id, bot_instance)
-                            logger.info(
-                                f"Starting process_buy for {telegram_id} due to price drop"
-                            )
-                            asyncio.create_task(
-                                process_buy(
-                                    telegram_id,
-                                    "price_drop",
-                                    fake_message,
-                                    user_settings,
-                                )
-                            )
-
-                except Exception as e:
-                    logger.error(
-                        f"Ошибка в обработчике bookTicker autobuy для {telegram_id} ({symbol_name}): {e}",
-                        exc_info=True,
-                    )
-
-            # Регистрируем колбэк с WebSocket менеджером
-            await websocket_manager.register_bookticker_callback(
-                symbol, update_bookticker_for_autobuy
-            )
-            autobuy_states[telegram_id]["bookticker_callbacks"].append(
-                update_bookticker_for_autobuy
+            # Подключаем пользователя к книге триггеров пары: на пару регистрируется
+            # один колбэк bookTicker, условия падения/роста считаются векторно для всех
+            await attach_autobuy_state(
+                symbol,
+                state,
+                user_settings_cache.get(telegram_id),
+                on_drop=handle_drop_trigger,
+                on_rise=handle_rise_trigger,
             )
-            logger.info(f"Registered bookTicker callback for {telegram_id} on {symbol}")
+            logger.info(f"Attached autobuy state for {telegram_id} to {symbol} trigger book")
 
             # Получаем текущую цену через REST API для начала
             ticker_data = await rest.ticker_price(symbol)
             handle_mexc_response(ticker_data, "Получение цены")
             current_price = float(ticker_data["price"])
-            autobuy_states[telegram_id]["current_price"] = current_price
+            state.current_price = current_price
             logger.info(f"Получена начальная цена для {telegram_id}: {current_price}")
 
             # Отмечаем, что система готова обрабатывать обновления
-            autobuy_states[telegram_id]["is_ready"] = True
+            state.is_ready = True
 
             # Если нет активных ордеров и есть начальная цена, делаем первую покупку
             if not active_orders and current_price > 0:
                 logger.info(
                     f"Запускаем первую покупку для {telegram_id} по цене {current_price}"
                 )
-                await process_buy(telegram_id, "initial_purchase", message, user)
+                await process_buy(telegram_id, "initial_purchase", message)
 
             # Планируем задачу проверки ресурсов
             asyncio.create_task(periodic_resource_check(telegram_id))
@@ -288,32 +154,29 @@ async def autobuy_loop(message: Message, telegram_id: int):
                         task.cancel()
                         del user_autobuy_tasks[telegram_id]
                     await message.answer(
-                        "⛔ Ваша подписка закончилась. Автобай остановлен."
+                        "⛔ Ваша подписка закончилась. Автобай остановлен.",
+                        priority=Priority.WARNING,
                     )
                     break
 
-                # Проверяем, не нужно ли начать новую покупку после периода ожидания
-                current_time = time.time()
-                restart_after = autobuy_states[telegram_id].get("restart_after", 0)
-                waiting_for_opportunity = autobuy_states[telegram_id].get(
-                    "waiting_for_opportunity", False
-                )
+                # Подтягиваем настройки, изменённые вне процесса бота (например, в админке)
+                try:
+                    await user_settings_cache.refresh(telegram_id)
+                except Exception as e:
+                    logger.warning(
+                        f"Не удалось обновить кэш настроек для {telegram_id}: {e}"
+                    )
 
-                if (
-                    waiting_for_opportunity
-                    and restart_after > 0
-                    and current_time >= restart_after
-                ):
+                # Проверяем, не нужно ли начать новую покупку после периода ожидания
+                if state.waiting_expired():
                     # Время ожидания истекло, запускаем новую покупку
-                    autobuy_states[telegram_id]["restart_after"] = 0
-                    autobuy_states[telegram_id]["waiting_for_opportunity"] = False
-                    autobuy_states[telegram_id]["waiting_reported"] = False
+                    state.clear_waiting()
                     logger.info(
                         f"Период ожидания после закрытия сделки истек для {telegram_id} (проверка в основном цикле)"
                     )
 
                     # Запускаем новую покупку, если нет активных ордеров
-                    if not autobuy_states[telegram_id]["active_orders"]:
+                    if not state.active_order_count:
                         # Дополнительная проверка в БД на активные сделки autobuy
                         has_active = await sync_to_async(
                             Deal.objects.filter(
@@ -327,12 +190,11 @@ async def autobuy_loop(message: Message, telegram_id: int):
                                 f"DB guard: активные сделки обнаружены для {telegram_id}, покупка не запускается"
                             )
                         else:
-                            # await message.answer(f"🔄 Возобновляем автобай после паузы (основной цикл). Текущая цена: {autobuy_states[telegram_id]['current_price']}")
+                            # await message.answer(f"🔄 Возобновляем автобай после паузы (основной цикл). Текущая цена: {state.current_price}")
                             await process_buy(
                                 telegram_id,
                                 "after_waiting_period_main_loop",
                                 message,
-                                user,
                             )
 
                 # Просто ждем, реальная работа происходит в колбэках
@@ -346,52 +208,13 @@ async def autobuy_loop(message: Message, telegram_id: int):
             logger.info(f"Задача автобая для {telegram_id} была отменена")
             # Очищаем ресурсы
             if telegram_id in autobuy_states:
-                # Импортируем websocket_manager внутри блока
-                from bot.utils.websocket_manager import websocket_manager
-
-                # Clean up price callbacks
-                for callback in autobuy_states[telegram_id]["price_callbacks"]:
-                    try:
-                        user = await sync_to_async(User.objects.get)(
-                            telegram_id=telegram_id
-                        )
-                        symbol_to_unregister = user.pair.replace("/", "")
-                        if symbol_to_unregister in websocket_manager.price_callbacks:
-                            if (
-                                callback
-                                in websocket_manager.price_callbacks[
-                                    symbol_to_unregister
-                                ]
-                            ):
-                                websocket_manager.price_callbacks[
-                                    symbol_to_unregister
-                                ].remove(callback)
-                    except Exception as e:
-                        logger.error(
-                            f"Ошибка при очистке price колбэков для {telegram_id}: {e}"
-                        )
-
-                # Clean up bookTicker callbacks
-                for callback in autobuy_states[telegram_id]["bookticker_callbacks"]:
-                    try:
-                        user = await sync_to_async(User.objects.get)(
-                            telegram_id=telegram_id
-                        )
-                        symbol_to_unregister = user.pair.replace("/", "")
-                        await websocket_manager.unregister_bookticker_callback(
-                            symbol_to_unregister, callback
-                        )
-                    except Exception as e:
-                        logger.error(
-                            f"Ошибка при очистке bookTicker колбэков для {telegram_id}: {e}"
-                        )
-
-            # Если есть сессия, закрываем её
-            if session:
+                # Отключаем пользователя от книги триггеров пары
                 try:
-                    await session.close()
+                    await detach_autobuy_state(autobuy_states[telegram_id])
                 except Exception as e:
-                    logger.error(f"Ошибка при закрытии сессии: {e}")
+                    logger.error(
+                        f"Ошибка при отключении от книги триггеров для {telegram_id}: {e}"
+                    )
 
             raise
 
@@ -402,7 +225,7 @@ async def autobuy_loop(message: Message, telegram_id: int):
             startup_fail_count += 1
             if startup_fail_count >= MAX_FAILS:
                 error_message = parse_mexc_error(e)
-                await message.answer(f"⛔ {error_message}\n\n  Автобай остановлен.")
+                await message.answer(f"⛔ {error_message}\n\n  Автобай остановлен.", priority=Priority.WARNING)
                 user.autobuy = False
                 await sync_to_async(user.save)()
                 task = user_autobuy_tasks.get(telegram_id)
@@ -411,67 +234,25 @@ async def autobuy_loop(message: Message, telegram_id: int):
                     del user_autobuy_tasks[telegram_id]
 
                 # Send additional notification about autobuy stop
-                try:
-                    from bot.config import bot_instance
-
-                    await bot_instance.send_message(
-                        telegram_id,
-                        f"⛔ Автобай остановлен после {MAX_FAILS} последовательных ошибок.\n"
-                        f"Проверьте настройки и баланс.",
-                    )
-                except Exception as notify_error:
-                    logger.error(
-                        f"Failed to send autobuy stop notification to {telegram_id}: {notify_error}"
-                    )
+                message_bus.send(
+                    telegram_id,
+                    f"⛔ Автобай остановлен после {MAX_FAILS} последовательных ошибок.\n"
+                    f"Проверьте настройки и баланс.",
+                    priority=Priority.WARNING,
+                )
 
-                # Удаляем колбэки и состояние
+                # Удаляем состояние
                 if telegram_id in autobuy_states:
-                    # Импортируем websocket_manager внутри блока
-                    from bot.utils.websocket_manager import websocket_manager
-
-                    # Clean up price callbacks
-                    for callback in autobuy_states[telegram_id]["price_callbacks"]:
-                        try:
-                            symbol_to_unregister = user.pair.replace("/", "")
-                            if (
-                                symbol_to_unregister
-                                in websocket_manager.price_callbacks
-                            ):
-                                if (
-                                    callback
-                                    in websocket_manager.price_callbacks[
-                                        symbol_to_unregister
-                                    ]
-                                ):
-                                    websocket_manager.price_callbacks[
-                                        symbol_to_unregister
-                                    ].remove(callback)
-                        except Exception as cleanup_error:
-                            logger.error(
-                                f"Ошибка при очистке price колбэков: {cleanup_error}"
-                            )
-
-                    # Clean up bookTicker callbacks
-                    for callback in autobuy_states[telegram_id]["bookticker_callbacks"]:
-                        try:
-                            symbol_to_unregister = user.pair.replace("/", "")
-                            await websocket_manager.unregister_bookticker_callback(
-                                symbol_to_unregister, callback
-                            )
-                        except Exception as cleanup_error:
-                            logger.error(
-                                f"Ошибка при очистке bookTicker колбэков: {cleanup_error}"
-                            )
+                    # Отключаем пользователя от книги триггеров пары
+                    try:
+                        await detach_autobuy_state(autobuy_states[telegram_id])
+                    except Exception as cleanup_error:
+                        logger.error(
+                            f"Ошибка при отключении от книги триггеров: {cleanup_error}"
+                        )
 
                     del autobuy_states[telegram_id]
 
-                # Если есть сессия, закрываем её
-                if session:
-                    try:
-                        await session.close()
-                    except Exception as se:
-                        logger.error(f"Ошибка при закрытии сессии: {se}")
-
                 break
             await asyncio.sleep(30)
     else:
@@ -487,149 +268,263 @@ async def autobuy_loop(message: Message, telegram_id: int):
             del user_autobuy_tasks[telegram_id]
 
         # Send notification about autobuy failure
+        message_bus.send(
+            telegram_id,
+            f"⛔ Автобай не удалось запустить после {MAX_FAILS} попыток.\n"
+            f"Проверьте настройки и попробуйте снова.",
+            priority=Priority.WARNING,
+        )
+
+
+async def _resolve_buy_fill(rest: MexcRestClient, symbol: str, order_id, buy_order, telegram_id: int):
+    """
+    Исполнение MARKET покупки без лишнего запроса, если это возможно:
+    1) из ответа new_order (если биржа вернула исполнение);
+    2) из приватного стрима ордеров (если у пользователя открыт user WS);
+    3) иначе — query_order, как раньше.
+    """
+    from bot.utils.websocket_manager import websocket_manager
+
+    fill = OrderFill.from_rest(buy_order, source="order_response")
+    if fill is not None:
+        return fill
+
+    if telegram_id in websocket_manager.user_connections:
+        fill = await order_fills.wait(order_id, ORDER_FILL_WAIT_TIMEOUT)
+        if fill is not None and fill.executed_qty > 0 and fill.quote_qty > 0:
+            return fill
+
+    order_info = await rest.query_order(symbol, {"orderId": order_id})
+    logger.info(f"Детали ордера {order_id}: {order_info}")
+    return OrderFill.from_rest(order_info, source="query_order")
+
+
+def _spawn_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _persist_autobuy_deal(
+    telegram_id: int,
+    settings: UserSettings,
+    message: Message,
+    order: ActiveOrder,
+    rest: MexcRestClient,
+    symbol: str,
+    executed_qty: float,
+    spent: float,
+    sell_price: float,
+):
+    """
+    Запись сделки в БД и уведомление пользователя — уже после выставления SELL.
+
+    Запись повторяется с растущей паузой: пока строки в БД нет, ордер живет
+    только в памяти (persisted=False) и его не видят ресинк и reconciler.
+    """
+    real_price = order.buy_price
+    sell_order_id = order.order_id
+    user_order_number = None
+    for attempt in range(1, DEAL_PERSIST_ATTEMPTS + 1):
         try:
-            from bot.config import bot_instance
+            # Номер берем один раз, чтобы повтор не оставлял дыр в нумерации
+            if user_order_number is None:
+                user_order_number = await sync_to_async(next_user_order_number)(settings.user_id)
+                order.user_order_number = user_order_number
 
-            await bot_instance.send_message(
-                telegram_id,
-                f"⛔ Автобай не удалось запустить после {MAX_FAILS} попыток.\n"
-                f"Проверьте настройки и попробуйте снова.",
+            # get_or_create: если прошлая попытка успела записать строку, но упала на ответе
+            await sync_to_async(Deal.objects.get_or_create)(
+                order_id=sell_order_id,
+                defaults=dict(
+                    user_id=settings.user_id,
+                    user_order_number=user_order_number,
+                    symbol=symbol,
+                    buy_price=real_price,
+                    quantity=executed_qty,
+                    sell_price=sell_price,
+                    status="NEW",
+                    is_autobuy=True,
+                ),
             )
-        except Exception as notify_error:
+            order.persisted = True
+            break
+        except Exception as e:
             logger.error(
-                f"Failed to send autobuy failure notification to {telegram_id}: {notify_error}"
+                f"[Autobuy] Не удалось сохранить сделку {sell_order_id} для {telegram_id} "
+                f"(попытка {attempt}/{DEAL_PERSIST_ATTEMPTS}): {e}",
+                extra={"user_id": telegram_id},
             )
+            if attempt < DEAL_PERSIST_ATTEMPTS:
+                await asyncio.sleep(DEAL_PERSIST_RETRY_DELAY * 2 ** (attempt - 1))
+    else:
+        # Ордер остается в памяти: автобай продолжает его учитывать до перезапуска
+        message_bus.send(
+            telegram_id,
+            f"⚠️ Сделка по ордеру `{sell_order_id}` не сохранилась в базе.\n\n"
+            f"📉 Куплено по: `{real_price:.6f}` {symbol[3:]}\n"
+            f"📦 Кол-во: `{executed_qty:.6f}` {symbol[:3]}\n"
+            f"📈 Лимит на продажу: `{sell_price:.6f}` {symbol[3:]}\n\n"
+            f"SELL ордер выставлен на бирже, но бот не отследит его исполнение и прибыль. "
+            f"Проверьте ордер на MEXC.",
+            parse_mode="Markdown",
+            priority=Priority.WARNING,
+        )
+        return
+
+    # Отправляем сообщение об открытии сделки
+    text = (
+        f"🟢 *СДЕЛКА {user_order_number} ОТКРЫТА*\n\n"
+        f"📉 Куплено по: `{real_price:.6f}` {symbol[3:]}\n"
+        f"📦 Кол-во: `{executed_qty:.6f}` {symbol[:3]}\n"
+        f"💸 Потрачено: `{spent:.2f}` {symbol[3:]}\n\n"
+        f"📈 Лимит на продажу: `{sell_price:.6f}` {symbol[3:]}\n"
+    )
+    message_bus.send(telegram_id, text, parse_mode="Markdown", priority=Priority.TRADE)
+
+    # Уточняем статус через REST: SELL мог исполниться раньше, чем появилась
+    # строка в БД, и тогда обновление из стрима не нашло сделку. Пускаем статус
+    # по полному пути (БД, состояние автобая, уведомление о завершении).
+    try:
+        order_check = await rest.query_order(symbol, {"orderId": sell_order_id})
+        current_status = order_check.get("status")
+        if current_status and current_status != "NEW":
+            from bot.utils.websocket_handlers import update_order_status
+
+            await update_order_status(sell_order_id, symbol, current_status, telegram_id)
+    except Exception as e:
+        logger.warning(
+            f"[Autobuy] Не удалось уточнить начальный статус ордера {sell_order_id}: {e}"
+        )
 
 
-async def process_buy(telegram_id: int, reason: str, message: Message, user: User):
-    """Обработка покупки с защитой от одновременных операций"""
+async def _stop_autobuy(telegram_id: int) -> None:
+    """Выключает автобай в БД (post_save обновит кэш настроек и книгу триггеров)."""
+    user = await sync_to_async(User.objects.get)(telegram_id=telegram_id)
+    user.autobuy = False
+    await sync_to_async(user.save)()
+
+
+async def process_buy(
+    telegram_id: int,
+    reason: str,
+    message: Message,
+    tick_at: Optional[float] = None,
+):
+    """
+    Обработка покупки с защитой от одновременных операций.
+
+    Критический путь: MARKET BUY → исполнение → LIMIT SELL. Настройки и ключи
+    берутся из user_settings_cache (БД читается только при промахе кэша).
+    Запись сделки в БД и уведомление в Telegram выполняются в фоне после
+    выставления SELL.
+    tick_at — time.perf_counter() приема тика, вызвавшего покупку (для
+    замера задержки до SELL ордера).
+    """
     # Импортируем здесь для избежания циклических импортов
     from bot.utils.websocket_manager import websocket_manager
 
+    timer = ExecutionTimer(tick_at)
     logger.info(f"process_buy called for {telegram_id} with reason: {reason}")
 
-    # Получаем актуальные настройки пользователя из БД
-    user = await sync_to_async(User.objects.get)(telegram_id=telegram_id)
-
     # Глобальная защита на пользователя
     state = autobuy_states.get(telegram_id)
     if not state:
         logger.warning(f"No state for user {telegram_id} in process_buy")
         return
 
-    lock = state.get("buy_lock")
-    if lock is None:
-        lock = asyncio.Lock()
-        state["buy_lock"] = lock
+    lock = state.buy_lock
 
-    if state.get("buy_in_progress"):
+    if state.buy_in_progress:
         logger.info(f"Skip process_buy: buy_in_progress for {telegram_id}")
         return
 
     await lock.acquire()
-    state["buy_in_progress"] = True
+    state.buy_in_progress = True
 
     try:
-        # Еще раз проверяем, что пользователь все еще в режиме автобай
-        user_active = await sync_to_async(
-            User.objects.filter(telegram_id=telegram_id, autobuy=True).exists
-        )()
-        if not user_active:
+        # Ключи, настройки и режим автобай из кэша (обновляется post_save и refresh)
+        settings = await user_settings_cache.get_or_load(telegram_id)
+        timer.mark("settings_loaded")
+        if settings is None or not settings.autobuy:
             logger.info(
                 f"Отмена покупки - пользователь {telegram_id} больше не в режиме автобай"
             )
             return
 
         # Помечаем время последней операции
-        autobuy_states[telegram_id]["last_trade_time"] = time.time()
+        state.last_trade_time = time.time()
 
         # Сбрасываем флаги ожидания
-        autobuy_states[telegram_id]["waiting_for_opportunity"] = False
-        autobuy_states[telegram_id]["restart_after"] = 0
-        autobuy_states[telegram_id]["waiting_reported"] = False
-
-        # Получаем текущие данные - ВСЕГДА свежие из БД
-        client_session = None
+        state.clear_waiting()
 
         # Счетчик последовательных ошибок
-        consecutive_errors = autobuy_states[telegram_id].get("consecutive_errors", 0)
+        consecutive_errors = state.consecutive_errors
 
         try:
-            # Отправляем сообщение о начале покупки для лучшей обратной связи
-            if reason == "after_waiting_period":
-                symbol = user.pair.replace("/", "")
-                current_price = autobuy_states[telegram_id].get("current_price", 0)
-                # await message.answer(f"🔄 Возобновляем автобай для {symbol} после паузы. Текущая цена: {current_price:.6f} {symbol[3:]}")
-
-            rest = MexcRestClient(api_key=user.api_key, api_secret=user.api_secret)
-            symbol = user.pair.replace("/", "")
-            buy_amount = float(user.buy_amount)
-            profit_percent = float(user.profit)
-            pause_seconds = user.pause  # Для использования после покупки
+            rest = rest_client_for(settings.api_key, settings.api_secret)
+            symbol = settings.symbol
+            buy_amount = float(settings.buy_amount)
+            profit_percent = float(settings.profit)
+            pause_seconds = settings.pause  # Для использования после покупки
 
             # Логируем начало покупки
             logger.info(f"Начинаем покупку для {telegram_id}, причина: {reason}")
 
             # Выполняем покупку
+            timer.mark("buy_sent")
             buy_order = await rest.new_order(
                 symbol, "BUY", "MARKET", {"quoteOrderQty": buy_amount}
             )
+            timer.mark("buy_ack")
             handle_mexc_response(buy_order, "Покупка")
             order_id = buy_order["orderId"]
 
-            # Подтягиваем детали ордера
-            order_info = await rest.query_order(symbol, {"orderId": order_id})
-            logger.info(f"Детали ордера {order_id}: {order_info}")
+            # Исполнение: из ответа, из user stream или query_order
+            fill = await _resolve_buy_fill(rest, symbol, order_id, buy_order, telegram_id)
+            timer.mark("fill_known")
 
-            executed_qty = float(order_info.get("executedQty", 0))
+            executed_qty = fill.executed_qty if fill else 0.0
             if executed_qty == 0:
-                await message.answer("❗ Ошибка при создании ордера (executedQty=0).")
-                autobuy_states[telegram_id]["consecutive_errors"] = (
-                    consecutive_errors + 1
-                )
-                if autobuy_states[telegram_id]["consecutive_errors"] >= 3:
-                    user.autobuy = False
-                    await sync_to_async(user.save)()
+                await message.answer("❗ Ошибка при создании ордера (executedQty=0).", priority=Priority.WARNING)
+                state.consecutive_errors = consecutive_errors + 1
+                if state.consecutive_errors >= 3:
+                    await _stop_autobuy(telegram_id)
                     await message.answer(
-                        "⛔ Автобай остановлен после 3 последовательных ошибок при создании ордеров."
+                        "⛔ Автобай остановлен после 3 последовательных ошибок при создании ордеров.",
+                        priority=Priority.WARNING,
                     )
                 return
 
-            spent = float(order_info["cummulativeQuoteQty"])
+            spent = fill.quote_qty
             if spent == 0:
-                await message.answer("❗ Ошибка при создании ордера (spent=0).")
-                autobuy_states[telegram_id]["consecutive_errors"] = (
-                    consecutive_errors + 1
-                )
-                if autobuy_states[telegram_id]["consecutive_errors"] >= 3:
-                    user.autobuy = False
-                    await sync_to_async(user.save)()
+                await message.answer("❗ Ошибка при создании ордера (spent=0).", priority=Priority.WARNING)
+                state.consecutive_errors = consecutive_errors + 1
+                if state.consecutive_errors >= 3:
+                    await _stop_autobuy(telegram_id)
                     await message.answer(
-                        "⛔ Автобай остановлен после 3 последовательных ошибок при создании ордеров."
+                        "⛔ Автобай остановлен после 3 последовательных ошибок при создании ордеров.",
+                        priority=Priority.WARNING,
                     )
                 return
 
             # Сбрасываем счетчик ошибок при успешной покупке
-            autobuy_states[telegram_id]["consecutive_errors"] = 0
+            state.reset_errors()
 
             real_price = spent / executed_qty if executed_qty > 0 else 0
 
             # Сохраняем новую цену последней покупки сразу
-            autobuy_states[telegram_id]["last_buy_price"] = real_price
+            state.last_buy_price = real_price
 
             # Логируем причину покупки
             logger.info(
                 f"Buy triggered for {telegram_id} because of {reason}. New last_buy_price: {real_price}"
             )
 
-            # Расчёт цены продажи - всегда используем актуальный профит из БД
-            user_settings = await sync_to_async(User.objects.get)(
-                telegram_id=telegram_id
-            )
-            profit_percent = float(user_settings.profit)
+            # Расчёт цены продажи по профиту из настроек, прочитанных в начале покупки
             sell_price = round(real_price * (1 + profit_percent / 100), 6)
 
             # Создание лимитного ордера на продажу
+            timer.mark("sell_sent")
             sell_order = await rest.new_order(
                 symbol,
                 "SELL",
@@ -640,85 +535,33 @@ async def process_buy(telegram_id: int, reason: str, message: Message, user: Use
                     "timeInForce": "GTC",
                 },
             )
+            timer.mark("sell_ack")
             handle_mexc_response(sell_order, "Продажа")
             sell_order_id = sell_order["orderId"]
             logger.info(
                 f"SELL ордер {sell_order_id} выставлен на {sell_price:.6f} {symbol[3:]}"
             )
-
-            # Сохраняем ордер в базу
-            last_number = await sync_to_async(Deal.objects.filter(user=user).count)()
-            user_order_number = last_number + 1
-
-            await sync_to_async(Deal.objects.create)(
-                user=user,
-                order_id=sell_order_id,
-                user_order_number=user_order_number,
-                symbol=symbol,
-                buy_price=real_price,
-                quantity=executed_qty,
-                sell_price=sell_price,
-                status="NEW",
-                is_autobuy=True,
+            execution_latency.record(timer, fill.source)
+            logger.info(
+                f"[Exec] {telegram_id} {reason}: {timer.summary()} (fill via {fill.source})"
             )
 
-            # Уточняем статус сразу после создания SELL через REST
-            try:
-                order_check = await rest.query_order(symbol, {"orderId": sell_order_id})
-                current_status = order_check.get("status")
-                if current_status and current_status != "NEW":
-                    deal_obj = await sync_to_async(Deal.objects.get)(
-                        order_id=sell_order_id
-                    )
-                    deal_obj.status = current_status
-                    await sync_to_async(deal_obj.save)()
-            except Exception as e:
-                logger.warning(
-                    f"[Autobuy] Не удалось уточнить начальный статус ордера {sell_order_id}: {e}"
-                )
-
-            # Добавляем ордер в список активных
-            order_info = {
-                "order_id": sell_order_id,
-                "buy_price": real_price,
-                "notified": False,
-                "user_order_number": user_order_number,
-            }
-
-            # Получаем актуальный список активных ордеров
-            active_orders = autobuy_states[telegram_id]["active_orders"]
-            active_orders.append(order_info)
-            autobuy_states[telegram_id]["active_orders"] = active_orders
-
-            # Отправляем сообщение об открытии сделки
-            try:
-                from bot.config import bot_instance
+            # Добавляем ордер в список активных; номер сделки уточнится при записи в БД
+            latest = state.latest_order()
+            order = ActiveOrder(
+                sell_order_id,
+                real_price,
+                ((latest.user_order_number or 0) + 1) if latest else None,
+                persisted=False,
+            )
+            state.add_order(order)
 
-                await bot_instance.send_message(
-                    telegram_id,
-                    f"🟢 *СДЕЛКА {user_order_number} ОТКРЫТА*\n\n"
-                    f"📉 Куплено по: `{real_price:.6f}` {symbol[3:]}\n"
-                    f"📦 Кол-во: `{executed_qty:.6f}` {symbol[:3]}\n"
-                    f"💸 Потрачено: `{spent:.2f}` {symbol[3:]}\n\n"
-                    f"📈 Лимит на продажу: `{sell_price:.6f}` {symbol[3:]}\n",
-                    parse_mode="Markdown",
+            # Запись в БД и уведомление — вне критического пути
+            _spawn_background(
+                _persist_autobuy_deal(
+                    telegram_id, settings, message, order, rest, symbol, executed_qty, spent, sell_price
                 )
-            except Exception as e:
-                logger.error(f"Failed to send buy notification to {telegram_id}: {e}")
-                # Fallback to message.answer if bot_instance fails
-                try:
-                    await message.answer(
-                        f"🟢 *СДЕЛКА {user_order_number} ОТКРЫТА*\n\n"
-                        f"📉 Куплено по: `{real_price:.6f}` {symbol[3:]}\n"
-                        f"📦 Кол-во: `{executed_qty:.6f}` {symbol[:3]}\n"
-                        f"💸 Потрачено: `{spent:.2f}` {symbol[3:]}\n\n"
-                        f"📈 Лимит на продажу: `{sell_price:.6f}` {symbol[3:]}\n",
-                        parse_mode="Markdown",
-                    )
-                except Exception as fallback_error:
-                    logger.error(
-                        f"Failed to send buy notification via fallback to {telegram_id}: {fallback_error}"
-                    )
+            )
 
             # Устанавливаем триггер для покупок на росте после любой покупки или продажи
             if reason in [
@@ -738,14 +581,7 @@ async def process_buy(telegram_id: int, reason: str, message: Message, user: Use
                     current_time = time.time()
 
                     # Устанавливаем триггер на росте по ask цене
-                    autobuy_states[telegram_id]["trigger_price"] = ask_price
-                    autobuy_states[telegram_id]["trigger_time"] = current_time
-                    autobuy_states[telegram_id]["is_rise_trigger"] = True
-                    autobuy_states[telegram_id]["is_trigger_activated"] = False
-                    autobuy_states[telegram_id]["trigger_activated_time"] = 0
-                    autobuy_states[telegram_id]["pause_trend_prices"] = []
-                    autobuy_states[telegram_id]["trend_only_rise"] = True
-                    autobuy_states[telegram_id]["last_pause_price"] = None
+                    state.arm_rise_trigger(ask_price, current_time)
 
                     logger.info(
                         f"Rise trigger set for {telegram_id} at ask price {ask_price:.6f} after {reason}"
@@ -758,9 +594,8 @@ async def process_buy(telegram_id: int, reason: str, message: Message, user: Use
             # Если это была покупка на росте, устанавливаем паузу ПОСЛЕ покупки
             if reason == "price_rise" and pause_seconds > 0:
                 # Устанавливаем время возобновления после паузы
-                autobuy_states[telegram_id]["waiting_for_opportunity"] = True
-                autobuy_states[telegram_id]["restart_after"] = (
-                    time.time() + pause_seconds
+                state.enter_waiting(
+                    time.time() + pause_seconds, clear_last_buy_price=False
                 )
                 logger.info(
                     f"Установлена пауза {pause_seconds}с после покупки на росте для {telegram_id}"
@@ -772,37 +607,29 @@ async def process_buy(telegram_id: int, reason: str, message: Message, user: Use
                 extra={"user_id": telegram_id},
             )
             error_message = parse_mexc_error(e)
-            await message.answer(f"❌ Ошибка при покупке: {error_message}")
+            await message.answer(f"❌ Ошибка при покупке: {error_message}", priority=Priority.WARNING)
             try:
                 await notify_user_autobuy_error(telegram_id, "при создании ордера", e)
             except Exception:
                 pass
 
             # Увеличиваем счетчик последовательных ошибок
-            autobuy_states[telegram_id]["consecutive_errors"] = consecutive_errors + 1
+            state.consecutive_errors = consecutive_errors + 1
 
             # Если достигли 3 последовательных ошибки, останавливаем автобай
-            if autobuy_states[telegram_id]["consecutive_errors"] >= 3:
-                user.autobuy = False
-                await sync_to_async(user.save)()
+            if state.consecutive_errors >= 3:
+                await _stop_autobuy(telegram_id)
                 await message.answer(
-                    "⛔ Автобай остановлен после 3 последовательных ошибок. Проверьте настройки и баланс."
+                    "⛔ Автобай остановлен после 3 последовательных ошибок. Проверьте настройки и баланс.",
+                    priority=Priority.WARNING,
                 )
                 logger.warning(
                     f"Автобай остановлен для {telegram_id} после 3 последовательных ошибок"
                 )
-
-        finally:
-            # Закрываем сессию, если она была создана
-            if client_session:
-                try:
-                    await client_session.close()
-                except Exception as e:
-                    logger.error(f"Ошибка при закрытии сессии: {e}")
     except Exception as e:
         logger.error(f"Ошибка при выполнении покупки для {telegram_id}: {e}")
         error_message = parse_mexc_error(e)
-        await message.answer(f"❌ Ошибка при покупке: {error_message}")
+        await message.answer(f"❌ Ошибка при покупке: {error_message}", priority=Priority.WARNING)
         try:
             await notify_user_autobuy_error(telegram_id, "при выполнении покупки", e)
         except Exception:
@@ -810,7 +637,7 @@ async def process_buy(telegram_id: int, reason: str, message: Message, user: Use
     finally:
         # Всегда освобождаем блокировку и сбрасываем флаг
         try:
-            state["buy_in_progress"] = False
+            state.buy_in_progress = False
         finally:
             try:
                 lock.release()
@@ -818,178 +645,85 @@ async def process_buy(telegram_id: int, reason: str, message: Message, user: Use
                 pass
 
 
-async def check_rise_triggers(
+def _send_trigger_notification(telegram_id: int, text: str, kind: str):
+    # Повторные срабатывания за окно склейки сливаются в одно (последнее) сообщение
+    message_bus.send(telegram_id, text, priority=Priority.INFO, coalesce_key=f"trigger:{kind}")
+    logger.info(f"{kind} notification queued for {telegram_id}")
+
+
+async def handle_drop_trigger(
     telegram_id: int,
     symbol: str,
-    bid_price: float,
     ask_price: float,
-    is_rise: bool,
-    current_time: float,
-    user_settings: User,
+    last_buy_price: float,
+    price_drop_percent: float,
+    loss_threshold: float,
+    tick_at: Optional[float] = None,
 ):
-    """
-    Проверяет триггеры для покупок на росте цены с правильным анализом тренда.
-
-    Логика:
-    1. Триггер устанавливается на ask_price (цена продажи)
-    2. Активация триггера - при пересечении ask_price уровня trigger_price (в любую сторону)
-    3. Начало отсчета паузы - при активации триггера
-    4. Анализ тренда во время паузы - mid цена должна только расти (без единого падения)
-    5. Сброс при малейшем движении вниз mid цены → сброс триггера
-    6. Ожидание нового пересечения триггера
-    """
-    try:
-        if telegram_id not in autobuy_states:
-            return
-
-        state = autobuy_states[telegram_id]
-        ask_price_float = float(ask_price)
-        bid_price_float = float(bid_price)
-        mid_price = (bid_price_float + ask_price_float) / 2
-        pause_seconds = user_settings.pause
-
-        # Инициализация и сохранение предыдущих цен
-        prev_ask_price = state.get("last_ask_price")
-        prev_mid_price = state.get("last_mid_price")
-        state["last_ask_price"] = ask_price_float
-        state["last_mid_price"] = mid_price
-
-        # Проверяем, что триггер установлен
-        if state.get("is_rise_trigger") and state.get("trigger_price") is not None:
-            trigger_price = state["trigger_price"]
-            is_activated = state.get("is_trigger_activated", False)
-
-            # ЭТАП 1: Активация триггера при пересечении уровня в любую сторону
-            if not is_activated:
-                if prev_ask_price is not None:
-                    crossed_up = prev_ask_price <= trigger_price < ask_price_float
-                    crossed_down = prev_ask_price >= trigger_price > ask_price_float
-                    if crossed_up or crossed_down:
-                        # Запускаем паузу и анализ тренда (используем mid цену)
-                        state["is_trigger_activated"] = True
-                        state["trigger_activated_time"] = current_time
-                        state["pause_trend_prices"] = [mid_price]  # Сохраняем mid цену
-                        state["trend_only_rise"] = True
-                        state["last_pause_price"] = mid_price
-
-                        direction = "↑" if crossed_up else "↓"
-                        logger.info(
-                            f"Trigger crossed {direction} for {telegram_id}: "
-                            f"ask {prev_ask_price:.6f} → {ask_price_float:.6f}, "
-                            f"mid {mid_price:.6f}. Starting {pause_seconds}s pause."
-                        )
-                        # Уведомление об активации триггера (закомментировано)
-                        # from bot.config import bot_instance
-                        # try:
-                        #     await bot_instance.send_message(
-                        #         telegram_id,
-                        #         f"🔔 Триггер активирован для {symbol}\n\n"
-                        #         f"📈 Цена ({ask_price_float:.6f} USDC) пересекла триггер {trigger_price:.6f} USDC\n"
-                        #         f"⏱️ Начинаем анализ тренда на {pause_seconds}с"
-                        #     )
-                        #     logger.info(f"Trigger activation notification sent to {telegram_id}")
-                        # except Exception as e:
-                        #     logger.error(f"Failed to send trigger activation notification to {telegram_id}: {e}")
-
-            # ЭТАП 2: Анализ тренда во время паузы
-            else:
-                triggered_time = state.get("trigger_activated_time", 0)
-                pause_prices = state.get("pause_trend_prices", [])
-
-                # 2.1 Сброс при любом движении вниз mid цены относительно prev_mid_price
-                if prev_mid_price is not None and mid_price < prev_mid_price:
-                    logger.info(
-                        f"Mid price drop detected for {telegram_id}: {prev_mid_price:.6f} → {mid_price:.6f}. Resetting trigger."
-                    )
-                    reset_rise_trigger(state)
-                    return
-
-                # 2.2 Добавляем текущую mid цену в историю паузы
-                pause_prices.append(mid_price)
-                state["pause_trend_prices"] = pause_prices
-
-                # 2.3 Проверяем завершение паузы
-                elapsed = current_time - triggered_time
-                if elapsed >= pause_seconds:
-                    # Если рост без единого падения и ask цена выше триггера — покупаем
-                    if (
-                        state.get("trend_only_rise", True)
-                        and ask_price_float > trigger_price
-                    ):
-                        logger.info(
-                            f"Rise conditions met for {telegram_id}: exclusive mid price rise during {pause_seconds}s pause. "
-                            f"Final ask: {ask_price_float:.6f}, final mid: {mid_price:.6f}"
-                        )
-
-                        # Уведомление о покупке
-                        from bot.config import bot_instance
-
-                        try:
-                            await bot_instance.send_message(
-                                telegram_id,
-                                f"⏫ Покупка по росту для {symbol}\n\n"
-                                f"📈 Исключительный рост {pause_seconds}с\n"
-                                f"🎯 Цена: {trigger_price:.6f} → {ask_price_float:.6f} USDC\n"
-                                f"💰 Совершаем покупку!",
-                            )
-                            logger.info(
-                                f"Rise purchase notification sent to {telegram_id}"
-                            )
-                        except Exception as e:
-                            logger.error(
-                                f"Failed to send rise purchase notification to {telegram_id}: {e}"
-                            )
+    """Действие книги триггеров: ask упала на loss% от последней покупки."""
+    # Уведомление только ставится в очередь: покупка не ждет ответа Telegram
+    _send_trigger_notification(
+        telegram_id,
+        f"🔻 Обнаружено падение цены для {symbol}\n\n"
+        f"🔻 Цена ({ask_price:.6f} USDC) снизилась на {price_drop_percent:.2f}% от покупки по {last_buy_price:.6f} USDC. \n"
+        f"Покупаем по условию падения ({loss_threshold:.2f}%).",
+        "Drop",
+    )
 
-                        # Совершаем покупку
-                        from bot.utils.autobuy_restart import FakeMessage
-                        from bot.config import bot_instance
+    # Перед запуском покупки проверяем флаг покупки
+    state = autobuy_states.get(telegram_id)
+    if state is None:
+        return
+    if state.buy_in_progress:
+        logger.info(f"Skip price_drop buy: buy_in_progress for {telegram_id}")
+        return
 
-                        fake_message = FakeMessage(telegram_id, bot_instance)
-                        asyncio.create_task(
-                            process_buy(
-                                telegram_id, "rise_trigger", fake_message, user_settings
-                            )
-                        )
+    from bot.utils.autobuy_restart import FakeMessage
 
-                        # Устанавливаем новый триггер по текущей цене
-                        state["trigger_price"] = ask_price_float
-                        state["trigger_time"] = current_time
-                        state["is_trigger_activated"] = False
-                        state["rise_buy_count"] += 1
+    fake_message = FakeMessage(telegram_id)
+    logger.info(f"Starting process_buy for {telegram_id} due to price drop")
+    await process_buy(
+        telegram_id,
+        "price_drop",
+        fake_message,
+        tick_at=tick_at,
+    )
 
-                        # Очищаем данные паузы
-                        state["pause_trend_prices"] = []
-                        state["trend_only_rise"] = True
-                        state["last_pause_price"] = None
 
-                        logger.info(
-                            f"New rise trigger set for {telegram_id} at ask price {ask_price_float:.6f}"
-                        )
-                    else:
-                        logger.info(
-                            f"Rise conditions NOT met for {telegram_id}. Final price: {ask_price_float:.6f}, "
-                            f"trend_only_rise: {state.get('trend_only_rise', False)}"
-                        )
-                        reset_rise_trigger(state)
+async def handle_rise_trigger(
+    telegram_id: int,
+    symbol: str,
+    trigger_price: float,
+    ask_price: float,
+    pause_seconds: float,
+    tick_at: Optional[float] = None,
+):
+    """
+    Действие книги триггеров: после пересечения триггера mid цена только росла
+    всю паузу и ask выше триггера — покупаем на росте.
 
-    except Exception as e:
-        logger.error(
-            f"Error in check_rise_triggers for {telegram_id}: {e}", exc_info=True
-        )
+    Сама логика триггера (пересечение, пауза, сброс при падении mid) считается
+    в SymbolTriggerBook.evaluate; новый триггер уже перенесен на текущую цену.
+    """
+    # Уведомление только ставится в очередь: покупка не ждет ответа Telegram
+    _send_trigger_notification(
+        telegram_id,
+        f"⏫ Покупка по росту для {symbol}\n\n"
+        f"📈 Исключительный рост {pause_seconds:.0f}с\n"
+        f"🎯 Цена: {trigger_price:.6f} → {ask_price:.6f} USDC\n"
+        f"💰 Совершаем покупку!",
+        "Rise purchase",
+    )
 
+    from bot.utils.autobuy_restart import FakeMessage
 
-def reset_rise_trigger(state):
-    """Сбрасывает триггер на росте и очищает связанные данные"""
-    state["is_rise_trigger"] = False
-    state["trigger_price"] = None
-    state["trigger_time"] = 0
-    state["is_trigger_activated"] = False
-    state["trigger_activated_time"] = 0
-    state["pause_trend_prices"] = []
-    state["trend_only_rise"] = True
-    state["last_pause_price"] = None
-    state["last_ask_price"] = None
-    state["last_mid_price"] = None
+    fake_message = FakeMessage(telegram_id)
+    await process_buy(
+        telegram_id,
+        "rise_trigger",
+        fake_message,
+        tick_at=tick_at,
+    )
 
 
 async def process_order_update_for_autobuy(order_id, symbol, status, user_id):
@@ -1005,29 +739,21 @@ async def process_order_update_for_autobuy(order_id, symbol, status, user_id):
     #     f"[AutobuyOrderUpdate] User {user_id}: Processing order_id={order_id}, symbol={symbol}, status={status}."
     # )
 
-    active_orders = autobuy_states[user_id]["active_orders"]
-    old_last_buy_price = autobuy_states[user_id].get("last_buy_price")
+    state = autobuy_states[user_id]
+    old_last_buy_price = state.last_buy_price
 
     # Ищем ордер среди активных
-    order_index = next(
-        (i for i, order in enumerate(active_orders) if order["order_id"] == order_id),
-        None,
-    )
+    order_found = state.has_order(order_id)
 
-    if order_index is not None:
-        # logger.info(f"[AutobuyOrderUpdate] User {user_id}: Found order {order_id} in active_orders at index {order_index}. Current active_orders: {active_orders}")
+    if order_found:
         if status in ["FILLED", "CANCELED"]:
-            # Получаем информацию о завершенном ордере
-            order_info = active_orders[order_index]
+            # Если ордер исполнен или отменен, удаляем его из активных
+            order_info = state.remove_order(order_id)
             logger.info(
-                f"[AutobuyOrderUpdate] User {user_id}: Order {order_id} (UserOrderNum: {order_info.get('user_order_number')}) has status {status}. Removing from active_orders."
+                f"[AutobuyOrderUpdate] User {user_id}: Order {order_id} (UserOrderNum: {order_info.user_order_number}) has status {status}. Removed from active_orders."
             )
-
-            # Если ордер исполнен или отменен, удаляем его из активных
-            active_orders.pop(order_index)
-            autobuy_states[user_id]["active_orders"] = active_orders
             logger.info(
-                f"[AutobuyOrderUpdate] User {user_id}: active_orders after removal: {len(active_orders)}"
+                f"[AutobuyOrderUpdate] User {user_id}: active_orders after removal: {state.active_order_count}"
             )
 
             # Устанавливаем триггер для покупок на росте после КАЖДОЙ продажи
@@ -1041,16 +767,7 @@ async def process_order_update_for_autobuy(order_id, symbol, status, user_id):
                     )  # Используем ask цену
                     current_time = time.time()
 
-                    autobuy_states[user_id]["trigger_price"] = ask_price
-                    autobuy_states[user_id]["trigger_time"] = current_time
-                    autobuy_states[user_id]["is_rise_trigger"] = True
-                    autobuy_states[user_id]["is_trigger_activated"] = False
-                    autobuy_states[user_id]["trigger_activated_time"] = 0
-                    autobuy_states[user_id]["pause_trend_prices"] = []
-                    autobuy_states[user_id]["trend_only_rise"] = True
-                    autobuy_states[user_id]["last_pause_price"] = None
-                    autobuy_states[user_id]["last_ask_price"] = None
-                    autobuy_states[user_id]["last_mid_price"] = None
+                    state.arm_rise_trigger(ask_price, current_time, reset_last_prices=True)
 
                     logger.info(
                         f"[AutobuyOrderUpdate] User {user_id}: Rise trigger set at ask price {ask_price:.6f} after order {order_id} filled"
@@ -1065,45 +782,36 @@ async def process_order_update_for_autobuy(order_id, symbol, status, user_id):
                 )
 
             # Если не осталось активных ордеров, устанавливаем паузу перед следующей покупкой
-            if not active_orders:
+            if not state.active_order_count:
                 logger.info(
                     f"[AutobuyOrderUpdate] User {user_id}: No active orders remaining."
                 )
                 # Получаем пользовательские настройки для определения паузы
                 try:
-                    user = await sync_to_async(User.objects.get)(telegram_id=user_id)
-                    pause_seconds = user.pause
+                    user_settings = await user_settings_cache.get_or_load(user_id)
+                    pause_seconds = user_settings.pause
 
                     # Устанавливаем время следующей возможной покупки
-                    autobuy_states[user_id]["last_buy_price"] = None
-                    autobuy_states[user_id]["waiting_for_opportunity"] = True
-                    autobuy_states[user_id]["restart_after"] = (
-                        time.time() + pause_seconds
-                    )
-                    autobuy_states[user_id]["waiting_reported"] = False
+                    state.enter_waiting(time.time() + pause_seconds)
 
                     logger.info(
-                        f"[AutobuyOrderUpdate] User {user_id}: Reset last_buy_price to None. waiting_for_opportunity=True. Next buy possible after {pause_seconds}s (at {autobuy_states[user_id]['restart_after']})."
+                        f"[AutobuyOrderUpdate] User {user_id}: Reset last_buy_price to None. waiting_for_opportunity=True. Next buy possible after {pause_seconds}s (at {state.restart_after})."
                     )
                 except Exception as e:
                     logger.error(
                         f"[AutobuyOrderUpdate] User {user_id}: Error getting user settings for pause: {e}"
                     )
                     # Если не удалось получить настройки паузы, просто сбрасываем last_buy_price
-                    autobuy_states[user_id]["last_buy_price"] = None
+                    state.last_buy_price = None
                     logger.info(
                         f"[AutobuyOrderUpdate] User {user_id}: Reset last_buy_price to None (error case)."
                     )
             else:
                 # Иначе устанавливаем last_buy_price по самому свежему ордеру
-                most_recent_order = max(
-                    active_orders, key=lambda x: x.get("user_order_number", 0)
-                )
-                autobuy_states[user_id]["last_buy_price"] = most_recent_order[
-                    "buy_price"
-                ]
+                most_recent_order = state.latest_order()
+                state.last_buy_price = most_recent_order.buy_price
                 logger.info(
-                    f"[AutobuyOrderUpdate] User {user_id}: Updated last_buy_price to {most_recent_order['buy_price']} from active order #{most_recent_order['user_order_number']}. Active orders count: {len(active_orders)}"
+                    f"[AutobuyOrderUpdate] User {user_id}: Updated last_buy_price to {most_recent_order.buy_price} from active order #{most_recent_order.user_order_number}. Active orders count: {state.active_order_count}"
                 )
         else:
             logger.debug(
@@ -1115,12 +823,12 @@ async def process_order_update_for_autobuy(order_id, symbol, status, user_id):
         )
 
     # Лог изменений
-    new_last_buy_price = autobuy_states[user_id].get("last_buy_price")
+    new_last_buy_price = state.last_buy_price
     if old_last_buy_price != new_last_buy_price:
         logger.info(
             f"[AutobuyOrderUpdate] User {user_id}: last_buy_price changed from {old_last_buy_price} to {new_last_buy_price}."
         )
-    elif status in ["FILLED", "CANCELED"] and order_index is not None:
+    elif status in ["FILLED", "CANCELED"] and order_found:
         logger.info(
             f"[AutobuyOrderUpdate] User {user_id}: last_buy_price remains {new_last_buy_price} after processing order {order_id} ({status})."
         )
@@ -1146,17 +854,11 @@ async def periodic_resource_check(telegram_id: int):
                 )
 
             # Проверяем состояние ожидания и обновляем его при необходимости
-            current_time = time.time()
-            restart_after = autobuy_states[telegram_id].get("restart_after", 0)
-            waiting_for_opportunity = autobuy_states[telegram_id].get(
-                "waiting_for_opportunity", False
-            )
+            state = autobuy_states.get(telegram_id)
+            if state is None:
+                break
 
-            if (
-                waiting_for_opportunity
-                and restart_after > 0
-                and current_time >= restart_after
-            ):
+            if state.waiting_expired():
                 logger.info(
                     f"Период ожидания истек для {telegram_id} (проверка ресурсов)"
                 )
@@ -1195,40 +897,24 @@ async def periodic_resource_check(telegram_id: int):
 
             active_deals = await sync_to_async(list)(deals_qs)
 
-            rebuilt_active_orders = []
-            for deal in active_deals:
-                rebuilt_active_orders.append(
-                    {
-                        "order_id": deal.order_id,
-                        "buy_price": float(deal.buy_price),
-                        "notified": False,
-                        "user_order_number": deal.user_order_number,
-                    }
-                )
-
-            state = autobuy_states.get(telegram_id, {})
-            current_active_orders = state.get("active_orders", [])
+            rebuilt_active_orders = [ActiveOrder.from_deal(deal) for deal in active_deals]
 
             # Обновляем только если реально поменялось
-            if rebuilt_active_orders != current_active_orders:
-                autobuy_states[telegram_id]["active_orders"] = rebuilt_active_orders
+            if state.replace_orders(rebuilt_active_orders):
                 logger.info(
                     f"[Resync] Пересобраны active_orders для {telegram_id}: {rebuilt_active_orders}"
                 )
 
                 # Если активных ордеров больше нет — переводим в режим ожидания новой возможности
-                if not rebuilt_active_orders:
+                if not state.active_order_count:
                     try:
                         pause_seconds = user.pause
                     except Exception:
                         pause_seconds = 0
 
-                    autobuy_states[telegram_id]["last_buy_price"] = None
-                    autobuy_states[telegram_id]["waiting_for_opportunity"] = True
-                    autobuy_states[telegram_id]["restart_after"] = (
+                    state.enter_waiting(
                         time.time() + pause_seconds if pause_seconds > 0 else 0
                     )
-                    autobuy_states[telegram_id]["waiting_reported"] = False
                     logger.info(
                         f"[Resync] Установлен режим ожидания для {telegram_id}. Пауза: {pause_seconds}s"
                     )
@@ -26,13 +26,13 @@ async def check_bookticker_data(message: Message):
         info = []
         info.append("📊 *BookTicker Data Status*\n")
         
-        for symbol, data in current_data.items():
+        for symbol, tick in current_data.items():
             info.append(f"🔸 *{symbol}:*")
-            info.append(f"   • Bid: {data.get('bid_price', 'N/A')}")
-            info.append(f"   • Ask: {data.get('ask_price', 'N/A')}")
-            info.append(f"   • Bid Qty: {data.get('bid_qty', 'N/A')}")
-            info.append(f"   • Ask Qty: {data.get('ask_qty', 'N/A')}")
-            info.append(f"   • Timestamp: {data.get('timestamp', 'N/A')}")
+            info.append(f"   • Bid: {tick.bid_price or 'N/A'}")
+            info.append(f"   • Ask: {tick.ask_price or 'N/A'}")
+            info.append(f"   • Bid Qty: {tick.bid_qty or 'N/A'}")
+            info.append(f"   • Ask Qty: {tick.ask_qty or 'N/A'}")
+            info.append(f"   • Timestamp: {tick.send_time or 'N/A'}")
             info.append("")
         
         await message.answer('\n'.join(info), parse_mode='Markdown')
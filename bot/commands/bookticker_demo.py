@@ -55,8 +55,8 @@ async def get_spread_info(message: Message):
                 
                 response_text = (
                     f"📊 *Спред для {pair}* (Real-time)\n\n"
-                    f"🟢 *Лучший бид:* `{bid_price}` (кол-во: {bid_qty})\n"
-                    f"🔴 *Лучший аск:* `{ask_price}` (кол-во: {ask_qty})\n"
+                    f"🟢 *Лучший бид:* `{tick.bid_price}` (кол-во: {tick.bid_qty})\n"
+                    f"🔴 *Лучший аск:* `{tick.ask_price}` (кол-во: {tick.ask_qty})\n"
                     f"📏 *Спред:* `{spread:.8f}` ({spread_percentage:.4f}%)\n"
                     f"⚖️ *Средняя цена:* `{mid_price:.6f}`\n\n"
                     f"📡 *REST API (для сравнения):*\n"
@@ -88,18 +88,19 @@ async def get_spread_info(message: Message):
             await websocket_manager.subscribe_bookticker_data([pair])
 
         # Create callback to update the message with real-time data
-        async def update_spread_message(symbol, bid_price, ask_price, bid_qty, ask_qty):
+        async def update_spread_message(tick):
             try:
-                bid = float(bid_price)
-                ask = float(ask_price)
+                symbol = tick.symbol
+                bid = tick.bid
+                ask = tick.ask
                 spread = ask - bid
                 spread_percentage = (spread / bid) * 100 if bid > 0 else 0
                 mid_price = (bid + ask) / 2
                 
                 updated_text = (
                     f"📊 *Спред для {symbol}* (Real-time ✅)\n\n"
-                    f"🟢 *Лучший бид:* `{bid_price}` (кол-во: {bid_qty})\n"
-                    f"🔴 *Лучший аск:* `{ask_price}` (кол-во: {ask_qty})\n"
+                    f"🟢 *Лучший бид:* `{tick.bid_price}` (кол-во: {tick.bid_qty})\n"
+                    f"🔴 *Лучший аск:* `{tick.ask_price}` (кол-во: {tick.ask_qty})\n"
                     f"📏 *Спред:* `{spread:.8f}` ({spread_percentage:.4f}%)\n"
                     f"⚖️ *Средняя цена:* `{mid_price:.6f}`\n\n"
                     f"🔄 *Обновлено в реальном времени*"
@@ -157,9 +158,9 @@ async def show_bookticker_status(message: Message):
                 
         if websocket_manager.current_bookticker:
             status_text += f"\n*Доступные данные:*\n"
-            for symbol, data in list(websocket_manager.current_bookticker.items())[:5]:  # Show max 5
-                bid = data.get('bid_price', 'N/A')
-                ask = data.get('ask_price', 'N/A')
+            for symbol, tick in list(websocket_manager.current_bookticker.items())[:5]:  # Show max 5
+                bid = tick.bid_price or 'N/A'
+                ask = tick.ask_price or 'N/A'
                 status_text += f"• {symbol}: {bid} / {ask}\n"
                 
             if len(websocket_manager.current_bookticker) > 5:
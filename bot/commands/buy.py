@@ -1,13 +1,13 @@
 import asyncio
 from aiogram.types import Message
 from asgiref.sync import sync_to_async
-from django.utils import timezone
 from users.models import Deal
 from bot.logger import logger
 from bot.utils.mexc import handle_mexc_response
 from bot.utils.api_errors import parse_mexc_error
 from mexc_sdk import Trade
 from bot.constants import MAX_FAILS
+from bot.utils.pnl_rollup import transition_deal_status
 
 
 async def monitor_order(message: Message, order_id: str, user_order_number: int):
@@ -33,9 +33,7 @@ async def monitor_order(message: Message, order_id: str, user_order_number: int)
             status = order_status.get("status")
 
             if status == "CANCELED":
-                deal.status = "CANCELED"
-                deal.updated_at = timezone.now()
-                await sync_to_async(deal.save)()
+                await sync_to_async(transition_deal_status)(deal, "CANCELED")
                 await message.answer(
                     f"❌ <b>СДЕЛКА {user_order_number} ОТМЕНЕНА</b>\n\n"
                     f"🔁 Покупка: {deal.quantity:.6f} {deal.symbol[:3]} по {deal.buy_price:.6f} {deal.symbol[3:]}\n"
@@ -45,9 +43,7 @@ async def monitor_order(message: Message, order_id: str, user_order_number: int)
                 return
 
             if status == "FILLED":
-                deal.status = "FILLED"
-                deal.updated_at = timezone.now()
-                await sync_to_async(deal.save)()
+                await sync_to_async(transition_deal_status)(deal, "FILLED")
 
                 buy_total = deal.quantity * deal.buy_price
                 sell_total = deal.quantity * deal.sell_price
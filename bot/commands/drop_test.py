@@ -46,7 +46,7 @@ async def test_drop_logic(message: Message):
         # Get last buy price from autobuy state
         last_buy_price = None
         if user_id in autobuy_states:
-            last_buy_price = autobuy_states[user_id].get('last_buy_price')
+            last_buy_price = autobuy_states[user_id].last_buy_price
         
         test_info = []
         test_info.append("📉 *Drop Test Results*\n")
@@ -132,12 +132,12 @@ async def show_price_info(message: Message):
         if user_id in autobuy_states:
             state = autobuy_states[user_id]
             price_info.append(f"\n🤖 *Autobuy State:*")
-            price_info.append(f"   • Last Buy Price: {state.get('last_buy_price', 'None')}")
-            price_info.append(f"   • Current Price: {state.get('current_price', 'None')}")
-            price_info.append(f"   • Active Orders: {len(state.get('active_orders', []))}")
-            price_info.append(f"   • Is Rise Trigger: {'✅' if state.get('is_rise_trigger', False) else '❌'}")
-            if state.get('trigger_price'):
-                price_info.append(f"   • Trigger Price: {state.get('trigger_price', 'None')}")
+            price_info.append(f"   • Last Buy Price: {state.last_buy_price}")
+            price_info.append(f"   • Current Price: {state.current_price}")
+            price_info.append(f"   • Active Orders: {state.active_order_count}")
+            price_info.append(f"   • Is Rise Trigger: {'✅' if state.is_rise_trigger else '❌'}")
+            if state.trigger_price:
+                price_info.append(f"   • Trigger Price: {state.trigger_price}")
         
         await message.answer('\n'.join(price_info), parse_mode='Markdown')
         
@@ -212,7 +212,8 @@ def save_user_parameter(user_id: int, param: str, value: float):
         user.save()
         logger.info(f"[OK] Saved {param}={value} for user {user_id}")
         
-        # Если пользователь в режиме автобая, обновляем параметры в реальном времени
+        # Кэш настроек автобая (user_settings_cache) обновляется сигналом post_save,
+        # поэтому новый параметр применяется со следующего тика bookTicker
         if hasattr(user, 'autobuy') and user.autobuy:
             # Импортируем autobuy_states здесь, чтобы избежать циклических импортов
             from bot.commands.autobuy import autobuy_states
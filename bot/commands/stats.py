@@ -1,7 +1,6 @@
 import pytz
 from django.utils import timezone
-from users.models import Deal
-from datetime import timedelta
+from datetime import date, timedelta
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from asgiref.sync import sync_to_async
@@ -9,6 +8,7 @@ from bot.keyboards.inline import get_period_keyboard, get_month_keyboard, get_ye
 from users.models import User
 from bot.logger import logger
 from bot.constants import MONTHS_RU
+from bot.utils.pnl_rollup import get_period_stats
 router = Router()
 
 MOSCOW_TZ = pytz.timezone("Europe/Moscow")
@@ -54,13 +54,14 @@ async def handle_stats_callback(callback_query: CallbackQuery):
         end_date = now
         period_label = f"{start_date.strftime('%d.%m.%Y')}"
     elif parts[1] == "7d":
-        start_date = now - timedelta(days=7)
+        # 7 московских дней включая сегодня: границы дней в сводке включительные
+        start_date = now - timedelta(days=6)
         end_date = now
         period_label = f"{start_date.strftime('%d.%m.%Y')}–{end_date.strftime('%d.%m.%Y')}"
     elif parts[1] == "year":
         year = int(parts[2])
         start_date = timezone.datetime(year, 1, 1, tzinfo=MOSCOW_TZ)
-        end_date = start_date + timedelta(days=365)
+        end_date = timezone.datetime(year, 12, 31, tzinfo=MOSCOW_TZ)
         period_label = f"{year} год"
     elif parts[1] == "all":
         start_date = timezone.datetime(2020, 1, 1, tzinfo=MOSCOW_TZ)
@@ -79,33 +80,24 @@ async def handle_stats_callback(callback_query: CallbackQuery):
 
     try:
         user_id = callback_query.from_user.id
-        user, deals = await get_user_and_deals(user_id, start_date, end_date)
+        # Статистика считается по московским дням из дневной сводки DailyPnl
+        user, deals_count, profit_total, percent_total = await get_user_and_period_stats(
+            user_id, start_date.date(), end_date.date()
+        )
 
-        if not deals:
+        if not deals_count:
             stats_message = (
                 f"<b>{period_label}</b>\n\n"
                 f"Количество сделок: 0\n"
             )
         else:
-            profit_total = 0
-            percent_total = 0
-
-            for deal in deals:
-                total_buy = deal.buy_price * deal.quantity
-                total_sell = deal.sell_price * deal.quantity
-                profit = total_sell - total_buy
-                profit_percent = ((deal.sell_price - deal.buy_price) / deal.buy_price) * 100 if deal.buy_price > 0 else 0
-
-                profit_total += profit
-                percent_total += profit_percent
-
-            avg_profit_percent = percent_total / len(deals)
+            avg_profit_percent = percent_total / deals_count
             
             pair = user.pair
 
             stats_message = (
                 f"<b>{period_label}</b>\n\n"
-                f"Количество сделок: {len(deals)}\n"
+                f"Количество сделок: {deals_count}\n"
                 f"Прибыль: {profit_total:.4f} {pair[3:]}\n"
                 f"Средний % профита: {avg_profit_percent:.2f}%"
             )
@@ -131,12 +123,7 @@ async def handle_stats_callback(callback_query: CallbackQuery):
 
 
 @sync_to_async
-def get_user_and_deals(telegram_id, start_date, end_date):
+def get_user_and_period_stats(telegram_id, start_day: date, end_day: date):
     user = User.objects.get(telegram_id=telegram_id)
-    deals = Deal.objects.filter(
-        user=user,
-        updated_at__range=[start_date, end_date],
-        sell_price__isnull=False,
-        status="FILLED"
-    ).order_by('updated_at')
-    return user, deals
+    deals_count, profit_total, percent_total = get_period_stats(user.id, start_day, end_day)
+    return user, deals_count, profit_total, percent_total
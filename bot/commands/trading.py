@@ -14,6 +14,8 @@ from bot.utils.error_notifier import notify_user_command_error
 from bot.keyboards.inline import get_period_keyboard, get_pagination_keyboard
 from asgiref.sync import sync_to_async
 from bot.utils.mexc_rest import MexcRestClient
+from bot.utils.pnl_rollup import transition_deal_status
+from bot.utils.deal_numbers import next_user_order_number
 from django.utils.timezone import localtime
 from bot.utils.mexc import handle_mexc_response
 from bot.utils.api_errors import parse_mexc_error
@@ -65,9 +67,9 @@ async def get_user_price(message: Message):
             await websocket_manager.subscribe_market_data([pair])
 
         # Функция для обновления цены в сообщении
-        async def update_price_message(symbol, price):
+        async def update_price_message(tick):
             nonlocal sent_message
-            await sent_message.edit_text(f"Цена {symbol}: {price} (обновлено)")
+            await sent_message.edit_text(f"Цена {tick.symbol}: {tick.price} (обновлено)")
 
         # Регистрируем callback для обновления цены в реальном времени
         await websocket_manager.register_price_callback(pair, update_price_message)
@@ -300,10 +302,7 @@ async def buy_handler(message: Message):
 
         # 6. Сохраняем ордер в базу
         # Получаем следующий номер
-        last_number = await sync_to_async(
-            lambda: Deal.objects.filter(user=user).count()
-        )()
-        user_order_number = last_number + 1
+        user_order_number = await sync_to_async(next_user_order_number)(user.id)
         extra_data["user_order_number"] = user_order_number
         deal = await sync_to_async(Deal.objects.create)(
             user=user,
@@ -321,8 +320,7 @@ async def buy_handler(message: Message):
             order_check = await rest.query_order(symbol, {"orderId": sell_order_id})
             current_status = order_check.get("status")
             if current_status and current_status != deal.status:
-                deal.status = current_status
-                await sync_to_async(deal.save)()
+                await sync_to_async(transition_deal_status)(deal, current_status)
         except Exception as e:
             logger.warning(
                 f"Не удалось уточнить начальный статус ордера {sell_order_id}: {e}"
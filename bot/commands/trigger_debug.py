@@ -5,7 +5,7 @@ from aiogram.filters import Command
 
 from bot.utils.mexc import get_user_client
 from bot.utils.websocket_manager import websocket_manager
-from bot.commands.autobuy import autobuy_states, trigger_states
+from bot.commands.autobuy import autobuy_states
 from bot.logger import logger
 import time
 
@@ -33,14 +33,14 @@ async def debug_trigger_logic(message: Message):
         if user_id in autobuy_states:
             state = autobuy_states[user_id]
             debug_info.append("✅ *Autobuy State:* Активен")
-            debug_info.append(f"   • Last Buy Price: {state.get('last_buy_price', 'None')}")
-            debug_info.append(f"   • Current Price: {state.get('current_price', 'None')}")
-            debug_info.append(f"   • Active Orders: {len(state.get('active_orders', []))}")
-            debug_info.append(f"   • Waiting Opportunity: {state.get('waiting_for_opportunity', False)}")
-            debug_info.append(f"   • Is Rise Trigger: {state.get('is_rise_trigger', False)}")
-            debug_info.append(f"   • Trigger Price: {state.get('trigger_price', 'None')}")
-            debug_info.append(f"   • Trigger Time: {state.get('trigger_time', 0)}")
-            debug_info.append(f"   • Rise Buy Count: {state.get('rise_buy_count', 0)}")
+            debug_info.append(f"   • Last Buy Price: {state.last_buy_price}")
+            debug_info.append(f"   • Current Price: {state.current_price}")
+            debug_info.append(f"   • Active Orders: {state.active_order_count}")
+            debug_info.append(f"   • Waiting Opportunity: {state.waiting_for_opportunity}")
+            debug_info.append(f"   • Is Rise Trigger: {state.is_rise_trigger}")
+            debug_info.append(f"   • Trigger Price: {state.trigger_price}")
+            debug_info.append(f"   • Trigger Time: {state.trigger_time}")
+            debug_info.append(f"   • Rise Buy Count: {state.rise_buy_count}")
         else:
             debug_info.append("❌ *Autobuy State:* Не активен")
 
@@ -65,6 +65,9 @@ async def debug_trigger_logic(message: Message):
         debug_info.append(f"   • Last Change Time: {direction_info.get('last_change_time', 0)}")
         debug_info.append(f"   • Current Price: {direction_info.get('current_price', 0)}")
         debug_info.append(f"   • Price History Length: {len(direction_info.get('price_history', []))}")
+        debug_info.append(f"   • Run Length: {direction_info.get('run_length', 0)}")
+        debug_info.append(f"   • Window Min/Max: {direction_info.get('rolling_min', 0)} / {direction_info.get('rolling_max', 0)}")
+        debug_info.append(f"   • Slope: {direction_info.get('slope', 0.0):.8f}")
 
         # Check WebSocket connection
         debug_info.append(f"\n🔗 *WebSocket Status:*")
@@ -105,14 +108,7 @@ async def test_trigger_logic(message: Message):
         current_time = time.time()
         
         # Set trigger
-        state['trigger_price'] = mid_price
-        state['trigger_time'] = current_time
-        state['is_rise_trigger'] = True
-        state['is_trigger_activated'] = False
-        state['trigger_activated_time'] = 0
-        state['pause_trend_prices'] = []
-        state['trend_only_rise'] = True
-        state['last_pause_price'] = None
+        state.arm_rise_trigger(mid_price, current_time)
         
         test_info = []
         test_info.append("🧪 *Trigger Test Results*\n")
@@ -98,11 +98,11 @@ async def show_trigger_status(message: Message):
         if user_id in autobuy_states:
             state = autobuy_states[user_id]
             status_info.append("✅ *Autobuy:* Активен")
-            status_info.append(f"   • Rise Trigger: {'✅' if state.get('is_rise_trigger', False) else '❌'}")
-            status_info.append(f"   • Trigger Price: {state.get('trigger_price', 'None')}")
-            status_info.append(f"   • Trigger Time: {state.get('trigger_time', 0):.1f}s ago")
-            status_info.append(f"   • Rise Buy Count: {state.get('rise_buy_count', 0)}")
-            status_info.append(f"   • Active Orders: {len(state.get('active_orders', []))}")
+            status_info.append(f"   • Rise Trigger: {'✅' if state.is_rise_trigger else '❌'}")
+            status_info.append(f"   • Trigger Price: {state.trigger_price}")
+            status_info.append(f"   • Trigger Time: {state.trigger_time:.1f}s ago")
+            status_info.append(f"   • Rise Buy Count: {state.rise_buy_count}")
+            status_info.append(f"   • Active Orders: {state.active_order_count}")
         else:
             status_info.append("❌ *Autobuy:* Не активен")
         
@@ -67,9 +67,9 @@ async def debug_websocket_connection(message: Message):
         )
 
         if websocket_manager.current_bookticker:
-            for symbol, data in websocket_manager.current_bookticker.items():
+            for symbol, tick in websocket_manager.current_bookticker.items():
                 debug_info.append(
-                    f"   • {symbol}: bid={data.get('bid_price', 'N/A')}, ask={data.get('ask_price', 'N/A')}"
+                    f"   • {symbol}: bid={tick.bid_price or 'N/A'}, ask={tick.ask_price or 'N/A'}"
                 )
 
         # Check callbacks
@@ -203,11 +203,11 @@ async def test_websocket_subscription(message: Message):
 
         callback_called = False
 
-        async def test_callback(symbol, bid_price, ask_price, bid_qty, ask_qty):
+        async def test_callback(tick):
             nonlocal callback_called
             callback_called = True
             logger.info(
-                f"Test callback called for {symbol}: bid={bid_price}, ask={ask_price}"
+                f"Test callback called for {tick.symbol}: bid={tick.bid_price}, ask={tick.ask_price}"
             )
 
         try:
@@ -261,6 +261,16 @@ async def ws_stats(message: Message):
         except Exception:
             stats = {}
 
+        for shard_id, shard in stats.get('market_shards', {}).get('shards', {}).items():
+            lines.append(
+                f"   • #{shard_id}: {'ОК' if shard['alive'] else 'Закрыт'}, "
+                f"{len(shard['symbols'])} симв., {shard['msg_per_sec']} msg/s, lag {shard['lag_ms']}ms"
+            )
+        for kind, counts in stats.get('market_shards', {}).get('dropped_frames', {}).items():
+            if counts:
+                dropped = ", ".join(f"{reason}: {count}" for reason, count in counts.items())
+                lines.append(f"   • Отброшено кадров {kind}: {dropped}")
+
         lines.append(
             f"👥 Пользовательских соединений: {stats.get('user_connections', 0)}"
         )
@@ -1,3 +1,5 @@
+import os
+
 from django.conf import settings
 
 
@@ -22,4 +24,53 @@ MONTHS_RU = {
 
 PAIR = settings.PAIR
 
-MAX_FAILS = 5 # Максимальное количество неудачных попыток до остановки мониторинга
\ No newline at end of file
+MAX_FAILS = 5 # Максимальное количество неудачных попыток до остановки мониторинга
+
+# Диспетчер колбэков рыночных данных (bookTicker / deals)
+WS_CALLBACK_TIMEOUT = getattr(settings, "WS_CALLBACK_TIMEOUT", 5.0)  # Таймаут одного колбэка, сек
+WS_CALLBACK_MAX_CONCURRENCY = getattr(settings, "WS_CALLBACK_MAX_CONCURRENCY", 100)  # Одновременно выполняемых колбэков
+
+# Пул market-соединений (bot/utils/ws/market_pool.py)
+WS_MARKET_SHARDS = getattr(settings, "WS_MARKET_SHARDS", 2)  # Сколько market-соединений держать при наличии подписок
+WS_MARKET_MAX_STREAMS = getattr(settings, "WS_MARKET_MAX_STREAMS", 30)  # Каналов на одно соединение (лимит MEXC — 30)
+WS_MARKET_MAX_CONNECTIONS = getattr(settings, "WS_MARKET_MAX_CONNECTIONS", 10)  # Максимум market-соединений
+
+# Запись тиков bookTicker / deals на диск (bot/utils/tick_recorder.py)
+TICK_RECORDER_ENABLED = getattr(settings, "TICK_RECORDER_ENABLED", False)  # Писать ли тики рынка в файлы
+TICK_RECORDER_DIR = getattr(settings, "TICK_RECORDER_DIR", os.path.join(getattr(settings, "BASE_DIR", "."), "ticks"))  # Каталог файлов тиков
+TICK_RECORDER_FLUSH_INTERVAL = getattr(settings, "TICK_RECORDER_FLUSH_INTERVAL", 1.0)  # Период сброса тиков на диск, сек
+TICK_RECORDER_MAX_BUFFER = getattr(settings, "TICK_RECORDER_MAX_BUFFER", 500000)  # Тиков в памяти до сброса, сверх — отбрасываются
+TICK_RECORDER_RETENTION_DAYS = getattr(settings, "TICK_RECORDER_RETENTION_DAYS", 30)  # Сколько дней хранить файлы тиков
+
+# Общий HTTP пул для REST запросов к MEXC (bot/utils/http_session.py)
+HTTP_POOL_LIMIT = getattr(settings, "HTTP_POOL_LIMIT", 100)  # Всего соединений в пуле
+HTTP_POOL_LIMIT_PER_HOST = getattr(settings, "HTTP_POOL_LIMIT_PER_HOST", 20)  # Соединений к одному хосту
+HTTP_DNS_CACHE_TTL = getattr(settings, "HTTP_DNS_CACHE_TTL", 300)  # Кэш DNS, сек
+HTTP_KEEPALIVE_TIMEOUT = getattr(settings, "HTTP_KEEPALIVE_TIMEOUT", 60.0)  # Простой keep-alive соединения, сек
+
+# Синхронизация часов с биржей для подписи запросов (bot/utils/clock_sync.py)
+CLOCK_SYNC_INTERVAL = getattr(settings, "CLOCK_SYNC_INTERVAL", 300)  # Период обновления смещения, сек
+CLOCK_SYNC_SAMPLES = getattr(settings, "CLOCK_SYNC_SAMPLES", 5)  # Замеров /api/v3/time на одно обновление
+
+# Исполнение покупки (bot/commands/autobuy.py: process_buy)
+ORDER_FILL_WAIT_TIMEOUT = getattr(settings, "ORDER_FILL_WAIT_TIMEOUT", 1.5)  # Ожидание исполнения MARKET из user stream, сек
+DEAL_PERSIST_ATTEMPTS = getattr(settings, "DEAL_PERSIST_ATTEMPTS", 6)  # Попыток записать сделку в БД после выставления SELL
+DEAL_PERSIST_RETRY_DELAY = getattr(settings, "DEAL_PERSIST_RETRY_DELAY", 1.0)  # Первая пауза между попытками, дальше x2, сек
+REST_CLIENT_CACHE_SIZE = getattr(settings, "REST_CLIENT_CACHE_SIZE", 1000)  # REST клиентов по ключам в памяти (LRU)
+
+# Reconciler статусов ордеров (bot/utils/reconciler.py)
+RECONCILE_USER_CONCURRENCY = getattr(settings, "RECONCILE_USER_CONCURRENCY", 10)  # Пользователей одновременно
+RECONCILE_QUERY_CONCURRENCY = getattr(settings, "RECONCILE_QUERY_CONCURRENCY", 5)  # query_order одновременно на пользователя
+RECONCILE_FAST_INTERVAL = getattr(settings, "RECONCILE_FAST_INTERVAL", 30)  # Интервал сверки, если user stream недоступен/молчит, сек
+RECONCILE_HEALTHY_INTERVAL = getattr(settings, "RECONCILE_HEALTHY_INTERVAL", 300)  # Интервал сверки при живом user stream, сек
+RECONCILE_WS_FRESH_SECONDS = getattr(settings, "RECONCILE_WS_FRESH_SECONDS", 90)  # Стрим считается живым, если сообщение было не раньше, сек
+RECONCILE_WS_ERROR_GRACE = getattr(settings, "RECONCILE_WS_ERROR_GRACE", 300)  # Сколько после ошибки стрима сверять часто, сек
+
+# Лимиты Telegram Bot API (bot/utils/telegram_sender.py)
+TELEGRAM_GLOBAL_RATE = getattr(settings, "TELEGRAM_GLOBAL_RATE", 25.0)  # Вызовов в секунду на бота (лимит Telegram ~30)
+TELEGRAM_CHAT_INTERVAL = getattr(settings, "TELEGRAM_CHAT_INTERVAL", 1.0)  # Минимальный интервал между вызовами в один чат, сек
+DAILY_STATS_SEND_CONCURRENCY = getattr(settings, "DAILY_STATS_SEND_CONCURRENCY", 20)  # Одновременных отправок ежедневной статистики
+TELEGRAM_BUS_WORKERS = getattr(settings, "TELEGRAM_BUS_WORKERS", 8)  # Воркеров очереди исходящих сообщений
+TELEGRAM_COALESCE_WINDOW = getattr(settings, "TELEGRAM_COALESCE_WINDOW", 3.0)  # Окно склейки повторов в один чат, сек
+TELEGRAM_BUS_MAX_QUEUE = getattr(settings, "TELEGRAM_BUS_MAX_QUEUE", 5000)  # Сверх этого информационные сообщения отбрасываются
+TELEGRAM_SEND_ATTEMPTS = getattr(settings, "TELEGRAM_SEND_ATTEMPTS", 4)  # Попыток отправки одного сообщения
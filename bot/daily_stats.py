@@ -1,18 +1,21 @@
 import asyncio
+import time
 from aiogram import Bot
 from datetime import timedelta
+from django.db.models import Sum
 from django.utils import timezone
 import pytz
 import os
-from users.models import User, Deal
+from users.models import DailyPnl
 from subscriptions.models import Subscription
 from editing.models import BotMessageForSubscription
 from bot.logger import logger
 from asgiref.sync import sync_to_async
-from bot.constants import DEFAULT_PAYMENT_MESSAGE
+from bot.constants import DEFAULT_PAYMENT_MESSAGE, DAILY_STATS_SEND_CONCURRENCY
 from aiogram.types import FSInputFile
 from django.db.utils import OperationalError
 from bot.utils.bot_logging import log_callback
+from bot.utils.telegram_sender import call_with_retry
 
 MOSCOW_TZ = pytz.timezone("Europe/Moscow")
 DAILY_STATS_TIME = "00:00"  # Moscow time
@@ -90,22 +93,19 @@ async def scheduler(bot: Bot):
                 logger.info(f"Skipping subscription check - last run was {current_time - last_sub_check_time:.2f} seconds ago")
 
 @sync_to_async
-def get_all_users():
-    """Get all users from the database with active subscriptions"""
-    # Получаем только пользователей с активными подписками
+def get_day_stats_rows(day):
+    """Deal count, profit and profit-percent sum for a Moscow day, for every user with an active subscription"""
     now = timezone.now()
-    return list(User.objects.filter(
-        subscription__expires_at__gt=now
-    ).distinct())
-
-@sync_to_async
-def get_user_deals(user, start_date, end_date):
-    """Get all completed deals for a user within the date range"""
-    return list(Deal.objects.filter(
-        user=user,
-        updated_at__range=(start_date, end_date),
-        status="FILLED"
-    ))
+    return list(
+        DailyPnl.objects.filter(
+            day=day,
+            deals__gt=0,
+            user_id__in=Subscription.objects.filter(expires_at__gt=now).values('user_id'),
+        )
+        .values('user__telegram_id', 'user__pair')
+        .annotate(deals_count=Sum('deals'), profit_sum=Sum('profit'), percent_sum=Sum('profit_percent_sum'))
+        .order_by()
+    )
 
 @sync_to_async
 def get_expiring_subscriptions():
@@ -124,55 +124,57 @@ def get_expiring_subscriptions():
 
 async def process_and_send_stats(bot: Bot):
     """Process and send daily statistics to all users"""
-    # Вычисляем даты
+    started = time.perf_counter()
+    # Вчерашний день по Москве
     moscow_now = timezone.now().astimezone(MOSCOW_TZ)
     yesterday_msk = moscow_now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
-    today_msk = moscow_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    period_label = yesterday_msk.strftime('%d.%m.%Y')
     
-    # Переводим в UTC
-    yesterday = yesterday_msk.astimezone(pytz.UTC)
-    today = today_msk.astimezone(pytz.UTC)
+    logger.info(f"Processing daily stats for {yesterday_msk.date()} (Moscow)")
     
-    logger.info(f"Processing daily stats for range: {yesterday} — {today} (UTC)")
+    # Один сгруппированный запрос на всех пользователей с подпиской
+    rows = await get_day_stats_rows(yesterday_msk.date())
+    query_s = time.perf_counter() - started
     
-    # Получаем всех пользователей
-    users = await get_all_users()
+    semaphore = asyncio.Semaphore(DAILY_STATS_SEND_CONCURRENCY)
+    delivered = 0
+    failed = 0
     
-    for user in users:
-        # Получаем сделки
-        deals = await get_user_deals(user, yesterday, today)
-        
-        if not deals:
-            logger.info(f"No deals for user {user.telegram_id} on {yesterday_msk.date()} (Moscow)")
-            continue
-        
-        profit_total = 0
-        percent_total = 0
-        
-        for deal in deals:
-            total_buy = deal.buy_price * deal.quantity
-            total_sell = deal.sell_price * deal.quantity
-            profit = total_sell - total_buy
-            profit_percent = ((deal.sell_price - deal.buy_price) / deal.buy_price) * 100 if deal.buy_price > 0 else 0
-            profit_total += profit
-            percent_total += profit_percent
-        
-        avg_profit_percent = percent_total / len(deals)
-        period_label = yesterday_msk.strftime('%d.%m.%Y')
-        
+    async def deliver(row):
+        nonlocal delivered, failed
+        telegram_id = row['user__telegram_id']
+        pair = row['user__pair'] or ''
+        avg_profit_percent = row['percent_sum'] / row['deals_count']
         stats_message = (
             f"📊 <b>Статистика за {period_label}</b>\n\n"
-            f"🔄 Количество сделок: {len(deals)}\n"
-            f"💰 Прибыль: {profit_total:.4f} {user.pair[3:]}\n"
+            f"🔄 Количество сделок: {row['deals_count']}\n"
+            f"💰 Прибыль: {row['profit_sum']:.4f} {pair[3:]}\n"
             f"📈 Средний % профита: {avg_profit_percent:.3f}%"
         )
-        
-        try:
-            msg = await bot.send_message(user.telegram_id, stats_message, parse_mode="HTML")
-            await bot.pin_chat_message(user.telegram_id, msg.message_id, disable_notification=True)
-            logger.info(f"Daily stats sent and pinned to {user.telegram_id}")
-        except Exception as e:
-            logger.error(f"Failed to send statistics to user {user.telegram_id}: {e}")
+        async with semaphore:
+            try:
+                msg = await call_with_retry(
+                    telegram_id, lambda: bot.send_message(telegram_id, stats_message, parse_mode="HTML")
+                )
+                await call_with_retry(
+                    telegram_id,
+                    lambda: bot.pin_chat_message(telegram_id, msg.message_id, disable_notification=True),
+                )
+                delivered += 1
+                logger.info(f"Daily stats sent and pinned to {telegram_id}")
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to send statistics to user {telegram_id}: {e}")
+    
+    send_started = time.perf_counter()
+    await asyncio.gather(*(deliver(row) for row in rows))
+    send_s = time.perf_counter() - send_started
+    
+    logger.info(
+        f"Daily stats for {yesterday_msk.date()}: {delivered}/{len(rows)} delivered, {failed} failed; "
+        f"query {query_s:.2f}s, delivery {send_s:.1f}s "
+        f"({delivered / send_s if send_s > 0 else 0:.1f} users/s), total {time.perf_counter() - started:.1f}s"
+    )
 
 async def check_subscription_expiration(bot: Bot):
     """Check and notify users whose subscription expires tomorrow or in 36 hours"""
@@ -31,7 +31,7 @@ except Exception:
     pass
 
 # Асинхронное логирование в БД
-async def log_to_db(message, level='INFO', user=None, extra_data=None):
+async def log_to_db(message, level='INFO', user=None, extra_data=None, telegram_id=None):
     """
     Асинхронно записать лог в базу данных.
     
@@ -39,6 +39,8 @@ async def log_to_db(message, level='INFO', user=None, extra_data=None):
     :param level: Уровень (INFO, WARNING, ERROR, DEBUG)
     :param user: Объект пользователя (опционально)
     :param extra_data: Дополнительные данные в формате dict (опционально)
+    :param telegram_id: telegram_id пользователя вместо объекта User (опционально,
+                        pk находится при записи пачки через кэш)
     """
     try:
         # Импортируем здесь для избежания циклических импортов
@@ -78,7 +80,7 @@ async def log_to_db(message, level='INFO', user=None, extra_data=None):
             message = str(message)
         
         # Асинхронно записываем лог
-        await log_async(message, level=log_level, user=user, extra_data=extra_data)
+        await log_async(message, level=log_level, user=user, extra_data=extra_data, telegram_id=telegram_id)
         
     except Exception as e:
         # В случае ошибки логируем в стандартный логгер
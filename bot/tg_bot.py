@@ -28,8 +28,13 @@ from bot.middlewares.error_reporting_middleware import ErrorReportingMiddleware
 from bot.utils.set_commands import set_default_commands
 from bot.utils.log_cleaner import start_log_cleaner
 from bot.utils.websocket_manager import websocket_manager
+from bot.utils.http_session import http_pool
+from bot.utils.clock_sync import exchange_clock
+from bot.utils.message_bus import message_bus
 from bot.utils.autobuy_restart import restart_autobuy_for_users
 from bot.utils.reconciler import order_status_reconciler_loop
+from bot.utils.tick_recorder import tick_recorder
+from logs.buffer import botlog_buffer
 from django.conf import settings
 
 config_obj = load_config()
@@ -52,6 +57,13 @@ async def main():
         # Сохраняем экземпляр бота в глобальную переменную для доступа из других модулей
         config.bot_instance = bot
 
+        # Очередь исходящих сообщений: торговый код только ставит сообщения в нее
+        message_bus.start(bot)
+        # Логи в БД пишутся пачками в фоне
+        botlog_buffer.start()
+        # Тики рынка пишутся на диск (если включено TICK_RECORDER_ENABLED)
+        tick_recorder.start()
+
         # Устанавливаем глобальный обработчик исключений для event loop
         loop = asyncio.get_event_loop()
         loop.set_exception_handler(exception_handler)
@@ -78,6 +90,13 @@ async def main():
         retention_days = getattr(settings, "LOG_RETENTION_DAYS", 7)
         log_cleaner_task = await start_log_cleaner(retention_days=retention_days)
 
+        # Общий keep-alive пул HTTP соединений к MEXC REST API
+        await http_pool.start()
+
+        # Смещение часов биржи для подписи запросов: первый замер до старта торговли, дальше в фоне
+        await exchange_clock.refresh()
+        exchange_clock.start()
+
         # Устанавливаем команды бота
         await set_default_commands(bot)
 
@@ -100,10 +119,8 @@ async def main():
             websocket_manager.monitor_connections()
         )
 
-        # Фоновый reconciler статусов ордеров
-        reconciler_task = asyncio.create_task(
-            order_status_reconciler_loop(poll_interval_seconds=60)
-        )
+        # Фоновый reconciler статусов ордеров (интервал по здоровью user stream)
+        reconciler_task = asyncio.create_task(order_status_reconciler_loop())
 
         # Инициализируем общее WebSocket соединение для мониторинга цен
         # Будем инициализировать его по требованию
@@ -153,6 +170,12 @@ async def main():
                 # Закрываем все WebSocket соединения
                 logger.info("Closing all WebSocket connections...")
                 await websocket_manager.disconnect_all()
+                await tick_recorder.stop()
+
+                # Досылаем очередь сообщений, останавливаем синхронизацию часов и закрываем общий HTTP пул
+                await message_bus.stop()
+                await exchange_clock.stop()
+                await http_pool.close()
 
                 # Логируем остановку бота
                 await log_to_db(
@@ -162,6 +185,8 @@ async def main():
                         "type": "bot_stop",
                     },
                 )
+                # Дописываем в БД буфер логов
+                await botlog_buffer.stop()
                 await bot.close()
                 # Очищаем глобальную переменную
                 config.bot_instance = None
@@ -5,7 +5,7 @@ from aiogram.types import Message
 from bot.utils.user_autobuy_tasks import user_autobuy_tasks
 from bot.commands.autobuy import autobuy_loop
 from bot.logger import logger
-from bot.config import bot_instance
+from bot.utils.message_bus import message_bus, Priority
 
 # Create a fake message class to use when restarting autobuy
 class FakeMessage:
@@ -13,20 +13,9 @@ class FakeMessage:
         self.chat_id = chat_id
         self.bot = bot
     
-    async def answer(self, text, parse_mode=None):
-        """Send a message to the user"""
-        # Use the bot instance provided at initialization if available
-        # Otherwise fall back to the global bot_instance
-        bot = self.bot or bot_instance
-        
-        if bot:
-            await bot.send_message(
-                chat_id=self.chat_id,
-                text=text,
-                parse_mode=parse_mode
-            )
-        else:
-            logger.error(f"Cannot send message to {self.chat_id}: bot instance is None")
+    async def answer(self, text, parse_mode=None, priority=Priority.INFO):
+        """Queue a message to the user (never waits for Telegram)"""
+        message_bus.send(self.chat_id, text, parse_mode=parse_mode, priority=priority)
 
 async def restart_autobuy_for_users(bot=None):
     """Restart autobuy for all users who have it enabled in the database"""
@@ -0,0 +1,332 @@
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class ActiveOrder:
+    """
+    Открытый SELL-ордер автобая, ожидающий исполнения.
+
+    persisted=False — сделка еще не записана в БД (запись идет в фоне после
+    выставления SELL). Такой ордер ресинк из БД не удаляет.
+    """
+
+    __slots__ = ("order_id", "buy_price", "user_order_number", "notified", "persisted")
+
+    def __init__(
+        self,
+        order_id: str,
+        buy_price: float,
+        user_order_number: Optional[int] = None,
+        notified: bool = False,
+        persisted: bool = True,
+    ):
+        self.order_id = order_id
+        self.buy_price = float(buy_price)
+        self.user_order_number = user_order_number
+        self.notified = notified
+        self.persisted = persisted
+
+    @classmethod
+    def from_deal(cls, deal) -> "ActiveOrder":
+        return cls(deal.order_id, deal.buy_price, deal.user_order_number)
+
+    def _key(self) -> Tuple[Any, float, Any]:
+        return (self.order_id, self.buy_price, self.user_order_number)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ActiveOrder):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return f"ActiveOrder(#{self.user_order_number}, {self.order_id}, buy={self.buy_price})"
+
+
+class _BookField:
+    """
+    Поле триггера. Пока состояние подключено к SymbolTriggerBook, значение
+    хранится в строке книги (там его читает проверка тика),
+    иначе — в собственном слоте объекта.
+    """
+
+    def __init__(self, column: str) -> None:
+        self.column = column
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.slot = "_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        book = obj._book
+        if book is None:
+            return getattr(obj, self.slot)
+        return book.get(obj.telegram_id, self.column)
+
+    def __set__(self, obj, value) -> None:
+        book = obj._book
+        if book is None:
+            setattr(obj, self.slot, value)
+        else:
+            book.set(obj.telegram_id, self.column, value)
+
+
+class _PrevPriceField:
+    """Цена предыдущего тика: в книге она общая для пары, у пользователя — только флаг has_prev."""
+
+    def __init__(self, book_attr: str) -> None:
+        self.book_attr = book_attr
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.slot = "_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        book = obj._book
+        if book is None:
+            return getattr(obj, self.slot)
+        if not book.get(obj.telegram_id, "has_prev"):
+            return None
+        return getattr(book, self.book_attr)
+
+    def __set__(self, obj, value) -> None:
+        book = obj._book
+        if book is None:
+            setattr(obj, self.slot, value)
+        else:
+            book.set(obj.telegram_id, "has_prev", value is not None)
+
+
+class AutobuyState:
+    """
+    Состояние автобая одного пользователя.
+
+    Класс со __slots__ вместо словаря: доступ по атрибуту без хэширования
+    строк и заметно меньше памяти на пользователя. Переходы триггера и режима
+    ожидания собраны в методы, чтобы не переписывать набор полей вручную
+    в каждом месте.
+
+    Поля, которые проверяются на каждом тике (last_buy_price, триггер),
+    после attach_book() живут в строке SymbolTriggerBook пары.
+    """
+
+    __slots__ = (
+        "telegram_id",
+        "_book",
+        # Цены
+        "_last_buy_price",
+        "_current_price",
+        "_last_ask_price",
+        "_last_mid_price",
+        # Жизненный цикл
+        "is_ready",
+        "last_trade_time",
+        "waiting_for_opportunity",
+        "restart_after",
+        "waiting_reported",
+        "consecutive_errors",
+        "_last_drop_notification",
+        # Триггер на росте
+        "_trigger_price",
+        "trigger_time",
+        "_trigger_activated_time",
+        "_is_rise_trigger",
+        "_is_trigger_activated",
+        "rise_buy_count",
+        # Защита от одновременных покупок
+        "buy_in_progress",
+        "buy_lock",
+        # Реестр активных ордеров {order_id: ActiveOrder}
+        "_orders",
+    )
+
+    last_buy_price = _BookField("last_buy")
+    last_drop_notification = _BookField("last_drop")
+    trigger_price = _BookField("trigger")
+    trigger_activated_time = _BookField("activated_at")
+    is_rise_trigger = _BookField("armed")
+    is_trigger_activated = _BookField("activated")
+    last_ask_price = _PrevPriceField("prev_ask")
+    last_mid_price = _PrevPriceField("prev_mid")
+
+    # Поле -> колонка книги (для переноса значений при attach/detach)
+    _BOOK_FIELDS = (
+        ("_last_buy_price", "last_buy"),
+        ("_last_drop_notification", "last_drop"),
+        ("_trigger_price", "trigger"),
+        ("_trigger_activated_time", "activated_at"),
+        ("_is_rise_trigger", "armed"),
+        ("_is_trigger_activated", "activated"),
+    )
+
+    def __init__(self, telegram_id: Optional[int] = None) -> None:
+        self.telegram_id = telegram_id
+        self._book = None
+
+        self._last_buy_price: Optional[float] = None
+        self._current_price: Optional[float] = None
+        self._last_ask_price: Optional[float] = None
+        self._last_mid_price: Optional[float] = None
+
+        self.is_ready = False
+        self.last_trade_time = 0.0
+        self.waiting_for_opportunity = False
+        self.restart_after = 0.0
+        self.waiting_reported = False
+        self.consecutive_errors = 0
+        self._last_drop_notification = 0.0
+
+        self._trigger_price: Optional[float] = None
+        self.trigger_time = 0.0
+        self._trigger_activated_time = 0.0
+        self._is_rise_trigger = False
+        self._is_trigger_activated = False
+        self.rise_buy_count = 0
+
+        self.buy_in_progress = False
+        self.buy_lock = asyncio.Lock()
+
+        self._orders: Dict[str, ActiveOrder] = {}
+
+    @property
+    def current_price(self) -> Optional[float]:
+        book = self._book
+        if book is not None and book.prev_mid is not None:
+            return book.prev_mid
+        return self._current_price
+
+    @current_price.setter
+    def current_price(self, value: Optional[float]) -> None:
+        self._current_price = value
+
+    # ---------- книга триггеров пары ----------
+
+    @property
+    def book(self):
+        return self._book
+
+    def attach_book(self, book) -> None:
+        """Переносит поля триггера в строку книги пары."""
+        if self._book is book:
+            return
+        if self._book is not None:
+            self.detach_book()
+        values = {column: getattr(self, slot) for slot, column in self._BOOK_FIELDS}
+        values["has_prev"] = self._last_ask_price is not None
+        book.add(self.telegram_id, self, values)
+        self._book = book
+
+    def detach_book(self) -> None:
+        """Возвращает поля триггера из книги в слоты объекта."""
+        book = self._book
+        if book is None:
+            return
+        values = book.remove(self.telegram_id)
+        self._book = None
+        for slot, column in self._BOOK_FIELDS:
+            value = values[column]
+            if column in ("last_drop", "activated_at") and value is None:
+                value = 0.0
+            setattr(self, slot, value)
+        has_prev = values["has_prev"]
+        self._last_ask_price = book.prev_ask if has_prev else None
+        self._last_mid_price = book.prev_mid if has_prev else None
+
+    # ---------- активные ордера ----------
+
+    @property
+    def active_orders(self) -> List[ActiveOrder]:
+        return list(self._orders.values())
+
+    @property
+    def active_order_count(self) -> int:
+        return len(self._orders)
+
+    def has_order(self, order_id: str) -> bool:
+        return order_id in self._orders
+
+    def add_order(self, order: ActiveOrder) -> None:
+        self._orders[order.order_id] = order
+
+    def remove_order(self, order_id: str) -> Optional[ActiveOrder]:
+        return self._orders.pop(order_id, None)
+
+    def replace_orders(self, orders: Iterable[ActiveOrder]) -> bool:
+        """
+        Заменяет реестр целиком. Ордера, еще не записанные в БД, сохраняются,
+        иначе SELL на бирже остался бы без учета. Возвращает True, если состав изменился.
+        """
+        new_orders = {order.order_id: order for order in orders}
+        for order_id, order in self._orders.items():
+            if not order.persisted:
+                new_orders.setdefault(order_id, order)
+        if new_orders == self._orders:
+            return False
+        self._orders = new_orders
+        return True
+
+    def latest_order(self) -> Optional[ActiveOrder]:
+        if not self._orders:
+            return None
+        return max(self._orders.values(), key=lambda o: o.user_order_number or 0)
+
+    # ---------- триггер на росте ----------
+
+    def _clear_pause(self) -> None:
+        self.is_trigger_activated = False
+        self.trigger_activated_time = 0.0
+
+    def arm_rise_trigger(self, ask_price: float, now: float, reset_last_prices: bool = False) -> None:
+        """Ставит триггер на росте по ask цене (после покупки или продажи)."""
+        self.trigger_price = ask_price
+        self.trigger_time = now
+        self.is_rise_trigger = True
+        self._clear_pause()
+        if reset_last_prices:
+            self.last_ask_price = None
+            self.last_mid_price = None
+
+    def reset_rise_trigger(self) -> None:
+        """Сбрасывает триггер на росте и очищает связанные данные."""
+        self.is_rise_trigger = False
+        self.trigger_price = None
+        self.trigger_time = 0.0
+        self._clear_pause()
+        self.last_ask_price = None
+        self.last_mid_price = None
+
+    # ---------- режим ожидания ----------
+
+    def enter_waiting(self, restart_after: float, clear_last_buy_price: bool = True) -> None:
+        """Ждем следующей возможности купить (restart_after — unix time, 0 — без таймера)."""
+        if clear_last_buy_price:
+            self.last_buy_price = None
+        self.waiting_for_opportunity = True
+        self.restart_after = restart_after
+        self.waiting_reported = False
+
+    def clear_waiting(self) -> None:
+        self.waiting_for_opportunity = False
+        self.restart_after = 0.0
+        self.waiting_reported = False
+
+    def waiting_expired(self, now: Optional[float] = None) -> bool:
+        if not self.waiting_for_opportunity or self.restart_after <= 0:
+            return False
+        return (now if now is not None else time.time()) >= self.restart_after
+
+    # ---------- ошибки ----------
+
+    def reset_errors(self) -> None:
+        self.consecutive_errors = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"AutobuyState(last_buy_price={self.last_buy_price}, orders={len(self._orders)}, "
+            f"trigger={self.trigger_price}, activated={self.is_trigger_activated})"
+        )
@@ -0,0 +1,455 @@
+import asyncio
+import math
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from bot.logger import logger
+
+
+# Минимальный интервал между уведомлениями о падении для одного пользователя (сек)
+DROP_NOTIFICATION_INTERVAL = 10
+
+# Обработчики событий получают еще tick_at=... — perf_counter приема тика
+DropHandler = Callable[..., Awaitable[Any]]  # (telegram_id, symbol, ask, last_buy, drop_percent, loss)
+RiseHandler = Callable[..., Awaitable[Any]]  # (telegram_id, symbol, trigger_price, ask, pause)
+
+_INF = float("inf")
+
+
+class PriceLevelIndex:
+    """Отсортированный индекс абсолютных ценовых уровней по ключу (telegram_id)."""
+
+    __slots__ = ("_entries", "_levels")
+
+    def __init__(self) -> None:
+        self._entries: List[Tuple[float, int]] = []
+        self._levels: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._levels
+
+    def level(self, key: int) -> Optional[float]:
+        return self._levels.get(key)
+
+    def set(self, key: int, level: Optional[float]) -> None:
+        """Ставит/переносит уровень ключа; None (или NaN) убирает его из индекса."""
+        old = self._levels.get(key)
+        if level is not None and math.isnan(level):
+            level = None
+        if old == level:
+            return
+        if old is not None:
+            del self._entries[bisect_left(self._entries, (old, key))]
+            del self._levels[key]
+        if level is not None:
+            insort(self._entries, (level, key))
+            self._levels[key] = level
+
+    def discard(self, key: int) -> None:
+        self.set(key, None)
+
+    def between(self, low: float, high: float) -> Iterator[int]:
+        """Ключи с уровнем в [low, high] — O(log n + k)."""
+        entries = self._entries
+        start = bisect_left(entries, (low,))
+        stop = bisect_right(entries, (high, _INF))
+        for i in range(start, stop):
+            yield entries[i][1]
+
+
+class _TriggerRow:
+    """Поля триггера одного пользователя в книге пары."""
+
+    FLOAT_FIELDS = ("last_buy", "loss", "pause", "trigger", "activated_at", "last_drop")
+    BOOL_FIELDS = ("enabled", "armed", "activated")
+
+    __slots__ = ("telegram_id", "state") + FLOAT_FIELDS + BOOL_FIELDS
+
+    def __init__(self, telegram_id: int, state: Any) -> None:
+        self.telegram_id = telegram_id
+        self.state = state
+        for name in self.FLOAT_FIELDS:
+            setattr(self, name, None)
+        for name in self.BOOL_FIELDS:
+            setattr(self, name, False)
+
+
+class SymbolTriggerBook:
+    """
+    Условия автобая всех пользователей одной пары.
+
+    Вместо отдельного колбэка bookTicker на каждого пользователя на пару
+    регистрируется один колбэк. Поля триггера хранятся в строках книги
+    (AutobuyState читает и пишет их через get()/set()), а поверх них
+    поддерживаются отсортированные индексы уровней:
+
+    - уровни покупки на падении last_buy * (1 - loss/100);
+    - уровни триггеров на росте (trigger_price взведенных триггеров).
+
+    Тик посещает только пользователей, чей уровень попал в диапазон цен
+    с прошлого тика, тех, кто сейчас ниже уровня падения, и тех, у кого идет
+    пауза после активации, поэтому тихий тик стоит O(log n).
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        on_drop: Optional[DropHandler] = None,
+        on_rise: Optional[RiseHandler] = None,
+    ) -> None:
+        self.symbol = symbol
+        self.on_drop = on_drop
+        self.on_rise = on_rise
+
+        self._rows: Dict[int, _TriggerRow] = {}
+
+        # Индексы уровней и множества пользователей, которых нужно смотреть на тике
+        self._drop_levels = PriceLevelIndex()
+        self._rise_levels = PriceLevelIndex()
+        self._below_drop: Set[int] = set()  # ask сейчас на/ниже уровня падения
+        self._activated: Set[int] = set()  # идет пауза после пересечения триггера
+        self._no_prev: Set[int] = set()  # нет цены предыдущего тика (после сброса)
+
+        # Общие для пары цены предыдущего тика
+        self.prev_ask: Optional[float] = None
+        self.prev_mid: Optional[float] = None
+
+        self._tasks: Set[asyncio.Task] = set()
+        self.callback = self.on_bookticker
+        self.ticks = 0
+        self.visited = 0
+        self.avg_eval_us = 0.0
+
+    # ---------- строки ----------
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, telegram_id: int) -> bool:
+        return telegram_id in self._rows
+
+    def add(self, telegram_id: int, state: Any, values: Dict[str, Any]) -> None:
+        """Добавляет строку пользователя; values — начальные значения полей."""
+        row = self._rows.get(telegram_id)
+        if row is not None:
+            row.state = state
+        else:
+            row = self._rows[telegram_id] = _TriggerRow(telegram_id, state)
+            self._no_prev.add(telegram_id)
+        for name, value in values.items():
+            self._write(row, name, value)
+
+    def remove(self, telegram_id: int) -> Dict[str, Any]:
+        """Удаляет строку и возвращает её значения."""
+        row = self._rows.pop(telegram_id)
+        values = {name: getattr(row, name) for name in _TriggerRow.FLOAT_FIELDS + _TriggerRow.BOOL_FIELDS}
+        values["has_prev"] = telegram_id not in self._no_prev
+
+        self._drop_levels.discard(telegram_id)
+        self._rise_levels.discard(telegram_id)
+        self._below_drop.discard(telegram_id)
+        self._activated.discard(telegram_id)
+        self._no_prev.discard(telegram_id)
+        return values
+
+    # ---------- доступ к полям ----------
+
+    def _write(self, row: _TriggerRow, name: str, value: Any) -> None:
+        telegram_id = row.telegram_id
+        if name == "has_prev":
+            if value:
+                self._no_prev.discard(telegram_id)
+            else:
+                self._no_prev.add(telegram_id)
+            return
+        if name in _TriggerRow.BOOL_FIELDS:
+            value = bool(value)
+        elif value is not None:
+            value = float(value)
+        setattr(row, name, value)
+
+        # Поддерживаем индексы уровней в актуальном состоянии
+        if name in ("last_buy", "loss"):
+            self._sync_drop_level(row)
+        elif name in ("trigger", "armed"):
+            self._rise_levels.set(telegram_id, row.trigger if row.armed else None)
+        elif name == "activated":
+            if value:
+                self._activated.add(telegram_id)
+            else:
+                self._activated.discard(telegram_id)
+
+    def _sync_drop_level(self, row: _TriggerRow) -> None:
+        telegram_id = row.telegram_id
+        last_buy = row.last_buy
+        if last_buy is not None and last_buy > 0 and row.loss is not None:
+            level = last_buy * (1 - row.loss / 100)
+            self._drop_levels.set(telegram_id, level)
+            if self.prev_ask is not None and self.prev_ask <= level:
+                self._below_drop.add(telegram_id)
+            else:
+                self._below_drop.discard(telegram_id)
+        else:
+            self._drop_levels.discard(telegram_id)
+            self._below_drop.discard(telegram_id)
+
+    def get(self, telegram_id: int, name: str) -> Any:
+        if name == "has_prev":
+            return telegram_id not in self._no_prev
+        return getattr(self._rows[telegram_id], name)
+
+    def set(self, telegram_id: int, name: str, value: Any) -> None:
+        self._write(self._rows[telegram_id], name, value)
+
+    def apply_settings(self, telegram_id: int, settings) -> None:
+        """Обновляет loss/pause/enabled строки из UserSettings (или отключает при None)."""
+        row = self._rows.get(telegram_id)
+        if row is None:
+            return
+        enabled = settings is not None and settings.autobuy and settings.is_complete
+        self._write(row, "enabled", enabled)
+        if enabled:
+            self._write(row, "loss", settings.loss)
+            self._write(row, "pause", settings.pause)
+
+    def drop_level(self, telegram_id: int) -> Optional[float]:
+        return self._drop_levels.level(telegram_id)
+
+    # ---------- тик ----------
+
+    def _reset_trigger(self, row: _TriggerRow) -> None:
+        self._write(row, "armed", False)
+        self._write(row, "trigger", None)
+        self._write(row, "activated", False)
+        self._write(row, "activated_at", 0.0)
+
+    def evaluate(
+        self,
+        bid_price: float,
+        ask_price: float,
+        now: float,
+        ask_range: Optional[Tuple[Optional[float], Optional[float]]] = None,
+    ) -> Dict[str, List[Tuple]]:
+        """
+        Проверка условий на тике по индексам уровней.
+
+        Применяет переходы триггера и возвращает события, требующие
+        Python-обработки: drops, rises, activations, resets.
+        """
+        events: Dict[str, List[Tuple]] = {"drops": [], "rises": [], "activations": [], "resets": []}
+        mid_price = (bid_price + ask_price) / 2
+        prev_ask, prev_mid = self.prev_ask, self.prev_mid
+        self.prev_ask, self.prev_mid = ask_price, mid_price
+        if not self._rows:
+            return events
+
+        rows = self._rows
+        no_prev = self._no_prev
+        visited = 0
+
+        # Пауза идет у тех, кто был активирован до этого тика
+        running = list(self._activated)
+
+        # ЭТАП 1: активация при пересечении уровня триггера (в любую сторону)
+        if prev_ask is not None and len(self._rise_levels):
+            range_min, range_max = ask_range if ask_range else (None, None)
+            use_range = range_min is not None and range_max is not None
+            if use_range:
+                low = min(prev_ask, range_min)
+                high = max(prev_ask, range_max)
+            else:
+                low, high = min(prev_ask, ask_price), max(prev_ask, ask_price)
+            if low < high:
+                for telegram_id in list(self._rise_levels.between(low, high)):
+                    visited += 1
+                    row = rows[telegram_id]
+                    if telegram_id in no_prev or not row.enabled or row.activated:
+                        continue
+                    trigger = row.trigger
+                    if not use_range and not (
+                        prev_ask <= trigger < ask_price or prev_ask >= trigger > ask_price
+                    ):
+                        continue
+                    self._write(row, "activated", True)
+                    self._write(row, "activated_at", now)
+                    events["activations"].append((telegram_id, trigger, prev_ask))
+
+        # ЭТАП 2: пауза после активации — mid должна только расти
+        resets: List[_TriggerRow] = []
+        for telegram_id in running:
+            visited += 1
+            row = rows[telegram_id]
+            if not row.enabled or not row.armed:
+                continue
+            trigger = row.trigger
+            if telegram_id not in no_prev and prev_mid is not None and mid_price < prev_mid:
+                resets.append(row)
+                events["resets"].append((telegram_id, "mid_drop", prev_mid))
+                continue
+            pause = row.pause
+            if now - row.activated_at >= pause:
+                if ask_price > trigger:
+                    events["rises"].append((telegram_id, trigger, pause))
+                    # После покупки на росте триггер переносится на текущую цену
+                    self._write(row, "trigger", ask_price)
+                    self._write(row, "activated", False)
+                    self._write(row, "activated_at", 0.0)
+                else:
+                    resets.append(row)
+                    events["resets"].append((telegram_id, "not_above_trigger", trigger))
+
+        # Покупка на падении: ask <= last_buy * (1 - loss/100)
+        below = self._below_drop
+        if prev_ask is None:
+            below.update(self._drop_levels.between(ask_price, _INF))
+        elif ask_price < prev_ask:
+            below.update(self._drop_levels.between(ask_price, prev_ask))
+        elif ask_price > prev_ask:
+            for telegram_id in list(self._drop_levels.between(prev_ask, ask_price)):
+                if self._drop_levels.level(telegram_id) < ask_price:
+                    below.discard(telegram_id)
+        for telegram_id in below:
+            visited += 1
+            row = rows[telegram_id]
+            if not row.enabled:
+                continue
+            if row.last_drop is not None and now - row.last_drop <= DROP_NOTIFICATION_INTERVAL:
+                continue
+            row.last_drop = now
+            last_buy = row.last_buy
+            events["drops"].append((telegram_id, last_buy, (last_buy - ask_price) / last_buy * 100, row.loss))
+
+        # Цена тика становится "предыдущей" для всех активных пользователей
+        if no_prev:
+            for telegram_id in list(no_prev):
+                if rows[telegram_id].enabled:
+                    no_prev.discard(telegram_id)
+        for row in resets:
+            self._reset_trigger(row)
+            no_prev.add(row.telegram_id)
+
+        self.visited += visited
+        return events
+
+    async def on_bookticker(self, tick, ask_range=None, received_at=None):
+        """Колбэк bookTicker для пары: один на всех пользователей (tick — BookTick с уже разобранными ценами)."""
+        started = time.perf_counter()
+        # Момент приема тика листенером — начало отсчета задержки до SELL ордера
+        tick_at = received_at or started
+        ask = tick.ask
+        bid = tick.bid
+        now = time.time()
+        events = self.evaluate(bid, ask, now, ask_range)
+
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        self.ticks += 1
+        self.avg_eval_us = elapsed_us if self.ticks == 1 else self.avg_eval_us * 0.9 + elapsed_us * 0.1
+
+        mid = (bid + ask) / 2
+        for telegram_id, trigger_price, prev_ask in events["activations"]:
+            logger.info(
+                f"Trigger crossed {'↑' if ask > trigger_price else '↓'} for {telegram_id}: "
+                f"ask {prev_ask:.6f} → {ask:.6f}, mid {mid:.6f}. "
+                f"Starting {self.get(telegram_id, 'pause'):.0f}s pause."
+            )
+        for telegram_id, reason, value in events["resets"]:
+            if reason == "mid_drop":
+                logger.info(
+                    f"Mid price drop detected for {telegram_id}: {value:.6f} → {mid:.6f}. Resetting trigger."
+                )
+            else:
+                logger.info(
+                    f"Rise conditions NOT met for {telegram_id}. Final price: {ask:.6f}, trigger: {value:.6f}"
+                )
+        for telegram_id, trigger_price, pause in events["rises"]:
+            state = self._rows[telegram_id].state
+            state.rise_buy_count += 1
+            state.trigger_time = now
+            logger.info(
+                f"Rise conditions met for {telegram_id}: exclusive mid price rise during {pause:.0f}s pause. "
+                f"Final ask: {ask:.6f}, final mid: {mid:.6f}. New rise trigger at {ask:.6f}"
+            )
+            if self.on_rise is not None:
+                self._spawn(self.on_rise(telegram_id, self.symbol, trigger_price, ask, pause, tick_at=tick_at))
+        for telegram_id, last_buy, drop_percent, loss in events["drops"]:
+            logger.info(
+                f"Price drop condition met for {telegram_id}: ask={ask:.6f}, last_buy={last_buy:.6f}, "
+                f"drop={drop_percent:.2f}% >= {loss:.2f}%"
+            )
+            if self.on_drop is not None:
+                self._spawn(self.on_drop(telegram_id, self.symbol, ask, last_buy, drop_percent, loss, tick_at=tick_at))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._rows),
+            "enabled": sum(1 for row in self._rows.values() if row.enabled),
+            "ticks": self.ticks,
+            "visited_per_tick": round(self.visited / self.ticks, 2) if self.ticks else 0.0,
+            "drop_levels": len(self._drop_levels),
+            "rise_levels": len(self._rise_levels),
+            "below_drop": len(self._below_drop),
+            "in_pause": len(self._activated),
+            "avg_eval_us": round(self.avg_eval_us, 2),
+        }
+
+
+# Реестр книг триггеров по паре
+trigger_books: Dict[str, SymbolTriggerBook] = {}
+_user_books: Dict[int, SymbolTriggerBook] = {}
+
+
+async def attach_autobuy_state(
+    symbol: str,
+    state,
+    settings,
+    on_drop: DropHandler,
+    on_rise: RiseHandler,
+) -> SymbolTriggerBook:
+    """Подключает состояние пользователя к книге пары (создает книгу и колбэк при необходимости)."""
+    from bot.utils.websocket_manager import websocket_manager
+
+    current = _user_books.get(state.telegram_id)
+    if current is not None and current.symbol != symbol:
+        await detach_autobuy_state(state)
+
+    book = trigger_books.get(symbol)
+    if book is None:
+        book = SymbolTriggerBook(symbol, on_drop=on_drop, on_rise=on_rise)
+        trigger_books[symbol] = book
+        await websocket_manager.register_bookticker_callback(symbol, book.callback, track_range=True)
+        logger.info(f"Registered autobuy trigger book callback for {symbol}")
+
+    state.attach_book(book)
+    _user_books[state.telegram_id] = book
+    book.apply_settings(state.telegram_id, settings)
+    return book
+
+
+async def detach_autobuy_state(state) -> None:
+    """Отключает состояние от книги; пустая книга снимает свой колбэк bookTicker."""
+    from bot.utils.websocket_manager import websocket_manager
+
+    book = _user_books.pop(state.telegram_id, None)
+    if book is None:
+        return
+    state.detach_book()
+    if len(book) == 0:
+        trigger_books.pop(book.symbol, None)
+        await websocket_manager.unregister_bookticker_callback(book.symbol, book.callback)
+        logger.info(f"Unregistered autobuy trigger book callback for {book.symbol}")
+
+
+def apply_user_settings(telegram_id: int, settings) -> None:
+    """Слушатель user_settings_cache: переносит loss/pause/autobuy в строку книги."""
+    book = _user_books.get(telegram_id)
+    if book is not None:
+        book.apply_settings(telegram_id, settings)
@@ -0,0 +1,513 @@
+import itertools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from bot.utils.autobuy_triggers import DROP_NOTIFICATION_INTERVAL
+from bot.utils.replay import MAIN_LOOP_INTERVAL
+
+# Ширина блока пирамиды экстремумов (первый индекс с ценой выше/ниже уровня)
+BLOCK = 64
+
+# Поля результата simulate() на каждый набор параметров
+RESULT_FIELDS = (
+    "pnl",
+    "realized",
+    "unrealized",
+    "trades",
+    "sells",
+    "open",
+    "max_open",
+    "drop_buys",
+    "rise_buys",
+    "wait_buys",
+)
+
+
+def _build_levels(values: np.ndarray, op) -> List[np.ndarray]:
+    """Уровни пирамиды: каждый следующий — op (max/min) по блокам BLOCK предыдущего."""
+    levels = [values]
+    while len(levels[-1]) > BLOCK:
+        level = levels[-1]
+        levels.append(op.reduceat(level, np.arange(0, len(level), BLOCK)))
+    return levels
+
+
+def _first_hit(levels: Sequence[np.ndarray], start: np.ndarray, level: np.ndarray, above: bool) -> np.ndarray:
+    """
+    Для каждого запроса — первый индекс t >= start с values[t] >= level
+    (above) или values[t] <= level; len(values), если такого нет.
+
+    Запросы идут вверх по пирамиде, пока блок не содержит нужной цены,
+    и обратно вниз до тика: O(log64 N) векторных шагов на пачку запросов.
+    """
+    n = len(levels[0])
+    result = np.full(len(start), n, dtype=np.int64)
+    todo = np.flatnonzero(start < n)
+    pos = start[todo]
+    wanted = level[todo]
+    offsets = np.arange(BLOCK)
+    found = []
+
+    for depth, values in enumerate(levels):
+        if not len(todo):
+            break
+        window = (pos // BLOCK * BLOCK)[:, None] + offsets
+        valid = (window >= pos[:, None]) & (window < len(values))
+        prices = values[np.minimum(window, len(values) - 1)]
+        hit = valid & (prices >= wanted[:, None] if above else prices <= wanted[:, None])
+        any_hit = hit.any(axis=1)
+        if any_hit.any():
+            rows = np.flatnonzero(any_hit)
+            found.append((todo[rows], depth, window[rows, hit[rows].argmax(axis=1)], wanted[rows]))
+        miss = ~any_hit
+        todo, wanted = todo[miss], wanted[miss]
+        pos = pos[miss] // BLOCK + 1
+
+    for queries, depth, pos, wanted in found:
+        while depth > 0:
+            depth -= 1
+            values = levels[depth]
+            window = pos[:, None] * BLOCK + offsets
+            valid = window < len(values)
+            prices = values[np.minimum(window, len(values) - 1)]
+            hit = valid & (prices >= wanted[:, None] if above else prices <= wanted[:, None])
+            pos = window[np.arange(len(pos)), hit.argmax(axis=1)]
+        result[queries] = pos
+    return result
+
+
+def _next_in(indices: np.ndarray, start: np.ndarray, n: int) -> np.ndarray:
+    """Первый элемент отсортированного indices >= start (n, если такого нет)."""
+    k = np.searchsorted(indices, start, "left")
+    return np.where(k < len(indices), indices[np.minimum(k, len(indices) - 1)], n) if len(indices) else np.full(len(start), n)
+
+
+def prepare_ticks(ticks: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Массивы для simulate() из записей BOOK_DTYPE (tick_recorder).
+
+    now — время тика в секундах, как time.time() автобая в реплее; chg —
+    тики, где ask изменилась; mid_down — где mid упала; checks — тики
+    проверок ожидания основного цикла. Пирамиды max(bid), max(ask) и
+    min(ask) ищут ближайшее исполнение SELL, пересечение триггера и падение.
+    """
+    ts = np.ascontiguousarray(ticks["ts"], dtype=np.int64)
+    bid = np.ascontiguousarray(ticks["bid"], dtype=np.float64)
+    ask = np.ascontiguousarray(ticks["ask"], dtype=np.float64)
+    now = ts / 1000
+    mid = (bid + ask) / 2
+
+    # Проверки ожидания: первая через MAIN_LOOP_INTERVAL после старта, следующая — от момента предыдущей
+    checks = []
+    if len(now):
+        at = np.searchsorted(now, now[0] + MAIN_LOOP_INTERVAL, "left")
+        while at < len(now):
+            checks.append(at)
+            at = np.searchsorted(now, now[at] + MAIN_LOOP_INTERVAL, "left")
+    checks = np.asarray(checks, dtype=np.int64)
+
+    data = {
+        "now": now,
+        "bid": bid,
+        "ask": ask,
+        "mid": mid,
+        "chg": np.flatnonzero(ask[1:] != ask[:-1]) + 1,
+        "mid_down": np.flatnonzero(mid[1:] < mid[:-1]) + 1,
+        "checks": checks,
+        "check_now": now[checks],
+    }
+    for name, values, op in (("bid_max", bid, np.maximum), ("ask_max", ask, np.maximum), ("ask_min", ask, np.minimum)):
+        for depth, level in enumerate(_build_levels(values, op)[1:], start=1):
+            data[f"{name}_{depth}"] = level
+    return data
+
+
+def _levels(data: Dict[str, np.ndarray], name: str, base: str) -> List[np.ndarray]:
+    levels = [data[base]]
+    depth = 1
+    while f"{name}_{depth}" in data:
+        levels.append(data[f"{name}_{depth}"])
+        depth += 1
+    return levels
+
+
+class _Deals:
+    """Открытые SELL ордера всех наборов параметров: строка — набор, столбец — слот сделки."""
+
+    def __init__(self, count: int, capacity: int = 8) -> None:
+        self.sell = np.full((count, capacity), np.inf)
+        self.buy = np.zeros((count, capacity))
+        self.qty = np.zeros((count, capacity))
+        self.seq = np.full((count, capacity), -1, dtype=np.int64)
+
+    def _grow(self) -> None:
+        count, capacity = self.sell.shape
+        self.sell = np.hstack([self.sell, np.full((count, capacity), np.inf)])
+        self.buy = np.hstack([self.buy, np.zeros((count, capacity))])
+        self.qty = np.hstack([self.qty, np.zeros((count, capacity))])
+        self.seq = np.hstack([self.seq, np.full((count, capacity), -1, dtype=np.int64)])
+
+    def add(self, rows: np.ndarray, sell: np.ndarray, buy: np.ndarray, qty: np.ndarray, seq: np.ndarray) -> None:
+        free = np.isinf(self.sell[rows])
+        if not free.any(axis=1).all():
+            self._grow()
+            free = np.isinf(self.sell[rows])
+        slots = free.argmax(axis=1)
+        self.sell[rows, slots] = sell
+        self.buy[rows, slots] = buy
+        self.qty[rows, slots] = qty
+        self.seq[rows, slots] = seq
+
+
+class _Ahead:
+    """
+    Найденный тик события и уровни, по которым он искался. Пока уровни
+    те же и тик не пройден, поиск по пирамиде не повторяется.
+    """
+
+    def __init__(self, count: int, keys: int) -> None:
+        self.at = np.full(count, -1, dtype=np.int64)
+        self.keys = np.full((keys, count), np.nan)
+
+    def stale(self, rows: np.ndarray, cur: np.ndarray, *keys: np.ndarray) -> np.ndarray:
+        mask = self.at[rows] <= cur
+        for stored, key in zip(self.keys, keys):
+            mask |= stored[rows] != key
+        return mask
+
+    def store(self, rows: np.ndarray, at: np.ndarray, *keys: np.ndarray) -> None:
+        self.at[rows] = at
+        for stored, key in zip(self.keys, keys):
+            stored[rows] = key
+
+
+def simulate(
+    data: Dict[str, np.ndarray],
+    profit: np.ndarray,
+    loss: np.ndarray,
+    pause: np.ndarray,
+    buy_amount: float = 10.0,
+    fee: float = 0.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Стратегия автобая для всех наборов (profit, loss, pause) сразу.
+
+    Переходы повторяют bot/commands/autobuy.py и SymbolTriggerBook.evaluate
+    в порядке реплея (bot/utils/replay.py): на тике — пауза триггера,
+    пересечение триггера и падение, затем исполнение SELL по bid, затем
+    проверка ожидания основного цикла. Первая покупка — по ask первого тика.
+
+    Состояние — массивы по наборам. Набор не перебирает тики: для каждого
+    ищется ближайший тик, на котором у него может что-то произойти
+    (пирамиды цен, индексы изменений, searchsorted по времени), и весь тик
+    применяется векторно к наборам, дошедшим до своего тика.
+    """
+    now, bid, ask, mid = data["now"], data["bid"], data["ask"], data["mid"]
+    chg, mid_down, checks, check_now = data["chg"], data["mid_down"], data["checks"], data["check_now"]
+    bid_max = _levels(data, "bid_max", "bid")
+    ask_max = _levels(data, "ask_max", "ask")
+    ask_min = _levels(data, "ask_min", "ask")
+    n = len(now)
+
+    profit = np.asarray(profit, dtype=np.float64)
+    loss = np.asarray(loss, dtype=np.float64)
+    pause = np.asarray(pause, dtype=np.float64)
+    count = len(profit)
+    result = {name: np.zeros(count) for name in RESULT_FIELDS}
+    if not n or not count:
+        return result
+
+    deals = _Deals(count)
+    opened = np.zeros(count, dtype=np.int64)
+    last_buy = np.full(count, np.nan)
+    last_drop = np.full(count, np.nan)
+    armed = np.zeros(count, dtype=bool)
+    trigger = np.full(count, np.nan)
+    activated = np.zeros(count, dtype=bool)
+    activated_at = np.zeros(count)
+    # Первый тик, на котором возможна активация (после сброса тик без предыдущей цены пропускается)
+    act_from = np.full(count, 2, dtype=np.int64)
+    waiting = np.zeros(count, dtype=bool)
+    restart_after = np.zeros(count)
+    min_sell = np.full(count, np.inf)
+    crossing_at, drop_at, fill_at = _Ahead(count, 2), _Ahead(count, 2), _Ahead(count, 1)
+    realized = np.zeros(count)
+    trades = result["trades"]
+    sells = result["sells"]
+    max_open = result["max_open"]
+    cost = buy_amount * (1 + fee)
+
+    def buy(rows: np.ndarray, t: np.ndarray, arm: bool) -> None:
+        price = ask[t]
+        qty = buy_amount / price
+        real_price = buy_amount / qty
+        # round() как в process_buy: np.round округляет иначе на половинках
+        sell = np.fromiter(
+            (round(p * (1 + pr / 100), 6) for p, pr in zip(real_price.tolist(), profit[rows].tolist())),
+            dtype=np.float64,
+            count=len(rows),
+        )
+        trades[rows] += 1
+        deals.add(rows, sell, real_price, qty, trades[rows].astype(np.int64))
+        opened[rows] += 1
+        max_open[rows] = np.maximum(max_open[rows], opened[rows])
+        min_sell[rows] = np.minimum(min_sell[rows], sell)
+        last_buy[rows] = real_price
+        waiting[rows] = False
+        restart_after[rows] = 0.0
+        if arm:
+            armed[rows] = True
+            trigger[rows] = price
+            activated[rows] = False
+            activated_at[rows] = 0.0
+
+    # Тик 0: первая покупка (initial_purchase взводит триггер)
+    rows = np.arange(count)
+    t = np.zeros(count, dtype=np.int64)
+    buy(rows, t, arm=True)
+    cur = np.zeros(count, dtype=np.int64)
+    stage = "fills"
+
+    while True:
+        if stage == "next":
+            # Ближайший тик, на котором у набора может что-то произойти
+            t1 = cur + 1
+            cand = np.full(len(rows), n, dtype=np.int64)
+
+            sub = armed[rows] & ~activated[rows]
+            if sub.any():
+                idx = np.flatnonzero(sub)
+                r = rows[idx]
+                keys = (trigger[r], act_from[r])
+                stale = crossing_at.stale(r, cur[idx], *keys)
+                if stale.any():
+                    rs = r[stale]
+                    t0 = np.maximum(np.maximum(t1[idx][stale], act_from[rs]), 2)
+                    prev = ask[np.minimum(t0 - 1, n - 1)]
+                    level = trigger[rs]
+                    hit = np.full(len(rs), n, dtype=np.int64)
+                    below, over = prev < level, prev > level
+                    if below.any():
+                        hit[below] = _first_hit(ask_max, t0[below], level[below], above=True)
+                    if over.any():
+                        hit[over] = _first_hit(ask_min, t0[over], level[over], above=False)
+                    same = ~below & ~over
+                    if same.any():
+                        hit[same] = _next_in(chg, t0[same], n)
+                    crossing_at.store(rs, hit, *(key[stale] for key in keys))
+                cand[idx] = np.minimum(cand[idx], crossing_at.at[r])
+
+            sub = activated[rows]
+            if sub.any():
+                idx = np.flatnonzero(sub)
+                r = rows[idx]
+                # Время — с запасом на тик: сам тик проверяется точно
+                elapsed = np.maximum(np.searchsorted(now, activated_at[r] + pause[r], "left") - 1, t1[idx])
+                cand[idx] = np.minimum(cand[idx], np.minimum(_next_in(mid_down, t1[idx], n), elapsed))
+
+            sub = ~np.isnan(last_buy[rows])
+            if sub.any():
+                idx = np.flatnonzero(sub)
+                r = rows[idx]
+                keys = (
+                    last_buy[r] * (1 - loss[r] / 100),
+                    np.where(np.isnan(last_drop[r]), -np.inf, last_drop[r] + DROP_NOTIFICATION_INTERVAL),
+                )
+                stale = drop_at.stale(r, cur[idx], *keys)
+                if stale.any():
+                    level, after = (key[stale] for key in keys)
+                    t0 = np.maximum(np.searchsorted(now, after, "right") - 1, t1[idx][stale])
+                    drop_at.store(r[stale], _first_hit(ask_min, t0, level, above=False), level, after)
+                cand[idx] = np.minimum(cand[idx], drop_at.at[r])
+
+            sub = opened[rows] > 0
+            if sub.any():
+                idx = np.flatnonzero(sub)
+                r = rows[idx]
+                stale = fill_at.stale(r, cur[idx], min_sell[r])
+                if stale.any():
+                    rs = r[stale]
+                    fill_at.store(rs, _first_hit(bid_max, t1[idx][stale], min_sell[rs], above=True), min_sell[rs])
+                cand[idx] = np.minimum(cand[idx], fill_at.at[r])
+
+            sub = waiting[rows]
+            if sub.any():
+                idx = np.flatnonzero(sub)
+                k = np.maximum(
+                    np.searchsorted(checks, t1[idx], "left"),
+                    np.searchsorted(check_now, restart_after[rows[idx]], "left"),
+                )
+                cand[idx] = np.minimum(cand[idx], np.where(k < len(checks), checks[np.minimum(k, len(checks) - 1)], n))
+
+            live = cand < n
+            if not live.any():
+                break
+            rows, t = rows[live], cand[live]
+            cur = t
+            stage = "evaluate"
+
+        if stage == "evaluate":
+            # SymbolTriggerBook.evaluate на тике t (у каждого набора свой t)
+            a_t, a_prev = ask[t], ask[t - 1]
+            t_now = now[t]
+            run = activated[rows]
+            mid_drop = run & (t >= 2) & (mid[t] < mid[t - 1])
+            elapsed = run & ~mid_drop & (t_now - activated_at[rows] >= pause[rows])
+            rise = elapsed & (a_t > trigger[rows])
+            reset = mid_drop | (elapsed & ~rise)
+
+            can = armed[rows] & ~run & (t >= act_from[rows]) & (t >= 2)
+            low, high = np.minimum(a_prev, a_t), np.maximum(a_prev, a_t)
+            level = trigger[rows]
+            activate = can & (low < high) & (level >= low) & (level <= high)
+
+            drop_level = last_buy[rows] * (1 - loss[rows] / 100)
+            drop = (a_t <= drop_level) & ~(t_now - last_drop[rows] <= DROP_NOTIFICATION_INTERVAL)
+
+            r = rows[rise]
+            trigger[r] = a_t[rise]
+            activated[r] = False
+            activated_at[r] = 0.0
+            r = rows[reset]
+            armed[r] = False
+            trigger[r] = np.nan
+            activated[r] = False
+            activated_at[r] = 0.0
+            act_from[r] = t[reset] + 2
+            r = rows[activate]
+            activated[r] = True
+            activated_at[r] = t_now[activate]
+            last_drop[rows[drop]] = t_now[drop]
+
+            # Покупка на росте идет первой, покупка на падении в том же тике пропускается (buy_in_progress)
+            result["rise_buys"][rows[rise]] += 1
+            result["drop_buys"][rows[drop & ~rise]] += 1
+            bought = rise | drop
+            if bought.any():
+                buy(rows[bought], t[bought], arm=True)
+            stage = "fills"
+
+        if stage == "fills":
+            # Исполнение SELL по bid, затем process_order_update_for_autobuy
+            b_t = bid[t]
+            has = min_sell[rows] <= b_t
+            if has.any():
+                r, tf = rows[has], t[has]
+                filled = deals.sell[r] <= b_t[has][:, None]
+                proceeds = (np.where(filled, deals.sell[r], 0.0) * deals.qty[r]).sum(axis=1)
+                closed = filled.sum(axis=1)
+                realized[r] += proceeds * (1 - fee) - closed * cost
+                sells[r] += closed
+                opened[r] -= closed
+                sell_left = np.where(filled, np.inf, deals.sell[r])
+                seq_left = np.where(filled, -1, deals.seq[r])
+                deals.sell[r] = sell_left
+                deals.seq[r] = seq_left
+                min_sell[r] = sell_left.min(axis=1)
+
+                armed[r] = True
+                trigger[r] = ask[tf]
+                activated[r] = False
+                activated_at[r] = 0.0
+                act_from[r] = tf + 2
+
+                empty = opened[r] == 0
+                newest = deals.buy[r, seq_left.argmax(axis=1)]
+                last_buy[r] = np.where(empty, np.nan, newest)
+                waiting[r[empty]] = True
+                restart_after[r[empty]] = now[tf[empty]] + pause[r[empty]]
+            stage = "check"
+
+        if stage == "check":
+            # Проверка ожидания основного цикла autobuy_loop
+            if len(checks):
+                k = np.minimum(np.searchsorted(checks, t, "left"), len(checks) - 1)
+                due = (checks[k] == t) & waiting[rows] & (restart_after[rows] > 0) & (now[t] >= restart_after[rows])
+                if due.any():
+                    r = rows[due]
+                    waiting[r] = False
+                    restart_after[r] = 0.0
+                    idle = opened[r] == 0
+                    if idle.any():
+                        result["wait_buys"][r[idle]] += 1
+                        buy(r[idle], t[due][idle], arm=False)
+            stage = "next"
+
+    last_bid = bid[-1]
+    open_qty = (deals.qty * ~np.isinf(deals.sell)).sum(axis=1)
+    result["realized"] = realized
+    result["unrealized"] = open_qty * last_bid * (1 - fee) - opened * cost
+    result["pnl"] = realized + result["unrealized"]
+    result["open"] = opened.astype(np.float64)
+    return result
+
+
+# Массивы тиков в процессе пула (np.load с mmap: страницы общие для всех процессов)
+_worker_data: Optional[Dict[str, np.ndarray]] = None
+
+
+def _init_worker(directory: str) -> None:
+    global _worker_data
+    _worker_data = {
+        name[:-4]: np.load(os.path.join(directory, name), mmap_mode="r")
+        for name in os.listdir(directory)
+        if name.endswith(".npy")
+    }
+
+
+def _simulate_chunk(args) -> Dict[str, np.ndarray]:
+    profit, loss, pause, buy_amount, fee = args
+    return simulate(_worker_data, profit, loss, pause, buy_amount, fee)
+
+
+def parameter_grid(profits: Iterable[float], losses: Iterable[float], pauses: Iterable[float]) -> Dict[str, np.ndarray]:
+    """Все сочетания (profit, loss, pause) столбцами."""
+    grid = np.array(list(itertools.product(profits, losses, pauses)), dtype=np.float64).reshape(-1, 3)
+    return {"profit": grid[:, 0], "loss": grid[:, 1], "pause": grid[:, 2]}
+
+
+def sweep(
+    ticks: np.ndarray,
+    grid: Dict[str, np.ndarray],
+    buy_amount: float = 10.0,
+    fee: float = 0.0,
+    workers: Optional[int] = None,
+    chunks_per_worker: int = 2,
+) -> Dict[str, np.ndarray]:
+    """
+    simulate() по сетке параметров в пуле процессов.
+
+    Сетка делится на куски по наборам; массивы тиков готовятся один раз,
+    сохраняются во временный каталог и открываются процессами через mmap.
+    Возвращает столбцы сетки и RESULT_FIELDS в исходном порядке наборов.
+    """
+    data = prepare_ticks(ticks)
+    size = len(grid["profit"])
+    workers = max(1, min(workers or os.cpu_count() or 1, size))
+    if workers == 1:
+        result = simulate(data, grid["profit"], grid["loss"], grid["pause"], buy_amount, fee)
+        return {**grid, **result}
+
+    # Чем меньше пауза и profit+loss, тем больше сделок и событий у набора.
+    # Соседние по активности наборы в одном куске идут по событиям вместе,
+    # а самые тяжелые куски уходят в пул первыми.
+    order = np.lexsort((grid["pause"], grid["profit"] + grid["loss"]))
+    parts = [part for part in np.array_split(order, workers * chunks_per_worker) if len(part)]
+    tasks = [(grid["profit"][p], grid["loss"][p], grid["pause"][p], buy_amount, fee) for p in parts]
+
+    with tempfile.TemporaryDirectory(prefix="autobuy_sweep_") as directory:
+        for name, values in data.items():
+            np.save(os.path.join(directory, f"{name}.npy"), values)
+        del data
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(directory,)) as pool:
+            chunks = list(pool.map(_simulate_chunk, tasks))
+
+    result = {name: np.zeros(size) for name in RESULT_FIELDS}
+    for part, chunk in zip(parts, chunks):
+        for name in RESULT_FIELDS:
+            result[name][part] = chunk[name]
+    return {**grid, **result}
@@ -53,14 +53,11 @@ async def log_user_action(
         else:
             logger.info(log_message)
         
-        # Найдем пользователя в базе данных
-        user = await find_user_by_telegram_id(user_id)
-            
-        # Логируем в базу данных
+        # Логируем в базу данных (пользователь находится по telegram_id при записи пачки)
         await log_to_db(
             message=action,
             level=level,
-            user=user,
+            telegram_id=user_id,
             extra_data={
                 'user_id': user_id,
                 **(extra_data or {})
@@ -104,11 +101,6 @@ async def log_api_call(
         else:
             logger.info(log_message)
             
-        # Пытаемся найти пользователя в базе данных
-        user = None
-        if user_id:
-            user = await find_user_by_telegram_id(user_id)
-                
         # Очищаем параметры от чувствительных данных и сокращаем объем
         safe_params = {}
         for key, value in params.items():
@@ -125,7 +117,7 @@ async def log_api_call(
         await log_to_db(
             message=log_message,
             level=log_level,
-            user=user,
+            telegram_id=user_id,
             extra_data={
                 'method': method,
                 'params': safe_params,
@@ -180,14 +172,11 @@ async def log_command(
         # Добавляем статус выполнения
         command_data['success'] = success
         
-        # Находим пользователя
-        user = await find_user_by_telegram_id(user_id)
-        
         # Логируем в БД единой записью
         await log_to_db(
             message=action,
             level=level,
-            user=user,
+            telegram_id=user_id,
             extra_data={
                 'user_id': user_id,
                 'command': command,
@@ -240,14 +229,11 @@ async def log_callback(
         # Добавляем статус выполнения
         callback_info['success'] = success
         
-        # Находим пользователя
-        user = await find_user_by_telegram_id(user_id)
-        
         # Логируем в БД единой записью
         await log_to_db(
             message=action,
             level=level,
-            user=user,
+            telegram_id=user_id,
             extra_data={
                 'user_id': user_id,
                 **callback_info
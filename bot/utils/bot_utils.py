@@ -2,6 +2,7 @@ from bot.config import bot_instance
 from aiogram import Bot
 from django.conf import settings
 from bot.logger import logger
+from bot.utils.message_bus import message_bus, Priority
 
 async def get_bot_instance():
     """
@@ -14,20 +15,27 @@ async def get_bot_instance():
         logger.warning("Bot instance not initialized yet. Main bot is not started or not accessible.")
     return bot_instance
 
-async def send_message_safely(user_id, text, parse_mode=None, **kwargs):
+async def send_message_safely(user_id, text, parse_mode=None, priority=Priority.INFO, **kwargs):
     """
-    Отправляет сообщение пользователю, используя глобальный экземпляр бота.
-    Если глобальный экземпляр недоступен, создает временный экземпляр для отправки.
+    Отправляет сообщение пользователю.
+    В процессе бота сообщение ставится в очередь message_bus и функция не ждет Telegram.
+    Вне его (очередь не запущена) отправляет сразу через глобальный экземпляр бота,
+    а если его нет — через временный экземпляр.
     
     Args:
         user_id (int): ID пользователя Telegram
         text (str): Текст сообщения
         parse_mode (str, optional): Режим парсинга текста. По умолчанию None.
+        priority (Priority, optional): Приоритет в очереди. По умолчанию Priority.INFO.
         **kwargs: Дополнительные параметры для метода send_message
         
     Returns:
-        Message: Объект отправленного сообщения или None в случае ошибки
+        Message: Объект отправленного сообщения; None, если сообщение поставлено в очередь или при ошибке
     """
+    if message_bus.is_running:
+        message_bus.send(user_id, text, parse_mode=parse_mode, priority=priority, **kwargs)
+        return None
+
     temp_bot = None
     try:
         # Пытаемся использовать глобальный экземпляр бота
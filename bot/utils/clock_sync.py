@@ -0,0 +1,190 @@
+import asyncio
+import json
+import statistics
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from bot.logger import logger
+from bot.utils.http_session import http_pool
+
+
+class ExchangeClock:
+    """Process-wide estimate of the MEXC server clock offset.
+
+    Every signed request needs a timestamp inside the exchange's recvWindow.
+    Instead of each `MexcRestClient` fetching `/api/v3/time` before its first
+    order, one background task samples the server time, and all signing paths
+    read `now_ms()`, a local clock plus the cached offset, without any I/O.
+
+    Each refresh takes several samples. For each sample the offset is
+    `server_ms - (t_send + t_recv) / 2`, and only the samples with the
+    lowest round trip are kept (a slow sample has an uncertain midpoint).
+    The result is the median of those. Before the first successful sync
+    the offset is 0, which is the old local-clock fallback.
+    """
+
+    TIME_URL = "https://api.mexc.com/api/v3/time"
+
+    def __init__(
+        self,
+        refresh_interval: float = 300.0,
+        samples: int = 5,
+        keep_best: int = 3,
+        timeout: float = 5.0,
+    ) -> None:
+        self.refresh_interval = refresh_interval
+        self.samples = samples
+        self.keep_best = keep_best
+        self.timeout = timeout
+
+        self.offset_ms: float = 0.0
+        self.rtt_ms: Optional[float] = None
+        self.last_sync: float = 0.0
+        self.syncs = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    # ---------- чтение ----------
+
+    @property
+    def is_synced(self) -> bool:
+        return self.last_sync > 0
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self.last_sync > self.refresh_interval * 2
+
+    def now_ms(self) -> int:
+        """Текущее время биржи в мс. Никогда не делает сетевых запросов."""
+        return int(time.time() * 1000 + self.offset_ms)
+
+    # ---------- оценка смещения ----------
+
+    def _apply(self, samples: List[Tuple[float, float]]) -> bool:
+        """samples: [(rtt_ms, offset_ms)]. Берем медиану самых быстрых замеров."""
+        if not samples:
+            self.failures += 1
+            return False
+        best = sorted(samples)[: self.keep_best]
+        self.offset_ms = statistics.median(offset for _, offset in best)
+        self.rtt_ms = best[0][0]
+        self.last_sync = time.time()
+        self.syncs += 1
+        return True
+
+    async def _sample(self, session) -> Optional[Tuple[float, float]]:
+        try:
+            sent = time.time() * 1000
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with session.get(self.TIME_URL, timeout=timeout) as resp:
+                data = await resp.json(content_type=None)
+            received = time.time() * 1000
+            server_ms = int(data["serverTime"])
+        except Exception:
+            return None
+        return received - sent, server_ms - (sent + received) / 2
+
+    async def refresh(self, samples: Optional[int] = None) -> bool:
+        """
+        Обновляет смещение по нескольким замерам (samples — сколько, по
+        умолчанию self.samples). Замеры идут одновременно, так что обновление
+        длится не дольше одного таймаута. Параллельные вызовы схлопываются в один.
+        """
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        if self._refresh_lock.locked():
+            # Кто-то уже синхронизирует: дожидаемся его результата
+            async with self._refresh_lock:
+                return self.is_synced
+        async with self._refresh_lock:
+            session = await http_pool.get_session()
+            count = samples or self.samples
+            results = await asyncio.gather(*(self._sample(session) for _ in range(count)))
+            taken = [sample for sample in results if sample is not None]
+            ok = self._apply(taken)
+            if ok:
+                logger.debug(
+                    f"[Clock] offset={self.offset_ms:.0f}ms rtt={self.rtt_ms:.0f}ms "
+                    f"({len(taken)}/{count} samples)"
+                )
+            else:
+                logger.warning("[Clock] Не удалось получить время сервера MEXC, оставляем прежнее смещение")
+            return ok
+
+    def refresh_blocking(self) -> bool:
+        """Синхронный вариант refresh() для кода без event loop (mexc_spot_v3)."""
+        samples = []
+        for _ in range(self.samples):
+            try:
+                sent = time.time() * 1000
+                with urllib.request.urlopen(self.TIME_URL, timeout=self.timeout) as resp:
+                    data = json.loads(resp.read())
+                received = time.time() * 1000
+                samples.append((received - sent, int(data["serverTime"]) - (sent + received) / 2))
+            except Exception:
+                continue
+        return self._apply(samples)
+
+    # ---------- фоновое обновление ----------
+
+    async def _run(self) -> None:
+        while True:
+            # Ждем до следующего планового обновления (сразу, если еще не синхронизированы)
+            await asyncio.sleep(max(0.0, self.last_sync + self.refresh_interval - time.time()))
+            try:
+                ok = await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Clock] Ошибка синхронизации времени: {e}")
+                ok = False
+            if not ok:
+                await asyncio.sleep(min(30.0, self.refresh_interval))
+
+    def start(self) -> asyncio.Task:
+        """Запускает фоновую синхронизацию (при старте бота)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def ensure_started(self) -> None:
+        """Для процессов, где start() не вызывался: запускает синхронизацию в фоне, не дожидаясь ее."""
+        if self._task is None or self._task.done():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "offset_ms": round(self.offset_ms, 1),
+            "rtt_ms": round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+            "last_sync": self.last_sync,
+            "syncs": self.syncs,
+            "failures": self.failures,
+        }
+
+
+def _build_clock() -> ExchangeClock:
+    try:
+        from bot.constants import CLOCK_SYNC_INTERVAL, CLOCK_SYNC_SAMPLES
+    except Exception:
+        return ExchangeClock()
+    return ExchangeClock(refresh_interval=CLOCK_SYNC_INTERVAL, samples=CLOCK_SYNC_SAMPLES)
+
+
+exchange_clock = _build_clock()
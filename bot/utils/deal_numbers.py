@@ -0,0 +1,33 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max
+
+from users.models import Deal, DealCounter
+
+
+def _read(user_id: int) -> int:
+    return DealCounter.objects.filter(user_id=user_id).values_list("last_number", flat=True).get()
+
+
+def next_user_order_number(user_id: int) -> int:
+    """
+    Следующий номер сделки пользователя (user_order_number).
+
+    Один UPDATE ... SET last_number = last_number + 1 по первичному ключу:
+    строка счетчика заблокирована до конца транзакции, поэтому параллельные
+    покупки (триггеры роста и падения) получают разные номера.
+    """
+    with transaction.atomic():
+        if DealCounter.objects.filter(user_id=user_id).update(last_number=F("last_number") + 1):
+            return _read(user_id)
+
+        # Счетчика еще нет (новый пользователь) — начинаем после уже записанных сделок
+        totals = Deal.objects.filter(user_id=user_id).aggregate(deals=Count("id"), top=Max("user_order_number"))
+        start = max(totals["deals"], totals["top"] or 0)
+        try:
+            with transaction.atomic():
+                DealCounter.objects.create(user_id=user_id, last_number=start + 1)
+            return start + 1
+        except IntegrityError:
+            # Счетчик параллельно создала другая покупка
+            DealCounter.objects.filter(user_id=user_id).update(last_number=F("last_number") + 1)
+            return _read(user_id)
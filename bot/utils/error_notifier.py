@@ -57,6 +57,15 @@ async def _send_direct_message(
     chat_id: int | str, text: str, parse_mode: str = "HTML"
 ) -> None:
     """Send message via main bot instance if available; fallback to a temporary Bot."""
+    try:
+        # In the bot process the message only goes to the outbound queue
+        from bot.utils.message_bus import message_bus, Priority
+
+        if message_bus.is_running:
+            message_bus.send(chat_id, text, parse_mode=parse_mode, priority=Priority.WARNING)
+            return
+    except Exception:
+        pass
     try:
         # Try global bot instance first (more reliable within running loop)
         try:
@@ -0,0 +1,78 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ExecutionTimer:
+    """
+    Отметки времени одной покупки: от тика bookTicker до выставленного SELL.
+
+    started — time.perf_counter() момента приема тика листенером (или начала
+    обработки, если тик неизвестен). Каждая mark() сохраняет этап и время.
+    """
+
+    __slots__ = ("started", "marks")
+
+    def __init__(self, started: Optional[float] = None) -> None:
+        self.started = started if started is not None else time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, stage: str) -> None:
+        self.marks.append((stage, time.perf_counter()))
+
+    def elapsed_ms(self) -> Dict[str, float]:
+        """Время от тика до каждого этапа, мс."""
+        return {stage: (at - self.started) * 1000 for stage, at in self.marks}
+
+    def summary(self) -> str:
+        return ", ".join(f"{stage}={ms:.1f}ms" for stage, ms in self.elapsed_ms().items())
+
+
+class _StageStats:
+    __slots__ = ("count", "last_ms", "avg_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms: float) -> None:
+        self.count += 1
+        self.last_ms = latency_ms
+        self.avg_ms = latency_ms if self.count == 1 else self.avg_ms * 0.9 + latency_ms * 0.1
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "last_ms": round(self.last_ms, 3),
+            "avg_ms": round(self.avg_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class ExecutionLatencyStats:
+    """Сводка задержек исполнения по этапам (EMA/max), для get_connection_stats и логов."""
+
+    def __init__(self) -> None:
+        self._stages: Dict[str, _StageStats] = {}
+        self.fill_sources: Dict[str, int] = {}
+
+    def record(self, timer: ExecutionTimer, fill_source: Optional[str] = None) -> None:
+        for stage, ms in timer.elapsed_ms().items():
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = _StageStats()
+            stats.record(ms)
+        if fill_source:
+            self.fill_sources[fill_source] = self.fill_sources.get(fill_source, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "stages": {stage: stats.as_dict() for stage, stats in self._stages.items()},
+            "fill_sources": dict(self.fill_sources),
+        }
+
+
+execution_latency = ExecutionLatencyStats()
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from bot.logger import logger
+
+
+class HttpSessionPool:
+    """Process-wide keep-alive HTTP pool for REST calls to MEXC.
+
+    One `aiohttp.ClientSession` with one `TCPConnector` is shared by every
+    user and every `MexcRestClient`, so buy/sell/query_order reuse warm
+    TCP+TLS connections to api.mexc.com instead of paying a handshake per
+    request. The session is opened in `start()` at bot startup and closed in
+    `close()` on shutdown; `get_session()` opens it lazily for scripts and
+    management commands that never call `start()`.
+
+    Connection setup and request latency are counted through aiohttp trace
+    hooks and exposed via `get_stats()`.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 60.0,
+    ) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+        # Статистика
+        self.handshakes = 0  # новые TCP(+TLS) соединения
+        self.reused = 0  # запросы на уже открытом соединении
+        self.requests = 0
+        self.failed = 0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.started = time.perf_counter()
+
+        async def on_request_end(session, ctx, params):
+            self._record((time.perf_counter() - ctx.started) * 1000)
+
+        async def on_request_exception(session, ctx, params):
+            self.failed += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.handshakes += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.reused += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    def _record(self, latency_ms: float) -> None:
+        self.requests += 1
+        # EMA, как в CallbackDispatcher
+        self.avg_ms = latency_ms if self.requests == 1 else self.avg_ms * 0.9 + latency_ms * 0.1
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[self._trace_config()],
+        )
+
+    @property
+    def is_open(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def start(self) -> aiohttp.ClientSession:
+        """Открывает общий пул (вызывается при старте бота)."""
+        return await self.get_session()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self.is_open:
+            return self._session
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.is_open:
+                self._session = self._create_session()
+                logger.info(
+                    f"HTTP pool opened (limit={self.limit}, per_host={self.limit_per_host}, "
+                    f"dns_ttl={self.dns_cache_ttl}s)"
+                )
+        return self._session
+
+    async def close(self) -> None:
+        """Закрывает пул и все keep-alive соединения (вызывается при остановке бота)."""
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            try:
+                await session.close()
+                logger.info(f"HTTP pool closed: {self.get_stats()}")
+            except Exception as e:
+                logger.error(f"Error closing HTTP pool: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "open": self.is_open,
+            "requests": self.requests,
+            "failed": self.failed,
+            "handshakes": self.handshakes,
+            "reused": self.reused,
+            "avg_ms": round(self.avg_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+def _build_pool() -> HttpSessionPool:
+    try:
+        from bot.constants import (
+            HTTP_POOL_LIMIT,
+            HTTP_POOL_LIMIT_PER_HOST,
+            HTTP_DNS_CACHE_TTL,
+            HTTP_KEEPALIVE_TIMEOUT,
+        )
+    except Exception:
+        # Без Django (скрипты, бенчмарки) — значения по умолчанию
+        return HttpSessionPool()
+    return HttpSessionPool(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        dns_cache_ttl=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    )
+
+
+http_pool = _build_pool()
@@ -1,10 +1,7 @@
 import asyncio
 import logging
 from datetime import datetime
-from asgiref.sync import sync_to_async
-from logs.models import BotLog
-from django.utils import timezone
-from datetime import timedelta
+from logs.services import cleanup_old_logs_async
 
 logger = logging.getLogger('TelegramBot')
 
@@ -17,13 +14,8 @@ async def cleanup_logs_task(interval_minutes=30, retention_days=7):
     """
     while True:
         try:
-            # Получаем дату, старше которой нужно удалить логи
-            cutoff_date = timezone.now() - timedelta(days=retention_days)
-            
-            # Удаляем логи старше cutoff_date
-            deleted_count, _ = await sync_to_async(BotLog.objects.filter(
-                timestamp__lt=cutoff_date
-            ).delete)()
+            # Удаляем логи старше retention_days: целыми секциями или пачками DELETE
+            deleted_count = await cleanup_old_logs_async(days=retention_days)
             
             # Логируем результат
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,269 @@
+import asyncio
+import itertools
+import time
+from enum import IntEnum
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from bot.logger import logger
+from bot.utils.telegram_sender import TelegramRateLimiter, call_with_retry, telegram_limiter
+
+
+class Priority(IntEnum):
+    TRADE = 0  # Открытие/закрытие сделок
+    WARNING = 1  # Ошибки, остановка автобая
+    INFO = 2  # Триггеры, активация и прочие информационные
+
+
+class OutboundMessage:
+    __slots__ = ("chat_id", "text", "parse_mode", "kwargs", "priority", "key", "enqueued_at", "coalesced", "seq")
+
+    def __init__(self, chat_id: int, text: str, parse_mode: Optional[str], kwargs: Dict[str, Any],
+                 priority: Priority, key: Tuple[int, Hashable]) -> None:
+        self.chat_id = chat_id
+        self.text = text
+        self.parse_mode = parse_mode
+        self.kwargs = kwargs
+        self.priority = priority
+        self.key = key
+        self.enqueued_at = time.monotonic()
+        self.coalesced = 0
+        self.seq = 0
+
+
+class TelegramMessageBus:
+    """
+    Общая очередь исходящих сообщений Telegram.
+
+    Торговый код вызывает send() — синхронно, без ожидания Telegram. Воркеры
+    отправляют сообщения по приоритету (сделки → предупреждения → инфо) через
+    общий TelegramRateLimiter и call_with_retry (429/сетевые ошибки).
+
+    Склейка повторов в один чат:
+    - такое же сообщение (тот же текст или тот же coalesce_key) уже ждет в
+      очереди — новое не добавляется, по coalesce_key текст заменяется последним;
+    - такой же текст отправлен в чат меньше coalesce_window секунд назад — отбрасывается;
+    - сообщение с coalesce_key, отправленным недавно, ждет конца окна, и за это
+      время все новые с тем же ключом склеиваются в последнее.
+
+    Воркер берет только то, что можно отправить сразу: если чат еще не вышел
+    из интервала TelegramRateLimiter, сообщение возвращается в очередь к
+    моменту освобождения чата (со своим местом в порядке), а воркер берет
+    следующее. Поток сообщений в один чат не занимает всех воркеров, и
+    сделки в другие чаты не ждут за ним.
+    """
+
+    def __init__(
+        self,
+        limiter: TelegramRateLimiter = telegram_limiter,
+        workers: int = 8,
+        coalesce_window: float = 3.0,
+        max_queue: int = 5000,
+        attempts: int = 4,
+    ) -> None:
+        self.limiter = limiter
+        self.workers = workers
+        self.coalesce_window = coalesce_window
+        self.max_queue = max_queue
+        self.attempts = attempts
+
+        self._bot = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._pending: Dict[Tuple[int, Hashable], OutboundMessage] = {}
+        self._last_sent: Dict[Tuple[int, Hashable], float] = {}
+        self._deferred = 0
+
+        self.enqueued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_wait_ms: Dict[str, float] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    # ---------- постановка в очередь ----------
+
+    def send(
+        self,
+        chat_id: int,
+        text: str,
+        parse_mode: Optional[str] = None,
+        priority: Priority = Priority.INFO,
+        coalesce_key: Optional[Hashable] = None,
+        **kwargs: Any,
+    ) -> bool:
+        """Ставит сообщение в очередь и сразу возвращается. False — сообщение отброшено."""
+        self._ensure_started()
+        key = (chat_id, coalesce_key if coalesce_key is not None else text)
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.text, pending.parse_mode, pending.kwargs = text, parse_mode, kwargs
+            pending.coalesced += 1
+            self.coalesced += 1
+            return True
+
+        now = time.monotonic()
+        sent_at = self._last_sent.get(key)
+        recently_sent = sent_at is not None and now - sent_at < self.coalesce_window
+        if recently_sent and coalesce_key is None:
+            self.coalesced += 1
+            return True
+
+        if self._queue.qsize() >= self.max_queue and priority >= Priority.INFO:
+            self.dropped += 1
+            logger.warning(f"[MessageBus] Очередь переполнена, сообщение для {chat_id} отброшено")
+            return False
+
+        message = OutboundMessage(chat_id, text, parse_mode, kwargs, priority, key)
+        message.seq = next(self._seq)
+        self._pending[key] = message
+        self.enqueued += 1
+        if recently_sent:
+            self._put_later(sent_at + self.coalesce_window - now, message)
+        else:
+            self._put(message)
+        return True
+
+    def _put(self, message: OutboundMessage) -> None:
+        # seq назначается один раз: отложенное сообщение сохраняет свое место в очереди
+        self._queue.put_nowait((message.priority, message.seq, message))
+
+    def _put_later(self, delay: float, message: OutboundMessage) -> None:
+        self._deferred += 1
+        asyncio.get_running_loop().call_later(delay, self._release, message)
+
+    def _release(self, message: OutboundMessage) -> None:
+        self._deferred -= 1
+        self._put(message)
+
+    # ---------- отправка ----------
+
+    def _resolve_bot(self):
+        if self._bot is not None:
+            return self._bot
+        from bot import config
+
+        return config.bot_instance
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, message = await self._queue.get()
+            try:
+                delay = self.limiter.chat_delay(message.chat_id)
+                if delay > 0:
+                    # Чат занят — не спим на нем, возвращаем сообщение к моменту освобождения
+                    self._put_later(delay, message)
+                    continue
+                if self._pending.get(message.key) is message:
+                    del self._pending[message.key]
+                await self._deliver(message)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: OutboundMessage) -> None:
+        bot = self._resolve_bot()
+        if bot is None:
+            self.failed += 1
+            logger.error(f"[MessageBus] Cannot send message to {message.chat_id}: bot instance is None")
+            return
+        try:
+            await call_with_retry(
+                message.chat_id,
+                lambda: bot.send_message(
+                    message.chat_id, message.text, parse_mode=message.parse_mode, **message.kwargs
+                ),
+                attempts=self.attempts,
+                limiter=self.limiter,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"[MessageBus] Failed to send message to {message.chat_id}: {e}")
+            return
+
+        self.sent += 1
+        self._last_sent[message.key] = time.monotonic()
+        wait_ms = (time.monotonic() - message.enqueued_at) * 1000
+        name = message.priority.name
+        if wait_ms > self.max_wait_ms.get(name, 0.0):
+            self.max_wait_ms[name] = wait_ms
+        if len(self._last_sent) > 10000:
+            self._prune()
+
+    def _prune(self) -> None:
+        expire_before = time.monotonic() - self.coalesce_window
+        for key in [key for key, at in self._last_sent.items() if at < expire_before]:
+            del self._last_sent[key]
+
+    # ---------- жизненный цикл ----------
+
+    def _ensure_started(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        if not self.is_running:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def start(self, bot=None) -> None:
+        """Запускает воркеры (при старте бота). bot — экземпляр aiogram.Bot, по умолчанию config.bot_instance."""
+        self._bot = bot
+        self._ensure_started()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Досылает очередь (не дольше timeout секунд) и останавливает воркеры."""
+        if self._queue is not None and self.is_running:
+            try:
+                await asyncio.wait_for(self._drain(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"[MessageBus] {self._queue.qsize() + self._deferred} сообщений не отправлено при остановке"
+                )
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _drain(self) -> None:
+        while True:
+            await self._queue.join()
+            if not self._deferred:
+                return
+            await asyncio.sleep(0.05)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "deferred": self._deferred,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "max_wait_ms": {name: round(ms, 1) for name, ms in self.max_wait_ms.items()},
+        }
+
+
+def _build_bus() -> TelegramMessageBus:
+    try:
+        from bot.constants import (
+            TELEGRAM_BUS_WORKERS,
+            TELEGRAM_COALESCE_WINDOW,
+            TELEGRAM_BUS_MAX_QUEUE,
+            TELEGRAM_SEND_ATTEMPTS,
+        )
+    except Exception:
+        return TelegramMessageBus()
+    return TelegramMessageBus(
+        workers=TELEGRAM_BUS_WORKERS,
+        coalesce_window=TELEGRAM_COALESCE_WINDOW,
+        max_queue=TELEGRAM_BUS_MAX_QUEUE,
+        attempts=TELEGRAM_SEND_ATTEMPTS,
+    )
+
+
+message_bus = _build_bus()
@@ -1,13 +1,13 @@
 import hmac
 import hashlib
-import time
 import requests
-import aiohttp
 from mexc_sdk import Spot
 from users.models import User
 from bot.logger import logger
 from utils.api_errors import parse_mexc_error
 from bot.utils.mexc_rest import MexcRestClient
+from bot.utils.http_session import http_pool
+from bot.utils.clock_sync import exchange_clock
 
 
 async def get_actual_order_status_async(user: User, symbol: str, order_id: str) -> str:
@@ -33,7 +33,7 @@ async def get_actual_order_status_async(user: User, symbol: str, order_id: str)
 # Синхронная версия для обратной совместимости
 def check_mexc_keys(api_key: str, api_secret: str) -> tuple:
     url = "https://api.mexc.com/api/v3/account"
-    timestamp = int(time.time() * 1000)
+    timestamp = exchange_clock.now_ms()
 
     query_string = f"timestamp={timestamp}"
     signature = hmac.new(
@@ -60,7 +60,7 @@ def check_mexc_keys(api_key: str, api_secret: str) -> tuple:
 # Новая асинхронная версия
 async def check_mexc_keys_async(api_key: str, api_secret: str) -> tuple:
     url = "https://api.mexc.com/api/v3/account"
-    timestamp = int(time.time() * 1000)
+    timestamp = exchange_clock.now_ms()
 
     query_string = f"timestamp={timestamp}"
     signature = hmac.new(
@@ -70,33 +70,33 @@ async def check_mexc_keys_async(api_key: str, api_secret: str) -> tuple:
     headers = {"X-MEXC-APIKEY": api_key}
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{url}?{query_string}&signature={signature}", headers=headers
-            ) as response:
-                status_code = response.status
-                response_text = await response.text()
-                logger.info(
-                    f"Response status code: {status_code}, response text: {response_text}"
-                )
-
-                # Проверяем наличие ошибок
-                if status_code != 200:
-                    # Обработка ошибки IP whitelist
-                    if (
-                        "700006" in response_text
-                        and "ip white list" in response_text.lower()
-                    ):
-                        error_msg = "IP адрес вашего сервера не добавлен в белый список. Пожалуйста, откройте настройки API ключа на MEXC и добавьте IP ограничения, либо уберите ограничения по IP."
-                        logger.warning(f"IP не в белом списке: {response_text}")
-                        return False, error_msg
-
-                    # Другие ошибки
-                    error = parse_mexc_error(response_text)
-                    return False, error
-
-                # Если статус 200, ключи валидны
-                return True, ""
+        session = await http_pool.get_session()
+        async with session.get(
+            f"{url}?{query_string}&signature={signature}", headers=headers
+        ) as response:
+            status_code = response.status
+            response_text = await response.text()
+            logger.info(
+                f"Response status code: {status_code}, response text: {response_text}"
+            )
+
+            # Проверяем наличие ошибок
+            if status_code != 200:
+                # Обработка ошибки IP whitelist
+                if (
+                    "700006" in response_text
+                    and "ip white list" in response_text.lower()
+                ):
+                    error_msg = "IP адрес вашего сервера не добавлен в белый список. Пожалуйста, откройте настройки API ключа на MEXC и добавьте IP ограничения, либо уберите ограничения по IP."
+                    logger.warning(f"IP не в белом списке: {response_text}")
+                    return False, error_msg
+
+                # Другие ошибки
+                error = parse_mexc_error(response_text)
+                return False, error
+
+            # Если статус 200, ключи валидны
+            return True, ""
     except Exception as e:
         logger.error(f"Ошибка при проверке ключей API: {e}")
         return False, f"Ошибка соединения: {str(e)}"
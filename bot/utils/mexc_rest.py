@@ -2,10 +2,13 @@ import asyncio
 import aiohttp
 import hmac
 import hashlib
-import time
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 from urllib.parse import urlencode, quote
 
+from bot.utils.http_session import http_pool
+from bot.utils.clock_sync import exchange_clock
+
 
 class MexcRestClient:
     """Minimal MEXC Spot v3 REST client (async), signed endpoints included."""
@@ -15,31 +18,37 @@ class MexcRestClient:
     def __init__(self, api_key: str, api_secret: str):
         self.api_key = api_key
         self.api_secret = api_secret
-        self._time_offset_ms: Optional[int] = None
-        self._last_time_sync: float = 0.0
-        self._time_sync_interval_sec: int = 300
-
-    async def _server_time(self) -> int:
-        timeout = aiohttp.ClientTimeout(total=10)
-        try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(f"{self.BASE_URL}/api/v3/time") as resp:
-                    data = await resp.json(content_type=None)
-                    return int(data.get("serverTime", int(time.time() * 1000)))
-        except Exception:
-            # Fallback to local timestamp on timeout/network errors
-            return int(time.time() * 1000)
-
-    async def _ensure_time_offset(self) -> None:
-        now = time.time()
-        if (
-            self._time_offset_ms is None
-            or (now - self._last_time_sync) > self._time_sync_interval_sec
-        ):
-            server_ms = await self._server_time()
-            local_ms = int(now * 1000)
-            self._time_offset_ms = server_ms - local_ms
-            self._last_time_sync = now
+        # Ключ HMAC подготовлен заранее: на подпись только copy() + update()
+        self._hmac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+        self._headers = {"x-mexc-apikey": api_key, "Content-Type": "application/json"}
+
+    def _sign(self, params: Dict[str, Any], recv_window_ms: int) -> Dict[str, Any]:
+        # Server time from the shared clock (no /api/v3/time round trip) and honor recvWindow
+        server_ts = exchange_clock.now_ms()
+        sign_params = params.copy()
+        # stringify values to be safe
+        for k, v in list(sign_params.items()):
+            if isinstance(v, (float, int)):
+                sign_params[k] = str(v)
+        if "recvWindow" not in sign_params and recv_window_ms:
+            # Clamp to allowed maximum (< 60000)
+            if int(recv_window_ms) >= 60000:
+                recv_window_ms = 59000
+            sign_params["recvWindow"] = str(recv_window_ms)
+        sign_base = urlencode(sign_params, quote_via=quote)
+        to_sign = (
+            f"{sign_base}&timestamp={server_ts}"
+            if sign_base
+            else f"timestamp={server_ts}"
+        )
+        mac = self._hmac.copy()
+        mac.update(to_sign.encode())
+        signature = mac.hexdigest()
+
+        # final query params include original params + timestamp + signature
+        sign_params["timestamp"] = server_ts
+        sign_params["signature"] = signature
+        return sign_params
 
     async def _request(
         self,
@@ -50,39 +59,13 @@ class MexcRestClient:
         timeout_sec: int = 20,
         recv_window_ms: int = 59000,
     ) -> Dict[str, Any]:
-        params = params.copy() if params else {}
+        base_params = params.copy() if params else {}
+        params = base_params
         headers = {}
 
         if signed:
-            # Keep client clock aligned and honor recvWindow
-            await self._ensure_time_offset()
-            server_ts = int(time.time() * 1000 + (self._time_offset_ms or 0))
-            sign_params = params.copy()
-            # stringify values to be safe
-            for k, v in list(sign_params.items()):
-                if isinstance(v, (float, int)):
-                    sign_params[k] = str(v)
-            if "recvWindow" not in sign_params and recv_window_ms:
-                # Clamp to allowed maximum (< 60000)
-                if int(recv_window_ms) >= 60000:
-                    recv_window_ms = 59000
-                sign_params["recvWindow"] = str(recv_window_ms)
-            sign_base = urlencode(sign_params, quote_via=quote)
-            to_sign = (
-                f"{sign_base}&timestamp={server_ts}"
-                if sign_base
-                else f"timestamp={server_ts}"
-            )
-            signature = hmac.new(
-                self.api_secret.encode(), to_sign.encode(), hashlib.sha256
-            ).hexdigest()
-
-            # final query params include original params + timestamp + signature
-            params = sign_params
-            params["timestamp"] = server_ts
-            params["signature"] = signature
-            headers["x-mexc-apikey"] = self.api_key
-            headers["Content-Type"] = "application/json"
+            exchange_clock.ensure_started()
+            headers = self._headers
 
         url = f"{self.BASE_URL}{path}"
         timeout = aiohttp.ClientTimeout(total=timeout_sec)
@@ -91,62 +74,32 @@ class MexcRestClient:
         last_err = None
         for _ in range(max_retries):
             try:
-                async with aiohttp.ClientSession(
-                    timeout=timeout,
-                    connector=aiohttp.TCPConnector(
-                        limit=100, limit_per_host=10, enable_cleanup_closed=True
-                    ),
-                ) as session:
-                    if method == "GET":
-                        async with session.get(
-                            url, params=params, headers=headers
-                        ) as resp:
-                            data = await resp.json(content_type=None)
-                            if resp.status != 200:
-                                # If timestamp window error, resync time and retry
-                                if (
-                                    isinstance(data, dict)
-                                    and data.get("code") == 700003
-                                ):
-                                    self._last_time_sync = 0.0
-                                    await self._ensure_time_offset()
-                                    raise aiohttp.ServerDisconnectedError()
-                                raise RuntimeError(data)
-                            return data
-                    elif method == "POST":
-                        if signed:
-                            # Send with params in query (no body) per official examples
-                            async with session.post(
-                                url, params=params, headers=headers
-                            ) as resp:
-                                data = await resp.json(content_type=None)
-                                if resp.status != 200:
-                                    if (
-                                        isinstance(data, dict)
-                                        and data.get("code") == 700003
-                                    ):
-                                        self._last_time_sync = 0.0
-                                        await self._ensure_time_offset()
-                                        raise aiohttp.ServerDisconnectedError()
-                                    raise RuntimeError(data)
-                                return data
-                        # Unsigned POST (rare): send JSON
-                        async with session.post(
-                            url, json=params, headers=headers
-                        ) as resp:
-                            data = await resp.json(content_type=None)
-                            if resp.status != 200:
-                                if (
-                                    isinstance(data, dict)
-                                    and data.get("code") == 700003
-                                ):
-                                    self._last_time_sync = 0.0
-                                    await self._ensure_time_offset()
-                                    raise aiohttp.ServerDisconnectedError()
-                                raise RuntimeError(data)
-                            return data
+                if signed:
+                    # Подписываем каждую попытку заново: после ресинка часов нужен новый timestamp
+                    params = self._sign(base_params, recv_window_ms)
+                # Общий keep-alive пул: без нового TCP/TLS рукопожатия на каждый запрос
+                session = await http_pool.get_session()
+                if method == "GET":
+                    request = session.get(url, params=params, headers=headers, timeout=timeout)
+                elif method == "POST":
+                    if signed:
+                        # Send with params in query (no body) per official examples
+                        request = session.post(url, params=params, headers=headers, timeout=timeout)
                     else:
-                        raise ValueError("Unsupported method")
+                        # Unsigned POST (rare): send JSON
+                        request = session.post(url, json=params, headers=headers, timeout=timeout)
+                else:
+                    raise ValueError("Unsupported method")
+                async with request as resp:
+                    data = await resp.json(content_type=None)
+                    if resp.status != 200:
+                        # If timestamp window error, resync the shared clock and retry
+                        if isinstance(data, dict) and data.get("code") == 700003:
+                            # Один замер: ордер не ждет полной синхронизации
+                            await exchange_clock.refresh(samples=1)
+                            raise aiohttp.ServerDisconnectedError()
+                        raise RuntimeError(data)
+                    return data
             except (
                 aiohttp.ClientConnectorError,
                 aiohttp.ClientOSError,
@@ -196,3 +149,31 @@ class MexcRestClient:
         return await self._request(
             "GET", "/api/v3/order", params, signed=True, timeout_sec=20
         )
+
+
+def _cache_size() -> int:
+    try:
+        from bot.constants import REST_CLIENT_CACHE_SIZE
+    except Exception:
+        # Без Django (скрипты, бенчмарки) — значение по умолчанию
+        return 1000
+    return REST_CLIENT_CACHE_SIZE
+
+
+# Клиенты по паре ключей: подготовленная подпись переиспользуется между покупками.
+# LRU с ограничением: клиенты старых ключей и ушедших пользователей вытесняются.
+_clients: "OrderedDict[Tuple[str, str], MexcRestClient]" = OrderedDict()
+_clients_limit = _cache_size()
+
+
+def rest_client_for(api_key: str, api_secret: str) -> MexcRestClient:
+    """Общий MexcRestClient для ключей пользователя (новый при смене ключей)."""
+    key = (api_key, api_secret)
+    client = _clients.get(key)
+    if client is None:
+        client = _clients[key] = MexcRestClient(api_key, api_secret)
+        if len(_clients) > _clients_limit:
+            _clients.popitem(last=False)
+    else:
+        _clients.move_to_end(key)
+    return client
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from bot.logger import logger
+
+
+# Статусы, после которых исполнение ордера больше не меняется
+_FINAL_STATUSES = ("FILLED", "CANCELED", "REJECTED")
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class OrderFill:
+    """Итог исполнения ордера: сколько куплено и за сколько (quote)."""
+
+    __slots__ = ("order_id", "status", "executed_qty", "quote_qty", "source", "received_at")
+
+    def __init__(self, order_id: str, status: str, executed_qty: float, quote_qty: float, source: str) -> None:
+        self.order_id = str(order_id)
+        self.status = status
+        self.executed_qty = executed_qty
+        self.quote_qty = quote_qty
+        self.source = source
+        self.received_at = time.time()
+
+    @property
+    def avg_price(self) -> float:
+        return self.quote_qty / self.executed_qty if self.executed_qty > 0 else 0.0
+
+    @classmethod
+    def from_rest(cls, response: Dict[str, Any], source: str = "rest") -> Optional["OrderFill"]:
+        """
+        Исполнение из ответа REST (new_order или query_order).
+
+        Понимает executedQty/cummulativeQuoteQty и список fills (ответ FULL).
+        Если биржа вернула только ACK без исполнения — None.
+        """
+        if not isinstance(response, dict) or not response.get("orderId"):
+            return None
+        executed = _to_float(response.get("executedQty"))
+        quote = _to_float(response.get("cummulativeQuoteQty"))
+        fills = response.get("fills")
+        if fills and (executed <= 0 or quote <= 0):
+            executed = sum(_to_float(f.get("qty")) for f in fills)
+            quote = sum(_to_float(f.get("qty")) * _to_float(f.get("price")) for f in fills)
+        if executed <= 0 or quote <= 0:
+            return None
+        return cls(response["orderId"], response.get("status") or "FILLED", executed, quote, source)
+
+    def __repr__(self) -> str:
+        return (
+            f"OrderFill({self.order_id}, {self.status}, qty={self.executed_qty}, "
+            f"quote={self.quote_qty}, via {self.source})"
+        )
+
+
+class OrderFillRegistry:
+    """
+    Исполнения ордеров из приватного стрима spot@private.orders.
+
+    process_buy после MARKET покупки ждет здесь исполнение вместо отдельного
+    query_order. Событие стрима может прийти раньше, чем ответ new_order с
+    orderId, поэтому финальные исполнения держим в небольшом буфере недавних.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_recent: int = 1000) -> None:
+        self.ttl = ttl
+        self.max_recent = max_recent
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._recent: "OrderedDict[str, OrderFill]" = OrderedDict()
+
+        self.published = 0
+        self.hits = 0
+        self.timeouts = 0
+
+    def publish(self, order_id, status: str, executed_qty, quote_qty) -> None:
+        """Вызывается слушателем user stream на каждое обновление ордера (не блокирует)."""
+        if not order_id or status not in _FINAL_STATUSES:
+            return
+        fill = OrderFill(order_id, status, _to_float(executed_qty), _to_float(quote_qty), "user_stream")
+        self.published += 1
+
+        waiter = self._waiters.pop(fill.order_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(fill)
+            return
+
+        self._recent[fill.order_id] = fill
+        self._recent.move_to_end(fill.order_id)
+        self._trim()
+
+    def _trim(self) -> None:
+        expire_before = time.time() - self.ttl
+        recent = self._recent
+        while recent:
+            oldest = next(iter(recent.values()))
+            if len(recent) <= self.max_recent and oldest.received_at >= expire_before:
+                break
+            recent.popitem(last=False)
+
+    async def wait(self, order_id, timeout: float) -> Optional[OrderFill]:
+        """Ждет финальное исполнение ордера из стрима не дольше timeout секунд."""
+        order_id = str(order_id)
+        fill = self._recent.pop(order_id, None)
+        if fill is not None:
+            self.hits += 1
+            return fill
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[order_id] = waiter
+        try:
+            fill = await asyncio.wait_for(waiter, timeout)
+            self.hits += 1
+            return fill
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.debug(f"[OrderFills] Нет исполнения {order_id} из стрима за {timeout:.1f}с")
+            return None
+        finally:
+            self._waiters.pop(order_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "hits": self.hits,
+            "timeouts": self.timeouts,
+            "waiting": len(self._waiters),
+            "recent": len(self._recent),
+        }
+
+
+order_fills = OrderFillRegistry()
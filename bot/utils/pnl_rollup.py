@@ -0,0 +1,83 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional, Tuple
+
+import pytz
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from users.models import DailyPnl, Deal
+
+MOSCOW_TZ = pytz.timezone("Europe/Moscow")
+
+ZERO = Decimal("0")
+
+
+def moscow_day(moment) -> date:
+    """Московский день момента времени (границы дня как в /stats и ежедневной статистике)."""
+    return moment.astimezone(MOSCOW_TZ).date()
+
+
+def deal_pnl(deal: Deal) -> Tuple[Decimal, Decimal]:
+    """(прибыль, % профита) закрытой сделки — те же формулы, что были в /stats."""
+    profit = (deal.sell_price - deal.buy_price) * deal.quantity
+    percent = ((deal.sell_price - deal.buy_price) / deal.buy_price) * 100 if deal.buy_price > 0 else ZERO
+    return profit, percent
+
+
+def add_filled_deal(deal: Deal) -> None:
+    """
+    Добавляет сделку, только что перешедшую в FILLED, в дневную сводку.
+
+    Вызывается синхронно в той же транзакции, что и смена статуса, и только
+    при реальном переходе (условный UPDATE), поэтому сделка не учитывается дважды.
+    """
+    if deal.sell_price is None:
+        return
+    profit, percent = deal_pnl(deal)
+    day = moscow_day(deal.updated_at or timezone.now())
+    increment = dict(
+        deals=F("deals") + 1,
+        profit=F("profit") + profit,
+        profit_percent_sum=F("profit_percent_sum") + percent,
+    )
+    if DailyPnl.objects.filter(user_id=deal.user_id, day=day).update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            DailyPnl.objects.create(
+                user_id=deal.user_id, day=day, deals=1, profit=profit, profit_percent_sum=percent
+            )
+    except IntegrityError:
+        # Строку дня параллельно создал другой обработчик
+        DailyPnl.objects.filter(user_id=deal.user_id, day=day).update(**increment)
+
+
+def transition_deal_status(deal: Deal, new_status: str) -> bool:
+    """
+    Атомарно меняет статус сделки, если он не поменялся с момента чтения.
+
+    Возвращает True, если переход выполнен этим вызовом. Параллельный
+    user stream / reconciler / monitor_order не применят тот же переход дважды.
+    """
+    old_status = deal.status
+    now = timezone.now()
+    with transaction.atomic():
+        changed = Deal.objects.filter(pk=deal.pk, status=old_status).update(status=new_status, updated_at=now)
+        if not changed:
+            return False
+        deal.status = new_status
+        deal.updated_at = now
+        if new_status == "FILLED":
+            add_filled_deal(deal)
+    return True
+
+
+def get_period_stats(user_id: int, start_day: Optional[date], end_day: date) -> Tuple[int, Decimal, Decimal]:
+    """(кол-во сделок, прибыль, сумма % профита) за дни [start_day, end_day] включительно."""
+    qs = DailyPnl.objects.filter(user_id=user_id, day__lte=end_day)
+    if start_day is not None:
+        qs = qs.filter(day__gte=start_day)
+    totals = qs.aggregate(deals=Sum("deals"), profit=Sum("profit"), percent=Sum("profit_percent_sum"))
+    return totals["deals"] or 0, totals["profit"] or ZERO, totals["percent"] or ZERO
@@ -1,118 +1,436 @@
 import asyncio
 import time
-from typing import Dict, List
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
 from bot.logger import logger
 from users.models import User, Deal
-from bot.utils.mexc_rest import MexcRestClient
-from bot.utils.websocket_handlers import update_order_status
-
-
-async def _reconcile_user_orders(user: User) -> None:
-    """Reconcile one user's active orders against REST API and update DB."""
-    try:
-        # Skip if no pair configured
-        if not user.pair:
-            return
-
-        # Collect active deals from DB
-        active_deals: List[Deal] = await sync_to_async(list)(
-            Deal.objects.filter(
-                user=user, status__in=["NEW", "PARTIALLY_FILLED"]
-            ).order_by("-created_at")
+from bot.utils.mexc_rest import MexcRestClient, rest_client_for
+from bot.utils.websocket_handlers import apply_order_status_change
+from bot.utils.pnl_rollup import add_filled_deal
+from bot.utils.websocket_manager import websocket_manager
+from bot.constants import (
+    RECONCILE_USER_CONCURRENCY,
+    RECONCILE_QUERY_CONCURRENCY,
+    RECONCILE_FAST_INTERVAL,
+    RECONCILE_HEALTHY_INTERVAL,
+    RECONCILE_WS_FRESH_SECONDS,
+    RECONCILE_WS_ERROR_GRACE,
+)
+
+ACTIVE_STATUSES = ("NEW", "PARTIALLY_FILLED")
+
+# (deal, old_status, new_status)
+StatusChange = Tuple[Deal, str, str]
+
+
+class ReconcilerStats:
+    """Длительность проходов reconciler и отставание по пользователям."""
+
+    def __init__(self) -> None:
+        self.sweeps = 0
+        self.last_sweep_s = 0.0
+        self.avg_sweep_s = 0.0
+        self.max_sweep_s = 0.0
+        self.last_users = 0
+        self.last_deals = 0
+        self.rest_calls = 0
+        self.user_reconciles = 0
+        self.status_changes = 0
+        self.errors = 0
+        # telegram_id -> time.time() последней успешной сверки
+        self.last_success: Dict[int, float] = {}
+
+    def record_sweep(self, elapsed: float, users: int, deals: int) -> None:
+        self.sweeps += 1
+        self.last_sweep_s = elapsed
+        self.avg_sweep_s = elapsed if self.sweeps == 1 else self.avg_sweep_s * 0.9 + elapsed * 0.1
+        self.max_sweep_s = max(self.max_sweep_s, elapsed)
+        self.last_users = users
+        self.last_deals = deals
+
+    def user_lag(self, now: Optional[float] = None) -> Dict[int, float]:
+        """Секунды с последней успешной сверки каждого пользователя."""
+        now = now or time.time()
+        return {telegram_id: now - at for telegram_id, at in self.last_success.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        lags = sorted(self.user_lag().values())
+        return {
+            "sweeps": self.sweeps,
+            "last_sweep_s": round(self.last_sweep_s, 3),
+            "avg_sweep_s": round(self.avg_sweep_s, 3),
+            "max_sweep_s": round(self.max_sweep_s, 3),
+            "last_users": self.last_users,
+            "last_deals": self.last_deals,
+            "rest_calls": self.rest_calls,
+            "user_reconciles": self.user_reconciles,
+            "status_changes": self.status_changes,
+            "errors": self.errors,
+            "max_user_lag_s": round(lags[-1], 1) if lags else 0.0,
+            "p95_user_lag_s": round(lags[min(len(lags) - 1, int(len(lags) * 0.95))], 1) if lags else 0.0,
+        }
+
+
+reconciler_stats = ReconcilerStats()
+
+# Не больше одной сверки одновременно на один API ключ (лимиты MEXC считаются по ключу)
+_key_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+@sync_to_async
+def _load_active_deals(user_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Deal]]:
+    """Одним запросом: активные сделки пользователей с ключами, сгруппированные по telegram_id."""
+    qs = (
+        Deal.objects.filter(status__in=ACTIVE_STATUSES)
+        .exclude(user__api_key__isnull=True)
+        .exclude(user__api_key="")
+        .exclude(user__api_secret__isnull=True)
+        .exclude(user__api_secret="")
+        .exclude(user__pair__isnull=True)
+        .exclude(user__pair="")
+        .select_related("user")
+        .order_by("-created_at")
+    )
+    if user_ids is not None:
+        qs = qs.filter(user__telegram_id__in=list(user_ids))
+    grouped: Dict[int, List[Deal]] = defaultdict(list)
+    for deal in qs:
+        grouped[deal.user.telegram_id].append(deal)
+    return grouped
+
+
+@sync_to_async
+def _active_user_ids() -> Set[int]:
+    """telegram_id пользователей с ключами и активными сделками."""
+    return set(
+        Deal.objects.filter(status__in=ACTIVE_STATUSES)
+        .exclude(user__api_key__isnull=True)
+        .exclude(user__api_key="")
+        .exclude(user__api_secret__isnull=True)
+        .exclude(user__api_secret="")
+        .values_list("user__telegram_id", flat=True)
+        .distinct()
+    )
+
+
+@sync_to_async
+def _write_status_changes(changes: List[StatusChange]) -> List[StatusChange]:
+    """
+    Пакетная запись статусов в одной транзакции.
+
+    Строки блокируются и перечитываются: если статус уже поменял user stream,
+    сделку не трогаем, чтобы не перезаписать его и не отправить уведомление дважды.
+    Возвращает реально примененные изменения.
+    """
+    if not changes:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        current = dict(
+            Deal.objects.select_for_update()
+            .filter(pk__in=[deal.pk for deal, _, _ in changes])
+            .values_list("pk", "status")
         )
-        if not active_deals:
-            return
+        applied: List[StatusChange] = []
+        for deal, old_status, new_status in changes:
+            if current.get(deal.pk) != old_status:
+                continue
+            deal.status = new_status
+            # bulk_update не трогает auto_now — updated_at ставим сами (по нему считается статистика)
+            deal.updated_at = now
+            applied.append((deal, old_status, new_status))
+        if applied:
+            Deal.objects.bulk_update([deal for deal, _, _ in applied], ["status", "updated_at"])
+            for deal, _, new_status in applied:
+                if new_status == "FILLED":
+                    add_filled_deal(deal)
+    return applied
+
+
+async def _query_missing(
+    client: MexcRestClient, symbol: str, deals: List[Deal], telegram_id: int
+) -> List[StatusChange]:
+    """Параллельный query_order для сделок, которых нет в open_orders."""
+    semaphore = asyncio.Semaphore(RECONCILE_QUERY_CONCURRENCY)
+
+    async def query(deal: Deal) -> Optional[StatusChange]:
+        async with semaphore:
+            for attempt in range(2):
+                try:
+                    reconciler_stats.rest_calls += 1
+                    resp = await client.query_order(symbol, {"orderId": deal.order_id})
+                    api_status = resp.get("status")
+                    if api_status and api_status != deal.status:
+                        return deal, deal.status, api_status
+                    return None
+                except Exception as e:
+                    if attempt:
+                        logger.warning(
+                            f"[Reconciler] query_order failed for {deal.order_id} (user {telegram_id}): {e}"
+                        )
+        return None
+
+    results = await asyncio.gather(*(query(deal) for deal in deals))
+    return [change for change in results if change is not None]
 
-        # Fetch open orders from REST for the configured pair (async client with time sync and recvWindow)
+
+async def _reconcile_user_orders(user: User, active_deals: List[Deal]) -> List[StatusChange]:
+    """Сверяет активные сделки одного пользователя с REST и возвращает изменения статусов."""
+    symbol = (user.pair or "").replace("/", "")
+    client = rest_client_for(user.api_key, user.api_secret)
+
+    open_orders = None
+    for attempt in range(2):
         try:
-            client = MexcRestClient(user.api_key, user.api_secret)
-            symbol = (user.pair or "").replace("/", "")
-            # Primary attempt
+            reconciler_stats.rest_calls += 1
             open_orders = await client.open_orders(symbol)
+            break
         except Exception as e:
-            # Retry once using local timestamp by forcing zero offset (avoid /api/v3/time dependency)
-            try:
-                setattr(client, "_time_offset_ms", 0)
-                setattr(client, "_last_time_sync", time.time())
-                open_orders = await client.open_orders(symbol)
-            except Exception as e2:
-                logger.warning(
-                    f"[Reconciler] open_orders failed for user {user.telegram_id}: {e2}"
-                )
-                # При ошибке не мутируем БД; пусть следующая итерация или WS восстановит состояние
-                open_orders = []
-
-        # Map and update
-        deals_by_id: Dict[str, Deal] = {d.order_id: d for d in active_deals}
-        api_by_id: Dict[str, Dict] = {
-            str(o.get("orderId")): o for o in open_orders if o.get("orderId")
-        }
+            if attempt:
+                logger.warning(f"[Reconciler] open_orders failed for user {user.telegram_id}: {e}")
+    if open_orders is None:
+        # При ошибке не мутируем БД; пусть следующая итерация или WS восстановит состояние
+        return []
+
+    api_by_id: Dict[str, Dict] = {
+        str(o.get("orderId")): o for o in open_orders if o.get("orderId")
+    }
+
+    changes: List[StatusChange] = []
+    missing: List[Deal] = []
+    for deal in active_deals:
+        order = api_by_id.get(deal.order_id)
+        if order is None:
+            missing.append(deal)
+            continue
+        api_status = order.get("status")
+        if api_status and api_status != deal.status:
+            changes.append((deal, deal.status, api_status))
+
+    if missing:
+        changes.extend(await _query_missing(client, symbol, missing, user.telegram_id))
+    return changes
+
+
+async def reconcile_users(user_ids: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+    """
+    Один проход сверки: все пользователи с активными сделками или только user_ids.
 
-        # First, update deals that are present in open_orders (centralized updater with notifications)
-        for order_id, order in api_by_id.items():
-            if order_id in deals_by_id:
-                current_status = order.get("status")
-                if current_status:
-                    await update_order_status(
-                        order_id, symbol, current_status, user_id=user.telegram_id
+    Пользователи обрабатываются параллельно (RECONCILE_USER_CONCURRENCY), но не
+    больше одного одновременно на API ключ. Статусы записываются одной
+    транзакцией на пользователя, затем отрабатывают автобай и уведомления.
+    """
+    started = time.time()
+    grouped = await _load_active_deals(user_ids)
+    semaphore = asyncio.Semaphore(RECONCILE_USER_CONCURRENCY)
+    applied_total = 0
+
+    async def run_user(telegram_id: int, deals: List[Deal]) -> None:
+        nonlocal applied_total
+        user = deals[0].user
+        async with semaphore, _key_locks[user.api_key]:
+            try:
+                reconciler_stats.user_reconciles += 1
+                changes = await _reconcile_user_orders(user, deals)
+                applied = await _write_status_changes(changes)
+                symbol = (user.pair or "").replace("/", "")
+                for deal, old_status, new_status in applied:
+                    logger.info(
+                        f"[Reconciler] Deal {deal.order_id} (user {telegram_id}): {old_status} -> {new_status}"
                     )
+                    await apply_order_status_change(
+                        deal, deal.order_id, symbol, new_status, telegram_id, True
+                    )
+                applied_total += len(applied)
+                reconciler_stats.last_success[telegram_id] = time.time()
+            except Exception as e:
+                reconciler_stats.errors += 1
+                logger.error(f"[Reconciler] Unexpected error for user {telegram_id}: {e}")
 
-        # Then, for DB-active deals that are missing in open_orders, confirm status via query_order (centralized updater)
-        for order_id, deal in deals_by_id.items():
-            if order_id not in api_by_id:
-                try:
-                    resp = await client.query_order(symbol, {"orderId": order_id})
-                    api_status = resp.get("status")
-                    if api_status:
-                        await update_order_status(
-                            order_id, symbol, api_status, user_id=user.telegram_id
+    await asyncio.gather(*(run_user(telegram_id, deals) for telegram_id, deals in grouped.items()))
+
+    # Пользователям без активных сделок сверять нечего — они не отстают
+    now = time.time()
+    if user_ids is None:
+        for telegram_id in list(reconciler_stats.last_success):
+            if telegram_id not in grouped:
+                reconciler_stats.last_success.pop(telegram_id, None)
+
+    elapsed = now - started
+    reconciler_stats.status_changes += applied_total
+    deals_count = sum(len(deals) for deals in grouped.values())
+    reconciler_stats.record_sweep(elapsed, len(grouped), deals_count)
+    return {"users": len(grouped), "deals": deals_count, "changes": applied_total, "elapsed_s": elapsed}
+
+
+class ReconcileScheduler:
+    """
+    Индивидуальный интервал сверки для каждого пользователя по здоровью его user stream.
+
+    Пока spot@private.orders живой (last_message_at свежий), статусы приходят
+    из стрима и REST нужен только как страховка — раз в healthy_interval.
+    Если стрима нет, он переподключается, молчит или недавно падал с ошибкой —
+    сверяем раз в fast_interval. Сразу после (пере)подключения стрима
+    пользователь сверяется вне очереди: события за время разрыва могли потеряться.
+    """
+
+    # Старый цикл сверял всех раз в 60 сек — относительно него считаем экономию
+    LEGACY_INTERVAL = 60.0
+
+    def __init__(
+        self,
+        fast_interval: float = RECONCILE_FAST_INTERVAL,
+        healthy_interval: float = RECONCILE_HEALTHY_INTERVAL,
+        fresh_seconds: float = RECONCILE_WS_FRESH_SECONDS,
+        error_grace: float = RECONCILE_WS_ERROR_GRACE,
+        tick: float = 5.0,
+    ) -> None:
+        self.fast_interval = fast_interval
+        self.healthy_interval = healthy_interval
+        self.fresh_seconds = fresh_seconds
+        self.error_grace = error_grace
+        self.tick = tick
+
+        self.next_due: Dict[int, float] = {}
+        self.health: Dict[int, str] = {}
+        self._immediate: Set[int] = set()
+        self._wake: Optional[asyncio.Event] = None
+
+        self.started_at = 0.0
+        self.legacy_reconciles = 0.0  # сколько сверок сделал бы старый цикл за то же время
+        self.immediate_runs = 0
+
+    def request_immediate(self, user_id: int) -> None:
+        """Сверить пользователя на ближайшем шаге (после reconnect user stream)."""
+        self._immediate.add(user_id)
+        if self._wake is not None:
+            self._wake.set()
+
+    def user_health(self, user_id: int, now: Optional[float] = None) -> str:
+        """fresh / stale / reconnecting / error / no_stream."""
+        now = now or time.time()
+        if user_id in websocket_manager.reconnecting_users:
+            return "reconnecting"
+        connection = websocket_manager.user_connections.get(user_id)
+        if connection is None:
+            return "no_stream"
+        ws = connection.get("ws")
+        if ws is not None and ws.closed:
+            return "reconnecting"
+        if now - websocket_manager.user_stream_errors.get(user_id, 0) < self.error_grace:
+            return "error"
+        if now - connection.get("last_message_at", 0) > self.fresh_seconds:
+            return "stale"
+        return "fresh"
+
+    def interval_for(self, health: str) -> float:
+        return self.healthy_interval if health == "fresh" else self.fast_interval
+
+    def _schedule(self, user_ids: Iterable[int], batch_started: float) -> None:
+        now = time.time()
+        for user_id in user_ids:
+            health = self.user_health(user_id, now)
+            self.health[user_id] = health
+            if reconciler_stats.last_success.get(user_id, 0) < batch_started:
+                # Сверка не удалась (REST ошибка) — повторяем быстро
+                interval = self.fast_interval
+            else:
+                interval = self.interval_for(health)
+            self.next_due[user_id] = now + interval
+
+    def _forget(self, user_ids: Iterable[int]) -> None:
+        # Пользователям без активных сделок сверять нечего — они не отстают
+        for user_id in user_ids:
+            self.next_due.pop(user_id, None)
+            self.health.pop(user_id, None)
+            reconciler_stats.last_success.pop(user_id, None)
+
+    async def run(self) -> None:
+        logger.info("[Reconciler] Starting adaptive order status reconciler")
+        self._wake = asyncio.Event()
+        self.started_at = time.time()
+        candidates: Set[int] = set()
+        last_refresh = 0.0
+        last_tick = time.time()
+        last_report = time.time()
+
+        while True:
+            try:
+                now = time.time()
+                if now - last_refresh >= self.fast_interval:
+                    fresh_candidates = await _active_user_ids()
+                    self._forget(candidates - fresh_candidates)
+                    candidates = fresh_candidates
+                    last_refresh = now
+
+                self.legacy_reconciles += len(candidates) * (now - last_tick) / self.LEGACY_INTERVAL
+                last_tick = now
+
+                due = {user_id for user_id in candidates if self.next_due.get(user_id, 0) <= now}
+                immediate, self._immediate = self._immediate, set()
+                self.immediate_runs += len(immediate)
+                due |= immediate
+
+                if due:
+                    result = await reconcile_users(due)
+                    self._schedule(due & candidates, now)
+                    if result["changes"]:
+                        logger.info(
+                            f"[Reconciler] {result['users']} users, {result['deals']} deals, "
+                            f"{result['changes']} changes in {result['elapsed_s']:.2f}s"
                         )
-                except Exception as e:
-                    # Retry once with local timestamp fallback
-                    try:
-                        setattr(client, "_time_offset_ms", 0)
-                        setattr(client, "_last_time_sync", time.time())
-                        resp = await client.query_order(symbol, {"orderId": order_id})
-                        api_status = resp.get("status")
-                        if api_status:
-                            await update_order_status(
-                                order_id, symbol, api_status, user_id=user.telegram_id
-                            )
-                    except Exception as e2:
+                    if result["elapsed_s"] > self.fast_interval:
                         logger.warning(
-                            f"[Reconciler] query_order failed for {order_id} (user {user.telegram_id}): {e2}"
+                            f"[Reconciler] Batch of {result['users']} users took {result['elapsed_s']:.1f}s, "
+                            f"longer than the {self.fast_interval}s fast interval"
                         )
+                if now - last_report >= 3600:
+                    last_report = now
+                    stats = self.get_stats()
+                    logger.info(
+                        f"[Reconciler] {stats['scheduled_users']} users {stats['health']}, "
+                        f"REST calls saved ~{stats['rest_calls_saved_per_hour']}/h vs fixed 60s polling"
+                    )
+            except Exception as e:
+                reconciler_stats.errors += 1
+                logger.error(f"[Reconciler] Scheduler error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.tick)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        hours = (time.time() - self.started_at) / 3600 if self.started_at else 0.0
+        done = reconciler_stats.user_reconciles
+        calls_per_reconcile = reconciler_stats.rest_calls / done if done else 1.0
+        saved_calls = max(0.0, (self.legacy_reconciles - done) * calls_per_reconcile)
+        modes: Dict[str, int] = {}
+        for health in self.health.values():
+            modes[health] = modes.get(health, 0) + 1
+        return {
+            "scheduled_users": len(self.next_due),
+            "health": modes,
+            "immediate_runs": self.immediate_runs,
+            "legacy_reconciles": round(self.legacy_reconciles, 1),
+            "rest_calls_saved": round(saved_calls),
+            "rest_calls_saved_per_hour": round(saved_calls / hours) if hours > 0 else 0,
+        }
 
-    except Exception as e:
-        logger.error(
-            f"[Reconciler] Unexpected error for user {getattr(user, 'telegram_id', 'unknown')}: {e}"
-        )
 
+reconcile_scheduler = ReconcileScheduler()
 
-async def order_status_reconciler_loop(poll_interval_seconds: int = 60) -> None:
+
+async def order_status_reconciler_loop() -> None:
     """Continuously reconcile order statuses for all users with API keys.
 
     - Only updates active statuses (NEW, PARTIALLY_FILLED)
-    - Uses open_orders to batch, then per-order query as fallback
+    - Per-user interval depends on the health of the user's private WebSocket
+    - Uses open_orders to batch, then concurrent per-order query as fallback
     """
-    logger.info("[Reconciler] Starting background order status reconciler loop")
-    while True:
-        start_ts = time.time()
-        try:
-            users = await sync_to_async(list)(
-                User.objects.exclude(api_key__isnull=True)
-                .exclude(api_key="")
-                .exclude(api_secret__isnull=True)
-                .exclude(api_secret="")
-            )
-            for user in users:
-                await _reconcile_user_orders(user)
-        except Exception as e:
-            logger.error(f"[Reconciler] Top-level loop error: {e}")
-
-        # Sleep remaining time of the interval if processing was fast
-        elapsed = time.time() - start_ts
-        sleep_for = max(5, poll_interval_seconds - int(elapsed))
-        await asyncio.sleep(sleep_for)
+    await reconcile_scheduler.run()
@@ -0,0 +1,539 @@
+import asyncio
+import itertools
+import logging
+import time as _time
+from importlib import import_module
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from bot.logger import logger
+from bot.utils.mexc_rest import MexcRestClient
+from bot.utils.ws.events import BookTick
+
+# Модули горячего пути автобая, в которых time.time() подменяется часами реплея
+CLOCK_MODULES = (
+    "bot.commands.autobuy",
+    "bot.utils.autobuy_state",
+    "bot.utils.autobuy_triggers",
+    "bot.utils.order_fills",
+    "bot.utils.user_settings_cache",
+    "bot.utils.websocket_handlers",
+    "bot.utils.ws.price_direction",
+)
+
+# Шаг проверки ожидания в основном цикле autobuy_loop (сек)
+MAIN_LOOP_INTERVAL = 10
+
+
+class VirtualClock:
+    """
+    Часы реплея: time() — время текущего тика (sendTime биржи), остальное
+    (perf_counter, monotonic, ...) берется из настоящего модуля time.
+    """
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(_time, name)
+
+
+class ReplayUser:
+    """Пользователь реплея: те же поля, что autobuy читает у User."""
+
+    def __init__(
+        self,
+        telegram_id: int,
+        pair: str,
+        profit: float,
+        loss: float,
+        pause: int,
+        buy_amount: float,
+    ) -> None:
+        self.id = telegram_id
+        self.telegram_id = telegram_id
+        self.pair = pair
+        self.profit = profit
+        self.loss = loss
+        self.pause = pause
+        self.buy_amount = buy_amount
+        self.autobuy = True
+        self.api_key = f"replay-{telegram_id}"
+        self.api_secret = f"replay-{telegram_id}"
+
+    def save(self, *args, **kwargs) -> None:
+        pass
+
+    def __repr__(self) -> str:
+        return (
+            f"ReplayUser({self.telegram_id}, profit={self.profit}, loss={self.loss}, "
+            f"pause={self.pause}, buy_amount={self.buy_amount})"
+        )
+
+
+class _ReplayUserManager:
+    def __init__(self, users: Dict[int, ReplayUser]) -> None:
+        self._users = users
+
+    def get(self, telegram_id: int, **kwargs) -> ReplayUser:
+        return self._users[telegram_id]
+
+
+class _ReplayUserModel:
+    """Замена модели User в autobuy: User.objects.get читает пользователей реплея."""
+
+    def __init__(self, users: Dict[int, ReplayUser]) -> None:
+        self.objects = _ReplayUserManager(users)
+
+
+class _NullBus:
+    """Вместо message_bus: сообщения только считаются, в Telegram ничего не уходит."""
+
+    def __init__(self) -> None:
+        self.sent = 0
+
+    def send(self, *args, **kwargs) -> None:
+        self.sent += 1
+
+
+class UserReport:
+    """Итоги одного пользователя за реплей."""
+
+    def __init__(self, user: ReplayUser) -> None:
+        self.user = user
+        self.buys: Dict[str, int] = {}
+        self.sells = 0
+        self.spent = 0.0
+        self.proceeds = 0.0
+        self.fees = 0.0
+        self.realized = 0.0
+        self.max_open = 0
+        self.errors = 0
+        self.latencies_ms: List[float] = []
+        self.open_qty = 0.0
+        self.open_cost = 0.0
+        self.unrealized = 0.0
+
+    @property
+    def trades(self) -> int:
+        return sum(self.buys.values())
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = np.asarray(self.latencies_ms) if self.latencies_ms else None
+        return {
+            "telegram_id": self.user.telegram_id,
+            "profit": self.user.profit,
+            "loss": self.user.loss,
+            "pause": self.user.pause,
+            "buys": dict(self.buys),
+            "trades": self.trades,
+            "sells": self.sells,
+            "open": self.trades - self.sells,
+            "max_open": self.max_open,
+            "realized": round(self.realized, 6),
+            "unrealized": round(self.unrealized, 6),
+            "pnl": round(self.realized + self.unrealized, 6),
+            "fees": round(self.fees, 6),
+            "errors": self.errors,
+            "latency_avg_ms": round(float(latencies.mean()), 3) if latencies is not None else None,
+            "latency_p99_ms": round(float(np.percentile(latencies, 99)), 3) if latencies is not None else None,
+        }
+
+
+class SimulatedRestClient(MexcRestClient):
+    """
+    MexcRestClient без сети: запросы исполняет SimulatedExchange.
+
+    new_order/query_order/ticker_price собирают параметры как настоящий
+    клиент, подменяется только _request.
+    """
+
+    def __init__(self, exchange: "SimulatedExchange", user: ReplayUser) -> None:
+        super().__init__(user.api_key, user.api_secret)
+        self.exchange = exchange
+        self.telegram_id = user.telegram_id
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        signed: bool = False,
+        timeout_sec: int = 20,
+        recv_window_ms: int = 59000,
+    ) -> Dict[str, Any]:
+        params = params or {}
+        if path == "/api/v3/ticker/price":
+            return self.exchange.ticker_price(params["symbol"])
+        if path == "/api/v3/order" and method == "POST":
+            return self.exchange.new_order(self.telegram_id, params)
+        if path == "/api/v3/order" and method == "GET":
+            return self.exchange.query_order(params["symbol"], str(params.get("orderId")))
+        return {"code": 404, "msg": f"{method} {path} не поддерживается в реплее"}
+
+
+class SimulatedExchange:
+    """
+    Биржа реплея по одной паре.
+
+    MARKET BUY исполняется сразу по ask текущего тика, LIMIT SELL ждет тика,
+    на котором bid дойдет до цены ордера, и исполняется по своей цене.
+    fee — комиссия в долях с каждой стороны сделки.
+    """
+
+    def __init__(self, symbol: str, reports: Dict[int, UserReport], fee: float = 0.0) -> None:
+        self.symbol = symbol
+        self.reports = reports
+        self.fee = fee
+        self.tick: Optional[BookTick] = None
+        # perf_counter подачи текущего тика — начало отсчета задержки решения
+        self.tick_fed_at: Optional[float] = None
+        self._ids = itertools.count(1)
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._open_sells: Dict[str, Dict[str, Any]] = {}
+        # Последняя покупка пользователя (quote, qty): себестоимость следующего SELL
+        self._last_buy: Dict[int, Tuple[float, float]] = {}
+
+    def _error(self, msg: str) -> Dict[str, Any]:
+        return {"code": 30004, "msg": msg}
+
+    def ticker_price(self, symbol: str) -> Dict[str, Any]:
+        if self.tick is None:
+            return self._error("нет цены")
+        return {"symbol": symbol, "price": self.tick.ask_price}
+
+    def new_order(self, telegram_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+        tick = self.tick
+        if tick is None or params.get("symbol") != self.symbol:
+            return self._error("нет рынка для ордера")
+        report = self.reports[telegram_id]
+        order_id = f"R{next(self._ids)}"
+
+        if params.get("side") == "BUY" and params.get("type") == "MARKET":
+            if self.tick_fed_at is not None:
+                report.latencies_ms.append((_time.perf_counter() - self.tick_fed_at) * 1000)
+            if tick.ask <= 0:
+                return self._error("нет ask для покупки")
+            quote = float(params["quoteOrderQty"])
+            qty = quote / tick.ask
+            report.spent += quote
+            report.fees += quote * self.fee
+            self._last_buy[telegram_id] = (quote, qty)
+            order = {
+                "orderId": order_id,
+                "symbol": self.symbol,
+                "side": "BUY",
+                "type": "MARKET",
+                "status": "FILLED",
+                "price": tick.ask_price,
+                "executedQty": str(qty),
+                "cummulativeQuoteQty": str(quote),
+            }
+            self._orders[order_id] = order
+            return dict(order)
+
+        if params.get("side") == "SELL" and params.get("type") == "LIMIT":
+            qty = float(params["quantity"])
+            quote, bought = self._last_buy.get(telegram_id, (qty * tick.ask, qty))
+            order = {
+                "orderId": order_id,
+                "symbol": self.symbol,
+                "side": "SELL",
+                "type": "LIMIT",
+                "status": "NEW",
+                "price": str(params["price"]),
+                "origQty": str(params["quantity"]),
+                "executedQty": "0",
+                "cummulativeQuoteQty": "0",
+            }
+            self._orders[order_id] = order
+            self._open_sells[order_id] = {
+                "telegram_id": telegram_id,
+                "price": float(params["price"]),
+                "qty": qty,
+                "cost": quote * qty / bought if bought > 0 else quote,
+            }
+            report.max_open = max(report.max_open, self.open_count(telegram_id))
+            return dict(order)
+
+        return self._error(f"ордер {params.get('side')} {params.get('type')} не поддерживается")
+
+    def query_order(self, symbol: str, order_id: str) -> Dict[str, Any]:
+        order = self._orders.get(order_id)
+        return dict(order) if order else self._error(f"ордер {order_id} не найден")
+
+    def open_count(self, telegram_id: int) -> int:
+        return sum(1 for sell in self._open_sells.values() if sell["telegram_id"] == telegram_id)
+
+    def match_sells(self, bid: float) -> List[Tuple[str, int]]:
+        """Исполняет SELL ордера, до цены которых дошел bid; возвращает (order_id, telegram_id)."""
+        filled = [order_id for order_id, sell in self._open_sells.items() if sell["price"] <= bid]
+        result = []
+        for order_id in filled:
+            sell = self._open_sells.pop(order_id)
+            order = self._orders[order_id]
+            proceeds = sell["qty"] * sell["price"]
+            order.update(
+                status="FILLED",
+                executedQty=order["origQty"],
+                cummulativeQuoteQty=str(proceeds),
+            )
+            report = self.reports[sell["telegram_id"]]
+            report.sells += 1
+            report.proceeds += proceeds
+            report.fees += proceeds * self.fee
+            report.realized += proceeds * (1 - self.fee) - sell["cost"] * (1 + self.fee)
+            result.append((order_id, sell["telegram_id"]))
+        return result
+
+    def mark_to_market(self, bid: float) -> None:
+        """Открытые SELL ордера по текущему bid и итоговый PnL."""
+        for report in self.reports.values():
+            report.open_qty = 0.0
+            report.open_cost = 0.0
+        for sell in self._open_sells.values():
+            report = self.reports[sell["telegram_id"]]
+            report.open_qty += sell["qty"]
+            report.open_cost += sell["cost"]
+        for report in self.reports.values():
+            report.unrealized = report.open_qty * bid * (1 - self.fee) - report.open_cost * (1 + self.fee)
+
+
+def book_ticks(symbol: str, ticks: np.ndarray) -> Iterable[BookTick]:
+    """BookTick из записей BOOK_DTYPE (tick_recorder) — как их прислал бы листенер."""
+    channel = f"spot@public.aggre.bookTicker.v3.api.pb@100ms@{symbol}"
+    for ts, bid, ask, bid_qty, ask_qty in zip(
+        ticks["ts"].tolist(),
+        ticks["bid"].tolist(),
+        ticks["ask"].tolist(),
+        ticks["bid_qty"].tolist(),
+        ticks["ask_qty"].tolist(),
+    ):
+        yield BookTick(channel, symbol, ts, repr(bid), repr(ask), repr(bid_qty), repr(ask_qty))
+
+
+class AutobuyReplay:
+    """
+    Ускоренный прогон настоящего автобая (bot/commands/autobuy.py) по записанным тикам.
+
+    Тики идут через handle_market_message_impl и почтовые ящики книги
+    триггеров, как от листенера; time.time() в модулях автобая показывает
+    время тика, поэтому паузы и окна проходят виртуально. Вместо БД, REST
+    и Telegram — пользователи реплея, SimulatedExchange и пустая шина
+    сообщений. Основной цикл autobuy_loop не запускается: его проверка
+    ожидания раз в MAIN_LOOP_INTERVAL секунд выполняется по виртуальным часам.
+
+    Состояние автобая глобальное (autobuy_states, книги триггеров),
+    поэтому один реплей на процесс.
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        users: Iterable[ReplayUser],
+        fee: float = 0.0,
+        log_level: Optional[int] = logging.WARNING,
+    ) -> None:
+        self.symbol = symbol.upper()
+        self.log_level = log_level
+        self.users = {user.telegram_id: user for user in users}
+        self.reports = {telegram_id: UserReport(user) for telegram_id, user in self.users.items()}
+        self.exchange = SimulatedExchange(self.symbol, self.reports, fee=fee)
+        self.clock = VirtualClock()
+        self.bus = _NullBus()
+        self.ticks = 0
+        self.wall_seconds = 0.0
+        self._patches: List[Tuple[Any, str, Any]] = []
+        self._muted_handlers: List[logging.Handler] = []
+        self._saved_level: Optional[int] = None
+        self._clients: Dict[int, SimulatedRestClient] = {}
+        self._idle_tasks: set = set()
+
+    # ---------- подмены ----------
+
+    def _patch(self, target: Any, name: str, value: Any) -> None:
+        self._patches.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def _install(self) -> None:
+        from bot.commands import autobuy
+        from bot.utils import autobuy_restart
+        from bot.utils.error_notifier import TelegramErrorHandler
+
+        # Сначала импортируем все, что затронет прогон: импорт модуля при
+        # настройке логгера может вернуть ему уровень и обработчики
+        modules = [import_module(module_name) for module_name in CLOCK_MODULES]
+        import_module("bot.utils.ws.market_stream")
+
+        # Ошибки реплея не уходят в чат уведомлений
+        self._muted_handlers = [h for h in logger.handlers if isinstance(h, TelegramErrorHandler)]
+        for handler in self._muted_handlers:
+            logger.removeHandler(handler)
+        self._saved_level = logger.level
+        if self.log_level is not None:
+            logger.setLevel(self.log_level)
+
+        for module in modules:
+            self._patch(module, "time", self.clock)
+
+        async def persist_deal(telegram_id, settings, message, order, rest, symbol, executed_qty, spent, sell_price):
+            # Номер сделки вместо next_user_order_number, без записи Deal
+            report = self.reports[telegram_id]
+            order.user_order_number = report.trades
+            order.persisted = True
+
+        async def notify_error(telegram_id, context, error):
+            self.reports[telegram_id].errors += 1
+
+        def client_for(api_key, api_secret):
+            return self._clients[int(api_key.rsplit("-", 1)[1])]
+
+        self._patch(autobuy, "User", _ReplayUserModel(self.users))
+        self._patch(autobuy, "rest_client_for", client_for)
+        self._patch(autobuy, "_persist_autobuy_deal", persist_deal)
+        self._patch(autobuy, "notify_user_autobuy_error", notify_error)
+        self._patch(autobuy, "message_bus", self.bus)
+        self._patch(autobuy_restart, "message_bus", self.bus)
+
+        original_process_buy = autobuy.process_buy
+
+        async def process_buy(telegram_id, reason, *args, **kwargs):
+            before = self.reports[telegram_id].spent
+            await original_process_buy(telegram_id, reason, *args, **kwargs)
+            if self.reports[telegram_id].spent > before:
+                buys = self.reports[telegram_id].buys
+                buys[reason] = buys.get(reason, 0) + 1
+
+        self._patch(autobuy, "process_buy", process_buy)
+
+    def _uninstall(self) -> None:
+        while self._patches:
+            target, name, value = self._patches.pop()
+            setattr(target, name, value)
+        for handler in self._muted_handlers:
+            logger.addHandler(handler)
+        self._muted_handlers = []
+        if self._saved_level is not None:
+            logger.setLevel(self._saved_level)
+            self._saved_level = None
+
+    # ---------- прогон ----------
+
+    async def _settle(self) -> None:
+        """Ждет, пока тик пройдет через почтовые ящики, книгу и все покупки."""
+        from bot.utils.websocket_manager import websocket_manager
+
+        current = asyncio.current_task()
+        while True:
+            await asyncio.sleep(0)
+            mailboxes = websocket_manager.bookticker_mailboxes.get(self.symbol, {}).values()
+            if any(mailbox._latest is not None for mailbox in mailboxes):
+                continue
+            busy = asyncio.all_tasks() - self._idle_tasks - {current}
+            if not busy:
+                return
+            await asyncio.wait(busy)
+
+    async def _start_users(self) -> None:
+        """Старт как в autobuy_loop: книга триггеров, начальная цена и первая покупка."""
+        from bot.commands import autobuy
+        from bot.utils.autobuy_restart import FakeMessage
+        from bot.utils.autobuy_state import AutobuyState
+        from bot.utils.autobuy_triggers import attach_autobuy_state
+        from bot.utils.user_settings_cache import user_settings_cache
+        from bot.utils.websocket_manager import websocket_manager
+
+        for telegram_id, user in self.users.items():
+            user_settings_cache.put(user)
+            self._clients[telegram_id] = SimulatedRestClient(self.exchange, user)
+            state = autobuy.autobuy_states[telegram_id] = AutobuyState(telegram_id)
+            await attach_autobuy_state(
+                self.symbol,
+                state,
+                user_settings_cache.get(telegram_id),
+                on_drop=autobuy.handle_drop_trigger,
+                on_rise=autobuy.handle_rise_trigger,
+            )
+            ticker = await self._clients[telegram_id].ticker_price(self.symbol)
+            state.current_price = float(ticker["price"])
+            state.is_ready = True
+
+        mailboxes = websocket_manager.bookticker_mailboxes.get(self.symbol, {}).values()
+        self._idle_tasks = {mailbox._task for mailbox in mailboxes if mailbox._task is not None}
+
+        for telegram_id in self.users:
+            await autobuy.process_buy(telegram_id, "initial_purchase", FakeMessage(telegram_id))
+        await self._settle()
+
+    async def _main_loop_check(self) -> None:
+        """Проверка ожидания из основного цикла autobuy_loop (без DB guard)."""
+        from bot.commands import autobuy
+        from bot.utils.autobuy_restart import FakeMessage
+
+        for telegram_id in self.users:
+            state = autobuy.autobuy_states.get(telegram_id)
+            if state is None or not state.waiting_expired():
+                continue
+            state.clear_waiting()
+            if not state.active_order_count:
+                await autobuy.process_buy(telegram_id, "after_waiting_period_main_loop", FakeMessage(telegram_id))
+
+    async def _fill_sells(self, bid: float) -> bool:
+        from bot.commands import autobuy
+
+        filled = self.exchange.match_sells(bid)
+        for order_id, telegram_id in filled:
+            await autobuy.process_order_update_for_autobuy(order_id, self.symbol, "FILLED", telegram_id)
+        return bool(filled)
+
+    async def run(self, ticks: Iterable[BookTick]) -> Dict[int, UserReport]:
+        from bot.commands import autobuy
+        from bot.utils.autobuy_triggers import detach_autobuy_state
+        from bot.utils.websocket_manager import websocket_manager
+        from bot.utils.ws.market_stream import handle_market_message_impl
+
+        started = _time.perf_counter()
+        self._install()
+        try:
+            next_check = None
+            last_bid = 0.0
+            for tick in ticks:
+                self.clock.now = tick.send_time / 1000
+                self.exchange.tick = tick
+                self.exchange.tick_fed_at = _time.perf_counter()
+                await handle_market_message_impl(websocket_manager, tick)
+                if self.ticks == 0:
+                    # Первая покупка не вызвана тиком — в задержку решений не входит
+                    self.exchange.tick_fed_at = None
+                    await self._start_users()
+                    next_check = self.clock.now + MAIN_LOOP_INTERVAL
+                self.ticks += 1
+                last_bid = tick.bid
+                await self._settle()
+
+                self.exchange.tick_fed_at = None
+                acted = await self._fill_sells(tick.bid)
+                if self.clock.now >= next_check:
+                    next_check = self.clock.now + MAIN_LOOP_INTERVAL
+                    await self._main_loop_check()
+                    acted = True
+                if acted:
+                    await self._settle()
+
+            self.exchange.mark_to_market(last_bid)
+        finally:
+            for telegram_id in self.users:
+                state = autobuy.autobuy_states.pop(telegram_id, None)
+                if state is not None:
+                    try:
+                        await detach_autobuy_state(state)
+                    except Exception as e:
+                        logger.error(f"[Replay] Ошибка при отключении {telegram_id} от книги триггеров: {e}")
+            websocket_manager.current_bookticker.pop(self.symbol, None)
+            self._uninstall()
+            self.wall_seconds = _time.perf_counter() - started
+        return self.reports
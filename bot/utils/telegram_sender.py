@@ -0,0 +1,146 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from bot.logger import logger
+
+T = TypeVar("T")
+
+
+class TelegramRateLimiter:
+    """
+    Лимиты Telegram Bot API: общий token bucket и минимальный интервал на чат.
+
+    Telegram допускает около 30 сообщений в секунду на бота и не больше
+    одного в секунду в один чат; сверх этого отвечает 429 с retry_after.
+    acquire(chat_id) ждет, пока оба лимита разрешат следующий вызов.
+    """
+
+    def __init__(self, rate_per_second: float = 25.0, chat_interval: float = 1.0, burst: Optional[float] = None) -> None:
+        self.rate = rate_per_second
+        self.capacity = burst if burst is not None else rate_per_second
+        self.chat_interval = chat_interval
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._chat_next: Dict[int, float] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self, chat_id: int) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+        # Слот в чате резервируем непосредственно перед вызовом: параллельные вызовы
+        # в один чат встают друг за другом с интервалом chat_interval
+        now = time.monotonic()
+        slot = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + self.chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+        if len(self._chat_next) > 10000:
+            self._prune()
+
+    def chat_delay(self, chat_id: int) -> float:
+        """Сколько секунд чат еще занят предыдущими вызовами (0 — можно отправлять сейчас)."""
+        return max(0.0, self._chat_next.get(chat_id, 0.0) - time.monotonic())
+
+    def pause(self, seconds: float) -> None:
+        """Telegram ответил 429: никаких вызовов, пока не истечет retry_after."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def pause_chat(self, chat_id: int, seconds: float) -> None:
+        self._chat_next[chat_id] = max(self._chat_next.get(chat_id, 0.0), time.monotonic() + seconds)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, at in self._chat_next.items() if at < now]:
+            del self._chat_next[chat_id]
+
+
+class TelegramSendStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.failed = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+
+def _build_limiter() -> TelegramRateLimiter:
+    try:
+        from bot.constants import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_INTERVAL
+    except Exception:
+        return TelegramRateLimiter()
+    return TelegramRateLimiter(rate_per_second=TELEGRAM_GLOBAL_RATE, chat_interval=TELEGRAM_CHAT_INTERVAL)
+
+
+telegram_limiter = _build_limiter()
+telegram_send_stats = TelegramSendStats()
+
+
+async def call_with_retry(
+    chat_id: int,
+    call: Callable[[], Awaitable[T]],
+    attempts: int = 3,
+    limiter: TelegramRateLimiter = telegram_limiter,
+) -> T:
+    """
+    Вызов Bot API в чат chat_id с учетом лимитов.
+
+    429 — ждем retry_after (для всего бота) и повторяем; сетевые и 5xx ошибки —
+    повтор с экспоненциальной задержкой. Заблокированный бот и неверный запрос
+    не повторяются. После последней попытки исключение пробрасывается.
+    """
+    for attempt in range(1, attempts + 1):
+        await limiter.acquire(chat_id)
+        telegram_send_stats.calls += 1
+        try:
+            return await call()
+        except TelegramRetryAfter as e:
+            telegram_send_stats.rate_limited += 1
+            limiter.pause(e.retry_after)
+            limiter.pause_chat(chat_id, e.retry_after)
+            logger.warning(f"[TelegramSender] 429 для чата {chat_id}, retry_after={e.retry_after}с")
+            if attempt == attempts:
+                telegram_send_stats.failed += 1
+                raise
+        except (TelegramForbiddenError, TelegramBadRequest):
+            telegram_send_stats.failed += 1
+            raise
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if attempt == attempts:
+                telegram_send_stats.failed += 1
+                raise
+            delay = 2 ** (attempt - 1)
+            logger.warning(f"[TelegramSender] Ошибка Telegram для чата {chat_id}: {e}, повтор через {delay}с")
+            await asyncio.sleep(delay)
+        telegram_send_stats.retries += 1
+    raise RuntimeError("unreachable")
@@ -0,0 +1,366 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from bot.constants import (
+    TICK_RECORDER_DIR,
+    TICK_RECORDER_ENABLED,
+    TICK_RECORDER_FLUSH_INTERVAL,
+    TICK_RECORDER_MAX_BUFFER,
+    TICK_RECORDER_RETENTION_DAYS,
+)
+from bot.logger import logger
+from bot.utils.ws.events import BookTick, DealTick, PushEvent
+
+# Фиксированные записи без заголовка файла: файл дня — это массив записей,
+# np.memmap(path, dtype=...) читает его без копирования.
+# ts — sendTime биржи, мс UTC
+BOOK_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("bid_qty", "<f8"),
+    ("ask_qty", "<f8"),
+])
+# side: tradeType MEXC (1 — покупка, 2 — продажа)
+DEAL_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("price", "<f8"),
+    ("quantity", "<f8"),
+    ("side", "<i8"),
+])
+DTYPES = {"bookticker": BOOK_DTYPE, "deals": DEAL_DTYPE}
+
+DAY_MS = 86_400_000
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _day_of(ts_ms: int) -> date:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).date()
+
+
+def day_path(root: str, kind: str, symbol: str, day: date) -> str:
+    """Файл тиков: <root>/<kind>/<SYMBOL>/<YYYYMMDD>.bin (дни по UTC)."""
+    return os.path.join(root, kind, symbol.upper(), f"{day:%Y%m%d}.bin")
+
+
+class TickRecorder:
+    """
+    Запись тиков bookTicker и deals в файлы по символу и дню.
+
+    record() вызывается listener'ом на каждый декодированный тик и только
+    кладет его в память. Фоновая задача раз в flush_interval секунд
+    собирает накопленное в массивы numpy и дописывает их в файлы в отдельном
+    потоке — event loop на диске не ждет. Файл дня закрывается сам собой
+    при смене даты (UTC), файлы старше retention_days удаляются.
+
+    Тики одного символа пишутся в порядке ts: более старый тик (дубль из
+    освобождаемого шарда, переупорядочивание) отбрасывается — читатель
+    ищет диапазоны двоичным поиском. Если буфер достиг max_buffered
+    (диск не успевает), новые тики отбрасываются; все считается в dropped.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        enabled: bool = False,
+        flush_interval: float = 1.0,
+        max_buffered: int = 500000,
+        retention_days: int = 30,
+    ) -> None:
+        self.root = root
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.retention_days = retention_days
+
+        # (kind, symbol) -> список кортежей в порядке полей dtype
+        self._pending: Dict[Tuple[str, str], List[tuple]] = {}
+        self._buffered = 0
+        self._last_ts: Dict[Tuple[str, str], int] = {}
+        self._checked_files: set = set()
+        self._write_lock = threading.Lock()  # Сброс из stop() не должен писать параллельно с прерванным фоновым
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+
+        self.recorded = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.flushes = 0
+        self.write_errors = 0
+        self.dropped: Dict[str, int] = {}
+        self.pruned_files = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # ---------- запись ----------
+
+    def record(self, event: PushEvent) -> None:
+        """Кладет тик в буфер (не блокирует). Ничего не делает, если запись выключена."""
+        if not self.enabled:
+            return
+        if isinstance(event, BookTick):
+            kind = "bookticker"
+            rows = [(event.send_time, event.bid, event.ask, event.bid_qty, event.ask_qty)]
+        elif isinstance(event, DealTick):
+            if not event.items:
+                return
+            kind = "deals"
+            # Строка на каждую сделку кадра, со своим временем сделки
+            rows = [
+                (deal_time or event.send_time, price, quantity, trade_type)
+                for price, quantity, trade_type, deal_time in event.items
+            ]
+            rows.sort(key=lambda row: row[0])
+        else:
+            return
+
+        key = (kind, event.symbol)
+        last_ts = self._last_ts.get(key, 0)
+        if rows[0][0] < last_ts:
+            fresh = [row for row in rows if row[0] >= last_ts]
+            self._count_dropped("out_of_order", len(rows) - len(fresh))
+            if not fresh:
+                return
+            rows = fresh
+        if self._buffered + len(rows) > self.max_buffered:
+            self._count_dropped("buffer_full", len(rows))
+            return
+        self._last_ts[key] = rows[-1][0]
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = []
+        pending.extend(rows)
+        self._buffered += len(rows)
+        self.recorded += len(rows)
+
+    def _count_dropped(self, reason: str, count: int = 1) -> None:
+        self.dropped[reason] = self.dropped.get(reason, 0) + count
+
+    async def flush(self) -> int:
+        """Дописывает буфер в файлы (в отдельном потоке). Возвращает число записанных тиков."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        self._buffered = 0
+        try:
+            written = await asyncio.to_thread(self._write, pending)
+        except Exception as e:
+            self.write_errors += 1
+            self._count_dropped("write_error", sum(len(rows) for rows in pending.values()))
+            logger.error(f"[TickRecorder] Ошибка записи тиков: {e}")
+            return 0
+        self.flushes += 1
+        return written
+
+    def _write(self, pending: Dict[Tuple[str, str], List[tuple]]) -> int:
+        with self._write_lock:
+            return self._write_locked(pending)
+
+    def _write_locked(self, pending: Dict[Tuple[str, str], List[tuple]]) -> int:
+        written = 0
+        for (kind, symbol), rows in pending.items():
+            dtype = DTYPES[kind]
+            if kind == "bookticker":
+                # Количества приходят строками — разбираем здесь, вне event loop
+                rows = [(ts, bid, ask, _to_float(bid_qty), _to_float(ask_qty)) for ts, bid, ask, bid_qty, ask_qty in rows]
+            else:
+                rows = [(ts, _to_float(price), _to_float(quantity), side) for ts, price, quantity, side in rows]
+            ticks = np.array(rows, dtype=dtype)
+
+            # Тики одной пачки могут перейти через полночь UTC — режем по дням
+            days = ticks["ts"] // DAY_MS
+            bounds = np.flatnonzero(np.diff(days)) + 1
+            for chunk in np.split(ticks, bounds):
+                path = day_path(self.root, kind, symbol, _day_of(int(chunk["ts"][0])))
+                self._append(path, chunk)
+                written += len(chunk)
+                self.bytes_written += chunk.nbytes
+        self.written += written
+        return written
+
+    def _append(self, path: str, chunk: np.ndarray) -> None:
+        if path not in self._checked_files:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Хвост от прерванной записи (процесс убит посреди записи) обрезаем до целой записи
+            if os.path.exists(path):
+                size = os.path.getsize(path)
+                if size % chunk.dtype.itemsize:
+                    with open(path, "r+b") as f:
+                        f.truncate(size - size % chunk.dtype.itemsize)
+            if len(self._checked_files) > 10000:
+                self._checked_files.clear()
+            self._checked_files.add(path)
+        with open(path, "ab") as f:
+            chunk.tofile(f)
+
+    def prune(self) -> int:
+        """Удаляет файлы дней старше retention_days. Возвращает число удаленных файлов."""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = f"{datetime.now(timezone.utc).date() - timedelta(days=self.retention_days):%Y%m%d}"
+        removed = 0
+        for kind in DTYPES:
+            kind_dir = os.path.join(self.root, kind)
+            if not os.path.isdir(kind_dir):
+                continue
+            for symbol in os.listdir(kind_dir):
+                symbol_dir = os.path.join(kind_dir, symbol)
+                for name in os.listdir(symbol_dir):
+                    if name.endswith(".bin") and name[:-4] < cutoff:
+                        os.remove(os.path.join(symbol_dir, name))
+                        self._checked_files.discard(os.path.join(symbol_dir, name))
+                        removed += 1
+                if not os.listdir(symbol_dir):
+                    shutil.rmtree(symbol_dir, ignore_errors=True)
+        self.pruned_files += removed
+        return removed
+
+    # ---------- жизненный цикл ----------
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_prune >= 3600:
+                    self._last_prune = time.monotonic()
+                    removed = await asyncio.to_thread(self.prune)
+                    if removed:
+                        logger.info(f"[TickRecorder] Удалено устаревших файлов тиков: {removed}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[TickRecorder] Ошибка фонового сброса тиков: {e}")
+
+    def start(self) -> None:
+        """Запускает фоновый сброс, если запись включена (при старте бота)."""
+        if not self.enabled or self.is_running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"[TickRecorder] Запись тиков в {self.root}")
+
+    async def stop(self) -> None:
+        """Останавливает фоновый сброс и дописывает буфер."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "buffered": self._buffered,
+            "recorded": self.recorded,
+            "written": self.written,
+            "bytes_written": self.bytes_written,
+            "flushes": self.flushes,
+            "write_errors": self.write_errors,
+            "dropped": dict(self.dropped),
+            "pruned_files": self.pruned_files,
+        }
+
+
+# ---------- чтение ----------
+
+
+def list_symbols(kind: str, root: str = TICK_RECORDER_DIR) -> List[str]:
+    kind_dir = os.path.join(root, kind)
+    return sorted(os.listdir(kind_dir)) if os.path.isdir(kind_dir) else []
+
+
+def list_days(kind: str, symbol: str, root: str = TICK_RECORDER_DIR) -> List[date]:
+    symbol_dir = os.path.join(root, kind, symbol.upper())
+    if not os.path.isdir(symbol_dir):
+        return []
+    return sorted(
+        datetime.strptime(name[:-4], "%Y%m%d").date()
+        for name in os.listdir(symbol_dir)
+        if name.endswith(".bin")
+    )
+
+
+def open_day(kind: str, symbol: str, day: date, root: str = TICK_RECORDER_DIR) -> np.ndarray:
+    """Тики дня как np.memmap только для чтения (пустой массив, если файла нет)."""
+    dtype = DTYPES[kind]
+    path = day_path(root, kind, symbol, day)
+    try:
+        count = os.path.getsize(path) // dtype.itemsize
+    except OSError:
+        return np.empty(0, dtype=dtype)
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    # Недописанная последняя запись (идет запись) в отображение не попадает
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def iter_ranges(
+    kind: str,
+    symbol: str,
+    start_ms: int,
+    end_ms: int,
+    root: str = TICK_RECORDER_DIR,
+) -> Iterator[np.ndarray]:
+    """
+    Тики с start_ms <= ts < end_ms: по одному срезу memmap на день, без копирования.
+
+    Границы ищутся двоичным поиском по ts (в файле тики упорядочены).
+    """
+    day = _day_of(start_ms)
+    last_day = _day_of(max(start_ms, end_ms - 1))
+    while day <= last_day:
+        ticks = open_day(kind, symbol, day, root)
+        if len(ticks):
+            ts = ticks["ts"]
+            lo, hi = np.searchsorted(ts, start_ms, "left"), np.searchsorted(ts, end_ms, "left")
+            if hi > lo:
+                yield ticks[lo:hi]
+        day += timedelta(days=1)
+
+
+def read_range(
+    kind: str,
+    symbol: str,
+    start_ms: int,
+    end_ms: int,
+    root: str = TICK_RECORDER_DIR,
+) -> np.ndarray:
+    """
+    Тики с start_ms <= ts < end_ms одним массивом.
+
+    В пределах одного дня возвращается срез memmap без копирования; если
+    диапазон захватывает несколько дней — склеенная копия (см. iter_ranges).
+    """
+    parts = list(iter_ranges(kind, symbol, start_ms, end_ms, root))
+    if not parts:
+        return np.empty(0, dtype=DTYPES[kind])
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate(parts)
+
+
+tick_recorder = TickRecorder(
+    TICK_RECORDER_DIR,
+    enabled=TICK_RECORDER_ENABLED,
+    flush_interval=TICK_RECORDER_FLUSH_INTERVAL,
+    max_buffered=TICK_RECORDER_MAX_BUFFER,
+    retention_days=TICK_RECORDER_RETENTION_DAYS,
+)
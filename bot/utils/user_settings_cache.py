@@ -0,0 +1,158 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.db.models.signals import post_save, post_delete
+
+from users.models import User
+from bot.logger import logger
+
+
+class UserSettings:
+    """Снимок торговых настроек пользователя для горячего пути autobuy."""
+
+    __slots__ = (
+        "telegram_id",
+        "user_id",
+        "api_key",
+        "api_secret",
+        "pair",
+        "symbol",
+        "profit",
+        "loss",
+        "pause",
+        "buy_amount",
+        "autobuy",
+        "loaded_at",
+    )
+
+    def __init__(self, user: User):
+        self.telegram_id = user.telegram_id
+        self.user_id = user.id
+        self.api_key = user.api_key
+        self.api_secret = user.api_secret
+        self.pair = user.pair
+        self.symbol = (user.pair or "").replace("/", "")
+        self.profit = float(user.profit) if user.profit is not None else None
+        self.loss = float(user.loss) if user.loss is not None else None
+        self.pause = user.pause
+        self.buy_amount = float(user.buy_amount) if user.buy_amount is not None else None
+        self.autobuy = bool(user.autobuy)
+        self.loaded_at = time.time()
+
+    @property
+    def is_complete(self) -> bool:
+        """Все ли параметры, нужные для торговли, заданы."""
+        return (
+            self.profit is not None
+            and self.loss is not None
+            and self.pause is not None
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"UserSettings(telegram_id={self.telegram_id}, pair={self.pair}, "
+            f"profit={self.profit}, loss={self.loss}, pause={self.pause}, "
+            f"buy_amount={self.buy_amount}, autobuy={self.autobuy})"
+        )
+
+
+class UserSettingsCache:
+    """
+    In-memory кэш настроек пользователей по telegram_id.
+
+    Колбэк bookTicker читает настройки только отсюда и не обращается к БД.
+    Кэш обновляется сигналом post_save (любой user.save() в процессе бота),
+    а изменения из других процессов (админка) подтягиваются периодическим
+    refresh() из основного цикла автобая.
+
+    Записи и слушатели (книга триггеров) меняются только в event loop:
+    post_save приходит из потока sync_to_async, и такое обновление
+    передается в loop через call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._settings: Dict[int, UserSettings] = {}
+        self._listeners: List[Callable[[int, Optional[UserSettings]], None]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add_listener(self, listener: Callable[[int, Optional[UserSettings]], None]) -> None:
+        """Слушатель вызывается при каждом изменении записи: (telegram_id, settings или None)."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, telegram_id: int, settings: Optional[UserSettings]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(telegram_id, settings)
+            except Exception as e:
+                logger.error(f"Ошибка слушателя кэша настроек для {telegram_id}: {e}")
+
+    def _store(self, telegram_id: int, settings: Optional[UserSettings]) -> None:
+        if settings is None:
+            self._settings.pop(telegram_id, None)
+        else:
+            self._settings[telegram_id] = settings
+        self._notify(telegram_id, settings)
+
+    def _apply(self, telegram_id: int, settings: Optional[UserSettings]) -> None:
+        """Применяет изменение в event loop; из чужого потока — через call_soon_threadsafe."""
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = self._loop
+            if loop is not None and loop.is_running():
+                loop.call_soon_threadsafe(self._store, telegram_id, settings)
+                return
+        # В loop или loop еще не запущен (старт, management-команды)
+        self._store(telegram_id, settings)
+
+    def get(self, telegram_id: int) -> Optional[UserSettings]:
+        return self._settings.get(telegram_id)
+
+    def put(self, user: User) -> UserSettings:
+        settings = UserSettings(user)
+        self._apply(user.telegram_id, settings)
+        return settings
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._apply(telegram_id, None)
+
+    async def refresh(self, telegram_id: int) -> Optional[UserSettings]:
+        """Перечитывает настройки из БД и кладёт их в кэш."""
+        user = await sync_to_async(
+            User.objects.filter(telegram_id=telegram_id).first
+        )()
+        if user is None:
+            self.invalidate(telegram_id)
+            return None
+        return self.put(user)
+
+    async def get_or_load(self, telegram_id: int) -> Optional[UserSettings]:
+        settings = self._settings.get(telegram_id)
+        if settings is None:
+            settings = await self.refresh(telegram_id)
+        return settings
+
+    def __len__(self) -> int:
+        return len(self._settings)
+
+
+user_settings_cache = UserSettingsCache()
+
+
+def _on_user_saved(sender, instance: User, **kwargs):
+    try:
+        user_settings_cache.put(instance)
+    except Exception as e:
+        logger.error(f"Ошибка обновления кэша настроек для {instance.telegram_id}: {e}")
+        user_settings_cache.invalidate(instance.telegram_id)
+
+
+def _on_user_deleted(sender, instance: User, **kwargs):
+    user_settings_cache.invalidate(instance.telegram_id)
+
+
+post_save.connect(_on_user_saved, sender=User, dispatch_uid="user_settings_cache_save")
+post_delete.connect(_on_user_deleted, sender=User, dispatch_uid="user_settings_cache_delete")
@@ -4,11 +4,14 @@ import time
 from typing import Dict, Any, Optional
 from decimal import Decimal
 
-from logger import logger
+from bot.logger import logger
 
 from users.models import User, Deal
 from asgiref.sync import sync_to_async
 from bot.utils.bot_utils import send_message_safely
+from bot.utils.message_bus import Priority
+from bot.utils.pnl_rollup import transition_deal_status
+from bot.utils.ws.events import BookTick, DealTick
 
 # Импортируем функцию из autobuy.py
 from bot.commands.autobuy import process_order_update_for_autobuy
@@ -63,12 +66,10 @@ async def update_order_status(order_id: str, symbol: str, status: str, user_id:
                 else:
                     deal = Deal.objects.get(order_id=order_id)
                 old_status = deal.status
-                # Обновляем только если статус изменился
-                if old_status != status:
-                    deal.status = status
-                    deal.save()
+                # Обновляем только если статус изменился (и его не успел поменять reconciler)
+                if old_status != status and transition_deal_status(deal, status):
                     logger.info(f"Updated deal status: {deal.order_id} - {old_status} -> {status}")
-                    return deal, old_status != status, deal.user.telegram_id
+                    return deal, True, deal.user.telegram_id
                 return deal, False, deal.user.telegram_id
             except Deal.DoesNotExist:
                 logger.warning(f"Deal with order_id {order_id} not found (user={user_id})")
@@ -78,8 +79,27 @@ async def update_order_status(order_id: str, symbol: str, status: str, user_id:
                 return None, False, None
 
         deal, status_changed, deal_user_id = await get_and_update_deal()
-        effective_user_id = user_id or deal_user_id
+        await apply_order_status_change(
+            deal, order_id, symbol, status, user_id or deal_user_id, status_changed
+        )
 
+    except Exception as e:
+        logger.exception(f"Error in update_order_status: {e}")
+
+
+async def apply_order_status_change(
+    deal: Optional[Deal],
+    order_id: str,
+    symbol: str,
+    status: str,
+    effective_user_id: Optional[int],
+    status_changed: bool,
+):
+    """Побочные эффекты обновления статуса (автобай, уведомление) после записи в БД.
+
+    Вызывается из update_order_status и из reconciler после пакетной записи статусов.
+    """
+    try:
         # Если сделка найдена, передаем информацию в автобай (независимо от смены статуса)
         if deal and effective_user_id:
             await handle_autobuy_order_update(order_id, symbol, status, effective_user_id)
@@ -87,17 +107,12 @@ async def update_order_status(order_id: str, symbol: str, status: str, user_id:
             # Если сделки нет в БД, но пришло активное состояние по WS — инициируем мягкий ресинк памяти из БД
             try:
                 from bot.commands.autobuy import autobuy_states
+                from bot.utils.autobuy_state import ActiveOrder
                 missing_deal = await sync_to_async(lambda: Deal.objects.filter(order_id=order_id, user__telegram_id=effective_user_id).first())()
                 if missing_deal and effective_user_id in autobuy_states:
-                    active_orders = autobuy_states[effective_user_id].get('active_orders', [])
-                    if not any(o.get('order_id') == order_id for o in active_orders):
-                        active_orders.append({
-                            "order_id": order_id,
-                            "buy_price": float(missing_deal.buy_price),
-                            "notified": False,
-                            "user_order_number": missing_deal.user_order_number,
-                        })
-                        autobuy_states[effective_user_id]['active_orders'] = active_orders
+                    state = autobuy_states[effective_user_id]
+                    if not state.has_order(order_id):
+                        state.add_order(ActiveOrder.from_deal(missing_deal))
                         from bot.logger import logger as _l
                         _l.info(f"[WS-Resync] Added missing active order {order_id} to memory for user {effective_user_id}")
             except Exception:
@@ -122,7 +137,7 @@ async def update_order_status(order_id: str, symbol: str, status: str, user_id:
                     f"📊 Прибыль: `{profit:.4f}` {quote}"
                 )
 
-                await send_message_safely(user.telegram_id, text, parse_mode='Markdown')
+                await send_message_safely(user.telegram_id, text, parse_mode='Markdown', priority=Priority.TRADE)
 
             elif status == "CANCELED":
                 text = (
@@ -132,24 +147,22 @@ async def update_order_status(order_id: str, symbol: str, status: str, user_id:
                     f"📈 Продажа: `{deal.quantity:.4f}` {symbol[:3]} по {deal.sell_price:.6f} {symbol[3:]}\n"
                 )
 
-                await send_message_safely(user.telegram_id, text, parse_mode='Markdown')
-
+                await send_message_safely(user.telegram_id, text, parse_mode='Markdown', priority=Priority.TRADE)
     except Exception as e:
-        logger.exception(f"Error in update_order_status: {e}")
+        logger.exception(f"Error in apply_order_status_change: {e}")
 
 
-async def handle_price_update(symbol: str, price: str) -> None:
+async def handle_price_update(tick: DealTick) -> None:
     """
     Process price updates from market data stream.
     This is a placeholder function that can be expanded later.
 
     Args:
-        symbol: Trading pair symbol
-        price: Current price
+        tick: DealTick event (symbol, price)
     """
     try:
         # For now just log the price update
-        logger.debug(f"Price update: {symbol} - {price}")
+        logger.debug(f"Price update: {tick.symbol} - {tick.price}")
 
         # In the future you might want to:
         # 1. Update cached prices
@@ -159,24 +172,21 @@ async def handle_price_update(symbol: str, price: str) -> None:
         logger.exception(f"Error handling price update: {e}")
 
 
-async def handle_bookticker_update(symbol: str, bid_price: str, ask_price: str, bid_qty: str, ask_qty: str) -> None:
+async def handle_bookticker_update(tick: BookTick) -> None:
     """
     Process bookTicker updates from market data stream.
     
     Args:
-        symbol: Trading pair symbol
-        bid_price: Best bid price
-        ask_price: Best ask price  
-        bid_qty: Quantity at best bid
-        ask_qty: Quantity at best ask
+        tick: BookTick event (bid/ask prices as received and parsed floats, quantities)
     """
+    symbol = tick.symbol
     try:
         # Calculate spread
-        try:
-            bid = float(bid_price)
-            ask = float(ask_price)
+        bid = tick.bid
+        ask = tick.ask
+        if bid > 0 and ask > 0:
             spread = ask - bid
-            spread_percentage = (spread / bid) * 100 if bid > 0 else 0
+            spread_percentage = (spread / bid) * 100
             
             # Логируем только раз в 10 секунд для уменьшения спама
             current_time = time.time()
@@ -186,12 +196,12 @@ async def handle_bookticker_update(symbol: str, bid_price: str, ask_price: str,
             if symbol not in handle_bookticker_update.last_log_time or \
                current_time - handle_bookticker_update.last_log_time.get(symbol, 0) > 10:
                 
-                # logger.debug(f"BookTicker update: {symbol} - bid: {bid_price} ({bid_qty}), ask: {ask_price} ({ask_qty})")
+                # logger.debug(f"BookTicker update: {symbol} - bid: {tick.bid_price} ({tick.bid_qty}), ask: {tick.ask_price} ({tick.ask_qty})")
                 # logger.debug(f"BookTicker spread for {symbol}: {spread:.8f} ({spread_percentage:.4f}%)")
                 handle_bookticker_update.last_log_time[symbol] = current_time
                 
-        except (ValueError, TypeError):
-            logger.warning(f"Could not calculate spread for {symbol}: bid={bid_price}, ask={ask_price}")
+        else:
+            logger.warning(f"Could not calculate spread for {symbol}: bid={tick.bid_price}, ask={tick.ask_price}")
 
         # Future enhancements could include:
         # 1. Store bookTicker data in database/cache
@@ -3,17 +3,34 @@ import json
 import time
 import logging
 import aiohttp
-from typing import Dict, List, Optional, Callable, Any, Tuple
+from typing import Dict, List, Optional, Callable, Any, Tuple, Union
 import hmac
 import hashlib
 
 from users.models import User
 from bot.logger import logger
 from bot.utils.error_notifier import notify_component_error
-from bot.utils.ws.pb_decoder import decode_push_message
+from bot.utils.ws.events import BookTick, DealTick, PushEvent
+from bot.utils.http_session import http_pool
+from bot.utils.clock_sync import exchange_clock
+from bot.utils.order_fills import order_fills
+from bot.utils.execution_latency import execution_latency
+from bot.utils.message_bus import message_bus
+from bot.utils.telegram_sender import telegram_send_stats
 from bot.utils.ws.price_direction import PriceDirectionTracker
+from bot.utils.ws.dispatcher import CallbackDispatcher
+from bot.utils.ws.mailbox import BookTickerMailbox
+from bot.constants import (
+    WS_CALLBACK_TIMEOUT,
+    WS_CALLBACK_MAX_CONCURRENCY,
+    WS_MARKET_SHARDS,
+    WS_MARKET_MAX_STREAMS,
+    WS_MARKET_MAX_CONNECTIONS,
+)
 from bot.utils.ws.market_stream import handle_market_message_impl
 from bot.utils.ws.market_stream import listen_market_messages_impl
+from bot.utils.ws.market_pool import MarketShardPool
+from bot.utils.tick_recorder import tick_recorder
 from bot.utils.ws.user_stream import listen_user_messages_impl
 from bot.utils.ws.subscriptions import subscribe_market_data as _subscribe_market_data
 from bot.utils.ws.subscriptions import subscribe_bookticker_data as _subscribe_bookticker_data
@@ -30,21 +47,31 @@ class MexcWebSocketManager:
 
     def __init__(self):
         self.user_connections: Dict[int, Dict] = {}  # {user_id: {'ws': websocket, 'listen_key': key}}
-        self.market_connection = None
+        # Желаемые подписки (символы); по соединениям их раскладывает market_pool
         self.market_subscriptions: List[str] = []
         self.bookticker_subscriptions: List[str] = []  # Track bookTicker subscriptions separately
-        self.market_connection_task = None
+        self.market_pool = MarketShardPool(
+            self,
+            target_shards=WS_MARKET_SHARDS,
+            max_streams=WS_MARKET_MAX_STREAMS,
+            max_connections=WS_MARKET_MAX_CONNECTIONS,
+        )
         self.ping_tasks: Dict[int, asyncio.Task] = {}
         self.price_callbacks: Dict[str, List[Callable]] = {}  # {symbol: [callbacks]}
         self.bookticker_callbacks: Dict[str, List[Callable]] = {}  # {symbol: [callbacks for bid/ask]}
-        self.current_bookticker: Dict[str, Dict] = {}  # {symbol: {'bid_price': x, 'ask_price': y, 'bid_qty': z, 'ask_qty': w}}
+        # {symbol: {callback: mailbox}} — каждый подписчик получает только последний тик
+        self.bookticker_mailboxes: Dict[str, Dict[Callable, BookTickerMailbox]] = {}
+        self.current_bookticker: Dict[str, BookTick] = {}  # {symbol: последний BookTick}
         self.reconnect_delay = 1  # Initial reconnect delay in seconds
         self.is_shutting_down = False
         self.reconnecting_users = set()  # Set to track users currently in reconnection process
-        self.market_connection_lock = asyncio.Lock()  # Блокировка для market connection
-        self.market_listener_active = False  # Флаг активного listener
+        self.user_stream_errors: Dict[int, float] = {}  # {user_id: time.time() последней ошибки user stream}
         # Трекер направления цены (рост/падение)
         self.direction_tracker = PriceDirectionTracker(max_history_size=100)
+        # Диспетчер колбэков: listener только планирует вызовы и не ждет пользовательский код
+        self.callback_dispatcher = CallbackDispatcher(
+            "MarketWS", timeout=WS_CALLBACK_TIMEOUT, max_concurrency=WS_CALLBACK_MAX_CONCURRENCY
+        )
 
     async def get_listen_key(self, api_key: str, api_secret: str) -> Tuple[bool, str, Optional[str]]:
         """
@@ -57,7 +84,7 @@ class MexcWebSocketManager:
         url = f"{self.REST_API_URL}{endpoint}"
 
         # Generate timestamp and signature for authentication
-        timestamp = int(time.time() * 1000)
+        timestamp = exchange_clock.now_ms()
         query_string = f"timestamp={timestamp}"
         signature = hmac.new(
             api_secret.encode(),
@@ -74,31 +101,31 @@ class MexcWebSocketManager:
         request_url = f"{url}?{query_string}&signature={signature}"
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(request_url, headers=headers) as response:
-                    response_text = await response.text()
-                    logger.info(f"Listen key API response: {response.status} - {response_text}")
-
-                    if response.status != 200:
-                        # Обрабатываем ошибку связанную с IP ограничениями
-                        if "700006" in response_text and "ip white list" in response_text.lower():
-                            error_msg = "IP адрес сервера не добавлен в белый список API ключа. Пожалуйста, настройте IP ограничения в настройках ключа на MEXC."
-                            logger.warning(f"IP whitelist error for listen key: {response_text}")
-                            return False, error_msg, None
-
-                        error_text = f"Failed to get listen key: {response_text}"
-                        logger.error(error_text)
-                        return False, error_text, None
+            session = await http_pool.get_session()
+            async with session.post(request_url, headers=headers) as response:
+                response_text = await response.text()
+                logger.info(f"Listen key API response: {response.status} - {response_text}")
+
+                if response.status != 200:
+                    # Обрабатываем ошибку связанную с IP ограничениями
+                    if "700006" in response_text and "ip white list" in response_text.lower():
+                        error_msg = "IP адрес сервера не добавлен в белый список API ключа. Пожалуйста, настройте IP ограничения в настройках ключа на MEXC."
+                        logger.warning(f"IP whitelist error for listen key: {response_text}")
+                        return False, error_msg, None
+
+                    error_text = f"Failed to get listen key: {response_text}"
+                    logger.error(error_text)
+                    return False, error_text, None
 
-                    try:
-                        data = json.loads(response_text)
-                        listen_key = data.get("listenKey")
-                        if listen_key:
-                            return True, "", listen_key
-                        else:
-                            return False, "No listen key in response", None
-                    except json.JSONDecodeError:
-                        return False, f"Invalid JSON response: {response_text}", None
+                try:
+                    data = json.loads(response_text)
+                    listen_key = data.get("listenKey")
+                    if listen_key:
+                        return True, "", listen_key
+                    else:
+                        return False, "No listen key in response", None
+                except json.JSONDecodeError:
+                    return False, f"Invalid JSON response: {response_text}", None
         except Exception as e:
             error_msg = f"Error getting listen key: {str(e)}"
             logger.error(error_msg)
@@ -118,7 +145,7 @@ class MexcWebSocketManager:
                 url = f"{self.REST_API_URL}{endpoint}"
 
                 # Generate timestamp and signature for authentication
-                timestamp = int(time.time() * 1000)
+                timestamp = exchange_clock.now_ms()
                 query_string = f"timestamp={timestamp}&listenKey={listen_key}"
                 signature = hmac.new(
                     api_secret.encode(),
@@ -134,19 +161,20 @@ class MexcWebSocketManager:
                 # Add timestamp and signature to the URL
                 request_url = f"{url}?{query_string}&signature={signature}"
 
-                async with aiohttp.ClientSession() as session:
-                    async with session.put(request_url, headers=headers) as response:
-                        if response.status != 200:
-                            error_text = await response.text()
-                            logger.error(f"Failed to extend listen key for user {user_id}: {error_text}")
-                            # Переподключаем конкретного пользователя — его listenKey истек или недействителен
-                            try:
-                                await self.disconnect_user(user_id)
-                                await asyncio.sleep(1)
-                                await self.connect_user_data_stream(user_id)
-                            except Exception as e:
-                                logger.error(f"Error reconnecting user {user_id} after listen key failure: {e}")
-                            return
+                session = await http_pool.get_session()
+                async with session.put(request_url, headers=headers) as response:
+                    status = response.status
+                    error_text = await response.text() if status != 200 else ""
+                if status != 200:
+                    logger.error(f"Failed to extend listen key for user {user_id}: {error_text}")
+                    # Переподключаем конкретного пользователя — его listenKey истек или недействителен
+                    try:
+                        await self.disconnect_user(user_id)
+                        await asyncio.sleep(1)
+                        await self.connect_user_data_stream(user_id)
+                    except Exception as e:
+                        logger.error(f"Error reconnecting user {user_id} after listen key failure: {e}")
+                    return
 
                 # MEXC documentation says listen keys are valid for 60 minutes
                 # we'll refresh every 45 minutes to be safe
@@ -155,6 +183,11 @@ class MexcWebSocketManager:
                 logger.error(f"Error in keep_listen_key_alive for user {user_id}: {e}")
                 await asyncio.sleep(60)  # Wait before retry
 
+    @property
+    def market_connection(self) -> Optional[Dict[str, Any]]:
+        """Первое живое market-соединение пула (None, если живых нет)."""
+        return self.market_pool.connection
+
     async def send_ping(self, ws):
         """Send ping message to keep connection alive."""
         try:
@@ -201,7 +234,7 @@ class MexcWebSocketManager:
 
         logger.debug(f"Ping loop stopped for {connection_type}")
 
-    async def handle_market_message(self, message: dict):
+    async def handle_market_message(self, message: Union[PushEvent, dict]):
         """Handle incoming market data messages."""
         await handle_market_message_impl(self, message)
 
@@ -221,7 +254,10 @@ class MexcWebSocketManager:
             - is_rise: bool - текущее направление (True = рост, False = падение)
             - last_change_time: float - время последнего изменения направления
             - current_price: float - текущая средняя цена
-            - price_history: List[float] - история цен (последние N значений)
+            - price_history: PriceHistoryView - read-only история цен (последние N значений, без копирования)
+            - run_length: int - сколько тиков подряд держится текущее направление
+            - rolling_min / rolling_max: float - минимум/максимум mid цены в окне
+            - slope: float - наклон линейной регрессии mid цены по тикам окна
         """
         return self.direction_tracker.get(symbol)
 
@@ -251,6 +287,7 @@ class MexcWebSocketManager:
             success, error_message, listen_key = await self.get_listen_key(user.api_key, user.api_secret)
             if not success:
                 logger.error(f"Error getting listen key for user {user_id}: {error_message}")
+                self.mark_user_stream_error(user_id)
                 return False
 
             ws_url = f"{self.BASE_URL}?listenKey={listen_key}"
@@ -276,6 +313,7 @@ class MexcWebSocketManager:
             except Exception as e:
                 await session.close()
                 logger.error(f"Error connecting WebSocket for user {user_id}: {e}")
+                self.mark_user_stream_error(user_id)
                 try:
                     await notify_component_error("Вебсокет менеджере", f"Ошибка подключения пользователя {user_id}: {e}")
                 except Exception:
@@ -312,10 +350,12 @@ class MexcWebSocketManager:
             await self.subscribe_user_orders(user_id)
 
             logger.info(f"Connected user {user_id} to WebSocket")
+            self._on_user_stream_connected(user_id)
             return True
 
         except Exception as e:
             logger.error(f"Error connecting user {user_id} to WebSocket: {e}")
+            self.mark_user_stream_error(user_id)
             try:
                 await notify_component_error("Вебсокет менеджере", f"Ошибка подключения пользователя {user_id}: {e}")
             except Exception:
@@ -325,6 +365,19 @@ class MexcWebSocketManager:
             # Всегда убираем из списка переподключающихся
             self.reconnecting_users.discard(user_id)
 
+    def mark_user_stream_error(self, user_id: int):
+        """Запоминает ошибку user stream: reconciler какое-то время сверяет пользователя чаще."""
+        self.user_stream_errors[user_id] = time.time()
+
+    def _on_user_stream_connected(self, user_id: int):
+        # Пока стрима не было, события ордеров могли потеряться — сверяем пользователя сразу
+        try:
+            from bot.utils.reconciler import reconcile_scheduler
+
+            reconcile_scheduler.request_immediate(user_id)
+        except Exception as e:
+            logger.debug(f"Could not schedule reconcile for user {user_id}: {e}")
+
     async def _listen_user_messages(self, user_id: int):
         """Listen for messages from user data stream."""
         await listen_user_messages_impl(self, user_id)
@@ -333,98 +386,20 @@ class MexcWebSocketManager:
         """
         Connect to market data stream and subscribe to specified symbols.
         If no symbols are provided, will use existing subscriptions.
-        """
-        async with self.market_connection_lock:
-            # Проверяем, есть ли уже здоровое соединение
-            if self.market_connection:
-                ws = self.market_connection.get('ws')
-                if ws and not ws.closed:
-                    logger.debug("Market connection already exists and is healthy")
-                    # Если нужно добавить новые символы к существующему соединению
-                    if symbols:
-                        new_symbols = [s for s in symbols if s not in self.market_subscriptions]
-                        if new_symbols:
-                            await self.subscribe_market_data(new_symbols)
-                            await self.subscribe_bookticker_data(new_symbols)
-                    return True
-
-                # Если соединение нездоровое, отключаем его
-                await self.disconnect_market()
-                await asyncio.sleep(0.5)
 
-            try:
-                logger.info(f"[MarketWS] Starting connection to {self.BASE_URL}")
-
-                # Создаем новую сессию с правильными настройками
-                timeout = aiohttp.ClientTimeout(total=30)
-                session = aiohttp.ClientSession(
-                    timeout=timeout,
-                    connector=aiohttp.TCPConnector(
-                        limit=100,
-                        limit_per_host=30,
-                        keepalive_timeout=30,
-                        enable_cleanup_closed=True
-                    )
-                )
-                logger.debug("[MarketWS] Created session with optimized settings")
+        Соединения берутся из пула market_pool: символы раскладываются по
+        шардам, уже подписанные символы повторно не подписываются.
+        """
+        if not await self.market_pool.ensure_connected():
+            return False
 
-                ws = await session.ws_connect(
-                    self.BASE_URL,
-                    # НЕ используем автоматический heartbeat - MEXC сам отправляет PING
-                    heartbeat=None,
-                    compress=False  # Отключаем сжатие для стабильности
-                )
-                logger.info("[MarketWS] WebSocket connected successfully")
-
-                self.market_connection = {
-                    'ws': ws,
-                    'session': session,
-                    'created_at': time.time(),
-                    'last_ping': time.time(),
-                    'reconnect_count': 0
-                }
-                logger.debug("[MarketWS] Market connection object created")
-
-                # НЕ запускаем ping loop - MEXC сам отправляет PING, мы отвечаем PONG
-                # self.market_connection_task = asyncio.create_task(self.ping_loop(ws))
-
-                # Subscribe to symbols if provided
-                if symbols:
-                    logger.info(f"[MarketWS] Subscribing to provided symbols: {symbols}")
-                    # Небольшая задержка перед подпиской
-                    await asyncio.sleep(0.5)
-                    await self.subscribe_market_data(symbols)
-                    await self.subscribe_bookticker_data(symbols)
-                elif self.market_subscriptions:
-                    logger.info(f"[MarketWS] Reusing existing subscriptions: {self.market_subscriptions}")
-                    # Reuse existing subscriptions
-                    await asyncio.sleep(0.5)
-                    await self.subscribe_market_data(self.market_subscriptions)
-                    await self.subscribe_bookticker_data(self.bookticker_subscriptions)
-
-                # Start listening for messages только если не запущен
-                if not self.market_listener_active:
-                    logger.debug("[MarketWS] Starting market message listener")
-                    self.market_listener_active = True
-                    asyncio.create_task(self._listen_market_messages())
-
-                logger.info("Connected to market data WebSocket")
-                return True
+        if symbols:
+            logger.info(f"[MarketWS] Subscribing to provided symbols: {symbols}")
+            await self.subscribe_market_data(symbols)
+            await self.subscribe_bookticker_data(symbols)
 
-            except Exception as e:
-                logger.error(f"Error connecting to market data WebSocket: {e}")
-                try:
-                    await notify_component_error("вебсокетах (рынок)", f"Ошибка подключения: {e}")
-                except Exception:
-                    pass
-                # Cleanup on error
-                if 'session' in locals():
-                    try:
-                        await session.close()
-                        logger.debug("Cleaned up session after connection error")
-                    except Exception as cleanup_error:
-                        logger.debug(f"Error during session cleanup: {cleanup_error}")
-                return False
+        logger.info(f"Connected to market data WebSocket ({len(self.market_pool.alive_shards())} shards)")
+        return True
 
     async def subscribe_market_data(self, symbols: List[str]):
         """Subscribe to market data for specific symbols."""
@@ -434,9 +409,9 @@ class MexcWebSocketManager:
         """Subscribe to bookTicker data for specific symbols to get best bid/ask prices."""
         return await _subscribe_bookticker_data(self, symbols)
 
-    async def _listen_market_messages(self):
-        """Listen for messages from market data stream."""
-        await listen_market_messages_impl(self)
+    async def _listen_market_messages(self, shard):
+        """Listen for messages from one market data shard."""
+        await listen_market_messages_impl(self, shard)
 
     async def _ping_market_loop(self, ws):
         """Отправляет PING каждые 30 секунд для поддержания market соединения"""
@@ -446,8 +421,8 @@ class MexcWebSocketManager:
         """Отправляет PING каждые 30 секунд для поддержания user соединения"""
         await _ping_user_loop(ws, user_id)
 
-    async def register_price_callback(self, symbol: str, callback: Callable[[str, Any], None]):
-        """Register a callback function for price updates."""
+    async def register_price_callback(self, symbol: str, callback: Callable[[DealTick], Any]):
+        """Register a callback function for price updates (called with a DealTick)."""
         if symbol not in self.price_callbacks:
             self.price_callbacks[symbol] = []
 
@@ -457,34 +432,57 @@ class MexcWebSocketManager:
         if self.market_connection and symbol not in self.market_subscriptions:
             await self.subscribe_market_data([symbol])
 
-    async def register_bookticker_callback(self, symbol: str, callback: Callable[[str, str, str, str, str], Any]):
-        """Register a callback function for bookTicker updates (bid/ask prices)."""
-        if symbol not in self.bookticker_callbacks:
-            self.bookticker_callbacks[symbol] = []
-
-        self.bookticker_callbacks[symbol].append(callback)
+    async def register_bookticker_callback(
+        self,
+        symbol: str,
+        callback: Callable[[BookTick], Any],
+        track_range: bool = False,
+    ):
+        """Register a callback function for bookTicker updates (called with a BookTick).
+
+        Each callback gets its own latest-value mailbox: ticks arriving while
+        the callback is still running are coalesced into the newest one. With
+        `track_range=True` the callback also receives `ask_range=(min, max)`
+        covering every ask seen since its previous invocation.
+        """
+        mailboxes = self.bookticker_mailboxes.setdefault(symbol, {})
+        if callback in mailboxes:
+            logger.debug(f"bookTicker callback for {symbol} already registered")
+        else:
+            mailbox = BookTickerMailbox(symbol, callback, self.callback_dispatcher, track_range=track_range)
+            mailbox.start()
+            mailboxes[callback] = mailbox
+            self.bookticker_callbacks.setdefault(symbol, []).append(callback)
 
         # Ensure we're subscribed to this symbol
         if self.market_connection and symbol not in self.bookticker_subscriptions:
             await self.subscribe_bookticker_data([symbol])
 
+    def has_market_consumers(self, kind: str, symbol: str) -> bool:
+        """Нужны ли кому-то кадры канала kind ('bookticker' / 'deals') по символу."""
+        if tick_recorder.enabled and self.market_pool.is_subscribed(kind, symbol):
+            return True
+        if kind == "bookticker":
+            # current_bookticker и трекер направления ведутся по всем подписанным символам
+            return symbol in self.bookticker_mailboxes or self.market_pool.is_subscribed(kind, symbol)
+        if kind == "deals":
+            return bool(self.price_callbacks.get(symbol))
+        return True
+
     def get_current_bookticker(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Get current best bid/ask prices for a symbol."""
-        bookticker_data = self.current_bookticker.get(symbol)
-        if bookticker_data:
+        tick = self.current_bookticker.get(symbol)
+        if tick:
             # Добавляем информацию о направлении цены
             direction_info = self.get_price_direction(symbol)
-            return {**bookticker_data, **direction_info}
+            return {**tick.as_dict(), **direction_info}
         return None
 
     def get_current_bid_ask(self, symbol: str) -> Optional[Tuple[str, str]]:
         """Get current best bid and ask prices for a symbol as a tuple."""
-        bookticker = self.current_bookticker.get(symbol)
-        if bookticker:
-            bid_price = bookticker.get('bid_price')
-            ask_price = bookticker.get('ask_price')
-            if bid_price and ask_price:
-                return bid_price, ask_price
+        tick = self.current_bookticker.get(symbol)
+        if tick and tick.bid_price and tick.ask_price:
+            return tick.bid_price, tick.ask_price
         return None
 
     async def unregister_bookticker_callback(self, symbol: str, callback: Callable):
@@ -493,6 +491,19 @@ class MexcWebSocketManager:
             self.bookticker_callbacks[symbol].remove(callback)
             logger.debug(f"Unregistered bookTicker callback for {symbol}")
 
+        mailbox = self.bookticker_mailboxes.get(symbol, {}).pop(callback, None)
+        if mailbox is not None:
+            await mailbox.close()
+        if symbol in self.bookticker_mailboxes and not self.bookticker_mailboxes[symbol]:
+            del self.bookticker_mailboxes[symbol]
+
+    async def close_bookticker_mailboxes(self):
+        """Stop all bookTicker mailbox consumers."""
+        for mailboxes in list(self.bookticker_mailboxes.values()):
+            for mailbox in list(mailboxes.values()):
+                await mailbox.close()
+        self.bookticker_mailboxes.clear()
+
     async def unregister_price_callback(self, symbol: str, callback: Callable):
         """Unregister a specific price callback."""
         if symbol in self.price_callbacks and callback in self.price_callbacks[symbol]:
@@ -550,7 +561,7 @@ class MexcWebSocketManager:
                             url = f"{self.REST_API_URL}{endpoint}"
 
                             # Generate timestamp and signature for authentication
-                            timestamp = int(time.time() * 1000)
+                            timestamp = exchange_clock.now_ms()
                             query_string = f"timestamp={timestamp}&listenKey={listen_key}"
                             signature = hmac.new(
                                 user.api_secret.encode(),
@@ -566,8 +577,9 @@ class MexcWebSocketManager:
                             # Add timestamp and signature to the URL
                             request_url = f"{url}?{query_string}&signature={signature}"
 
-                            async with aiohttp.ClientSession() as session:
-                                await session.delete(request_url, headers=headers)
+                            session = await http_pool.get_session()
+                            async with session.delete(request_url, headers=headers):
+                                pass
                     except Exception as e:
                         logger.error(f"Error deleting listen key for user {user_id}: {e}")
 
@@ -581,43 +593,11 @@ class MexcWebSocketManager:
                     del self.user_connections[user_id]
 
     async def disconnect_market(self):
-        """Disconnect from market data WebSocket."""
-        if self.market_connection:
-            try:
-                # Сбрасываем флаги активности
-                self.market_listener_active = False
-                if hasattr(self, '_market_listener_started'):
-                    delattr(self, '_market_listener_started')
-
-                # Market ping task больше не используется
-                if self.market_connection_task:
-                    logger.debug("Clearing market connection task reference")
-                    self.market_connection_task = None
-
-                # Close WebSocket
-                ws = self.market_connection.get('ws')
-                if ws and not ws.closed:
-                    try:
-                        await ws.close()
-                    except Exception as e:
-                        logger.debug(f"Error closing market WebSocket: {e}")
-
-                # Close session
-                session = self.market_connection.get('session')
-                if session and not session.closed:
-                    try:
-                        await session.close()
-                    except Exception as e:
-                        logger.debug(f"Error closing market session: {e}")
-
-                self.market_connection = None
-                logger.info("Disconnected from market data WebSocket")
-
-            except Exception as e:
-                logger.error(f"Error disconnecting market WebSocket: {e}")
-                # Ensure cleanup even on error
-                self.market_connection = None
-                self.market_listener_active = False
+        """Disconnect all market data WebSocket shards."""
+        try:
+            await self.market_pool.close_all()
+        except Exception as e:
+            logger.error(f"Error disconnecting market WebSocket: {e}")
 
     async def disconnect_all(self):
         """Disconnect all WebSocket connections."""
@@ -630,6 +610,10 @@ class MexcWebSocketManager:
         # Disconnect market connection
         await self.disconnect_market()
 
+        # Cancel callbacks still in flight
+        await self.close_bookticker_mailboxes()
+        await self.callback_dispatcher.close()
+
         logger.info("All WebSocket connections closed")
 
     async def connect_valid_users(self):
@@ -664,45 +648,20 @@ class MexcWebSocketManager:
             try:
                 current_time = time.time()
 
-                # Проверяем market соединение
-                if self.market_connection:
-                    market_created = self.market_connection.get('created_at', 0)
-
-                    # Проверяем, не закрыто ли соединение
-                    ws = self.market_connection.get('ws')
-                    if ws and ws.closed:
-                        logger.warning("Market WebSocket is closed, reconnecting...")
-                        await self.disconnect_market()
-                        await asyncio.sleep(2)
-
-                        if market_failure_count < max_failures:
-                            success = await self.connect_market_data()
-                            if success:
-                                market_failure_count = 0
-                            else:
-                                market_failure_count += 1
-                        else:
-                            logger.error("Market WebSocket failed too many times, waiting longer...")
-                            await asyncio.sleep(60)
-                            market_failure_count = 0
-
-                    # Проверяем возраст соединения (30 минут)
-                    elif current_time - market_created > 1800:
-                        logger.info("Market connection is stale, reconnecting...")
-                        await self.disconnect_market()
-                        await asyncio.sleep(2)
-                        await self.connect_market_data()
+                # Проверяем market шарды: закрытые и старше 30 минут заменяются,
+                # их символы переподписываются в других шардах
+                if self.market_pool.shards:
+                    await self.market_pool.recycle_stale(1800)
 
-                elif self.market_subscriptions:
-                    # Если есть подписки, но нет соединения - пробуем переподключиться
-                    logger.info("No market connection but have subscriptions, reconnecting...")
+                if self.market_subscriptions or self.bookticker_subscriptions:
                     if market_failure_count < max_failures:
-                        success = await self.connect_market_data()
+                        success = await self.market_pool.ensure_connected()
                         if success:
                             market_failure_count = 0
                         else:
                             market_failure_count += 1
                     else:
+                        logger.error("Market WebSocket failed too many times, waiting longer...")
                         await asyncio.sleep(60)
                         market_failure_count = 0
 
@@ -764,16 +723,48 @@ class MexcWebSocketManager:
                 else:
                     session_count += 1
 
-        if self.market_connection and 'session' in self.market_connection:
-            if self.market_connection['session'].closed:
-                closed_sessions += 1
-            else:
-                session_count += 1
+        for shard in self.market_pool.shards.values():
+            if shard.session is not None:
+                if shard.session.closed:
+                    closed_sessions += 1
+                else:
+                    session_count += 1
 
         stats['active_sessions'] = session_count
         stats['closed_sessions'] = closed_sessions
         stats['total_market_subscriptions'] = len(self.market_subscriptions)
         stats['total_bookticker_subscriptions'] = len(self.bookticker_subscriptions)
+        stats['market_shards'] = self.market_pool.get_stats()
+        stats['tick_recorder'] = tick_recorder.get_stats()
+        stats['callback_dispatch'] = self.callback_dispatcher.get_stats()
+        stats['http_pool'] = http_pool.get_stats()
+        stats['exchange_clock'] = exchange_clock.get_stats()
+        stats['order_fills'] = order_fills.get_stats()
+        stats['execution_latency'] = execution_latency.get_stats()
+        stats['telegram_bus'] = message_bus.get_stats()
+        stats['telegram_bus']['api'] = telegram_send_stats.get_stats()
+        try:
+            from bot.utils.reconciler import reconciler_stats, reconcile_scheduler
+
+            stats['reconciler'] = reconciler_stats.get_stats()
+            stats['reconciler']['scheduler'] = reconcile_scheduler.get_stats()
+        except Exception:
+            pass
+        try:
+            from logs.buffer import botlog_buffer
+
+            stats['botlog_buffer'] = botlog_buffer.get_stats()
+        except Exception:
+            pass
+        stats['bookticker_mailboxes'] = {
+            symbol: {
+                'subscribers': len(mailboxes),
+                'offered': sum(m.offered for m in mailboxes.values()),
+                'delivered': sum(m.delivered for m in mailboxes.values()),
+                'coalesced': sum(m.coalesced for m in mailboxes.values()),
+            }
+            for symbol, mailboxes in self.bookticker_mailboxes.items()
+        }
 
         return stats
 
@@ -799,14 +790,11 @@ class MexcWebSocketManager:
             except Exception as e:
                 logger.error(f"Error cleaning up user {user_id} session: {e}")
 
-        # Cleanup market session if closed
-        if self.market_connection:
-            session = self.market_connection.get('session')
-            ws = self.market_connection.get('ws')
-
-            if (session and session.closed) or (ws and ws.closed):
-                logger.info(f"Cleaning up market session (session_closed={session.closed if session else 'None'}, ws_closed={ws.closed if ws else 'None'})")
-                await self.disconnect_market()
+        # Cleanup closed market shards (их символы переходят в другие шарды)
+        for shard in list(self.market_pool.shards.values()):
+            if (shard.session and shard.session.closed) or (shard.ws and shard.ws.closed):
+                logger.info(f"Cleaning up market shard #{shard.shard_id}")
+                await self.market_pool.replace_shard(shard, "Session is closed")
                 cleanup_count += 1
 
         logger.info(f"Force cleanup completed, cleaned {cleanup_count} sessions")
@@ -828,11 +816,11 @@ class MexcWebSocketManager:
                 logger.error(f"Error force disconnecting user {user_id}: {e}")
 
         # Принудительно отключаем market
-        if self.market_connection:
+        if self.market_pool.shards:
             try:
+                cleanup_count += len(self.market_pool.shards)
                 await self.disconnect_market()
-                cleanup_count += 1
-                logger.info("Force disconnected market connection")
+                logger.info("Force disconnected market connections")
             except Exception as e:
                 logger.error(f"Error force disconnecting market: {e}")
 
@@ -840,8 +828,6 @@ class MexcWebSocketManager:
         self.user_connections.clear()
         self.ping_tasks.clear()
         self.reconnecting_users.clear()
-        self.market_connection = None
-        self.market_listener_active = False
 
         logger.warning(f"Emergency cleanup completed, cleaned {cleanup_count} connections")
         return cleanup_count
@@ -870,17 +856,14 @@ class MexcWebSocketManager:
             if session:
                 health_stats['total_sessions'] += 1
 
-        # Check market connection
-        if self.market_connection:
-            ws = self.market_connection.get('ws')
-            session = self.market_connection.get('session')
-
-            if ws and not ws.closed and session and not session.closed:
+        # Check market shards
+        for shard in self.market_pool.shards.values():
+            if shard.alive and shard.session and not shard.session.closed:
                 health_stats['market_connection_healthy'] = True
             else:
-                health_stats['issues'].append("Market connection is unhealthy")
+                health_stats['issues'].append(f"Market shard #{shard.shard_id} is unhealthy")
 
-            if session:
+            if shard.session:
                 health_stats['total_sessions'] += 1
 
         return health_stats
@@ -145,6 +145,7 @@ class WebSocketMonitor:
             # Очистка внутренних структур данных
             self.ws_manager.price_callbacks.clear()
             self.ws_manager.bookticker_callbacks.clear()
+            await self.ws_manager.close_bookticker_mailboxes()
             self.ws_manager.current_bookticker.clear()
             self.ws_manager.reconnecting_users.clear()
             
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from bot.logger import logger
+
+
+class _SymbolDispatchStats:
+    __slots__ = (
+        "ticks",
+        "coalesced",
+        "completed",
+        "callbacks",
+        "errors",
+        "timeouts",
+        "last_ms",
+        "avg_ms",
+        "max_ms",
+    )
+
+    def __init__(self) -> None:
+        self.ticks = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.callbacks = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms: float) -> None:
+        self.completed += 1
+        self.last_ms = latency_ms
+        # EMA keeps the number stable without storing a window
+        self.avg_ms = latency_ms if self.completed == 1 else self.avg_ms * 0.9 + latency_ms * 0.1
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ticks": self.ticks,
+            "coalesced": self.coalesced,
+            "completed": self.completed,
+            "callbacks": self.callbacks,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "last_ms": round(self.last_ms, 3),
+            "avg_ms": round(self.avg_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class CallbackDispatcher:
+    """Fan out market ticks to subscriber callbacks without blocking the listener.
+
+    `dispatch()` is synchronous and returns immediately, so the WebSocket
+    receive loop never awaits user code. Each (channel, symbol, callback) has
+    a lane: at most one delivery running and one newest tick waiting. A tick
+    arriving while another one waits replaces it (counted as coalesced), so
+    a slow subscriber gets fresh data instead of an unbounded backlog of
+    tasks — the same latest-value rule as the bookTicker mailboxes. Every
+    callback runs under a shared semaphore (concurrency cap), with its own
+    timeout, and its exceptions are logged and counted instead of propagating.
+    Per-symbol latency is measured from the moment the tick is dispatched to
+    the moment the callback finishes with it.
+    """
+
+    def __init__(self, name: str, timeout: float = 5.0, max_concurrency: int = 100) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # (channel, symbol, callback) -> тик, ждущий своей очереди (None — ждущего нет)
+        self._lanes: Dict[Tuple[str, str, Callable], Optional[Tuple[Tuple[Any, ...], float]]] = {}
+        self._stats: Dict[str, Dict[str, _SymbolDispatchStats]] = {}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _symbol_stats(self, channel: str, symbol: str) -> _SymbolDispatchStats:
+        channel_stats = self._stats.get(channel)
+        if channel_stats is None:
+            channel_stats = self._stats[channel] = {}
+        stats = channel_stats.get(symbol)
+        if stats is None:
+            stats = channel_stats[symbol] = _SymbolDispatchStats()
+        return stats
+
+    def dispatch(self, channel: str, symbol: str, callbacks: Iterable[Callable], *args: Any) -> None:
+        """Schedule all callbacks for one tick and return immediately."""
+        callbacks = tuple(callbacks)
+        if not callbacks:
+            return
+        stats = self._symbol_stats(channel, symbol)
+        stats.ticks += 1
+        started = time.perf_counter()
+        lanes = self._lanes
+        for callback in callbacks:
+            key = (channel, symbol, callback)
+            if key in lanes:
+                # Доставка уже идет: оставляем только самый свежий тик
+                if lanes[key] is not None:
+                    stats.coalesced += 1
+                lanes[key] = (args, started)
+                continue
+            lanes[key] = None
+            task = asyncio.create_task(self._run_lane(key, symbol, callback, args, started, stats))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def invoke(
+        self,
+        channel: str,
+        symbol: str,
+        callback: Callable,
+        args: Tuple[Any, ...],
+        kwargs: Optional[Dict[str, Any]] = None,
+        started: Optional[float] = None,
+    ) -> None:
+        """Run a single callback with the same isolation rules, awaiting it.
+
+        Used by consumers that own their own task (e.g. mailboxes); `started`
+        lets the caller account for time the tick spent waiting before delivery.
+        """
+        stats = self._symbol_stats(channel, symbol)
+        stats.ticks += 1
+        if started is None:
+            started = time.perf_counter()
+        await self._run_callback(symbol, callback, args, kwargs, stats)
+        stats.record((time.perf_counter() - started) * 1000)
+
+    async def _run_lane(self, key, symbol, callback, args, started: float, stats: _SymbolDispatchStats) -> None:
+        try:
+            while True:
+                await self._run_callback(symbol, callback, args, None, stats)
+                stats.record((time.perf_counter() - started) * 1000)
+                waiting = self._lanes.get(key)
+                if waiting is None:
+                    break
+                self._lanes[key] = None
+                args, started = waiting
+        finally:
+            self._lanes.pop(key, None)
+
+    async def _run_callback(self, symbol: str, callback: Callable, args, kwargs, stats: _SymbolDispatchStats) -> None:
+        async with self._get_semaphore():
+            stats.callbacks += 1
+            try:
+                await asyncio.wait_for(callback(*args, **(kwargs or {})), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                logger.warning(
+                    f"[{self.name}] Callback {getattr(callback, '__name__', callback)} for {symbol} "
+                    f"timed out after {self.timeout}s"
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.errors += 1
+                logger.error(
+                    f"[{self.name}] Error in callback {getattr(callback, '__name__', callback)} for {symbol}: {e}",
+                    exc_info=True,
+                )
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "timeout": self.timeout,
+            "max_concurrency": self.max_concurrency,
+            "channels": {
+                channel: {symbol: stats.as_dict() for symbol, stats in symbols.items()}
+                for channel, symbols in self._stats.items()
+            },
+        }
+
+    async def close(self) -> None:
+        """Cancel in-flight ticks (used on shutdown)."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._lanes.clear()
@@ -0,0 +1,260 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+# Коды статусов ордера в private.orders
+ORDER_STATUSES = {
+    1: "NEW",
+    2: "FILLED",
+    3: "PARTIALLY_FILLED",
+    4: "CANCELED",
+    5: "REJECTED",
+}
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PushEvent:
+    """
+    Событие push-канала MEXC после декодирования.
+
+    Один объект на кадр отдается как есть всем потребителям (кэш, колбэки,
+    почтовые ящики) — поэтому события только для чтения: менять поля нельзя.
+    Экземпляр базового класса — кадр канала, для которого нет своего события.
+    """
+
+    __slots__ = ("channel", "symbol", "send_time")
+
+    def __init__(self, channel: str, symbol: str, send_time: int) -> None:
+        self.channel = channel
+        self.symbol = symbol
+        self.send_time = send_time
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields())
+        return f"{type(self).__name__}({fields})"
+
+    @classmethod
+    def _fields(cls):
+        for klass in reversed(cls.__mro__):
+            yield from getattr(klass, "__slots__", ())
+
+
+class BookTick(PushEvent):
+    """Лучшие бид/аск. Строки — как прислала биржа, bid/ask — те же цены, разобранные один раз."""
+
+    __slots__ = ("bid_price", "ask_price", "bid_qty", "ask_qty", "bid", "ask")
+
+    def __init__(
+        self,
+        channel: str,
+        symbol: str,
+        send_time: int,
+        bid_price: str,
+        ask_price: str,
+        bid_qty: str,
+        ask_qty: str,
+    ) -> None:
+        self.channel = channel
+        self.symbol = symbol
+        self.send_time = send_time
+        self.bid_price = bid_price
+        self.ask_price = ask_price
+        self.bid_qty = bid_qty
+        self.ask_qty = ask_qty
+        self.bid = _to_float(bid_price)
+        self.ask = _to_float(ask_price)
+
+    @property
+    def mid(self) -> float:
+        return (self.bid + self.ask) / 2
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Прежний формат current_bookticker[symbol]."""
+        return {
+            "bid_price": self.bid_price,
+            "ask_price": self.ask_price,
+            "bid_qty": self.bid_qty,
+            "ask_qty": self.ask_qty,
+            "timestamp": self.send_time,
+        }
+
+
+class DealTick(PushEvent):
+    """
+    Сделки кадра (aggre.deals): поля первой сделки, last — ее цена числом,
+    deals — сколько сделок в кадре. items — все сделки кадра кортежами
+    (price, quantity, trade_type, deal_time), строки — как прислала биржа.
+    """
+
+    __slots__ = ("price", "quantity", "trade_type", "deal_time", "deals", "last", "items")
+
+    def __init__(
+        self,
+        channel: str,
+        symbol: str,
+        send_time: int,
+        price: str,
+        quantity: str,
+        trade_type: int,
+        deal_time: int,
+        deals: int,
+        items: Tuple[Tuple[str, str, int, int], ...] = (),
+    ) -> None:
+        self.channel = channel
+        self.symbol = symbol
+        self.send_time = send_time
+        self.price = price
+        self.quantity = quantity
+        self.trade_type = trade_type
+        self.deal_time = deal_time
+        self.deals = deals
+        self.last = _to_float(price)
+        self.items = items
+
+
+class OrderUpdate(PushEvent):
+    """Обновление ордера пользователя (private.orders)."""
+
+    __slots__ = (
+        "order_id",
+        "client_id",
+        "price",
+        "quantity",
+        "avg_price",
+        "order_type",
+        "trade_type",
+        "is_maker",
+        "remain_quantity",
+        "cumulative_quantity",
+        "cumulative_amount",
+        "status_code",
+        "create_time",
+    )
+
+    def __init__(
+        self,
+        channel: str,
+        symbol: str,
+        send_time: int,
+        order_id: str,
+        client_id: str,
+        price: str,
+        quantity: str,
+        avg_price: str,
+        order_type: int,
+        trade_type: int,
+        is_maker: bool,
+        remain_quantity: str,
+        cumulative_quantity: str,
+        cumulative_amount: str,
+        status_code: int,
+        create_time: int,
+    ) -> None:
+        self.channel = channel
+        self.symbol = symbol
+        self.send_time = send_time
+        self.order_id = order_id
+        self.client_id = client_id
+        self.price = price
+        self.quantity = quantity
+        self.avg_price = avg_price
+        self.order_type = order_type
+        self.trade_type = trade_type
+        self.is_maker = is_maker
+        self.remain_quantity = remain_quantity
+        self.cumulative_quantity = cumulative_quantity
+        self.cumulative_amount = cumulative_amount
+        self.status_code = status_code
+        self.create_time = create_time
+
+    @property
+    def status(self) -> str:
+        return ORDER_STATUSES.get(self.status_code, "UNKNOWN")
+
+
+class AccountUpdate(PushEvent):
+    """Изменение баланса пользователя (private.account)."""
+
+    __slots__ = ("asset", "free", "locked", "free_change", "locked_change", "change_type", "change_time")
+
+    def __init__(
+        self,
+        channel: str,
+        symbol: str,
+        send_time: int,
+        asset: str,
+        free: str,
+        locked: str,
+        free_change: str,
+        locked_change: str,
+        change_type: str,
+        change_time: int,
+    ) -> None:
+        self.channel = channel
+        self.symbol = symbol
+        self.send_time = send_time
+        self.asset = asset
+        self.free = free
+        self.locked = locked
+        self.free_change = free_change
+        self.locked_change = locked_change
+        self.change_type = change_type
+        self.change_time = change_time
+
+
+def event_from_dict(data: Dict[str, Any]) -> Optional[PushEvent]:
+    """
+    Событие из словаря прежнего формата (decode_push_message или JSON-кадр
+    с короткими ключами c/s/t/d). None — если в словаре нет канала.
+    """
+    channel = data.get("channel") or data.get("c")
+    if not channel:
+        return None
+    symbol = data.get("symbol") or data.get("s") or ""
+    send_time = data.get("sendtime") or data.get("t") or 0
+
+    book = data.get("publicbookticker")
+    if book is not None:
+        return BookTick(
+            channel, symbol, send_time,
+            book.get("bidprice", ""), book.get("askprice", ""),
+            book.get("bidquantity", ""), book.get("askquantity", ""),
+        )
+
+    deals = data.get("publicdeals")
+    if deals is not None:
+        deals_list = deals.get("dealsList") or []
+        first = deals_list[0] if deals_list else {}
+        return DealTick(
+            channel, symbol, send_time,
+            first.get("price", ""), first.get("quantity", ""),
+            first.get("tradeType", 0), first.get("time", 0), len(deals_list),
+            tuple(
+                (deal.get("price", ""), deal.get("quantity", ""), deal.get("tradeType", 0), deal.get("time", 0))
+                for deal in deals_list
+            ),
+        )
+
+    d = data.get("d")
+    if isinstance(d, dict):
+        if "orders" in channel:
+            return OrderUpdate(
+                channel, symbol, send_time,
+                d.get("i", ""), d.get("c", ""), d.get("p", ""), d.get("q", ""), d.get("ap", ""),
+                d.get("ot", 0), d.get("tt", 0), d.get("m", False), d.get("rqa", ""),
+                d.get("cv", ""), d.get("ca", ""), d.get("s", 0), d.get("ct", 0),
+            )
+        if "account" in channel:
+            return AccountUpdate(
+                channel, symbol, send_time,
+                d.get("a", ""), d.get("f", ""), d.get("l", ""),
+                d.get("balanceAmountChange", ""), d.get("frozenAmountChange", ""),
+                d.get("type", ""), d.get("t", 0),
+            )
+
+    return PushEvent(channel, symbol, send_time)
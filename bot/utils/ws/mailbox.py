@@ -0,0 +1,118 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from bot.logger import logger
+from bot.utils.ws.dispatcher import CallbackDispatcher
+from bot.utils.ws.events import BookTick
+
+
+class BookTickerMailbox:
+    """Conflating latest-value mailbox for a single bookTicker subscriber.
+
+    The listener calls `offer()` for every BookTick; it never blocks and only the
+    newest tick is kept. A dedicated consumer task delivers the latest tick
+    to the callback once the previous delivery finished, so a slow subscriber
+    always works on fresh data instead of draining a backlog.
+
+    With `track_range=True` the mailbox also remembers the lowest and highest
+    ask seen since the last delivery and passes it as `ask_range=(min, max)`,
+    so level-crossing logic does not miss a crossing hidden inside a burst,
+    plus `received_at` (perf_counter of the delivered tick) for end-to-end
+    latency measurement.
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        callback: Callable,
+        dispatcher: CallbackDispatcher,
+        track_range: bool = False,
+    ) -> None:
+        self.symbol = symbol
+        self.callback = callback
+        self.dispatcher = dispatcher
+        self.track_range = track_range
+
+        self._latest: Optional[BookTick] = None
+        self._pending_since = 0.0
+        self._latest_at = 0.0
+        self._min_ask: Optional[float] = None
+        self._max_ask: Optional[float] = None
+        self._event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.offered = 0
+        self.delivered = 0
+        self.coalesced = 0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._event = asyncio.Event()
+            self._task = asyncio.create_task(self._consume())
+
+    def offer(self, tick: BookTick) -> None:
+        """Replace the pending tick with a newer one (never blocks)."""
+        self.offered += 1
+        if self._latest is None:
+            self._pending_since = time.perf_counter()
+        else:
+            self.coalesced += 1
+        self._latest = tick
+
+        if self.track_range:
+            self._latest_at = time.perf_counter()
+            ask = tick.ask
+            if ask > 0:
+                if self._min_ask is None or ask < self._min_ask:
+                    self._min_ask = ask
+                if self._max_ask is None or ask > self._max_ask:
+                    self._max_ask = ask
+
+        if self._event is not None:
+            self._event.set()
+
+    async def _consume(self) -> None:
+        try:
+            while True:
+                await self._event.wait()
+                self._event.clear()
+
+                latest = self._latest
+                if latest is None:
+                    continue
+                self._latest = None
+                started = self._pending_since
+
+                kwargs = None
+                if self.track_range:
+                    kwargs = {"ask_range": (self._min_ask, self._max_ask), "received_at": self._latest_at}
+                    self._min_ask = None
+                    self._max_ask = None
+
+                self.delivered += 1
+                await self.dispatcher.invoke(
+                    "bookTicker", self.symbol, self.callback, (latest,), kwargs, started
+                )
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"[MarketWS] Mailbox consumer for {self.symbol} stopped: {e}", exc_info=True)
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "callback": getattr(self.callback, "__name__", repr(self.callback)),
+            "offered": self.offered,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "pending": self._latest is not None,
+        }
@@ -0,0 +1,350 @@
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+from bot.logger import logger
+from bot.utils.clock_sync import exchange_clock
+from bot.utils.error_notifier import notify_component_error
+
+KINDS = ("deals", "bookticker")
+
+CHANNELS = {
+    "deals": "spot@public.aggre.deals.v3.api.pb@100ms@{}",
+    "bookticker": "spot@public.aggre.bookTicker.v3.api.pb@100ms@{}",
+}
+
+
+class MarketShard:
+    """Одно market-соединение пула: свой WebSocket, свои подписки и свой listener."""
+
+    RATE_WINDOW = 10.0  # Окно подсчета сообщений в секунду, сек
+
+    def __init__(self, shard_id: int) -> None:
+        self.shard_id = shard_id
+        self.ws = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.created_at = 0.0
+        self.listener: Optional[asyncio.Task] = None
+        self.closing = False
+        self.draining = False  # Символы уже переносятся в другие шарды, новые не принимаем
+        self.subscriptions: Dict[str, Set[str]] = {kind: set() for kind in KINDS}
+
+        self.messages = 0
+        self.last_message_at = 0.0
+        self.rate = 0.0
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.ws is not None and not self.ws.closed and not self.closing
+
+    @property
+    def accepting(self) -> bool:
+        return self.alive and not self.draining
+
+    @property
+    def symbols(self) -> Set[str]:
+        return self.subscriptions["deals"] | self.subscriptions["bookticker"]
+
+    @property
+    def channels(self) -> int:
+        return len(self.subscriptions["deals"]) + len(self.subscriptions["bookticker"])
+
+    @property
+    def connection(self) -> Dict[str, Any]:
+        """Описание соединения в прежнем формате market_connection."""
+        return {
+            "ws": self.ws,
+            "session": self.session,
+            "created_at": self.created_at,
+            "shard_id": self.shard_id,
+        }
+
+    def record_message(self, send_time_ms: Optional[int]) -> None:
+        """Учет сообщения с данными: частота и задержка от отправки биржей до получения."""
+        now = time.monotonic()
+        self.messages += 1
+        self.last_message_at = time.time()
+        self._window_count += 1
+        elapsed = now - self._window_start
+        if elapsed >= self.RATE_WINDOW:
+            self.rate = self._window_count / elapsed
+            self._window_start, self._window_count = now, 0
+
+        if send_time_ms:
+            lag = max(0.0, exchange_clock.now_ms() - send_time_ms)
+            self.lag_ms = lag if self.messages == 1 else self.lag_ms * 0.9 + lag * 0.1
+            if lag > self.max_lag_ms:
+                self.max_lag_ms = lag
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "alive": self.alive,
+            "age_s": int(time.time() - self.created_at) if self.created_at else 0,
+            "symbols": sorted(self.symbols),
+            "channels": self.channels,
+            "messages": self.messages,
+            "msg_per_sec": round(self.rate, 1),
+            "lag_ms": round(self.lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "last_message_age_s": round(time.time() - self.last_message_at, 1) if self.last_message_at else None,
+        }
+
+
+class MarketShardPool:
+    """
+    Пул market-соединений MEXC.
+
+    Каналы символа (deals и bookTicker) живут в одном шарде. Новый символ
+    уходит в наименее загруженный живой шард (по числу каналов, затем по
+    частоте сообщений); пока шардов меньше target_shards или все заполнены
+    до max_streams каналов, открывается новое соединение (не больше
+    max_connections). Символы умершего шарда переподписываются в других.
+    """
+
+    def __init__(
+        self,
+        manager,
+        target_shards: int = 2,
+        max_streams: int = 30,
+        max_connections: int = 10,
+    ) -> None:
+        self.manager = manager
+        self.target_shards = max(1, target_shards)
+        self.max_streams = max_streams
+        self.max_connections = max(self.target_shards, max_connections)
+
+        self.shards: Dict[int, MarketShard] = {}
+        self.symbol_shard: Dict[str, MarketShard] = {}
+        self._next_id = 0
+        self._lock = asyncio.Lock()
+
+        self.connects = 0
+        self.connect_failures = 0
+        self.rebalanced_symbols = 0
+        # Кадры, отброшенные listener'ом до декодирования: {вид канала: {причина: count}}
+        self.dropped_frames: Dict[str, Dict[str, int]] = {kind: {} for kind in KINDS}
+
+    # ---------- состояние ----------
+
+    def alive_shards(self) -> List[MarketShard]:
+        return [shard for shard in self.shards.values() if shard.alive]
+
+    @property
+    def connection(self) -> Optional[Dict[str, Any]]:
+        alive = self.alive_shards()
+        return alive[0].connection if alive else None
+
+    def is_subscribed(self, kind: str, symbol: str) -> bool:
+        shard = self.symbol_shard.get(symbol)
+        return shard is not None and symbol in shard.subscriptions[kind]
+
+    def drop_reason(self, shard: MarketShard, kind: str, symbol: str) -> Optional[str]:
+        """
+        Почему кадр шарда можно отбросить, не декодируя (None — кадр нужен).
+
+        moved — символ уже переподписан в другом шарде, а этот еще присылает
+        его (освобождаемый шард, дубли после переподключения);
+        no_consumers — по символу и каналу никто не ждет данных.
+        """
+        owner = self.symbol_shard.get(symbol)
+        if owner is not None and owner is not shard:
+            return "moved"
+        if not self.manager.has_market_consumers(kind, symbol):
+            return "no_consumers"
+        return None
+
+    def record_drop(self, kind: str, reason: str) -> None:
+        counts = self.dropped_frames.setdefault(kind, {})
+        counts[reason] = counts.get(reason, 0) + 1
+
+    # ---------- соединения ----------
+
+    async def _connect_shard(self) -> Optional[MarketShard]:
+        shard = MarketShard(self._next_id)
+        self._next_id += 1
+        try:
+            logger.info(f"[MarketWS#{shard.shard_id}] Starting connection to {self.manager.BASE_URL}")
+            shard.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=30),
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    limit_per_host=30,
+                    keepalive_timeout=30,
+                    enable_cleanup_closed=True,
+                ),
+            )
+            # НЕ используем автоматический heartbeat - MEXC сам отправляет PING
+            shard.ws = await shard.session.ws_connect(self.manager.BASE_URL, heartbeat=None, compress=False)
+        except Exception as e:
+            self.connect_failures += 1
+            logger.error(f"[MarketWS#{shard.shard_id}] Error connecting to market data WebSocket: {e}")
+            try:
+                await notify_component_error("вебсокетах (рынок)", f"Ошибка подключения: {e}")
+            except Exception:
+                pass
+            await self._close_shard(shard)
+            return None
+
+        shard.created_at = time.time()
+        self.shards[shard.shard_id] = shard
+        self.connects += 1
+
+        from bot.utils.ws.market_stream import listen_market_messages_impl
+
+        shard.listener = asyncio.create_task(listen_market_messages_impl(self.manager, shard))
+        logger.info(f"[MarketWS#{shard.shard_id}] Connected to market data WebSocket ({len(self.shards)} shards)")
+        return shard
+
+    async def _close_shard(self, shard: MarketShard) -> None:
+        shard.closing = True
+        self.shards.pop(shard.shard_id, None)
+        for symbol in shard.symbols:
+            if self.symbol_shard.get(symbol) is shard:
+                del self.symbol_shard[symbol]
+        if shard.ws is not None and not shard.ws.closed:
+            try:
+                await shard.ws.close()
+            except Exception as e:
+                logger.debug(f"[MarketWS#{shard.shard_id}] Error closing WebSocket: {e}")
+        if shard.session is not None and not shard.session.closed:
+            try:
+                await shard.session.close()
+            except Exception as e:
+                logger.debug(f"[MarketWS#{shard.shard_id}] Error closing session: {e}")
+        if shard.listener is not None and shard.listener is not asyncio.current_task():
+            shard.listener.cancel()
+
+    async def ensure_connected(self) -> bool:
+        """Хотя бы одно живое соединение; символы без живого шарда переподписываются."""
+        async with self._lock:
+            if not self.alive_shards() and await self._connect_shard() is None:
+                return False
+        await self.resubscribe_orphans()
+        return True
+
+    async def close_all(self) -> None:
+        async with self._lock:
+            for shard in list(self.shards.values()):
+                await self._close_shard(shard)
+            self.symbol_shard.clear()
+        logger.info("Disconnected from market data WebSocket")
+
+    # ---------- подписки ----------
+
+    async def _shard_for(self, symbol: str) -> Optional[MarketShard]:
+        shard = self.symbol_shard.get(symbol)
+        if shard is not None and shard.accepting:
+            return shard
+
+        alive = [s for s in self.shards.values() if s.accepting]
+        # Под символ резервируем место под оба канала
+        candidates = [s for s in alive if s.channels + len(KINDS) <= self.max_streams]
+        # Закрытые и освобождаемые шарды не считаются: их место занимает замена
+        if (len(alive) < self.target_shards or not candidates) and len(alive) < self.max_connections:
+            new_shard = await self._connect_shard()
+            if new_shard is not None:
+                candidates = [new_shard]
+        if not candidates:
+            # Пул заполнен — лучше перегрузить шард, чем потерять символ
+            candidates = alive
+        if not candidates:
+            return None
+        shard = min(candidates, key=lambda s: (s.channels, s.rate))
+        self.symbol_shard[symbol] = shard
+        return shard
+
+    async def subscribe(self, kind: str, symbols: Iterable[str]) -> bool:
+        """Подписывает символы на канал kind ('deals' / 'bookticker') в их шардах."""
+        from bot.utils.ws.subscriptions import send_subscription
+
+        ok = True
+        async with self._lock:
+            by_shard: Dict[int, List[str]] = {}
+            for symbol in dict.fromkeys(symbols):
+                shard = await self._shard_for(symbol)
+                if shard is None:
+                    logger.error(f"Market connection not established - cannot subscribe {kind} for {symbol}")
+                    ok = False
+                    continue
+                if symbol not in shard.subscriptions[kind]:
+                    by_shard.setdefault(shard.shard_id, []).append(symbol)
+
+            for shard_id, shard_symbols in by_shard.items():
+                shard = self.shards[shard_id]
+                params = [CHANNELS[kind].format(symbol.upper()) for symbol in shard_symbols]
+                if await send_subscription(shard.ws, params, f"MarketWS#{shard_id}"):
+                    shard.subscriptions[kind].update(shard_symbols)
+                    logger.info(f"[MarketWS#{shard_id}] Subscribed to {kind} for: {shard_symbols}")
+                else:
+                    ok = False
+        return ok
+
+    async def resubscribe_orphans(self) -> int:
+        """Подписывает желаемые символы, которые сейчас не подписаны ни в одном живом шарде."""
+        wanted = {
+            "deals": self.manager.market_subscriptions,
+            "bookticker": self.manager.bookticker_subscriptions,
+        }
+        moved = 0
+        for kind, symbols in wanted.items():
+            orphans = [
+                symbol for symbol in symbols
+                if not (shard := self.symbol_shard.get(symbol)) or not shard.accepting or symbol not in shard.subscriptions[kind]
+            ]
+            if orphans:
+                logger.info(f"[MarketWS] Re-subscribing {kind} for {orphans}")
+                await self.subscribe(kind, orphans)
+                moved += len(orphans)
+        return moved
+
+    # ---------- отказы ----------
+
+    async def replace_shard(self, shard: MarketShard, reason: str) -> None:
+        """
+        Переносит символы шарда в другие (или в новое соединение) и закрывает его.
+
+        Живой шард закрывается только после переподписки в другом месте —
+        поток цен по его символам не прерывается.
+        """
+        if self.shards.get(shard.shard_id) is not shard or shard.draining:
+            return
+        symbols = sorted(shard.symbols)
+        logger.warning(f"[MarketWS#{shard.shard_id}] {reason}, moving {len(symbols)} symbols: {symbols}")
+        shard.draining = True
+        if not self.manager.is_shutting_down:
+            self.rebalanced_symbols += len(symbols)
+            await self.resubscribe_orphans()
+        async with self._lock:
+            await self._close_shard(shard)
+
+    def on_listener_exit(self, shard: MarketShard) -> None:
+        """Listener шарда завершился: если шард не закрывали намеренно — переносим его символы."""
+        if shard.closing or self.manager.is_shutting_down:
+            return
+        asyncio.create_task(self.replace_shard(shard, "Listener stopped"))
+
+    async def recycle_stale(self, max_age: float) -> None:
+        """Заменяет закрытые шарды и самый старый из устаревших (по одному за проход)."""
+        now = time.time()
+        for shard in list(self.shards.values()):
+            if not shard.alive:
+                await self.replace_shard(shard, "WebSocket is closed")
+        stale = [shard for shard in self.shards.values() if shard.alive and now - shard.created_at > max_age]
+        if stale:
+            await self.replace_shard(min(stale, key=lambda s: s.created_at), "Connection is stale")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "shards": {shard.shard_id: shard.get_stats() for shard in self.shards.values()},
+            "alive": len(self.alive_shards()),
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "rebalanced_symbols": self.rebalanced_symbols,
+            "dropped_frames": {kind: dict(counts) for kind, counts in self.dropped_frames.items()},
+        }
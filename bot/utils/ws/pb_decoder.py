@@ -1,12 +1,11 @@
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 # Protobuf generated wrappers
 from bot.utils.websocket_pb import PushDataV3ApiWrapper_pb2
-from bot.utils.websocket_pb import PublicAggreBookTickerV3Api_pb2  # noqa: F401  (imported for type visibility)
-from bot.utils.websocket_pb import PublicAggreDealsV3Api_pb2  # noqa: F401
-from bot.utils.websocket_pb import PrivateOrdersV3Api_pb2  # noqa: F401
-from bot.utils.websocket_pb import PrivateAccountV3Api_pb2  # noqa: F401
+from bot.utils.ws.events import AccountUpdate, BookTick, DealTick, OrderUpdate, PushEvent
+
+_parse_wrapper = PushDataV3ApiWrapper_pb2.PushDataV3ApiWrapper.FromString
 
 
 def _map_bookticker(pb_obj) -> Dict[str, Any]:
@@ -48,6 +47,8 @@ def _map_private_orders(pb_obj) -> Dict[str, Any]:
         "tt": getattr(pb_obj, "tradeType", 0),
         "m": getattr(pb_obj, "isMaker", False),
         "rqa": getattr(pb_obj, "remainQuantity", ""),
+        "cv": getattr(pb_obj, "cumulativeQuantity", ""),
+        "ca": getattr(pb_obj, "cumulativeAmount", ""),
         "s": getattr(pb_obj, "status", 0),
         "ct": getattr(pb_obj, "createTime", 0),
     }
@@ -63,6 +64,8 @@ def _map_private_orders(pb_obj) -> Dict[str, Any]:
             "tradeType": getattr(pb_obj, "tradeType", 0),
             "isMaker": getattr(pb_obj, "isMaker", False),
             "remainQuantity": getattr(pb_obj, "remainQuantity", ""),
+            "cumulativeQuantity": getattr(pb_obj, "cumulativeQuantity", ""),
+            "cumulativeAmount": getattr(pb_obj, "cumulativeAmount", ""),
             "status": getattr(pb_obj, "status", 0),
             "createTime": getattr(pb_obj, "createTime", 0),
             "market": getattr(pb_obj, "market", ""),
@@ -98,6 +101,8 @@ def decode_push_message(binary_message: bytes) -> Optional[Dict[str, Any]]:
     """
     Decode Mexc protobuf push message into a dict compatible with existing JSON handlers.
 
+    Прежний путь со словарями; слушатели используют decode_push_event.
+
     Returns a dict containing at minimum:
     - 'channel' and 'c'
     - 'symbol' and 's' (if available)
@@ -157,3 +162,115 @@ def decode_push_message(binary_message: bytes) -> Optional[Dict[str, Any]]:
         # If decoding fails, return None so caller can ignore or log
         return None
 
+
+
+# ---------- типизированные события ----------
+
+
+def _book_tick(channel: str, symbol: str, send_time: int, pb_obj) -> BookTick:
+    return BookTick(
+        channel, symbol, send_time, pb_obj.bidPrice, pb_obj.askPrice, pb_obj.bidQuantity, pb_obj.askQuantity
+    )
+
+
+def _deal_tick(channel: str, symbol: str, send_time: int, pb_obj) -> DealTick:
+    deals = pb_obj.deals
+    if not deals:
+        return DealTick(channel, symbol, send_time, "", "", 0, 0, 0)
+    first = deals[0]
+    return DealTick(
+        channel, symbol, send_time, first.price, first.quantity, first.tradeType, first.time, len(deals),
+        tuple((deal.price, deal.quantity, deal.tradeType, deal.time) for deal in deals),
+    )
+
+
+def _order_update(channel: str, symbol: str, send_time: int, pb_obj) -> OrderUpdate:
+    return OrderUpdate(
+        channel, symbol, send_time,
+        pb_obj.id, pb_obj.clientId, pb_obj.price, pb_obj.quantity, pb_obj.avgPrice,
+        pb_obj.orderType, pb_obj.tradeType, pb_obj.isMaker, pb_obj.remainQuantity,
+        pb_obj.cumulativeQuantity, pb_obj.cumulativeAmount, pb_obj.status, pb_obj.createTime,
+    )
+
+
+def _account_update(channel: str, symbol: str, send_time: int, pb_obj) -> AccountUpdate:
+    return AccountUpdate(
+        channel, symbol, send_time,
+        pb_obj.vcoinName, pb_obj.balanceAmount, pb_obj.frozenAmount,
+        pb_obj.balanceAmountChange, pb_obj.frozenAmountChange, pb_obj.type, pb_obj.time,
+    )
+
+
+# Поле oneof body обертки -> конструктор события
+_EVENT_BUILDERS = {
+    "publicAggreBookTicker": _book_tick,
+    "publicBookTicker": _book_tick,
+    "publicAggreDeals": _deal_tick,
+    "publicDeals": _deal_tick,
+    "privateOrders": _order_update,
+    "privateAccount": _account_update,
+}
+
+
+def decode_push_event(binary_message: bytes) -> Optional[PushEvent]:
+    """
+    Decode Mexc protobuf push message into a typed event (BookTick, DealTick,
+    OrderUpdate, AccountUpdate; PushEvent for other channels).
+
+    Без промежуточных словарей: поле тела определяется одним WhichOneof,
+    цены разбираются в float один раз. None — если кадр не декодируется.
+    """
+    try:
+        wrapper = _parse_wrapper(binary_message)
+        send_time = wrapper.sendTime or int(time.time() * 1000)
+        body = wrapper.WhichOneof("body")
+        builder = _EVENT_BUILDERS.get(body)
+        if builder is None:
+            return PushEvent(wrapper.channel, wrapper.symbol, send_time)
+        return builder(wrapper.channel, wrapper.symbol, send_time, getattr(wrapper, body))
+    except Exception:
+        return None
+
+
+# ---------- заголовок кадра без разбора тела ----------
+
+# Тег поля channel (номер 1, length-delimited) — первый байт кадра
+_CHANNEL_TAG = (PushDataV3ApiWrapper_pb2.PushDataV3ApiWrapper.DESCRIPTOR.fields_by_name["channel"].number << 3) | 2
+
+# Сырые байты channel -> (channel, вид канала, символ); разных каналов немного
+_channels: Dict[bytes, Tuple[str, Optional[str], str]] = {}
+
+
+def _parse_channel(channel: str) -> Tuple[str, Optional[str], str]:
+    if "bookTicker" in channel:
+        kind = "bookticker"
+    elif "deals" in channel:
+        kind = "deals"
+    else:
+        return channel, None, ""
+    # spot@public.aggre.bookTicker.v3.api.pb@100ms@BTCUSDT
+    return channel, kind, channel.rsplit("@", 1)[-1]
+
+
+def peek_push_channel(frame: bytes) -> Optional[Tuple[str, Optional[str], str]]:
+    """
+    (channel, вид канала, символ) по первому полю кадра, без разбора protobuf.
+
+    Вид — "bookticker" / "deals" для публичных каналов, иначе None; символ
+    берется из суффикса канала. Нужен, чтобы отбросить ненужный кадр до
+    decode_push_event. None — если кадр начинается не с channel (тогда
+    кадр разбирается целиком).
+    """
+    if len(frame) < 2 or frame[0] != _CHANNEL_TAG or frame[1] >= 0x80:
+        return None
+    raw = frame[2:2 + frame[1]]
+    header = _channels.get(raw)
+    if header is None:
+        try:
+            header = _parse_channel(raw.decode())
+        except UnicodeDecodeError:
+            return None
+        if len(_channels) > 10000:
+            _channels.clear()
+        _channels[raw] = header
+    return header
@@ -1,54 +1,222 @@
 import time
-from typing import Any, Dict, List
+from array import array
+from typing import Any, Dict, Iterator, List
+
+
+class PriceHistoryView:
+    """Read-only chronological view over a symbol's ring buffer (no copying)."""
+
+    __slots__ = ("_ring",)
+
+    def __init__(self, ring: "_PriceRing") -> None:
+        self._ring = ring
+
+    def __len__(self) -> int:
+        return self._ring.count
+
+    def __getitem__(self, i: int) -> float:
+        ring = self._ring
+        count = ring.count
+        if i < 0:
+            i += count
+        if not 0 <= i < count:
+            raise IndexError("price history index out of range")
+        return ring.prices[(ring.seq - count + i) % ring.capacity]
+
+    def __iter__(self) -> Iterator[float]:
+        ring = self._ring
+        start = ring.seq - ring.count
+        for s in range(start, ring.seq):
+            yield ring.prices[s % ring.capacity]
+
+    def tolist(self) -> List[float]:
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"PriceHistoryView(len={len(self)})"
+
+
+class _PriceRing:
+    """
+    Fixed-capacity ring of mid prices for one symbol.
+
+    update() is O(1) and allocates nothing: prices/timestamps live in
+    preallocated array('d'), rolling min/max use monotonic queues stored in
+    preallocated array('q') rings, and the regression slope over the window
+    is maintained from running sums.
+    """
+
+    __slots__ = (
+        "capacity",
+        "prices",
+        "timestamps",
+        "seq",
+        "count",
+        "is_rise",
+        "last_change_time",
+        "run_length",
+        "_sum_y",
+        "_sum_xy",
+        "_min_q",
+        "_min_head",
+        "_min_size",
+        "_max_q",
+        "_max_head",
+        "_max_size",
+    )
+
+    # Пересчитываем суммы точно раз в столько тиков, чтобы не копилась ошибка float
+    RESYNC_EVERY = 10_000
+
+    def __init__(self, capacity: int, now: float) -> None:
+        self.capacity = capacity
+        self.prices = array("d", bytes(8 * capacity))
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.seq = 0  # номер следующего тика
+        self.count = 0
+        self.is_rise = False
+        self.last_change_time = now
+        self.run_length = 0
+        self._sum_y = 0.0
+        self._sum_xy = 0.0
+        self._min_q = array("q", bytes(8 * capacity))
+        self._min_head = 0
+        self._min_size = 0
+        self._max_q = array("q", bytes(8 * capacity))
+        self._max_head = 0
+        self._max_size = 0
+
+    def push(self, price: float, now: float) -> None:
+        capacity = self.capacity
+        seq = self.seq
+        slot = seq % capacity
+        count = self.count
+
+        # Направление относительно предыдущего тика
+        if count:
+            previous = self.prices[(seq - 1) % capacity]
+            new_is_rise = price > previous
+            if new_is_rise != self.is_rise:
+                self.last_change_time = now
+                self.run_length = 1
+            else:
+                self.run_length += 1
+            self.is_rise = new_is_rise
+
+        # Суммы для наклона: x = 0..count-1 внутри окна
+        if count == capacity:
+            oldest = self.prices[slot]
+            self._sum_xy = self._sum_xy - (self._sum_y - oldest) + (capacity - 1) * price
+            self._sum_y = self._sum_y - oldest + price
+        else:
+            self._sum_xy += count * price
+            self._sum_y += price
+            self.count = count + 1
+
+        self.prices[slot] = price
+        self.timestamps[slot] = now
+        self.seq = seq + 1
+
+        # Монотонные очереди номеров тиков: голова — min/max текущего окна
+        expired = seq - capacity
+        prices = self.prices
+
+        queue, head, size = self._min_q, self._min_head, self._min_size
+        if size and queue[head] <= expired:
+            head = (head + 1) % capacity
+            size -= 1
+        while size and prices[queue[(head + size - 1) % capacity] % capacity] >= price:
+            size -= 1
+        queue[(head + size) % capacity] = seq
+        self._min_head, self._min_size = head, size + 1
+
+        queue, head, size = self._max_q, self._max_head, self._max_size
+        if size and queue[head] <= expired:
+            head = (head + 1) % capacity
+            size -= 1
+        while size and prices[queue[(head + size - 1) % capacity] % capacity] <= price:
+            size -= 1
+        queue[(head + size) % capacity] = seq
+        self._max_head, self._max_size = head, size + 1
+
+        if self.seq % self.RESYNC_EVERY == 0:
+            self._resync_sums()
+
+    def _resync_sums(self) -> None:
+        start = self.seq - self.count
+        sum_y = 0.0
+        sum_xy = 0.0
+        for x, s in enumerate(range(start, self.seq)):
+            y = self.prices[s % self.capacity]
+            sum_y += y
+            sum_xy += x * y
+        self._sum_y = sum_y
+        self._sum_xy = sum_xy
+
+    @property
+    def current_price(self) -> float:
+        return self.prices[(self.seq - 1) % self.capacity] if self.count else 0
+
+    @property
+    def rolling_min(self) -> float:
+        if not self._min_size:
+            return 0
+        return self.prices[self._min_q[self._min_head] % self.capacity]
+
+    @property
+    def rolling_max(self) -> float:
+        if not self._max_size:
+            return 0
+        return self.prices[self._max_q[self._max_head] % self.capacity]
+
+    @property
+    def slope(self) -> float:
+        """Наклон линейной регрессии mid цены по тикам в окне (цена за тик)."""
+        m = self.count
+        if m < 2:
+            return 0.0
+        sum_x = m * (m - 1) / 2
+        sum_xx = (m - 1) * m * (2 * m - 1) / 6
+        denominator = m * sum_xx - sum_x * sum_x
+        return (m * self._sum_xy - sum_x * self._sum_y) / denominator
 
 
 class PriceDirectionTracker:
     def __init__(self, max_history_size: int = 100) -> None:
-        self.price_history: Dict[str, List[float]] = {}
-        self.price_timestamps: Dict[str, List[float]] = {}
-        self.is_rise: Dict[str, bool] = {}
-        self.last_price_change: Dict[str, float] = {}
         self.max_history_size = max_history_size
+        self._rings: Dict[str, _PriceRing] = {}
 
     async def update(self, symbol: str, bid_price: float, ask_price: float) -> None:
         try:
             current_time = time.time()
-            mid_price = (bid_price + ask_price) / 2
-
-            if symbol not in self.price_history:
-                self.price_history[symbol] = []
-                self.price_timestamps[symbol] = []
-                self.is_rise[symbol] = False
-                self.last_price_change[symbol] = current_time
-
-            self.price_history[symbol].append(mid_price)
-            self.price_timestamps[symbol].append(current_time)
-
-            if len(self.price_history[symbol]) > self.max_history_size:
-                self.price_history[symbol] = self.price_history[symbol][-self.max_history_size :]
-                self.price_timestamps[symbol] = self.price_timestamps[symbol][-self.max_history_size :]
-
-            if len(self.price_history[symbol]) >= 2:
-                current_price = self.price_history[symbol][-1]
-                previous_price = self.price_history[symbol][-2]
-                new_is_rise = current_price > previous_price
-                if new_is_rise != self.is_rise[symbol]:
-                    self.last_price_change[symbol] = current_time
-                self.is_rise[symbol] = new_is_rise
+            ring = self._rings.get(symbol)
+            if ring is None:
+                ring = self._rings[symbol] = _PriceRing(self.max_history_size, current_time)
+            ring.push((bid_price + ask_price) / 2, current_time)
         except Exception:
             # Silence tracking errors; not critical to main flow
             pass
 
     def get(self, symbol: str) -> Dict[str, Any]:
-        if symbol not in self.is_rise:
-            return {"is_rise": False, "last_change_time": 0, "current_price": 0, "price_history": []}
-        current_price = 0
-        if self.price_history.get(symbol):
-            current_price = self.price_history[symbol][-1]
+        ring = self._rings.get(symbol)
+        if ring is None:
+            return {
+                "is_rise": False,
+                "last_change_time": 0,
+                "current_price": 0,
+                "price_history": (),
+                "run_length": 0,
+                "rolling_min": 0,
+                "rolling_max": 0,
+                "slope": 0.0,
+            }
         return {
-            "is_rise": self.is_rise[symbol],
-            "last_change_time": self.last_price_change.get(symbol, 0),
-            "current_price": current_price,
-            "price_history": self.price_history.get(symbol, []),
+            "is_rise": ring.is_rise,
+            "last_change_time": ring.last_change_time,
+            "current_price": ring.current_price,
+            "price_history": PriceHistoryView(ring),
+            "run_length": ring.run_length,
+            "rolling_min": ring.rolling_min,
+            "rolling_max": ring.rolling_max,
+            "slope": ring.slope,
         }
-
@@ -5,61 +5,39 @@ from typing import List
 from bot.logger import logger
 
 
-async def subscribe_market_data(manager, symbols: List[str]) -> bool:
-    """Subscribe to market data for specific symbols."""
-    if not manager.market_connection:
-        logger.error("Market connection not established - cannot subscribe to market data")
-        logger.debug(f"Attempted to subscribe to symbols: {symbols}")
+async def send_subscription(ws, params: List[str], tag: str = "MarketWS") -> bool:
+    """Отправляет SUBSCRIPTION с каналами params в соединение ws."""
+    if ws is None or ws.closed:
+        logger.error(f"[{tag}] WebSocket is closed - cannot subscribe to {params}")
         return False
-
+    subscription_msg = {
+        "method": "SUBSCRIPTION",
+        "params": params,
+        "id": int(time.time() * 1000),
+    }
     try:
-        ws = manager.market_connection['ws']
-
-        params = [f"spot@public.aggre.deals.v3.api.pb@100ms@{symbol.upper()}" for symbol in symbols]
-
-        subscription_msg = {
-            "method": "SUBSCRIPTION",
-            "params": params,
-            "id": int(time.time() * 1000),
-        }
-
-        logger.info(f"[MarketWS] Sending market data subscription request: {subscription_msg}")
+        logger.info(f"[{tag}] Sending subscription request: {subscription_msg}")
         await ws.send_str(json.dumps(subscription_msg))
-
-        manager.market_subscriptions = list(set(manager.market_subscriptions + symbols))
-        logger.info(f"Subscribed to market data for: {symbols}")
         return True
     except Exception as e:
-        logger.error(f"Error subscribing to market data: {e}")
-        return False
-
-
-async def subscribe_bookticker_data(manager, symbols: List[str]) -> bool:
-    """Subscribe to bookTicker data for specific symbols to get best bid/ask prices."""
-    if not manager.market_connection:
-        logger.error("Market connection not established for bookTicker subscription")
+        logger.error(f"[{tag}] Error sending subscription request: {e}")
         return False
 
-    try:
-        ws = manager.market_connection['ws']
-
-        params = [f"spot@public.aggre.bookTicker.v3.api.pb@100ms@{symbol.upper()}" for symbol in symbols]
 
-        subscription_msg = {
-            "method": "SUBSCRIPTION",
-            "params": params,
-            "id": int(time.time() * 1000),
-        }
+async def subscribe_market_data(manager, symbols: List[str]) -> bool:
+    """Subscribe to market data (deals) for specific symbols in their market shards."""
+    ok = await manager.market_pool.subscribe("deals", symbols)
+    if ok:
+        manager.market_subscriptions = list(dict.fromkeys(manager.market_subscriptions + list(symbols)))
+    return ok
 
-        logger.info(f"[MarketWS] Sending bookTicker subscription request: {subscription_msg}")
-        await ws.send_str(json.dumps(subscription_msg))
 
-        manager.bookticker_subscriptions = list(set(manager.bookticker_subscriptions + symbols))
-        logger.info(f"Subscribed to bookTicker data for: {symbols}")
-        return True
-    except Exception as e:
-        logger.error(f"Error subscribing to bookTicker data: {e}")
-        return False
+async def subscribe_bookticker_data(manager, symbols: List[str]) -> bool:
+    """Subscribe to bookTicker data for specific symbols in their market shards."""
+    ok = await manager.market_pool.subscribe("bookticker", symbols)
+    if ok:
+        manager.bookticker_subscriptions = list(dict.fromkeys(manager.bookticker_subscriptions + list(symbols)))
+    return ok
 
 
 async def subscribe_user_orders(manager, user_id: int, symbol: str = None) -> bool:
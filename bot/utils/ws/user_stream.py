@@ -6,7 +6,40 @@ from typing import Any, Dict
 
 from bot.logger import logger
 from bot.utils.error_notifier import notify_component_error
-from bot.utils.ws.pb_decoder import decode_push_message
+from bot.utils.ws.events import AccountUpdate, OrderUpdate, PushEvent, event_from_dict
+from bot.utils.ws.pb_decoder import decode_push_event
+from bot.utils.order_fills import order_fills
+
+
+async def _handle_user_event(manager: Any, user_id: int, event: PushEvent, update_order_status) -> None:
+    """Обновление ордера или баланса пользователя (одинаково для JSON и protobuf кадров)."""
+    logger.debug(f"User {user_id} received message on channel: {event.channel}")
+
+    if isinstance(event, OrderUpdate):
+        manager.user_connections[user_id]["last_message_at"] = time.time()
+        order_id = event.order_id
+        status = event.status
+
+        logger.info(
+            f"Обновление ордера {order_id} для пользователя {user_id}: {event.symbol} - {status} (код: {event.status_code})"
+        )
+        # Исполнение сразу отдаем ожидающему process_buy, до записи в БД
+        order_fills.publish(
+            order_id, status, event.cumulative_quantity, event.cumulative_amount
+        )
+
+        try:
+            await update_order_status(order_id, event.symbol, status, user_id)
+        except Exception as e:
+            logger.error(f"Ошибка обновления статуса ордера: {e}")
+
+    elif isinstance(event, AccountUpdate):
+        manager.user_connections[user_id]["last_message_at"] = time.time()
+        logger.info(
+            f"Обновление баланса для {user_id}: {event.asset} - свободно: {event.free}, заблокировано: {event.locked}"
+        )
+    else:
+        logger.debug(f"Неизвестный канал для {user_id}: {event.channel}")
 
 
 async def listen_user_messages_impl(manager: Any, user_id: int):
@@ -118,95 +151,25 @@ async def listen_user_messages_impl(manager: Any, user_id: int):
                         break
                     continue
 
-                channel = data.get("c")
-                logger.debug(f"User {user_id} received message on channel: {channel}")
-
-                if channel == "spot@private.orders.v3.api.pb":
-                    manager.user_connections[user_id]["last_message_at"] = time.time()
-                    order_data = data.get("d", {})
-                    symbol = data.get("s")
-                    order_id = order_data.get("i")
-                    status_code = order_data.get("s")
-
-                    status_map = {
-                        1: "NEW",
-                        2: "FILLED",
-                        3: "PARTIALLY_FILLED",
-                        4: "CANCELED",
-                        5: "REJECTED",
-                    }
-                    status = status_map.get(status_code, "UNKNOWN")
-
-                    logger.info(
-                        f"Обновление ордера {order_id} для пользователя {user_id}: {symbol} - {status} (код: {status_code})"
-                    )
-
-                    try:
-                        await update_order_status(order_id, symbol, status, user_id)
-                    except Exception as e:
-                        logger.error(f"Ошибка обновления статуса ордера: {e}")
-
-                elif channel == "spot@private.account.v3.api.pb":
-                    manager.user_connections[user_id]["last_message_at"] = time.time()
-                    account_data = data.get("d", {})
-                    asset = account_data.get("a")
-                    free = account_data.get("f")
-                    locked = account_data.get("l")
-
-                    logger.info(
-                        f"Обновление баланса для {user_id}: {asset} - свободно: {free}, заблокировано: {locked}"
-                    )
-                else:
-                    logger.debug(f"Неизвестный канал для {user_id}: {channel}")
+                event = event_from_dict(data)
+                if event is None:
+                    logger.debug(f"Неизвестный канал для {user_id}: {data.get('c')}")
+                    continue
+                await _handle_user_event(manager, user_id, event, update_order_status)
 
             elif msg.type == aiohttp.WSMsgType.BINARY:
                 try:
-                    data = decode_push_message(msg.data)
+                    event = decode_push_event(msg.data)
                 except Exception as e:
                     logger.error(
                         f"[UserWS] Failed to decode binary protobuf for user {user_id}: {e}"
                     )
                     continue
 
-                if not data:
+                if event is None:
                     continue
 
-                channel = data.get("c")
-                logger.debug(f"User {user_id} received message on channel: {channel}")
-
-                if channel == "spot@private.orders.v3.api.pb":
-                    manager.user_connections[user_id]["last_message_at"] = time.time()
-                    order_data = data.get("d", {})
-                    symbol = data.get("s")
-                    order_id = order_data.get("i")
-                    status_code = order_data.get("s")
-                    status_map = {
-                        1: "NEW",
-                        2: "FILLED",
-                        3: "PARTIALLY_FILLED",
-                        4: "CANCELED",
-                        5: "REJECTED",
-                    }
-                    status = status_map.get(status_code, "UNKNOWN")
-                    logger.info(
-                        f"Обновление ордера {order_id} для пользователя {user_id}: {symbol} - {status} (код: {status_code})"
-                    )
-                    try:
-                        await update_order_status(order_id, symbol, status, user_id)
-                    except Exception as e:
-                        logger.error(f"Ошибка обновления статуса ордера: {e}")
-
-                elif channel == "spot@private.account.v3.api.pb":
-                    manager.user_connections[user_id]["last_message_at"] = time.time()
-                    account_data = data.get("d", {})
-                    asset = account_data.get("a")
-                    free = account_data.get("f")
-                    locked = account_data.get("l")
-                    logger.info(
-                        f"Обновление баланса для {user_id}: {asset} - свободно: {free}, заблокировано: {locked}"
-                    )
-                else:
-                    logger.debug(f"Неизвестный канал для {user_id}: {channel}")
+                await _handle_user_event(manager, user_id, event, update_order_status)
 
             elif msg.type == aiohttp.WSMsgType.CLOSED:
                 connection_age = time.time() - manager.user_connections[user_id].get(
@@ -224,6 +187,7 @@ async def listen_user_messages_impl(manager: Any, user_id: int):
                 logger.error(
                     f"WebSocket error for user {user_id} after {connection_age:.1f}s: {ws.exception()}"
                 )
+                manager.mark_user_stream_error(user_id)
                 break
             elif msg.type == aiohttp.WSMsgType.CLOSING:
                 logger.info(f"WebSocket for user {user_id} is closing")
@@ -234,6 +198,7 @@ async def listen_user_messages_impl(manager: Any, user_id: int):
         logger.info(f"WebSocket listener task cancelled for user {user_id}")
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error in WebSocket for user {user_id}: {e}")
+        manager.mark_user_stream_error(user_id)
         try:
             await notify_component_error(
                 "вебсокетах (пользователь)",
@@ -243,6 +208,7 @@ async def listen_user_messages_impl(manager: Any, user_id: int):
             pass
     except Exception as e:
         logger.error(f"Error in user WebSocket for {user_id}: {e}")
+        manager.mark_user_stream_error(user_id)
         try:
             await notify_component_error(
                 "вебсокетах (пользователь)",
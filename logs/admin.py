@@ -1,14 +1,59 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from datetime import timedelta
+from django.utils import timezone
+from .config import LogConfig
 from .models import BotLog, LogLevel
 
+
+class RecentLogsFilter(admin.SimpleListFilter):
+    """
+    Период логов. По умолчанию — последние LogConfig.ADMIN_DEFAULT_HOURS часов,
+    чтобы список, поиск и подсчет читали только свежие секции таблицы.
+    """
+    title = 'Период'
+    parameter_name = 'period'
+
+    PERIODS = {
+        '1h': timedelta(hours=1),
+        '7d': timedelta(days=7),
+        '30d': timedelta(days=30),
+    }
+
+    def lookups(self, request, model_admin):
+        return (
+            ('1h', 'Последний час'),
+            ('7d', 'Последние 7 дней'),
+            ('30d', 'Последние 30 дней'),
+            ('all', 'Все время'),
+        )
+
+    def choices(self, changelist):
+        choices = list(super().choices(changelist))
+        choices[0]['display'] = f'Последние {LogConfig.ADMIN_DEFAULT_HOURS} ч'
+        return choices
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value == 'all':
+            return queryset
+        # Выбран день/месяц в date_hierarchy — период задает он
+        if value is None and any(key.startswith('timestamp__') for key in request.GET):
+            return queryset
+        period = self.PERIODS.get(value, timedelta(hours=LogConfig.ADMIN_DEFAULT_HOURS))
+        return queryset.filter(timestamp__gte=timezone.now() - period)
+
+
 @admin.register(BotLog)
 class BotLogAdmin(admin.ModelAdmin):
     list_display = ('colored_level', 'timestamp', 'user_display', 'message_short', 'has_extra_data')
-    list_filter = ('level', 'timestamp', 'user')
+    list_filter = (RecentLogsFilter, 'level', 'user')
     search_fields = ('message', 'user__name', 'user__telegram_id')
     readonly_fields = ('timestamp', 'level', 'user', 'message', 'extra_data_pretty')
     date_hierarchy = 'timestamp'
+    list_select_related = ('user',)
+    # Полный COUNT(*) по всем секциям на каждой странице не нужен
+    show_full_result_count = False
     
     def colored_level(self, obj):
         colors = {
@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from asgiref.sync import sync_to_async
+from django.db import DataError, IntegrityError, InterfaceError, OperationalError
+
+from .config import LogBufferConfig
+from .models import BotLog, LogLevel
+
+# Логгер модуля не должен попадать в AsyncDatabaseHandler (см. handlers.py), иначе рекурсия
+logger = logging.getLogger(__name__)
+
+HIGH_LEVELS = (LogLevel.WARNING, LogLevel.ERROR)
+
+# (level, message, user_id, telegram_id, extra_data)
+Record = Tuple[str, str, Optional[int], Optional[int], Optional[dict]]
+
+
+def _normalize_telegram_id(telegram_id: Union[int, str, None]) -> Optional[int]:
+    if isinstance(telegram_id, int):
+        return telegram_id
+    if isinstance(telegram_id, str) and telegram_id.isdigit():
+        return int(telegram_id)
+    return None
+
+
+class BotLogBuffer:
+    """
+    Буфер записи BotLog: пишет пачками через bulk_create.
+
+    add() синхронный и потокобезопасный — запись только попадает в буфер.
+    Фоновая задача сбрасывает буфер каждые flush_interval секунд или сразу,
+    как только набралось batch_size записей.
+
+    Пользователь указывается объектом User или telegram_id; telegram_id
+    переводятся в pk одним запросом на пачку и кэшируются.
+
+    Если БД не успевает: буфер ограничен max_size записями, сверх этого
+    DEBUG/INFO отбрасываются, а WARNING/ERROR — только после еще reserve записей.
+    Пачка, не записанная из-за недоступности БД, возвращается в буфер,
+    следующий сброс — с нарастающей паузой. Все отброшенное считается в dropped.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        max_size: int = 10000,
+        reserve: int = 2000,
+        missing_user_ttl: float = 60.0,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.reserve = reserve
+        self.missing_user_ttl = missing_user_ttl
+
+        self._records: Deque[Record] = deque()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._backoff = 0.0
+        # telegram_id -> (pk или None, до какого момента верить записи)
+        self._user_pk: Dict[int, Tuple[Optional[int], float]] = {}
+
+        self.added = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped: Dict[str, int] = {}
+        self.user_lookups = 0
+        self._reported_dropped = 0
+        self._last_drop_report = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # ---------- постановка в буфер ----------
+
+    def add(
+        self,
+        message: str,
+        level: str = LogLevel.INFO,
+        user=None,
+        telegram_id: Union[int, str, None] = None,
+        extra_data: Optional[dict] = None,
+    ) -> bool:
+        """Кладет запись в буфер и сразу возвращается. False — запись отброшена."""
+        self._ensure_started()
+        limit = self.max_size + (self.reserve if level in HIGH_LEVELS else 0)
+        user_id = user.pk if user is not None else None
+        with self._lock:
+            size = len(self._records)
+            if size >= limit:
+                self._count_dropped(level)
+                return False
+            self._records.append((level, message, user_id, _normalize_telegram_id(telegram_id), extra_data))
+            self.added += 1
+        if size + 1 >= self.batch_size:
+            self._wake_flusher()
+        return True
+
+    def _count_dropped(self, level: str, count: int = 1) -> None:
+        level = str(level)
+        self.dropped[level] = self.dropped.get(level, 0) + count
+
+    # ---------- сброс в БД ----------
+
+    async def flush(self) -> int:
+        """Записывает содержимое буфера пачками. Возвращает число записанных строк."""
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._records.popleft() for _ in range(min(self.batch_size, len(self._records)))]
+            if not batch:
+                return written
+            try:
+                written += await sync_to_async(self._write)(batch)
+                self._backoff = 0.0
+            except (OperationalError, InterfaceError) as e:
+                # БД недоступна или перегружена — пачку обратно в буфер, повтор после паузы
+                self.failed_flushes += 1
+                self._requeue(batch)
+                self._backoff = min(5.0, self._backoff * 2 or self.flush_interval)
+                logger.error(f"[BotLogBuffer] Ошибка записи логов, повтор через {self._backoff:.1f}с: {e}")
+                await asyncio.sleep(self._backoff)
+                return written
+            except Exception as e:
+                self.failed_flushes += 1
+                for record in batch:
+                    self._count_dropped(record[0])
+                logger.error(f"[BotLogBuffer] Пачка из {len(batch)} логов отброшена: {e}")
+
+    def _write(self, batch: List[Record]) -> int:
+        user_ids = self._resolve_users(batch)
+        rows = [
+            BotLog(level=level, message=message, user_id=user_ids[i], extra_data=extra_data)
+            for i, (level, message, _, _, extra_data) in enumerate(batch)
+        ]
+        try:
+            BotLog.objects.bulk_create(rows)
+        except IntegrityError:
+            # Пользователя удалили после того, как pk попал в кэш или в запись
+            self._user_pk.clear()
+            self._forget_deleted_users(rows)
+            BotLog.objects.bulk_create(rows)
+        except (DataError, TypeError, ValueError):
+            # Одна плохая запись (например, extra_data не сериализуется) не должна терять всю пачку
+            return self._write_one_by_one(rows)
+        self.flushes += 1
+        self.written += len(rows)
+        return len(rows)
+
+    def _write_one_by_one(self, rows: List[BotLog]) -> int:
+        written = 0
+        for row in rows:
+            try:
+                row.save(force_insert=True)
+                written += 1
+            except (DataError, TypeError, ValueError, IntegrityError):
+                self._count_dropped(row.level)
+        self.flushes += 1
+        self.written += written
+        return written
+
+    def _resolve_users(self, batch: List[Record]) -> List[Optional[int]]:
+        """pk пользователей для пачки: по telegram_id из кэша, остальные — одним запросом."""
+        from users.models import User
+
+        now = time.monotonic()
+        missing = set()
+        for _, _, user_id, telegram_id, _ in batch:
+            if user_id is None and telegram_id is not None:
+                cached = self._user_pk.get(telegram_id)
+                if cached is None or cached[1] < now:
+                    missing.add(telegram_id)
+
+        if missing:
+            if len(self._user_pk) > 50000:
+                self._user_pk.clear()
+            self.user_lookups += 1
+            found = dict(User.objects.filter(telegram_id__in=missing).values_list("telegram_id", "id"))
+            for telegram_id in missing:
+                pk = found.get(telegram_id)
+                self._user_pk[telegram_id] = (pk, float("inf") if pk is not None else now + self.missing_user_ttl)
+
+        return [
+            user_id if user_id is not None or telegram_id is None else self._user_pk[telegram_id][0]
+            for _, _, user_id, telegram_id, _ in batch
+        ]
+
+    def _forget_deleted_users(self, rows: List[BotLog]) -> None:
+        from users.models import User
+
+        user_ids = {row.user_id for row in rows if row.user_id is not None}
+        existing = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True))
+        for row in rows:
+            if row.user_id is not None and row.user_id not in existing:
+                row.user_id = None
+
+    def _requeue(self, batch: List[Record]) -> None:
+        with self._lock:
+            room = self.max_size + self.reserve - len(self._records)
+            if len(batch) > room:
+                # Не помещается — в первую очередь жертвуем DEBUG/INFO
+                for record in batch:
+                    if record[0] not in HIGH_LEVELS:
+                        self._count_dropped(record[0])
+                batch = [record for record in batch if record[0] in HIGH_LEVELS]
+                if len(batch) > room:
+                    for record in batch[: len(batch) - room]:
+                        self._count_dropped(record[0])
+                    batch = batch[len(batch) - room:] if room > 0 else []
+            self._records.extendleft(reversed(batch))
+
+    def _report_dropped(self) -> None:
+        dropped = sum(self.dropped.values())
+        now = time.monotonic()
+        if dropped > self._reported_dropped and now - self._last_drop_report >= 60:
+            logger.warning(
+                f"[BotLogBuffer] БД не успевает: отброшено {dropped - self._reported_dropped} логов "
+                f"(всего {self.dropped}), в буфере {len(self._records)}"
+            )
+            self._reported_dropped = dropped
+            self._last_drop_report = now
+
+    # ---------- жизненный цикл ----------
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+                self._report_dropped()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[BotLogBuffer] Ошибка фонового сброса логов: {e}")
+
+    def _ensure_started(self) -> None:
+        if self.is_running:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Нет event loop (админка, management-команды) — записи дождутся flush()/stop()
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = loop.create_task(self._run())
+
+    def _wake_flusher(self) -> None:
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None or not self.is_running:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            wake.set()
+        else:
+            # add() из другого потока (sync_to_async, логгер в потоке)
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+
+    def start(self) -> None:
+        """Запускает фоновый сброс (при старте бота)."""
+        self._ensure_started()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Останавливает фоновый сброс и дописывает буфер (не дольше timeout секунд)."""
+        task, self._task = self._task, None
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+
+        async def drain():
+            if task is not None:
+                await task
+            while self._records:
+                await self.flush()
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                left = list(self._records)
+                self._records.clear()
+            for record in left:
+                self._count_dropped(record[0])
+            logger.warning(f"[BotLogBuffer] {len(left)} логов не записано при остановке")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._records),
+            "added": self.added,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": dict(self.dropped),
+            "user_lookups": self.user_lookups,
+            "cached_users": len(self._user_pk),
+        }
+
+
+botlog_buffer = BotLogBuffer(
+    batch_size=LogBufferConfig.BATCH_SIZE,
+    flush_interval=LogBufferConfig.FLUSH_INTERVAL_MS / 1000,
+    max_size=LogBufferConfig.MAX_SIZE,
+    reserve=LogBufferConfig.RESERVE,
+    missing_user_ttl=LogBufferConfig.MISSING_USER_TTL,
+)
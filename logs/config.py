@@ -4,6 +4,16 @@ class LogConfig:
     
     # Включить/выключить автоматическую очистку старых логов
     AUTO_CLEANUP_ENABLED = True
+
+    # Секционированная таблица: сколько дневных секций создавать наперед
+    PARTITION_DAYS_AHEAD = 3
+
+    # Таблица без секций: логов в одном DELETE и пауза между ними (сек)
+    DELETE_CHUNK_SIZE = 5000
+    DELETE_CHUNK_PAUSE = 0.1
+
+    # Админка по умолчанию показывает логи только за последние N часов
+    ADMIN_DEFAULT_HOURS = 24
     
     # Префиксы для сообщений логов
     PREFIXES = {
@@ -32,4 +42,20 @@ LOG_COMPONENTS = {
         'enabled': True,
         'levels': ['INFO', 'WARNING', 'ERROR', 'DEBUG'],
     }
-} 
\ No newline at end of file
+} 
+
+class LogBufferConfig:
+    # Записей в одном bulk_create
+    BATCH_SIZE = 200
+
+    # Максимальная задержка записи лога в БД (мс)
+    FLUSH_INTERVAL_MS = 500
+
+    # Размер буфера: сверх него DEBUG/INFO отбрасываются
+    MAX_SIZE = 10000
+
+    # Дополнительное место в буфере только для WARNING/ERROR
+    RESERVE = 2000
+
+    # Сколько секунд помнить, что пользователя с таким telegram_id нет
+    MISSING_USER_TTL = 60
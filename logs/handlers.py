@@ -1,12 +1,13 @@
 import logging
 import asyncio
-from asgiref.sync import sync_to_async
+from .buffer import botlog_buffer
 from .models import BotLog, LogLevel
 
 
 class AsyncDatabaseHandler(logging.Handler):
     """
     Обработчик логов, который асинхронно записывает логи в базу данных
+    через буфер logs.buffer.botlog_buffer
     """
 
     def __init__(self, *args, **kwargs):
@@ -14,6 +15,9 @@ class AsyncDatabaseHandler(logging.Handler):
         super().__init__(*args, **kwargs)
 
     def emit(self, record):
+        # Ошибки самого буфера не пишем обратно в БД
+        if record.name.startswith("logs.buffer"):
+            return
         try:
             # Форматирование сообщения
             msg = self.format(record)
@@ -37,20 +41,20 @@ class AsyncDatabaseHandler(logging.Handler):
                 "exc_info": record.exc_info is not None,
             }
 
-            # Безопасная проверка наличия running loop
-            try:
-                loop = asyncio.get_running_loop()
-                # Мы внутри async контекста - используем create_task
-                asyncio.create_task(self._emit_async(msg, level, extra_data))
-            except RuntimeError:
-                # Нет running loop - делаем синхронную запись
+            # В процессе бота запись уходит в общий буфер (пачками через bulk_create),
+            # без event loop (админка, management-команды) — сразу в БД, как раньше
+            if botlog_buffer.is_running or _has_running_loop():
+                botlog_buffer.add(msg, level=level, extra_data=extra_data)
+            else:
                 BotLog.objects.create(level=level, message=msg, extra_data=extra_data)
 
         except Exception:
             self.handleError(record)
 
-    async def _emit_async(self, msg, level, extra_data):
-        """Асинхронная функция для записи лога в БД"""
-        await sync_to_async(BotLog.objects.create)(
-            level=level, message=msg, extra_data=extra_data
-        )
+
+def _has_running_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
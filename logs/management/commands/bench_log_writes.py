@@ -0,0 +1,136 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from logs.buffer import BotLogBuffer
+from logs.config import LogBufferConfig
+from logs.models import BotLog, LogLevel
+from users.models import User
+
+LOCAL_HOSTS = ("", "localhost", "127.0.0.1", "::1")
+
+LEVELS = [LogLevel.DEBUG, LogLevel.INFO, LogLevel.INFO, LogLevel.INFO, LogLevel.WARNING, LogLevel.ERROR]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает запись BotLog по одной строке (create + поиск User на каждую запись) '
+        'и через буфер logs.buffer (bulk_create). Тестовые логи удаляются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=20000, help='Логов на каждый способ (по умолчанию: 20000)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=LogBufferConfig.BATCH_SIZE,
+            help=f'Размер пачки буфера (по умолчанию: {LogBufferConfig.BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--flush-ms',
+            type=int,
+            default=LogBufferConfig.FLUSH_INTERVAL_MS,
+            help=f'Интервал сброса буфера, мс (по умолчанию: {LogBufferConfig.FLUSH_INTERVAL_MS})'
+        )
+        parser.add_argument('--skip-per-row', action='store_true', help='Замерить только буфер')
+        parser.add_argument('--force', action='store_true', help='Разрешить запуск на нелокальном хосте БД')
+
+    def handle(self, *args, **options):
+        host = connection.settings_dict.get('HOST') or ''
+        if host not in LOCAL_HOSTS and not options['force']:
+            raise CommandError(f'БД на хосте "{host}" не выглядит локальной. Используйте --force, если это тестовая база.')
+        if options['records'] < 1:
+            raise CommandError('--records должен быть больше 0')
+
+        run_id = uuid.uuid4().hex
+        telegram_ids = list(User.objects.values_list('telegram_id', flat=True)[:50]) or [None]
+        records = [
+            (
+                LEVELS[i % len(LEVELS)],
+                f'bench log message {i}',
+                telegram_ids[i % len(telegram_ids)],
+                {'bench': run_id, 'i': i},
+            )
+            for i in range(options['records'])
+        ]
+
+        results = []
+        try:
+            if not options['skip_per_row']:
+                results.append(asyncio.run(self._per_row(records)))
+            results.append(asyncio.run(self._buffered(records, options['batch_size'], options['flush_ms'] / 1000)))
+        finally:
+            deleted, _ = BotLog.objects.filter(extra_data__bench=run_id).delete()
+            self.stdout.write(f'Тестовые логи удалены: {deleted}')
+
+        self._report(results)
+
+    async def _per_row(self, records):
+        """Прежний путь: задача на каждую запись, поиск User и BotLog.objects.create."""
+
+        def write(level, message, telegram_id, extra_data):
+            user = User.objects.filter(telegram_id=telegram_id).first() if telegram_id is not None else None
+            BotLog.objects.create(level=level, message=message, user=user, extra_data=extra_data)
+
+        started = time.perf_counter()
+        enqueue = []
+        tasks = []
+        for level, message, telegram_id, extra_data in records:
+            t0 = time.perf_counter()
+            tasks.append(asyncio.create_task(sync_to_async(write)(level, message, telegram_id, extra_data)))
+            enqueue.append(time.perf_counter() - t0)
+        await asyncio.gather(*tasks)
+        return self._result('per-row', records, started, enqueue, queries=2 * len(records))
+
+    async def _buffered(self, records, batch_size, flush_interval):
+        buffer = BotLogBuffer(
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            max_size=len(records),
+            reserve=0,
+        )
+        started = time.perf_counter()
+        enqueue = []
+        for level, message, telegram_id, extra_data in records:
+            t0 = time.perf_counter()
+            buffer.add(message, level=level, telegram_id=telegram_id, extra_data=extra_data)
+            enqueue.append(time.perf_counter() - t0)
+            if len(enqueue) % batch_size == 0:
+                # Отдаем управление фоновому сбросу, как в работающем боте
+                await asyncio.sleep(0)
+        await buffer.stop(timeout=600)
+        result = self._result('buffered', records, started, enqueue, queries=buffer.flushes + buffer.user_lookups)
+        result['dropped'] = sum(buffer.dropped.values())
+        return result
+
+    def _result(self, name, records, started, enqueue, queries):
+        elapsed = time.perf_counter() - started
+        enqueue_us = sorted(t * 1_000_000 for t in enqueue)
+        return {
+            'path': name,
+            'records': len(records),
+            'seconds': round(elapsed, 3),
+            'records_per_sec': round(len(records) / elapsed) if elapsed else None,
+            'enqueue_median_us': round(statistics.median(enqueue_us), 1),
+            'enqueue_p99_us': round(enqueue_us[max(0, int(len(enqueue_us) * 0.99) - 1)], 1),
+            'queries': queries,
+            'dropped': 0,
+        }
+
+    def _report(self, results):
+        self.stdout.write(
+            f'\n{"path":<10} {"records":>8} {"seconds":>9} {"rec/s":>9} '
+            f'{"enq med, us":>12} {"enq p99, us":>12} {"queries":>8} {"dropped":>8}'
+        )
+        for r in results:
+            self.stdout.write(
+                f'{r["path"]:<10} {r["records"]:>8} {r["seconds"]:>9} {r["records_per_sec"]:>9} '
+                f'{r["enqueue_median_us"]:>12} {r["enqueue_p99_us"]:>12} {r["queries"]:>8} {r["dropped"]:>8}'
+            )
+        if len(results) == 2 and results[0]['records_per_sec'] and results[1]['records_per_sec']:
+            self.stdout.write(f'Ускорение записи: x{results[1]["records_per_sec"] / results[0]["records_per_sec"]:.1f}')
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from logs.config import LogConfig
+from logs.partitions import (
+    convert_to_partitioned,
+    is_partitioned,
+    list_partitions,
+    maintain_partitions,
+)
+from logs.services import cleanup_old_logs_async
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание дневных секций таблицы логов (PostgreSQL): создает секции наперед '
+        'и удаляет устаревшие целиком. --convert переводит обычную таблицу в секционированную.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=LogConfig.RETENTION_DAYS,
+            help=f'Сколько дней хранить логи (по умолчанию: {LogConfig.RETENTION_DAYS})'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=LogConfig.PARTITION_DAYS_AHEAD,
+            help=f'На сколько дней вперед создавать секции (по умолчанию: {LogConfig.PARTITION_DAYS_AHEAD})'
+        )
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Перевести logs_botlog в секционированную таблицу (переносятся только логи за --days дней)'
+        )
+        parser.add_argument('--status', action='store_true', help='Только показать секции')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days должен быть больше 0')
+
+        if connection.vendor != 'postgresql':
+            if options['convert']:
+                raise CommandError('Секционирование логов поддерживается только в PostgreSQL')
+            self.stdout.write(self.style.WARNING('БД без секционирования, очистка пачками DELETE'))
+            self._fallback(options['days'])
+            return
+
+        if options['convert']:
+            if is_partitioned():
+                self.stdout.write('Таблица логов уже секционирована')
+            else:
+                started = time.perf_counter()
+                copied = convert_to_partitioned(options['days'], options['ahead'])
+                self.stdout.write(
+                    self.style.SUCCESS(f'Таблица логов секционирована: перенесено {copied} строк '
+                                       f'за {time.perf_counter() - started:.1f}с')
+                )
+
+        if not is_partitioned():
+            if options['status']:
+                self.stdout.write('Таблица логов не секционирована (используйте --convert)')
+                return
+            self.stdout.write(self.style.WARNING('Таблица логов не секционирована, очистка пачками DELETE'))
+            self._fallback(options['days'])
+            return
+
+        if not options['status']:
+            result = maintain_partitions(options['days'], options['ahead'])
+            for name in result['created']:
+                self.stdout.write(f'Создана секция {name}')
+            for name in result['dropped']:
+                self.stdout.write(f'Удалена секция {name}')
+            self.stdout.write(
+                self.style.SUCCESS(f'Создано секций: {len(result["created"])}, удалено: {len(result["dropped"])} '
+                                   f'(~{result["deleted_rows"]} логов)')
+            )
+
+        for name, day, estimate in list_partitions():
+            self.stdout.write(f'  {name}  {day}  ~{estimate} строк')
+
+    def _fallback(self, days):
+        started = time.perf_counter()
+        deleted = asyncio.run(cleanup_old_logs_async(days=days))
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено {deleted} логов старше {days} дней за {time.perf_counter() - started:.1f}с')
+        )
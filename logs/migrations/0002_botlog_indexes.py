@@ -0,0 +1,23 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY не работает внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('logs', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='botlog',
+            index=models.Index(fields=['-timestamp'], name='botlog_timestamp_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='botlog',
+            index=models.Index(fields=['level', '-timestamp'], name='botlog_level_ts_idx'),
+        ),
+    ]
@@ -31,6 +31,12 @@ class BotLog(models.Model):
         verbose_name = 'Лог'
         verbose_name_plural = 'Логи'
         ordering = ['-timestamp']
+        indexes = [
+            # Очистка старых логов и список в админке
+            models.Index(fields=['-timestamp'], name='botlog_timestamp_idx'),
+            # Фильтр по уровню в админке
+            models.Index(fields=['level', '-timestamp'], name='botlog_level_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.timestamp} [{self.level}] - {self.message[:50]}"
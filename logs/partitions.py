@@ -0,0 +1,213 @@
+import logging
+import re
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Tuple
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .config import LogConfig
+from .models import BotLog
+
+logger = logging.getLogger(__name__)
+
+TABLE = BotLog._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+LEGACY_TABLE = f"{TABLE}_legacy"
+SEQUENCE = f"{TABLE}_id_seq"
+PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{8}})$")
+
+# Секции — по дням UTC: [00:00, 00:00 следующего дня)
+
+
+def partition_name(day: date) -> str:
+    return f"{TABLE}_p{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def _utc_today() -> date:
+    return timezone.now().astimezone(dt_timezone.utc).date()
+
+
+def is_partitioned() -> bool:
+    """True, если logs_botlog — секционированная таблица PostgreSQL."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions() -> List[Tuple[str, date, int]]:
+    """Дневные секции: (имя, день, примерное число строк по статистике), по возрастанию дня."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, estimate in rows:
+        match = PARTITION_RE.match(name)
+        if match:
+            day = datetime.strptime(match.group(1), "%Y%m%d").date()
+            partitions.append((name, day, max(estimate, 0)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def _create_partition(cursor, day: date) -> None:
+    name = partition_name(day)
+    start, end = _day_start(day).isoformat(), _day_start(day + timedelta(days=1)).isoformat()
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    # Строки этого дня, попавшие в default-секцию, пока дневной секции не было
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *
+        )
+        INSERT INTO "{name}" SELECT * FROM moved
+        """,
+        [start, end],
+    )
+    cursor.execute(f"""ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM ('{start}') TO ('{end}')""")
+
+
+def ensure_partitions(days_ahead: int = LogConfig.PARTITION_DAYS_AHEAD) -> List[str]:
+    """Создает секции на сегодня и days_ahead дней вперед. Возвращает имена созданных."""
+    existing = {day for _, day, _ in list_partitions()}
+    today = _utc_today()
+    created = []
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day in existing:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            _create_partition(cursor, day)
+        created.append(partition_name(day))
+    return created
+
+
+def drop_expired_partitions(retention_days: int) -> Tuple[List[str], int]:
+    """
+    Удаляет секции, все строки которых старше retention_days.
+
+    DROP TABLE секции берет короткую эксклюзивную блокировку родительской
+    таблицы; lock_timeout не дает ей встать в очередь за долгим запросом и
+    задержать запись логов — секция удалится при следующем запуске.
+    Возвращает (имена удаленных секций, примерное число строк в них).
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    dropped, rows = [], 0
+    for name, day, estimate in list_partitions():
+        if _day_start(day + timedelta(days=1)) > cutoff:
+            break
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = '5s'")
+                cursor.execute(f'DROP TABLE "{name}"')
+        except DatabaseError as e:
+            logger.warning(f"Не удалось удалить секцию логов {name}: {e}")
+            continue
+        dropped.append(name)
+        rows += estimate
+
+    # В default-секцию попадают только строки вне созданных дней — там их немного
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" < %s', [cutoff])
+        rows += cursor.rowcount
+    return dropped, rows
+
+
+def maintain_partitions(retention_days: int, days_ahead: int = LogConfig.PARTITION_DAYS_AHEAD) -> Dict[str, Any]:
+    """Обслуживание секционированной таблицы: секции наперед и удаление устаревших."""
+    created = ensure_partitions(days_ahead)
+    dropped, rows = drop_expired_partitions(retention_days)
+    return {"created": created, "dropped": dropped, "deleted_rows": rows}
+
+
+def delete_old_chunk(cutoff: datetime, chunk_size: int = LogConfig.DELETE_CHUNK_SIZE) -> int:
+    """
+    Запасной путь для БД без секций: удаляет не больше chunk_size логов старше cutoff.
+
+    Короткие DELETE по первичному ключу не держат долгих блокировок;
+    вызывающий код повторяет, пока удалено ровно chunk_size.
+    """
+    ids = list(
+        BotLog.objects.filter(timestamp__lt=cutoff).order_by().values_list("id", flat=True)[:chunk_size]
+    )
+    if not ids:
+        return 0
+    deleted, _ = BotLog.objects.filter(id__in=ids).delete()
+    return deleted
+
+
+def convert_to_partitioned(retention_days: int, days_ahead: int = LogConfig.PARTITION_DAYS_AHEAD) -> int:
+    """
+    Переводит обычную таблицу logs_botlog в секционированную по дням.
+
+    Переносятся только логи за последние retention_days дней, остальные
+    удаляются вместе со старой таблицей. Выполняется в одной транзакции под
+    эксклюзивной блокировкой: на время переноса запись логов ждет.
+    Первичный ключ становится (id, timestamp) — так требует PostgreSQL;
+    уникальность id по-прежнему обеспечивает последовательность.
+    Возвращает число перенесенных строк.
+    """
+    if connection.vendor != "postgresql":
+        raise DatabaseError("Секционирование логов поддерживается только в PostgreSQL")
+    if is_partitioned():
+        return 0
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE')
+
+        # Вторичные индексы и внешние ключи пересоздаются на новой таблице под теми же именами
+        cursor.execute(
+            """
+            SELECT indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = %s
+              AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))
+            """,
+            [TABLE, TABLE],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min("timestamp") FROM "{TABLE}" WHERE "timestamp" >= %s', [cutoff])
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}") PARTITION BY RANGE ("timestamp")')
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+        today = _utc_today()
+        day = oldest.astimezone(dt_timezone.utc).date() if oldest else today
+        while day <= today + timedelta(days=days_ahead):
+            _create_partition(cursor, day)
+            day += timedelta(days=1)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{LEGACY_TABLE}" WHERE "timestamp" >= %s', [cutoff])
+        copied = cursor.rowcount
+        cursor.execute(f'DROP TABLE "{LEGACY_TABLE}"')
+
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"')
+        cursor.execute(f"""ALTER TABLE "{TABLE}" ALTER COLUMN "id" SET DEFAULT nextval('"{SEQUENCE}"')""")
+        cursor.execute(f"""SELECT setval('"{SEQUENCE}"', COALESCE((SELECT max("id") FROM "{TABLE}"), 0) + 1, false)""")
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY ("id", "timestamp")')
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+        cursor.execute(f'ANALYZE "{TABLE}"')
+    return copied
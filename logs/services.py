@@ -3,26 +3,35 @@ import json
 from asgiref.sync import sync_to_async
 from django.utils import timezone
 from datetime import timedelta
+from .buffer import botlog_buffer
+from .config import LogConfig
 from .models import BotLog, LogLevel
+from .partitions import delete_old_chunk, is_partitioned, maintain_partitions
 
 async def log_async(
     message, 
     level=LogLevel.INFO, 
     user=None, 
-    extra_data=None
+    extra_data=None,
+    telegram_id=None
 ):
     """
     Асинхронно записывает лог в базу данных
     
+    Запись попадает в буфер logs.buffer.botlog_buffer и пишется в БД пачкой
+    в течение LogBufferConfig.FLUSH_INTERVAL_MS.
+    
     :param message: Текст сообщения
     :param level: Уровень логирования (DEBUG, INFO, WARNING, ERROR)
     :param user: Объект пользователя (опционально)
     :param extra_data: Дополнительные данные в формате dict (опционально)
+    :param telegram_id: telegram_id пользователя, если объекта User нет (опционально)
     """
-    await sync_to_async(BotLog.objects.create)(
+    botlog_buffer.add(
+        message,
         level=level,
         user=user,
-        message=message,
+        telegram_id=telegram_id,
         extra_data=extra_data
     )
 
@@ -30,11 +39,23 @@ async def cleanup_old_logs_async(days=7):
     """
     Асинхронно удаляет логи старше указанного количества дней
     
+    Секционированная таблица (PostgreSQL): создаются секции наперед и
+    удаляются целые устаревшие секции — без DELETE по строкам.
+    Без секций: DELETE пачками по LogConfig.DELETE_CHUNK_SIZE с паузой,
+    чтобы не держать долгую блокировку и не занимать поток БД.
+    
     :param days: Количество дней, после которых логи удаляются
+    :return: Количество удаленных логов (для секций — по статистике PostgreSQL)
     """
+    if await sync_to_async(is_partitioned)():
+        result = await sync_to_async(maintain_partitions)(days)
+        return result['deleted_rows']
+
     cutoff_date = timezone.now() - timedelta(days=days)
-    deleted_count, _ = await sync_to_async(BotLog.objects.filter(
-        timestamp__lt=cutoff_date
-    ).delete)()
-    
-    return deleted_count 
\ No newline at end of file
+    deleted_count = 0
+    while True:
+        deleted = await sync_to_async(delete_old_chunk)(cutoff_date, LogConfig.DELETE_CHUNK_SIZE)
+        deleted_count += deleted
+        if deleted < LogConfig.DELETE_CHUNK_SIZE:
+            return deleted_count
+        await asyncio.sleep(LogConfig.DELETE_CHUNK_PAUSE)
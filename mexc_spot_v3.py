@@ -3,13 +3,18 @@ import hmac
 import hashlib
 from urllib.parse import urlencode, quote
 import config
+from bot.utils.clock_sync import exchange_clock
 
 # ServerTime、Signature
 class TOOL(object):
 
     @staticmethod
     def _get_server_time():
-        return requests.request('get', 'https://api.mexc.com/api/v3/time').json()['serverTime']
+        # Shared exchange clock instead of a blocking /api/v3/time call per request.
+        # Without a background sync (plain sync scripts) refresh it at most once per interval.
+        if not exchange_clock.is_synced or exchange_clock.is_stale:
+            exchange_clock.refresh_blocking()
+        return exchange_clock.now_ms()
 
     def _sign_v3(self, req_time, sign_params=None):
         if sign_params:
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк: стоимость одного тика bookTicker для состояния автобая.
+
+Сравнивает старое представление (dict со строковыми ключами) и AutobuyState
+со __slots__ на одинаковой последовательности операций, которую выполняет
+колбэк автобая на каждом тике: обновление current_price и ask/mid тика,
+проверка триггера/паузы и проверка падения. Плюс размер состояния в памяти.
+
+    python scripts/bench_autobuy_state.py [ticks]
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bot.utils.autobuy_state import AutobuyState, ActiveOrder
+
+
+def make_dict_state():
+    return {
+        "active_orders": [{"order_id": "1", "buy_price": 1.0, "notified": False, "user_order_number": 1}],
+        "last_buy_price": 1.0,
+        "current_price": None,
+        "price_callbacks": [],
+        "bookticker_callbacks": [],
+        "last_trade_time": 0,
+        "is_ready": True,
+        "waiting_for_opportunity": False,
+        "restart_after": 0,
+        "waiting_reported": False,
+        "consecutive_errors": 0,
+        "last_drop_notification": 0,
+        "last_rise_notification": 0,
+        "last_buy_success_time": 0,
+        "last_order_filled_time": 0,
+        "trigger_price": 1.0005,
+        "trigger_time": 0,
+        "trigger_activated_time": 0,
+        "is_rise_trigger": True,
+        "is_trigger_activated": False,
+        "pause_trend_prices": [],
+        "trend_only_rise": True,
+        "last_pause_price": None,
+        "rise_buy_count": 0,
+        "last_ask_price": None,
+        "last_mid_price": None,
+        "buy_in_progress": False,
+        "buy_lock": asyncio.Lock(),
+    }
+
+
+def make_slots_state():
+    state = AutobuyState()
+    state.add_order(ActiveOrder("1", 1.0, 1))
+    state.last_buy_price = 1.0
+    state.is_ready = True
+    state.arm_rise_trigger(1.0005, 0.0)
+    return state
+
+
+def dict_tick(states, telegram_id, bid, ask, now):
+    mid = (bid + ask) / 2
+    autobuy_states = states
+    autobuy_states[telegram_id]["current_price"] = mid
+
+    state = autobuy_states[telegram_id]
+    prev_ask = state.get("last_ask_price")
+    prev_mid = state.get("last_mid_price")
+    state["last_ask_price"] = ask
+    state["last_mid_price"] = mid
+    if state.get("is_rise_trigger") and state.get("trigger_price") is not None:
+        trigger = state["trigger_price"]
+        if not state.get("is_trigger_activated", False):
+            if prev_ask is not None and (prev_ask <= trigger < ask or prev_ask >= trigger > ask):
+                state["is_trigger_activated"] = True
+                state["trigger_activated_time"] = now
+                state["pause_trend_prices"] = [mid]
+                state["trend_only_rise"] = True
+                state["last_pause_price"] = mid
+        else:
+            if prev_mid is not None and mid < prev_mid:
+                state["is_rise_trigger"] = True
+                state["is_trigger_activated"] = False
+                state["trigger_activated_time"] = 0
+                state["pause_trend_prices"] = []
+                state["trend_only_rise"] = True
+                state["last_pause_price"] = None
+
+    last_buy = autobuy_states[telegram_id]["last_buy_price"]
+    if last_buy is not None:
+        drop = (last_buy - ask) / last_buy * 100
+        last_drop = autobuy_states[telegram_id].get("last_drop_notification", 0)
+        if drop >= 50 and now - last_drop > 10:
+            autobuy_states[telegram_id]["last_drop_notification"] = now
+        if autobuy_states.get(telegram_id, {}).get("buy_in_progress"):
+            return
+
+
+def slots_tick(states, telegram_id, bid, ask, now):
+    mid = (bid + ask) / 2
+    state = states[telegram_id]
+    state.current_price = mid
+
+    prev_ask, prev_mid = state.last_ask_price, state.last_mid_price
+    state.last_ask_price = ask
+    state.last_mid_price = mid
+    if state.is_rise_trigger and state.trigger_price is not None:
+        trigger = state.trigger_price
+        if not state.is_trigger_activated:
+            if prev_ask is not None and (prev_ask <= trigger < ask or prev_ask >= trigger > ask):
+                state.is_trigger_activated = True
+                state.trigger_activated_time = now
+        else:
+            if prev_mid is not None and mid < prev_mid:
+                state._clear_pause()
+
+    last_buy = state.last_buy_price
+    if last_buy is not None:
+        drop = (last_buy - ask) / last_buy * 100
+        if drop >= 50 and now - state.last_drop_notification > 10:
+            state.last_drop_notification = now
+        if state.buy_in_progress:
+            return
+
+
+def make_ticks(n):
+    ticks = []
+    for i in range(n):
+        ask = 1.0 + ((i % 20) - 10) * 0.0001
+        ticks.append((ask - 0.0001, ask, float(i)))
+    return ticks
+
+
+def run(name, tick_fn, states, ticks):
+    started = time.perf_counter()
+    for bid, ask, now in ticks:
+        tick_fn(states, 1, bid, ask, now)
+    elapsed = time.perf_counter() - started
+    ns_per_tick = elapsed / len(ticks) * 1e9
+    print(f"{name:<14} {ns_per_tick:8.1f} ns/tick  ({len(ticks)} ticks, {elapsed * 1000:.1f} ms)")
+    return ns_per_tick
+
+
+def measure_memory(factory, count=1000):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del objects
+    return total / count
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    ticks = make_ticks(n)
+
+    # Прогрев
+    run("warmup dict", dict_tick, {1: make_dict_state()}, ticks[:10_000])
+    run("warmup slots", slots_tick, {1: make_slots_state()}, ticks[:10_000])
+    print()
+
+    dict_ns = run("dict state", dict_tick, {1: make_dict_state()}, ticks)
+    slots_ns = run("AutobuyState", slots_tick, {1: make_slots_state()}, ticks)
+    print(f"speedup: x{dict_ns / slots_ns:.2f}")
+    print()
+
+    print(f"memory per user, dict state:   {measure_memory(make_dict_state):8.0f} B")
+    print(f"memory per user, AutobuyState: {measure_memory(make_slots_state):8.0f} B")
+
+
+if __name__ == "__main__":
+    main()
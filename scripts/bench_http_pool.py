@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: новая ClientSession на каждый запрос против общего keep-alive пула.
+
+Делает N последовательных запросов GET /api/v3/time к api.mexc.com двумя
+способами и печатает число TCP(+TLS) рукопожатий и задержку запроса
+(среднее, p50, p95).
+
+per-request — как раньше в MexcRestClient._request: новая сессия и коннектор
+pooled      — bot.utils.http_session.HttpSessionPool
+
+    python scripts/bench_http_pool.py [requests] [url]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bot.utils.http_session import HttpSessionPool
+
+URL = sys.argv[2] if len(sys.argv) > 2 else "https://api.mexc.com/api/v3/time"
+
+
+def _counting_trace(counter):
+    trace = aiohttp.TraceConfig()
+
+    async def on_connection_create_end(session, ctx, params):
+        counter["handshakes"] += 1
+
+    trace.on_connection_create_end.append(on_connection_create_end)
+    return trace
+
+
+async def per_request(n):
+    counter = {"handshakes": 0}
+    latencies = []
+    for _ in range(n):
+        started = time.perf_counter()
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=10),
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=10, enable_cleanup_closed=True),
+            trace_configs=[_counting_trace(counter)],
+        ) as session:
+            async with session.get(URL) as resp:
+                await resp.read()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return counter["handshakes"], latencies
+
+
+async def pooled(n):
+    pool = HttpSessionPool()
+    latencies = []
+    try:
+        for _ in range(n):
+            started = time.perf_counter()
+            session = await pool.get_session()
+            async with session.get(URL, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                await resp.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return pool.handshakes, latencies
+    finally:
+        await pool.close()
+
+
+def report(label, handshakes, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:<12} requests={len(latencies):<4} handshakes={handshakes:<4} "
+        f"avg={statistics.mean(latencies):7.1f} ms  p50={statistics.median(latencies):7.1f} ms  p95={p95:7.1f} ms"
+    )
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    report("per-request", *await per_request(n))
+    report("pooled", *await pooled(n))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: декодирование protobuf кадров MEXC.
+
+dict   — decode_push_message: вложенный словарь с дублями ключей,
+         каждый потребитель сам делает float() из строк цены.
+event  — decode_push_event: BookTick / DealTick / OrderUpdate со __slots__,
+         цены разобраны один раз при декодировании.
+
+Колонка "+N consumers" — декодирование плюс чтение bid/ask числами
+N потребителями (как кэш, трекер направления и колбэки на одном тике).
+
+drop   — кадр без потребителей: peek_push_channel читает только канал,
+         против полного decode_push_event, как было до отбрасывания.
+
+    python scripts/bench_pb_decode.py [frames]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bot.utils.websocket_pb import PushDataV3ApiWrapper_pb2
+from bot.utils.ws.pb_decoder import decode_push_event, decode_push_message, peek_push_channel
+
+CONSUMERS = 4
+
+
+def make_frames(count):
+    frames = {"bookTicker": [], "deals": [], "orders": []}
+    for i in range(count):
+        price = f"{1.0 + (i % 40) * 0.0001:.6f}"
+
+        wrapper = PushDataV3ApiWrapper_pb2.PushDataV3ApiWrapper()
+        wrapper.channel = "spot@public.aggre.bookTicker.v3.api.pb@100ms@BENCHUSDT"
+        wrapper.symbol = "BENCHUSDT"
+        wrapper.sendTime = 1_700_000_000_000 + i
+        book = wrapper.publicAggreBookTicker
+        book.bidPrice, book.askPrice = price, f"{float(price) + 0.0001:.6f}"
+        book.bidQuantity, book.askQuantity = "1200.5", "830.25"
+        frames["bookTicker"].append(wrapper.SerializeToString())
+
+        wrapper = PushDataV3ApiWrapper_pb2.PushDataV3ApiWrapper()
+        wrapper.channel = "spot@public.aggre.deals.v3.api.pb@100ms@BENCHUSDT"
+        wrapper.symbol = "BENCHUSDT"
+        wrapper.sendTime = 1_700_000_000_000 + i
+        for j in range(3):
+            deal = wrapper.publicAggreDeals.deals.add()
+            deal.price, deal.quantity, deal.tradeType, deal.time = price, "10.5", 1 + j % 2, 1_700_000_000_000 + i
+        frames["deals"].append(wrapper.SerializeToString())
+
+        wrapper = PushDataV3ApiWrapper_pb2.PushDataV3ApiWrapper()
+        wrapper.channel = "spot@private.orders.v3.api.pb"
+        wrapper.symbol = "BENCHUSDT"
+        wrapper.sendTime = 1_700_000_000_000 + i
+        order = wrapper.privateOrders
+        order.id, order.price, order.quantity, order.avgPrice = f"C02__{i}", price, "100", price
+        order.cumulativeQuantity, order.cumulativeAmount, order.status = "100", "100.5", 2
+        frames["orders"].append(wrapper.SerializeToString())
+    return frames
+
+
+def dict_consumers(frame):
+    data = decode_push_message(frame)
+    book = data.get("publicbookticker")
+    if book:
+        for _ in range(CONSUMERS):
+            float(book["bidprice"]), float(book["askprice"])
+
+
+def event_consumers(frame):
+    event = decode_push_event(frame)
+    for _ in range(CONSUMERS):
+        event.bid, event.ask
+
+
+def bench(fn, frames):
+    started = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    return len(frames) / (time.perf_counter() - started)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    frames = make_frames(count)
+    print(f"{'channel':>11} {'dict fr/s':>12} {'event fr/s':>12} {'speedup':>8}")
+    for channel, channel_frames in frames.items():
+        as_dict = bench(decode_push_message, channel_frames)
+        as_event = bench(decode_push_event, channel_frames)
+        print(f"{channel:>11} {as_dict:>12,.0f} {as_event:>12,.0f} {as_event / as_dict:>7.2f}x")
+
+    book_frames = frames["bookTicker"]
+    as_dict = bench(dict_consumers, book_frames)
+    as_event = bench(event_consumers, book_frames)
+    print(f"\nbookTicker +{CONSUMERS} consumers: dict {as_dict:,.0f} fr/s, event {as_event:,.0f} fr/s "
+          f"({as_event / as_dict:.2f}x)")
+
+    print(f"\n{'drop':>11} {'decode fr/s':>12} {'peek fr/s':>12} {'speedup':>8}")
+    for channel in ("bookTicker", "deals"):
+        decoded = bench(decode_push_event, frames[channel])
+        peeked = bench(peek_push_channel, frames[channel])
+        print(f"{channel:>11} {decoded:>12,.0f} {peeked:>12,.0f} {peeked / decoded:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
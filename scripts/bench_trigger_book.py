@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: проверка условий автобая на тике для N пользователей одной пары.
+
+scan  — проход по всем строкам книги на каждом тике, как делали
+        прежние колбэки на пользователя (пересечение триггера, пауза,
+        проверка падения);
+book  — SymbolTriggerBook.evaluate по индексам уровней.
+
+busy  — цена гуляет через уровни триггеров и падения пользователей;
+quiet — цена колеблется в стороне от всех уровней (обычный тихий рынок).
+
+    python scripts/bench_trigger_book.py [ticks]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bot.utils.autobuy_state import AutobuyState
+from bot.utils.autobuy_triggers import SymbolTriggerBook
+
+
+class _Settings:
+    autobuy = True
+    is_complete = True
+    loss = 2.0
+    pause = 30
+
+
+def make_book(n):
+    book = SymbolTriggerBook("BENCH")
+    for i in range(n):
+        state = AutobuyState(i)
+        state.last_buy_price = 1.0 + (i % 50) * 0.001
+        state.arm_rise_trigger(1.0 + (i % 37) * 0.0005, 0.0)
+        state.attach_book(book)
+        book.apply_settings(i, _Settings)
+    return book
+
+
+def scan_tick(book, bid, ask, now):
+    # Те же условия, что в evaluate, но без индексов уровней: O(n) на тик
+    mid = (bid + ask) / 2
+    prev_ask, prev_mid = book.prev_ask, book.prev_mid
+    book.prev_ask, book.prev_mid = ask, mid
+    for row in book._rows.values():
+        if not row.enabled:
+            continue
+        if row.armed:
+            trigger = row.trigger
+            if not row.activated:
+                if prev_ask is not None and (prev_ask <= trigger < ask or prev_ask >= trigger > ask):
+                    row.activated = True
+                    row.activated_at = now
+            elif prev_mid is not None and mid < prev_mid:
+                row.armed = row.activated = False
+                row.trigger = None
+            elif now - row.activated_at >= row.pause:
+                row.activated = False
+                if ask > trigger:
+                    row.trigger = ask
+                else:
+                    row.armed = False
+                    row.trigger = None
+        last_buy = row.last_buy
+        if last_buy is not None and last_buy > 0:
+            drop = (last_buy - ask) / last_buy * 100
+            if drop >= row.loss and now - row.last_drop > 10:
+                row.last_drop = now
+
+
+def make_ticks(count, quiet=False):
+    ticks = []
+    for i in range(count):
+        if quiet:
+            ask = 1.05 + (i % 2) * 0.0001
+        else:
+            ask = 1.0 + ((i % 40) - 20) * 0.0002
+        ticks.append((ask - 0.0001, ask, 1_000_000.0 + i * 0.1))
+    return ticks
+
+
+def bench(label, fn, ticks):
+    started = time.perf_counter()
+    for bid, ask, now in ticks:
+        fn(bid, ask, now)
+    return (time.perf_counter() - started) / len(ticks) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for quiet in (False, True):
+        ticks = make_ticks(count, quiet=quiet)
+        print(f"\n{'quiet' if quiet else 'busy'} ticks")
+        print(f"{'users':>7} {'scan us/tick':>14} {'book us/tick':>14} {'speedup':>8}")
+        for n in (1, 10, 100, 1000, 10000):
+            scanned = make_book(n)
+            scan = bench("scan", lambda b, a, t: scan_tick(scanned, b, a, t), ticks)
+
+            indexed = bench("book", make_book(n).evaluate, ticks)
+
+            print(f"{n:>7} {scan:>14.1f} {indexed:>14.1f} {scan / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
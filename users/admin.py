@@ -1,5 +1,5 @@
 from django.contrib import admin
-from users.models import User, Deal
+from users.models import User, Deal, DailyPnl, DealCounter
 
 
 @admin.register(User)
@@ -8,4 +8,15 @@ class UserAdmin(admin.ModelAdmin):
     
 @admin.register(Deal)
 class DealAdmin(admin.ModelAdmin):
-    list_display = ('user', 'user_order_number', 'order_id', 'symbol', 'quantity', 'buy_price', 'sell_price', 'status', 'created_at', 'updated_at', 'is_autobuy')
\ No newline at end of file
+    list_display = ('user', 'user_order_number', 'order_id', 'symbol', 'quantity', 'buy_price', 'sell_price', 'status', 'created_at', 'updated_at', 'is_autobuy')
+
+
+@admin.register(DailyPnl)
+class DailyPnlAdmin(admin.ModelAdmin):
+    list_display = ('user', 'day', 'deals', 'profit', 'profit_percent_sum', 'updated_at')
+    list_filter = ('day',)
+
+
+@admin.register(DealCounter)
+class DealCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'last_number')
@@ -0,0 +1,89 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+from bot.utils.pnl_rollup import MOSCOW_TZ
+from users.models import DailyPnl, Deal
+
+PNL_FIELD = DecimalField(max_digits=28, decimal_places=8)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневную сводку DailyPnl (по московским дням) из закрытых сделок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='telegram_id пользователя (можно указать несколько раз, по умолчанию: все)'
+        )
+        parser.add_argument('--since', help='Пересчитать только дни начиная с YYYY-MM-DD (по Москве)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки bulk_create (по умолчанию: 1000)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since должен быть в формате YYYY-MM-DD')
+
+        started = time.perf_counter()
+        deals = Deal.objects.filter(status='FILLED', sell_price__isnull=False)
+        rollups = DailyPnl.objects.all()
+        if options['users']:
+            deals = deals.filter(user__telegram_id__in=options['users'])
+            rollups = rollups.filter(user__telegram_id__in=options['users'])
+
+        # Те же формулы, что в bot.utils.pnl_rollup.deal_pnl, но агрегируются в БД
+        daily = (
+            deals.annotate(day=TruncDate('updated_at', tzinfo=MOSCOW_TZ))
+            .values('user_id', 'day')
+            .annotate(
+                deals_count=Count('id'),
+                profit_sum=Sum((F('sell_price') - F('buy_price')) * F('quantity'), output_field=PNL_FIELD),
+                percent_sum=Sum(
+                    Case(
+                        When(buy_price__gt=0, then=(F('sell_price') - F('buy_price')) / F('buy_price') * 100),
+                        default=Value(0),
+                        output_field=PNL_FIELD,
+                    )
+                ),
+            )
+            .order_by()
+        )
+        if since is not None:
+            daily = daily.filter(day__gte=since)
+            rollups = rollups.filter(day__gte=since)
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Живые инкременты (add_filled_deal) ждут окончания пересчета, чтение /stats не блокируется
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LOCK TABLE "{DailyPnl._meta.db_table}" IN EXCLUSIVE MODE')
+
+            deleted, _ = rollups.delete()
+            rows = [
+                DailyPnl(
+                    user_id=row['user_id'],
+                    day=row['day'],
+                    deals=row['deals_count'],
+                    profit=row['profit_sum'] or 0,
+                    profit_percent_sum=row['percent_sum'] or 0,
+                )
+                for row in daily.iterator()
+            ]
+            DailyPnl.objects.bulk_create(rows, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'DailyPnl пересчитан: удалено {deleted}, создано {len(rows)} строк '
+                f'({sum(row.deals for row in rows)} сделок) за {time.perf_counter() - started:.1f}с'
+            )
+        )
@@ -0,0 +1,202 @@
+import json
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from logs.models import BotLog
+from users.models import Deal, User
+
+ACTIVE_STATUSES = ["NEW", "PARTIALLY_FILLED"]
+
+# Индексы из users/0011 и logs/0002: --without-indexes удаляет их внутри транзакции
+BENCH_INDEXES = [
+    'DROP INDEX "deal_active_user_idx"',
+    'DROP INDEX "deal_user_status_upd_idx"',
+    'ALTER TABLE "users_deal" DROP CONSTRAINT "deal_order_id_uniq"',
+    'DROP INDEX "botlog_timestamp_idx"',
+    'DROP INDEX "botlog_level_ts_idx"',
+]
+
+LOCAL_HOSTS = ("", "localhost", "127.0.0.1", "::1")
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет локальный PostgreSQL тестовыми Deal/BotLog и печатает EXPLAIN ANALYZE '
+        'горячих запросов бота. По умолчанию все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Тестовых пользователей (по умолчанию: 2000)')
+        parser.add_argument('--deals', type=int, default=2_000_000, help='Тестовых сделок (по умолчанию: 2000000)')
+        parser.add_argument('--logs', type=int, default=2_000_000, help='Тестовых логов (по умолчанию: 2000000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса, берется медиана (по умолчанию: 5)')
+        parser.add_argument(
+            '--without-indexes',
+            action='store_true',
+            help='Удалить индексы горячих запросов перед замером (для сравнения, откатывается)'
+        )
+        parser.add_argument('--keep', action='store_true', help='Не откатывать тестовые данные')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON файл')
+        parser.add_argument('--force', action='store_true', help='Разрешить запуск на нелокальном хосте БД')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Эта команда работает только с PostgreSQL')
+        host = connection.settings_dict.get('HOST') or ''
+        if host not in LOCAL_HOSTS and not options['force']:
+            raise CommandError(f'БД на хосте "{host}" не выглядит локальной. Используйте --force, если это тестовая база.')
+        if options['keep'] and options['without_indexes']:
+            raise CommandError('--without-indexes нельзя сочетать с --keep')
+
+        results = []
+        try:
+            with transaction.atomic():
+                self._seed(options['users'], options['deals'], options['logs'])
+                if options['without_indexes']:
+                    with connection.cursor() as cursor:
+                        for sql in BENCH_INDEXES:
+                            cursor.execute(sql)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE "users_user"; ANALYZE "users_deal"; ANALYZE "logs_botlog";')
+
+                for name, queryset in self._hot_queries():
+                    results.append(self._measure(name, queryset, options['repeat']))
+
+                if not options['keep']:
+                    raise _Rollback()
+        except _Rollback:
+            self.stdout.write('Тестовые данные откачены')
+
+        self._report(results)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Результаты сохранены в {options["json_path"]}')
+
+    # ---------- данные ----------
+
+    def _seed(self, users, deals, logs):
+        """Генерация строк на стороне БД (generate_series): миллионы строк за секунды."""
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO users_user (name, telegram_id, api_key, api_secret, pair, created_at, buy_amount, autobuy)
+                SELECT 'bench ' || i, 9000000000 + i, 'bench-key-' || i, 'bench-secret-' || i,
+                       'KAS/USDT', now(), 10, (i %% 3 = 0)
+                FROM generate_series(1, %s) AS i
+                """,
+                [users],
+            )
+            cursor.execute("SELECT min(id), max(id) FROM users_user WHERE telegram_id > 9000000000")
+            first_user, last_user = cursor.fetchone()
+
+            # ~97% закрытых сделок, остальное — активные и отмененные, как в рабочей базе
+            cursor.execute(
+                """
+                INSERT INTO users_deal (user_id, order_id, user_order_number, symbol, buy_price, sell_price,
+                                        quantity, status, created_at, updated_at, is_autobuy)
+                SELECT %s + (i %% (%s - %s + 1)), 'bench-' || i, i / (%s - %s + 1) + 1, 'KASUSDT',
+                       0.1 + random() / 100, 0.1 + random() / 100, 100,
+                       CASE WHEN r < 0.97 THEN 'FILLED' WHEN r < 0.98 THEN 'NEW'
+                            WHEN r < 0.99 THEN 'PARTIALLY_FILLED' ELSE 'CANCELED' END,
+                       ts, ts + interval '5 minutes', (i %% 4 <> 0)
+                FROM (
+                    SELECT i, random() AS r, now() - random() * interval '365 days' AS ts
+                    FROM generate_series(1, %s) AS i
+                ) AS s
+                """,
+                [first_user, last_user, first_user, last_user, first_user, deals],
+            )
+
+            cursor.execute(
+                """
+                INSERT INTO logs_botlog (timestamp, level, user_id, message, extra_data)
+                SELECT now() - random() * interval '30 days',
+                       (ARRAY['DEBUG', 'INFO', 'INFO', 'INFO', 'WARNING', 'ERROR'])[1 + (i %% 6)],
+                       NULL, 'bench log message ' || i, NULL
+                FROM generate_series(1, %s) AS i
+                """,
+                [logs],
+            )
+        self.stdout.write(
+            f'Сгенерировано: {users} пользователей, {deals} сделок, {logs} логов '
+            f'за {time.perf_counter() - started:.1f}с'
+        )
+
+    def _hot_queries(self):
+        """Те же запросы ORM, что выполняет бот (см. комментарии)."""
+        user = User.objects.filter(telegram_id__gt=9000000000).order_by('?').first()
+        sample_deal = Deal.objects.filter(user=user).order_by('?').first()
+        now = timezone.now()
+
+        return [
+            # autobuy.py: восстановление и ресинк активных ордеров автобая
+            ('deal_active_autobuy', Deal.objects.filter(
+                user=user, status__in=ACTIVE_STATUSES, is_autobuy=True
+            ).order_by('-created_at')),
+            # trading.py: /orders
+            ('deal_active_user', Deal.objects.filter(
+                user=user, status__in=ACTIVE_STATUSES
+            ).order_by('-created_at')),
+            # reconciler.py: _load_active_deals
+            ('deal_active_all', Deal.objects.filter(status__in=ACTIVE_STATUSES)
+                .exclude(user__api_key__isnull=True)
+                .exclude(user__api_key='')
+                .select_related('user')
+                .order_by('-created_at')),
+            # websocket_handlers.py: update_order_status / handle_autobuy_order_update
+            ('deal_by_order_id', Deal.objects.filter(order_id=sample_deal.order_id)),
+            ('deal_by_order_id_user', Deal.objects.filter(
+                order_id=sample_deal.order_id, user__telegram_id=user.telegram_id
+            )),
+            # stats.py / daily_stats.py: закрытые сделки за период
+            ('deal_stats_period', Deal.objects.filter(
+                user=user,
+                updated_at__range=[now - timedelta(days=30), now],
+                sell_price__isnull=False,
+                status='FILLED',
+            ).order_by('updated_at')),
+            # log_cleaner.py / services.py: удаление старых логов
+            ('botlog_cleanup', BotLog.objects.filter(timestamp__lt=now - timedelta(days=7)).only('id')),
+            # admin: первая страница списка логов
+            ('botlog_admin_page', BotLog.objects.order_by('-timestamp')[:100]),
+            ('botlog_admin_level', BotLog.objects.filter(level='ERROR').order_by('-timestamp')[:100]),
+        ]
+
+    # ---------- замер ----------
+
+    def _measure(self, name, queryset, repeat):
+        timings = []
+        plan = ''
+        for _ in range(max(1, repeat)):
+            plan = queryset.explain(analyze=True, buffers=True)
+            match = re.search(r'Execution Time: ([\d.]+) ms', plan)
+            if match:
+                timings.append(float(match.group(1)))
+        scans = re.findall(r'((?:Parallel )?(?:Index Only Scan|Index Scan|Bitmap Index Scan|Seq Scan)[^(]*)', plan)
+        return {
+            'query': name,
+            'median_ms': round(statistics.median(timings), 3) if timings else None,
+            'max_ms': round(max(timings), 3) if timings else None,
+            'scans': [scan.strip() for scan in scans],
+            'plan': plan,
+        }
+
+    def _report(self, results):
+        self.stdout.write(f'\n{"query":<24} {"median, ms":>12} {"max, ms":>10}  scans')
+        for result in results:
+            scans = '; '.join(result['scans'])
+            has_seq_scan = 'Seq Scan' in scans
+            line = f'{result["query"]:<24} {result["median_ms"]:>12} {result["max_ms"]:>10}  {scans}'
+            self.stdout.write(self.style.WARNING(line) if has_seq_scan else line)
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bot.constants import TICK_RECORDER_DIR
+from bot.utils.replay import AutobuyReplay, ReplayUser, book_ticks
+from bot.utils.tick_recorder import list_days, read_range
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise CommandError(f'Дата "{value}" должна быть в формате YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = (
+        'Ускоренный прогон настоящей логики автобая по записанным тикам bookTicker '
+        '(tick_recorder) с виртуальными часами и симулированной биржей. Работает без сети и БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbol', help='Пара, например KASUSDT')
+        parser.add_argument('--from', dest='date_from', help='Первый день (YYYY-MM-DD, UTC), по умолчанию — первый записанный')
+        parser.add_argument('--to', dest='date_to', help='Последний день включительно (по умолчанию — равен --from)')
+        parser.add_argument(
+            '--user',
+            action='append',
+            default=[],
+            metavar='PROFIT:LOSS:PAUSE[:AMOUNT]',
+            help='Параметры пользователя реплея, можно несколько раз (по умолчанию: 1:1:60)'
+        )
+        parser.add_argument('--buy-amount', type=float, default=10.0, help='Сумма закупки по умолчанию (по умолчанию: 10)')
+        parser.add_argument('--fee', type=float, default=0.0, help='Комиссия в процентах с каждой стороны (по умолчанию: 0)')
+        parser.add_argument('--dir', default=TICK_RECORDER_DIR, help=f'Каталог тиков (по умолчанию: {TICK_RECORDER_DIR})')
+        parser.add_argument('--verbose', action='store_true', help='Не приглушать INFO логи автобая')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON файл')
+
+    def handle(self, *args, **options):
+        symbol = options['symbol'].upper()
+        days = list_days('bookticker', symbol, options['dir'])
+        if not days:
+            raise CommandError(f'Нет записанных тиков bookTicker для {symbol} в {options["dir"]}')
+
+        start = _parse_day(options['date_from']) if options['date_from'] else datetime(
+            days[0].year, days[0].month, days[0].day, tzinfo=timezone.utc
+        )
+        end = (_parse_day(options['date_to']) if options['date_to'] else start) + timedelta(days=1)
+        if end <= start:
+            raise CommandError('--to не может быть раньше --from')
+
+        ticks = read_range('bookticker', symbol, int(start.timestamp() * 1000), int(end.timestamp() * 1000), options['dir'])
+        if not len(ticks):
+            raise CommandError(f'Нет тиков {symbol} за {start:%Y-%m-%d} — {end - timedelta(days=1):%Y-%m-%d}')
+
+        users = [self._parse_user(i + 1, spec, symbol, options['buy_amount']) for i, spec in enumerate(options['user'] or ['1:1:60'])]
+        replay = AutobuyReplay(
+            symbol,
+            users,
+            fee=options['fee'] / 100,
+            log_level=None if options['verbose'] else logging.WARNING,
+        )
+        asyncio.run(replay.run(book_ticks(symbol, ticks)))
+
+        self._report(replay, ticks, options['json_path'])
+
+    def _parse_user(self, telegram_id, spec, symbol, buy_amount):
+        parts = spec.split(':')
+        if len(parts) not in (3, 4):
+            raise CommandError(f'--user "{spec}": нужно PROFIT:LOSS:PAUSE[:AMOUNT]')
+        try:
+            profit, loss, pause = float(parts[0]), float(parts[1]), int(parts[2])
+            amount = float(parts[3]) if len(parts) == 4 else buy_amount
+        except ValueError:
+            raise CommandError(f'--user "{spec}": параметры должны быть числами')
+        return ReplayUser(telegram_id, symbol, profit, loss, pause, amount)
+
+    def _report(self, replay, ticks, json_path):
+        virtual = (int(ticks['ts'][-1]) - int(ticks['ts'][0])) / 1000
+        self.stdout.write(
+            f'{replay.symbol}: {replay.ticks} тиков, {virtual / 3600:.2f} ч рынка за {replay.wall_seconds:.1f} с '
+            f'(x{virtual / replay.wall_seconds if replay.wall_seconds else 0:,.0f}), сообщений в Telegram: {replay.bus.sent}'
+        )
+        self.stdout.write(
+            f'{"user":>5} {"profit":>6} {"loss":>5} {"pause":>5} {"trades":>6} {"sells":>5} {"open":>4} {"max":>4} '
+            f'{"realized":>10} {"unreal":>10} {"pnl":>10} {"lat avg":>8} {"p99 ms":>8}'
+        )
+        results = []
+        for report in replay.reports.values():
+            row = report.as_dict()
+            results.append(row)
+            avg = f'{row["latency_avg_ms"]:.2f}' if row['latency_avg_ms'] is not None else '-'
+            p99 = f'{row["latency_p99_ms"]:.2f}' if row['latency_p99_ms'] is not None else '-'
+            self.stdout.write(
+                f'{row["telegram_id"]:>5} {row["profit"]:>6g} {row["loss"]:>5g} {row["pause"]:>5} {row["trades"]:>6} '
+                f'{row["sells"]:>5} {row["open"]:>4} {row["max_open"]:>4} {row["realized"]:>10.4f} '
+                f'{row["unrealized"]:>10.4f} {row["pnl"]:>10.4f} {avg:>8} {p99:>8}'
+            )
+            if row['errors']:
+                self.stdout.write(self.style.WARNING(f'      ошибок покупки: {row["errors"]}'))
+
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'symbol': replay.symbol, 'ticks': replay.ticks, 'wall_seconds': replay.wall_seconds, 'users': results},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            self.stdout.write(self.style.SUCCESS(f'Результаты сохранены в {json_path}'))
@@ -0,0 +1,136 @@
+import csv
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from bot.constants import TICK_RECORDER_DIR
+from bot.utils.backtest import RESULT_FIELDS, parameter_grid, sweep
+from bot.utils.tick_recorder import list_days, read_range
+
+# Поля в деньгах и сами параметры; остальное — счетчики
+MONEY_FIELDS = ('profit', 'loss', 'pause', 'pnl', 'realized', 'unrealized')
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise CommandError(f'Дата "{value}" должна быть в формате YYYY-MM-DD')
+
+
+def _parse_values(name, spec):
+    """START:STOP:STEP (STOP включительно) или список через запятую."""
+    try:
+        if ':' in spec:
+            start, stop, step = (float(part) for part in spec.split(':'))
+            if step <= 0 or stop < start:
+                raise CommandError(f'--{name} "{spec}": нужен STEP > 0 и STOP >= START')
+            return np.round(np.arange(start, stop + step / 2, step), 10)
+        return np.array([float(part) for part in spec.split(',') if part.strip()])
+    except ValueError:
+        raise CommandError(f'--{name} "{spec}": ожидается START:STOP:STEP или список через запятую')
+
+
+class Command(BaseCommand):
+    help = (
+        'Перебор параметров автобая (profit, loss, pause) по записанным тикам bookTicker '
+        'векторизованным бэктестером в пуле процессов. Результаты совпадают с replay_autobuy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbol', help='Пара, например KASUSDT')
+        parser.add_argument('--from', dest='date_from', help='Первый день (YYYY-MM-DD, UTC), по умолчанию — первый записанный')
+        parser.add_argument('--to', dest='date_to', help='Последний день включительно (по умолчанию — равен --from)')
+        parser.add_argument('--profit', default='0.5:3:0.5', help='Профит в %%: START:STOP:STEP или список (по умолчанию: 0.5:3:0.5)')
+        parser.add_argument('--loss', default='0.5:3:0.5', help='Падение в %%: START:STOP:STEP или список (по умолчанию: 0.5:3:0.5)')
+        parser.add_argument('--pause', default='0,30,60,120,300', help='Пауза в секундах: START:STOP:STEP или список (по умолчанию: 0,30,60,120,300)')
+        parser.add_argument('--buy-amount', type=float, default=10.0, help='Сумма закупки (по умолчанию: 10)')
+        parser.add_argument('--fee', type=float, default=0.0, help='Комиссия в процентах с каждой стороны (по умолчанию: 0)')
+        parser.add_argument('--workers', type=int, default=None, help='Процессов (по умолчанию: число CPU)')
+        parser.add_argument('--top', type=int, default=20, help='Сколько лучших наборов вывести (по умолчанию: 20)')
+        parser.add_argument('--dir', default=TICK_RECORDER_DIR, help=f'Каталог тиков (по умолчанию: {TICK_RECORDER_DIR})')
+        parser.add_argument('--csv', dest='csv_path', help='Сохранить все наборы в CSV файл')
+        parser.add_argument('--json', dest='json_path', help='Сохранить все наборы в JSON файл')
+
+    def handle(self, *args, **options):
+        symbol = options['symbol'].upper()
+        days = list_days('bookticker', symbol, options['dir'])
+        if not days:
+            raise CommandError(f'Нет записанных тиков bookTicker для {symbol} в {options["dir"]}')
+
+        start = _parse_day(options['date_from']) if options['date_from'] else datetime(
+            days[0].year, days[0].month, days[0].day, tzinfo=timezone.utc
+        )
+        end = (_parse_day(options['date_to']) if options['date_to'] else start) + timedelta(days=1)
+        if end <= start:
+            raise CommandError('--to не может быть раньше --from')
+
+        ticks = read_range('bookticker', symbol, int(start.timestamp() * 1000), int(end.timestamp() * 1000), options['dir'])
+        if len(ticks) < 3:
+            raise CommandError(f'Мало тиков {symbol} за {start:%Y-%m-%d} — {end - timedelta(days=1):%Y-%m-%d}')
+
+        grid = parameter_grid(
+            _parse_values('profit', options['profit']),
+            _parse_values('loss', options['loss']),
+            _parse_values('pause', options['pause']),
+        )
+        size = len(grid['profit'])
+        if not size:
+            raise CommandError('Пустая сетка параметров')
+        if (grid['profit'] <= 0).any() or (grid['loss'] <= 0).any() or (grid['pause'] < 0).any():
+            raise CommandError('profit и loss должны быть > 0, pause >= 0')
+
+        started = time.perf_counter()
+        results = sweep(ticks, grid, buy_amount=options['buy_amount'], fee=options['fee'] / 100, workers=options['workers'])
+        wall = time.perf_counter() - started
+
+        self._report(symbol, ticks, results, wall, options['top'])
+        self._save(symbol, ticks, results, wall, options['csv_path'], options['json_path'])
+
+    def _report(self, symbol, ticks, results, wall, top):
+        size = len(results['profit'])
+        virtual = (int(ticks['ts'][-1]) - int(ticks['ts'][0])) / 1000
+        self.stdout.write(
+            f'{symbol}: {len(ticks)} тиков, {virtual / 3600:.2f} ч рынка, {size} наборов за {wall:.1f} с '
+            f'({size * len(ticks) / wall if wall else 0:,.0f} набор-тиков/с)'
+        )
+        self.stdout.write(
+            f'{"#":>4} {"profit":>6} {"loss":>5} {"pause":>5} {"trades":>6} {"sells":>5} {"open":>4} {"max":>4} '
+            f'{"realized":>10} {"unreal":>10} {"pnl":>10}'
+        )
+        for rank, i in enumerate(np.argsort(-results['pnl'], kind='stable')[:top], 1):
+            self.stdout.write(
+                f'{rank:>4} {results["profit"][i]:>6g} {results["loss"][i]:>5g} {results["pause"][i]:>5g} '
+                f'{int(results["trades"][i]):>6} {int(results["sells"][i]):>5} {int(results["open"][i]):>4} '
+                f'{int(results["max_open"][i]):>4} {results["realized"][i]:>10.4f} {results["unrealized"][i]:>10.4f} '
+                f'{results["pnl"][i]:>10.4f}'
+            )
+
+    def _rows(self, results):
+        columns = ('profit', 'loss', 'pause') + RESULT_FIELDS
+        for i in np.argsort(-results['pnl'], kind='stable'):
+            yield {
+                name: results[name][i].item() if name in MONEY_FIELDS else int(results[name][i])
+                for name in columns
+            }
+
+    def _save(self, symbol, ticks, results, wall, csv_path, json_path):
+        if csv_path:
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=('profit', 'loss', 'pause') + RESULT_FIELDS)
+                writer.writeheader()
+                writer.writerows(self._rows(results))
+            self.stdout.write(self.style.SUCCESS(f'Результаты сохранены в {csv_path}'))
+
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {'symbol': symbol, 'ticks': len(ticks), 'wall_seconds': wall, 'sets': list(self._rows(results))},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            self.stdout.write(self.style.SUCCESS(f'Результаты сохранены в {json_path}'))
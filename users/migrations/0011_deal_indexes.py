@@ -0,0 +1,63 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+def check_duplicate_order_ids(apps, schema_editor):
+    """Уникальный индекс не создастся, если в таблице уже есть дубли order_id."""
+    Deal = apps.get_model('users', 'Deal')
+    duplicates = list(
+        Deal.objects.values('order_id')
+        .annotate(n=models.Count('id'))
+        .filter(n__gt=1)
+        .values_list('order_id', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"Найдены сделки с одинаковым order_id ({', '.join(duplicates)}). "
+            "Удалите или исправьте дубли и повторите migrate."
+        )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY не работает внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('users', '0010_deal_user_order_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_order_ids, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(
+                condition=models.Q(('status__in', ['NEW', 'PARTIALLY_FILLED'])),
+                fields=['user', 'is_autobuy', '-created_at'],
+                name='deal_active_user_idx',
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name='deal',
+            index=models.Index(fields=['user', 'status', 'updated_at'], name='deal_user_status_upd_idx'),
+        ),
+        # Уникальный индекс строим без блокировки записи, затем превращаем его в constraint
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql='CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "deal_order_id_uniq" ON "users_deal" ("order_id");',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "deal_order_id_uniq";',
+                ),
+                migrations.RunSQL(
+                    sql='ALTER TABLE "users_deal" ADD CONSTRAINT "deal_order_id_uniq" UNIQUE USING INDEX "deal_order_id_uniq";',
+                    reverse_sql='ALTER TABLE "users_deal" DROP CONSTRAINT IF EXISTS "deal_order_id_uniq";',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='deal',
+                    constraint=models.UniqueConstraint(fields=('order_id',), name='deal_order_id_uniq'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_deal_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPnl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('deals', models.PositiveIntegerField(default=0)),
+                ('profit', models.DecimalField(decimal_places=8, default=0, max_digits=28)),
+                ('profit_percent_sum', models.DecimalField(decimal_places=8, default=0, max_digits=28)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_pnl', to='users.user')),
+            ],
+            options={
+                'verbose_name': 'Дневной PnL',
+                'verbose_name_plural': 'Дневной PnL',
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='daily_pnl_user_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def backfill_counters(apps, schema_editor):
+    """Счетчик каждого пользователя продолжает уже выданные номера сделок."""
+    Deal = apps.get_model('users', 'Deal')
+    DealCounter = apps.get_model('users', 'DealCounter')
+
+    # Старый код выдавал count() + 1, поэтому берем максимум из числа сделок и наибольшего номера
+    rows = (
+        Deal.objects.values('user_id')
+        .annotate(deals=Count('id'), top=Max('user_order_number'))
+        .order_by()
+    )
+    DealCounter.objects.bulk_create(
+        [
+            DealCounter(user_id=row['user_id'], last_number=max(row['deals'], row['top'] or 0))
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_dailypnl'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='deal_counter', serialize=False, to='users.user')),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Счетчик сделок',
+                'verbose_name_plural': 'Счетчики сделок',
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
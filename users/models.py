@@ -48,5 +48,54 @@ class Deal(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_autobuy = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # Ордер биржи = одна сделка; по order_id ищут обработчики user stream
+            models.UniqueConstraint(fields=["order_id"], name="deal_order_id_uniq"),
+        ]
+        indexes = [
+            # Активные сделки пользователя (автобай, /orders, reconciler): маленький частичный индекс
+            models.Index(
+                fields=["user", "is_autobuy", "-created_at"],
+                name="deal_active_user_idx",
+                condition=models.Q(status__in=["NEW", "PARTIALLY_FILLED"]),
+            ),
+            # Статистика: закрытые сделки пользователя за период
+            models.Index(fields=["user", "status", "updated_at"], name="deal_user_status_upd_idx"),
+        ]
+
     def __str__(self):
         return f"Order ID: {self.order_id}, Symbol: {self.symbol}, Buy Price: {self.buy_price}, Sell Price: {self.sell_price}, Quantity: {self.quantity}, Status: {self.status}"
+
+
+class DealCounter(models.Model):
+    """Последний выданный номер сделки пользователя (Deal.user_order_number)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='deal_counter')
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Счетчик сделок'
+        verbose_name_plural = 'Счетчики сделок'
+
+    def __str__(self):
+        return f"{self.user}: {self.last_number}"
+
+
+class DailyPnl(models.Model):
+    """Сводка закрытых (FILLED) сделок пользователя за день по Москве — для /stats и ежедневной статистики."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_pnl')
+    day = models.DateField()
+    deals = models.PositiveIntegerField(default=0)
+    profit = models.DecimalField(max_digits=28, decimal_places=8, default=0)
+    profit_percent_sum = models.DecimalField(max_digits=28, decimal_places=8, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Дневной PnL'
+        verbose_name_plural = 'Дневной PnL'
+        constraints = [
+            models.UniqueConstraint(fields=["user", "day"], name="daily_pnl_user_day_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.day}: {self.deals} сделок, {self.profit}"